@@ -1,16 +1,53 @@
-from aphrodite.common.outputs import (CompletionOutput, EmbeddingOutput,
-                                      EmbeddingRequestOutput, RequestOutput)
-from aphrodite.common.pooling_params import PoolingParams
-from aphrodite.common.sampling_params import SamplingParams
-from aphrodite.endpoints.llm import LLM
-from aphrodite.engine.aphrodite_engine import AphroditeEngine
-from aphrodite.engine.args_tools import AsyncEngineArgs, EngineArgs
-from aphrodite.engine.async_aphrodite import AsyncAphrodite
-from aphrodite.executor.ray_utils import initialize_ray_cluster
-from aphrodite.modeling.models import ModelRegistry
+import importlib
+from typing import TYPE_CHECKING, Any
 
 from .version import __commit__, __short_commit__, __version__
 
+if TYPE_CHECKING:
+    from aphrodite.common.outputs import (CompletionOutput, EmbeddingOutput,
+                                          EmbeddingRequestOutput,
+                                          RequestOutput)
+    from aphrodite.common.pooling_params import PoolingParams
+    from aphrodite.common.sampling_params import SamplingParams
+    from aphrodite.endpoints.llm import LLM
+    from aphrodite.engine.aphrodite_engine import AphroditeEngine
+    from aphrodite.engine.args_tools import AsyncEngineArgs, EngineArgs
+    from aphrodite.engine.async_aphrodite import AsyncAphrodite
+    from aphrodite.executor.ray_utils import initialize_ray_cluster
+    from aphrodite.modeling.models import ModelRegistry
+
+# The public names and the modules they are imported from on first access,
+# so that importing aphrodite, e.g. to read its version or to run the CLI,
+# does not import torch and the engine.
+_LAZY_IMPORTS = {
+    "LLM": "aphrodite.endpoints.llm",
+    "ModelRegistry": "aphrodite.modeling.models",
+    "SamplingParams": "aphrodite.common.sampling_params",
+    "RequestOutput": "aphrodite.common.outputs",
+    "CompletionOutput": "aphrodite.common.outputs",
+    "EmbeddingOutput": "aphrodite.common.outputs",
+    "EmbeddingRequestOutput": "aphrodite.common.outputs",
+    "AphroditeEngine": "aphrodite.engine.aphrodite_engine",
+    "EngineArgs": "aphrodite.engine.args_tools",
+    "AsyncAphrodite": "aphrodite.engine.async_aphrodite",
+    "AsyncEngineArgs": "aphrodite.engine.args_tools",
+    "initialize_ray_cluster": "aphrodite.executor.ray_utils",
+    "PoolingParams": "aphrodite.common.pooling_params",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_IMPORTS:
+        value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return list(__all__)
+
+
 __all__ = [
     "__commit__",
     "__short_commit__",
@@ -778,6 +778,15 @@ class CacheConfig(ConfigMixin):
         cache_dtype: Data type for kv cache storage.
         num_gpu_blocks_override: Number of GPU blocks to use. This overrides the
             profiled num_gpu_blocks if specified. Does nothing if None.
+        prefix_cache_eviction_policy: Policy used to evict cached blocks when
+            prefix caching is enabled, one of "lru", "lfu" or "gdsf".
+        prefix_cache_cpu_gb: Size of the pinned CPU pool (in GiB per GPU) that
+            blocks evicted from the prefix cache are demoted to. 0 disables
+            prefix cache offloading.
+        prefix_cache_disk_path: Directory of the memory-mapped files that
+            blocks evicted from the CPU pool are saved to. None disables the
+            disk tier.
+        prefix_cache_disk_gb: Size of the disk tier (in GiB per GPU).
     """
 
     def __init__(
@@ -791,6 +800,10 @@ class CacheConfig(ConfigMixin):
         block_size: int = 16,
         gpu_memory_utilization: float = 0.9,
         cache_dtype: str = "auto",
+        prefix_cache_eviction_policy: str = "lru",
+        prefix_cache_cpu_gb: float = 0.0,
+        prefix_cache_disk_path: Optional[str] = None,
+        prefix_cache_disk_gb: float = 0.0,
     ) -> None:
         self.block_size = block_size
         self.gpu_memory_utilization = gpu_memory_utilization
@@ -801,6 +814,10 @@ class CacheConfig(ConfigMixin):
         self.sliding_window = sliding_window
         self.enable_prefix_caching = enable_prefix_caching
         self.cpu_offload_gb = cpu_offload_gb
+        self.prefix_cache_eviction_policy = prefix_cache_eviction_policy
+        self.prefix_cache_cpu_gb = prefix_cache_cpu_gb
+        self.prefix_cache_disk_path = prefix_cache_disk_path
+        self.prefix_cache_disk_gb = prefix_cache_disk_gb
         self._verify_args()
         self._verify_cache_dtype()
         self._verify_prefix_caching()
@@ -808,6 +825,8 @@ class CacheConfig(ConfigMixin):
         # Will be set after profiling.
         self.num_gpu_blocks = None
         self.num_cpu_blocks = None
+        self.num_prefix_cache_cpu_blocks = 0
+        self.num_prefix_cache_disk_blocks = 0
 
     def metrics_info(self):
         # convert cache_config to dict(key: str, value: str) for prometheus
@@ -819,6 +838,21 @@ class CacheConfig(ConfigMixin):
             raise ValueError(
                 "GPU memory utilization must be less than 1.0. Got "
                 f"{self.gpu_memory_utilization}.")
+        if self.prefix_cache_eviction_policy not in ("lru", "lfu", "gdsf"):
+            raise ValueError(
+                "Unknown prefix cache eviction policy: "
+                f"{self.prefix_cache_eviction_policy}. Must be one of "
+                "'lru', 'lfu' or 'gdsf'.")
+        if self.prefix_cache_cpu_gb < 0 or self.prefix_cache_disk_gb < 0:
+            raise ValueError(
+                "Prefix cache offload sizes must be non-negative, but got "
+                f"{self.prefix_cache_cpu_gb} GiB (CPU) and "
+                f"{self.prefix_cache_disk_gb} GiB (disk).")
+        if (self.prefix_cache_disk_path is not None
+                and self.prefix_cache_cpu_gb == 0):
+            raise ValueError(
+                "The prefix cache disk tier is filled from the CPU one. Set "
+                "--prefix-cache-cpu-gb to use --prefix-cache-disk-path.")
 
     def _verify_cache_dtype(self) -> None:
         if self.cache_dtype == "auto":
@@ -891,7 +925,7 @@ class TokenizerPoolConfig:
     extra_config: dict
 
     def __post_init__(self):
-        if self.pool_type not in ("ray", ) and not isinstance(
+        if self.pool_type not in ("ray", "process") and not isinstance(
                 self.pool_type, type):
             raise ValueError(f"Unknown pool type: {self.pool_type}")
         if not isinstance(self.extra_config, dict):
@@ -1158,7 +1192,17 @@ class SchedulerConfig(ConfigMixin):
             APHRODITE_USE_RAY_SPMD_WORKER=1
         single_user_mode: If True, we only allocate blocks for one sequence
             and use the maximum sequence length as the number of tokens.
-        policy: The scheduling policy to use. "fcfs" (default) or "priority".
+        policy: The scheduling policy to use. "fcfs" (default), "priority",
+            "prefix_aware" or "fair_share". "prefix_aware" schedules the
+            waiting requests with the longest cached prompt prefix first.
+            "fair_share" divides the token budget across the tenants that
+            submitted the requests.
+        prefix_aware_max_wait_time: With the "prefix_aware" policy, requests
+            that have been waiting for longer than this many seconds are
+            scheduled first, in FCFS order.
+        tenant_weights: With the "fair_share" policy, the weight of each
+            tenant's share of the token budget. Tenants that are not listed
+            have a weight of 1.
     """
 
     def __init__(self,
@@ -1178,7 +1222,9 @@ class SchedulerConfig(ConfigMixin):
                  multi_step_stream_outputs: bool = True,
                  send_delta_data: bool = False,
                  single_user_mode: bool = False,
-                 policy: str = "fcfs") -> None:
+                 policy: str = "fcfs",
+                 prefix_aware_max_wait_time: float = 10.0,
+                 tenant_weights: Optional[Dict[str, float]] = None) -> None:
         if max_num_batched_tokens is None:
             if enable_chunked_prefill:
                 if num_scheduler_steps > 1:
@@ -1244,6 +1290,8 @@ class SchedulerConfig(ConfigMixin):
         self.send_delta_data = send_delta_data
         self.single_user_mode = single_user_mode
         self.policy = policy
+        self.prefix_aware_max_wait_time = prefix_aware_max_wait_time
+        self.tenant_weights = tenant_weights or {}
         self._verify_args()
 
     def _verify_args(self) -> None:
@@ -1275,6 +1323,25 @@ class SchedulerConfig(ConfigMixin):
                 f"({self.num_scheduler_steps}) must be greater than or "
                 "equal to 1.")
 
+        if self.policy == "prefix_aware":
+            if (self.cache_config is None
+                    or not self.cache_config.enable_prefix_caching
+                    or not self.use_v2_block_manager):
+                raise ValueError(
+                    "The prefix_aware scheduling policy requires prefix "
+                    "caching with the v2 block manager.")
+            if self.prefix_aware_max_wait_time < 0:
+                raise ValueError(
+                    "prefix_aware_max_wait_time "
+                    f"({self.prefix_aware_max_wait_time}) must be greater "
+                    "than or equal to 0.")
+
+        for tenant, weight in self.tenant_weights.items():
+            if weight <= 0:
+                raise ValueError(
+                    f"The weight of tenant {tenant} ({weight}) must be "
+                    "greater than 0.")
+
     @property
     def is_multi_step(self) -> bool:
         return self.num_scheduler_steps > 1
@@ -1341,6 +1408,7 @@ class SpeculativeConfig(ConfigMixin):
         typical_acceptance_sampler_posterior_threshold: Optional[float],
         typical_acceptance_sampler_posterior_alpha: Optional[float],
         disable_logprobs: Optional[bool],
+        speculative_adaptive_length: bool = False,
     ) -> Optional["SpeculativeConfig"]:
         """Create a SpeculativeConfig if possible, else return None.
 
@@ -1401,6 +1469,10 @@ class SpeculativeConfig(ConfigMixin):
                 If set to False, token log probabilities are returned
                 according to the log probability settings in SamplingParams.
                 If not specified, it defaults to True.
+            speculative_adaptive_length (bool): Whether to choose the number
+                of speculative tokens of each step, up to
+                num_speculative_tokens, from the acceptance rates of the
+                requests and the measured stage times.
         Returns:
             Optional["SpeculativeConfig"]: An instance of SpeculativeConfig if
                 the necessary conditions are met, else None.
@@ -1531,6 +1603,7 @@ class SpeculativeConfig(ConfigMixin):
                 typical_acceptance_sampler_posterior_alpha,
             disable_logprobs=disable_logprobs,
             disable_log_stats=disable_log_stats,
+            speculative_adaptive_length=speculative_adaptive_length,
         )
 
     @staticmethod
@@ -1616,6 +1689,7 @@ class SpeculativeConfig(ConfigMixin):
         typical_acceptance_sampler_posterior_alpha: float,
         disable_logprobs: bool,
         disable_log_stats: bool,
+        speculative_adaptive_length: bool = False,
     ):
         """Create a SpeculativeConfig object.
 
@@ -1652,6 +1726,10 @@ class SpeculativeConfig(ConfigMixin):
                 returned.
             disable_log_stats: Whether to disable periodic printing of stage
                 times in speculative decoding.
+            speculative_adaptive_length: Whether to choose the number of
+                speculative tokens of each step, up to num_speculative_tokens,
+                and the requests to speculate on, from their acceptance rates
+                and the measured stage times.
         """
         self.draft_model_config = draft_model_config
         self.draft_parallel_config = draft_parallel_config
@@ -1668,6 +1746,7 @@ class SpeculativeConfig(ConfigMixin):
             typical_acceptance_sampler_posterior_alpha
         self.disable_logprobs = disable_logprobs
         self.disable_log_stats = disable_log_stats
+        self.speculative_adaptive_length = speculative_adaptive_length
 
         self._verify_args()
 
@@ -28,6 +28,7 @@ if TYPE_CHECKING:
     APHRODITE_TRACE_FUNCTION: int = 0
     APHRODITE_ATTENTION_BACKEND: Optional[str] = None
     APHRODITE_USE_SAMPLING_KERNELS: bool = False
+    APHRODITE_DISABLE_PERSISTENT_SAMPLING_STATE: bool = False
     APHRODITE_PP_LAYER_PARTITION: Optional[str] = None
     APHRODITE_CPU_KVCACHE_SPACE: int = 0
     APHRODITE_CPU_OMP_THREADS_BIND: str = ""
@@ -56,6 +57,7 @@ if TYPE_CHECKING:
     APHRODITE_TEST_FORCE_FP8_MARLIN: bool = False
     APHRODITE_PLUGINS: Optional[List[str]] = None
     APHRODITE_RPC_TIMEOUT: int = 20000
+    APHRODITE_MQ_OUTPUT_TRANSPORT: str = "msgspec"
     APHRODITE_FORCE_SINGLE_USER_PREFIX_CACHE: bool = False
     APHRODITE_TEST_DYNAMO_GRAPH_CAPTURE: int = 0
     APHRODITE_TEST_DYNAMO_FULLGRAPH_CAPTURE: int = 0
@@ -66,6 +68,8 @@ if TYPE_CHECKING:
     APHRODITE_TEST_ENABLE_ARTIFICIAL_PREEMPT: bool = False
     APHRODITE_REQUEST_LEVEL_METRICS: bool = False
     APHRODITE_TORCH_COMPILE_LEVEL: int = 0
+    APHRODITE_GUIDED_DECODING_MASK_CACHE_SIZE: int = 4096
+    APHRODITE_GRAMMAR_CACHE_PATH: Optional[str] = os.path.join(APHRODITE_CACHE_ROOT, "grammars")  # noqa: E501
 
 
 def get_default_cache_root():
@@ -270,6 +274,13 @@ environment_variables: Dict[str, Callable[[], Any]] = {
     "APHRODITE_USE_SAMPLING_KERNELS":
     lambda: bool(int(os.getenv("APHRODITE_USE_SAMPLING_KERNELS", "0"))),
 
+    # If set, the sampler rebuilds its sampling tensors from the sampling
+    # metadata on every step instead of keeping the sampling parameters of
+    # running sequences on the device
+    "APHRODITE_DISABLE_PERSISTENT_SAMPLING_STATE":
+    lambda: bool(
+        int(os.getenv("APHRODITE_DISABLE_PERSISTENT_SAMPLING_STATE", "0"))),
+
     # Pipeline stage partition strategy
     "APHRODITE_PP_LAYER_PARTITION":
     lambda: os.getenv("APHRODITE_PP_LAYER_PARTITION", None),
@@ -391,6 +402,12 @@ environment_variables: Dict[str, Callable[[], Any]] = {
     "APHRODITE_RPC_TIMEOUT":
     lambda: int(os.getenv("APHRODITE_RPC_TIMEOUT", "20000")),
 
+    # How the multiprocessing engine sends request outputs to the server:
+    # "pickle", "msgspec" (only the new part of streamed outputs), or
+    # "shm" (msgspec through a shared memory ring buffer).
+    "APHRODITE_MQ_OUTPUT_TRANSPORT":
+    lambda: os.getenv("APHRODITE_MQ_OUTPUT_TRANSPORT", "msgspec").lower(),
+
     # a list of plugin names to load, separated by commas.
     # if this is not set, it means all plugins will be loaded
     # if this is set to an empty string, no plugins will be loaded
@@ -425,6 +442,22 @@ environment_variables: Dict[str, Callable[[], Any]] = {
     # interval-based metrics.
     "APHRODITE_REQUEST_LEVEL_METRICS":
     lambda: bool(int(os.getenv("APHRODITE_REQUEST_LEVEL_METRICS", "0"))),
+
+    # The number of allowed-token masks of guided decoding states cached
+    # across requests, in each process. A mask takes 1 bit per token.
+    "APHRODITE_GUIDED_DECODING_MASK_CACHE_SIZE":
+    lambda: int(os.getenv("APHRODITE_GUIDED_DECODING_MASK_CACHE_SIZE",
+                          "4096")),
+
+    # Directory of the token masks of the parser states of GBNF grammars,
+    # reused across processes. Set it to an empty string to only keep them
+    # in memory.
+    "APHRODITE_GRAMMAR_CACHE_PATH":
+    lambda: os.path.expanduser(
+        os.getenv(
+            "APHRODITE_GRAMMAR_CACHE_PATH",
+            os.path.join(get_default_cache_root(), "aphrodite", "grammars"),
+        )) or None,
 }
 
 # end-env-vars-definition
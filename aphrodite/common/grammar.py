@@ -1,18 +1,31 @@
+import atexit
 import collections
 import functools
+import hashlib
+import os
+import threading
+import time
 import weakref
+from collections import OrderedDict
 from copy import copy, deepcopy
 from dataclasses import dataclass, fields
-from typing import List, Optional, Set, Union
+from typing import Dict, List, Optional, Set, Tuple, Union
 
+import lark
 import regex
 import torch
+import torch.nn.functional as F
 from lark import Lark
 from lark.lexer import Pattern, PatternRE, PatternStr, Token
 from lark.parsers.lalr_interactive_parser import InteractiveParser
 from lark.parsers.lalr_parser_state import ParserState
+from loguru import logger
 from transformers import PreTrainedTokenizer, PreTrainedTokenizerFast
 
+import aphrodite.common.envs as envs
+from aphrodite.modeling.guided_decoding.token_bitmask import (
+    apply_token_bitmasks, pack_token_bitmask)
+
 
 class FastParserState(ParserState):
     copy_memo = {}
@@ -360,6 +373,7 @@ class TokenVocab:
         per token
     - iter: iterate over normalized token strings
     - vocab[token_str]: return token id set
+    - trie: the normalized token strings, to walk them by common prefix
     """
 
     def __init__(self,
@@ -379,6 +393,12 @@ class TokenVocab:
                 [char in legal_chars for char in norm_token]):
                 self.norm_vocab[norm_token].add(token_id)
 
+        self.size = max(tokenizer.vocab.values()) + 1
+        self.trie = Trie()
+        for tok_str in self.norm_vocab:
+            if tok_str is not None:
+                self.trie.insert(tok_str, tok_str)
+
     def __iter__(self):
         return iter(self.norm_vocab)
 
@@ -386,6 +406,146 @@ class TokenVocab:
         return self.norm_vocab[tok_str]
 
 
+@functools.lru_cache(8)
+def _get_token_vocab(tokenizer, legal_chars: Optional[frozenset]):
+    return TokenVocab(tokenizer, legal_chars=legal_chars)
+
+
+def _get_grammar_digest(tokenizer, grammar: str, grammar_start: str,
+                        legal_chars: Optional[frozenset]) -> str:
+    """Identifies the parser states and the token masks of a grammar across
+    processes."""
+    key = (lark.__version__, grammar, grammar_start, type(tokenizer).__name__,
+           tokenizer.name_or_path, len(tokenizer),
+           None if legal_chars is None else sorted(legal_chars))
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+# The least time between two saves of the masks of a grammar.
+_SAVE_INTERVAL_S = 60.0
+
+MaskKey = Tuple[Tuple[int, ...], str]
+
+
+class CompiledGrammar:
+    """
+    The token masks of the parser states of a grammar, for a vocabulary.
+    A mask is computed the first time its state is reached, and the least
+    recently used masks are dropped past max_size. The masks of the states
+    between terminals, which are reached by every request using the grammar,
+    are saved to the cache directory, so that later processes only look
+    them up. Saves are throttled and written by a background thread, and
+    the last one happens when the process exits.
+    """
+
+    def __init__(self,
+                 digest: str,
+                 cache_dir: Optional[str],
+                 max_size: Optional[int] = None):
+        self.max_size = (envs.APHRODITE_GUIDED_DECODING_MASK_CACHE_SIZE
+                         if max_size is None else max_size)
+        # (parser state stack, partial terminal) -> packed token bitmask
+        self.masks: OrderedDict[MaskKey, torch.Tensor] = OrderedDict()
+        self.path = None
+        if cache_dir is not None:
+            self.path = os.path.join(cache_dir, f"{digest}.pt")
+            if os.path.exists(self.path):
+                try:
+                    self.masks.update(
+                        torch.load(self.path, weights_only=True))
+                except Exception as e:
+                    logger.warning(
+                        f"Ignoring the grammar cache {self.path}: {e}")
+                self._evict()
+        # The number of masks to save that were computed since the last save.
+        self._num_unsaved = 0
+        self._last_save_time = -_SAVE_INTERVAL_S
+        self._save_thread: Optional[threading.Thread] = None
+
+    def get(self, key: MaskKey) -> Optional[torch.Tensor]:
+        bitmask = self.masks.get(key)
+        if bitmask is not None:
+            self.masks.move_to_end(key)
+        return bitmask
+
+    def add(self, key: MaskKey, bitmask: torch.Tensor) -> None:
+        self.masks[key] = bitmask
+        self._evict()
+        if self._should_save(key):
+            self._num_unsaved += 1
+
+    def _evict(self) -> None:
+        while len(self.masks) > max(self.max_size, 0):
+            self.masks.popitem(last=False)
+
+    @staticmethod
+    def _should_save(key: MaskKey) -> bool:
+        # The partial terminal, e.g. the characters of an open string, is
+        # specific to a request.
+        return key[1] == ""
+
+    def maybe_save(self) -> None:
+        """Start saving the masks in the background, unless there are no
+        new ones, a save is in progress or the last one was too recent."""
+        if (self.path is None or not self._num_unsaved
+                or time.monotonic() - self._last_save_time < _SAVE_INTERVAL_S
+                or (self._save_thread is not None
+                    and self._save_thread.is_alive())):
+            return
+        masks = self._take_masks_to_save()
+        self._save_thread = threading.Thread(target=self._write,
+                                             args=(masks, ),
+                                             daemon=True)
+        self._save_thread.start()
+
+    def flush(self) -> None:
+        """Wait for the save in progress, then save the new masks."""
+        if self._save_thread is not None:
+            self._save_thread.join()
+        if self.path is not None and self._num_unsaved:
+            self._write(self._take_masks_to_save())
+
+    def _take_masks_to_save(self) -> Dict[MaskKey, torch.Tensor]:
+        self._num_unsaved = 0
+        self._last_save_time = time.monotonic()
+        return {
+            key: bitmask
+            for key, bitmask in self.masks.items() if self._should_save(key)
+        }
+
+    def _write(self, masks: Dict[MaskKey, torch.Tensor]) -> None:
+        assert self.path is not None
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # Written then renamed, so that processes sharing the directory
+            # never load a partial file.
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            torch.save(masks, tmp_path)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Failed to save the grammar cache {self.path}: "
+                           f"{e}")
+
+
+_compiled_grammars: Dict[Tuple[str, Optional[str]], CompiledGrammar] = {}
+
+
+def get_compiled_grammar(digest: str,
+                         cache_dir: Optional[str]) -> CompiledGrammar:
+    """Return the compiled grammar of the digest shared by the processors of
+    this process."""
+    key = (digest, cache_dir)
+    if key not in _compiled_grammars:
+        _compiled_grammars[key] = CompiledGrammar(digest, cache_dir)
+    return _compiled_grammars[key]
+
+
+@atexit.register
+def _flush_compiled_grammars() -> None:
+    for compiled in _compiled_grammars.values():
+        compiled.flush()
+
+
 class NextTokenValidator:
 
     def __init__(
@@ -394,11 +554,38 @@ class NextTokenValidator:
         grammar: str,
         grammar_start: str = "start",
         legal_chars: Optional[set[str]] = None,
+        use_disk_cache: bool = True,
     ):
         self.tokenizer = tokenizer
-        self.vocab = TokenVocab(tokenizer, legal_chars=legal_chars)
+        legal_chars = None if legal_chars is None else frozenset(legal_chars)
+        self.vocab = _get_token_vocab(tokenizer, legal_chars)
         self.root_parser = IncrementalParserState.from_grammar(
             grammar, grammar_start)
+        self.compiled = get_compiled_grammar(
+            _get_grammar_digest(tokenizer, grammar, grammar_start,
+                                legal_chars),
+            envs.APHRODITE_GRAMMAR_CACHE_PATH if use_disk_cache else None)
+
+    def _get_valid_token_strs(self, parser, partial_term):
+        """
+        Walk the vocab trie depth first. A string the parser rejects has no
+        valid extension, so the tokens starting with it are skipped without
+        being checked.
+        """
+        if self.vocab.trie.root.is_end_of_word and parser.is_valid_next_seq(
+                partial_term):
+            yield ""
+        stack = list(self.vocab.trie.root.children.items())
+        while stack:
+            prefix, node = stack.pop()
+            if not parser.is_valid_next_seq(partial_term + prefix):
+                continue
+            if node.is_end_of_word:
+                yield prefix
+            stack.extend(
+                (prefix + char, child) for char, child in node.children.items())
+        if partial_term == "" and parser.is_valid_next_seq(None):
+            yield None
 
     def get_valid_next_token_strs(self, full_seq):
         """
@@ -407,15 +594,9 @@ class NextTokenValidator:
 
         result = self.root_parser[full_seq]
         if result is None:
-            return []
+            return
         partial_term, parser = result
-        for token in self.vocab:
-            if token is None:
-                if partial_term == "" and parser.is_valid_next_seq(token):
-                    yield None
-            else:
-                if parser.is_valid_next_seq(partial_term + token):
-                    yield token
+        yield from self._get_valid_token_strs(parser, partial_term)
 
     def get_valid_next_token_ids(self, full_seq):
         """
@@ -424,6 +605,26 @@ class NextTokenValidator:
         for tok_str in self.get_valid_next_token_strs(full_seq):
             yield from self.vocab[tok_str]
 
+    def get_token_bitmask(self, full_seq) -> torch.Tensor:
+        """
+        Packed bitmask of the valid token ids given the full sequence, looked
+        up in the compiled grammar
+        """
+        result = self.root_parser[full_seq]
+        if result is None:
+            return pack_token_bitmask([], self.vocab.size)
+        partial_term, parser = result
+        key = (tuple(parser.interactive_parser.parser_state.state_stack),
+               partial_term)
+        bitmask = self.compiled.get(key)
+        if bitmask is None:
+            bitmask = pack_token_bitmask([
+                token_id for tok_str in self._get_valid_token_strs(
+                    parser, partial_term) for token_id in self.vocab[tok_str]
+            ], self.vocab.size)
+            self.compiled.add(key, bitmask)
+        return bitmask
+
 
 class GrammarLogitsProcessor(NextTokenValidator):
     """
@@ -432,14 +633,14 @@ class GrammarLogitsProcessor(NextTokenValidator):
 
     def __call__(self, logits: torch.Tensor,
                  token_ids: List[List[int]]) -> None:
+        bitmasks = []
+        num_words = (logits.shape[-1] + 31) // 32
         for i in range(len(token_ids)):
             # get valid token IDs given prior tokens
             sequence = self.tokenizer.decode(token_ids[i])
-            valid_token_ids = self.get_valid_next_token_ids(sequence)
-            valid = torch.tensor(list(valid_token_ids), dtype=torch.long)
-
-            # modify logits given valid token IDs
-            N = len(logits[i])
-            mask = torch.zeros(N, dtype=torch.bool)
-            mask[valid] = True
-            logits[i][~mask] = float("-inf")
+            bitmask = self.get_token_bitmask(sequence)
+            # the logits may cover more ids than the tokenizer
+            bitmasks.append(
+                F.pad(bitmask, (0, max(num_words - bitmask.shape[0], 0))))
+        self.compiled.maybe_save()
+        apply_token_bitmasks(logits, list(range(len(token_ids))), bitmasks)
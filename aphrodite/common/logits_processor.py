@@ -1,10 +1,77 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Union
 
 import torch
 
+from aphrodite.common.utils import make_tensor_with_pad
+
+
+@dataclass
+class LogitsProcessorBatch:
+    """The rows of the logits of a step that use a batched logits processor,
+    with the tokens of their sequences."""
+    rows: List[int]
+    prompt_token_ids: List[Sequence[int]]
+    output_token_ids: List[Sequence[int]]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get_rows(self, device: Union[str, torch.device]) -> torch.Tensor:
+        """The rows, to index the logits with."""
+        return torch.tensor(self.rows, dtype=torch.long, device=device)
+
+    def get_output_token_ids(self,
+                             device: Union[str, torch.device],
+                             pad: int = -1,
+                             max_len: Optional[int] = None) -> torch.Tensor:
+        """The output tokens of each row, padded to the longest."""
+        return make_tensor_with_pad(self.output_token_ids,
+                                    pad,
+                                    torch.long,
+                                    max_len=max_len,
+                                    device=device)
+
+    def get_prompt_token_ids(self,
+                             device: Union[str, torch.device],
+                             pad: int = -1,
+                             max_len: Optional[int] = None) -> torch.Tensor:
+        """The prompt tokens of each row, padded to the longest."""
+        return make_tensor_with_pad(self.prompt_token_ids,
+                                    pad,
+                                    torch.long,
+                                    max_len=max_len,
+                                    device=device)
+
+
+class BatchedLogitsProcessor(ABC):
+    """A logits processor that is called once per step with every row of the
+    batch that uses it, instead of once per row.
+
+    The rows of a step are grouped by processor object, so a processor shared
+    by several requests, or by the sequences of a request, gets all of their
+    rows at once. Processors of the same class can also be applied together
+    by overriding `apply_batches`. The processors of a row are still applied
+    in the order of its logits_processors.
+    """
+
+    @abstractmethod
+    def apply_batch(self, logits: torch.Tensor,
+                    batch: LogitsProcessorBatch) -> None:
+        """Edit the given rows of the logits of the whole batch in-place."""
+        raise NotImplementedError
 
-class LogitsProcessor(ABC):
+    @classmethod
+    def apply_batches(cls, logits: torch.Tensor,
+                      processors: List["BatchedLogitsProcessor"],
+                      batches: List[LogitsProcessorBatch]) -> None:
+        """Apply distinct processors of this class, each to its rows."""
+        for processor, batch in zip(processors, batches):
+            processor.apply_batch(logits, batch)
+
+
+class LogitsProcessor(BatchedLogitsProcessor):
 
     @abstractmethod
     def __call__(self, output_tokens: List[int],
@@ -18,6 +85,13 @@ class LogitsProcessor(ABC):
         """Logits are edited in-place"""
         pass
 
+    def apply_batch(self, logits: torch.Tensor,
+                    batch: LogitsProcessorBatch) -> None:
+        rows = batch.get_rows(logits.device)
+        batch_logits = logits[rows]
+        self.batched(batch_logits, batch.output_token_ids)
+        logits[rows] = batch_logits
+
 
 class BiasLogitsProcessor(LogitsProcessor):
     """Apply an additive bias to specific token logits.
@@ -299,11 +299,10 @@ class SamplingParams(
             samplers are applied.
         guided_decoding: If provided, the engine will construct a guided
             decoding logits processor from these parameters. Defaults to None.
-        logit_bias: If provided, the engine will construct a logits processor
-            that applies these logit biases. Defaults to None.
-        allowed_token_ids: If provided, the engine will construct a logits
-            processor which only retains scores for the given token ids.
-            Defaults to None.
+        logit_bias: If provided, the sampler adds these biases to the logits
+            of the given token ids. Defaults to None.
+        allowed_token_ids: If provided, the sampler only retains scores for
+            the given token ids. Defaults to None.
     """
 
     n: int = 1
@@ -371,6 +370,7 @@ class SamplingParams(
 
     # Fields used to construct logits processors
     guided_decoding: Optional[GuidedDecodingParams] = None
+    # Applied by the sampler to the whole batch at once
     logit_bias: Optional[Dict[int, float]] = None
     allowed_token_ids: Optional[List[int]] = None
 
@@ -15,8 +15,11 @@ import torch
 
 from aphrodite.common.pooling_params import PoolingParams
 from aphrodite.common.sampling_params import SamplingParams
+from aphrodite.common.token_index import (NGramIndex, PromptLookupIndex,
+                                          TokenPositionIndex)
 from aphrodite.inputs.parse import is_encoder_decoder_inputs
 from aphrodite.lora.request import LoRARequest
+from aphrodite.processing.block.hashing import get_extra_hash
 from aphrodite.prompt_adapter.request import PromptAdapterRequest
 from aphrodite.spec_decode.metrics import SpecDecodeWorkerMetrics
 
@@ -130,7 +133,9 @@ class SequenceDataDelta(
 
 
 class SequenceData(msgspec.Struct,
-                   omit_defaults=True):  # type: ignore[call-arg]
+                   omit_defaults=True,  # type: ignore[call-arg]
+                   dict=True,  # type: ignore[call-arg]
+                   weakref=True):  # type: ignore[call-arg]
     """Data associated with a sequence.
 
     Args:
@@ -143,6 +148,9 @@ class SequenceData(msgspec.Struct,
         output_token_ids: The token IDs of the output.
         cumulative_logprob: The cumulative log probability of the output.
     """
+    # NOTE: `dict=True` lets us attach process-local caches (e.g. the token
+    # indices) as plain attributes. They are never serialized, so a
+    # worker that receives a fresh copy rebuilds them lazily.
     # NOTE: we cannot use Union[List, array] because msgspec cannot support
     # union of 2 list types.
     _prompt_token_ids: array
@@ -245,6 +253,10 @@ class SequenceData(msgspec.Struct,
         self._output_token_ids = array(APHRODITE_TOKEN_ID_ARRAY_TYPE,
                                        new_output_token_ids)
         self._update_cached_all_tokens()
+        # The token indices are rebuilt on next use.
+        self.__dict__.pop("_token_position_index", None)
+        self.__dict__.pop("_ngram_indices", None)
+        self.__dict__.pop("_prompt_lookup_indices", None)
 
     @property
     def output_token_ids_array(self) -> array:
@@ -269,6 +281,55 @@ class SequenceData(msgspec.Struct,
         self._new_appended_tokens.append(token_id)
         self._cached_all_token_ids.append(token_id)
         self._cumulative_logprob += logprob
+        if self.__dict__:
+            self._update_token_indices((token_id, ))
+
+    def _update_token_indices(self, token_ids: List[int]) -> None:
+        token_position_index = self.__dict__.get("_token_position_index")
+        if token_position_index is not None:
+            token_position_index.extend(token_ids)
+        for ngram_index in self.__dict__.get("_ngram_indices", {}).values():
+            ngram_index.extend(token_ids)
+        for prompt_lookup_index in self.__dict__.get("_prompt_lookup_indices",
+                                                     {}).values():
+            prompt_lookup_index.extend(token_ids)
+
+    def get_token_position_index(self) -> TokenPositionIndex:
+        """Return the token -> positions index of this sequence, building it
+        on first use. It is kept up to date as tokens are appended."""
+        token_position_index = self.__dict__.get("_token_position_index")
+        if token_position_index is None:
+            token_position_index = TokenPositionIndex(
+                self._cached_all_token_ids)
+            self.__dict__["_token_position_index"] = token_position_index
+        return token_position_index
+
+    def get_ngram_index(self, ngram_size: int) -> NGramIndex:
+        """Return the n-gram index of this sequence for `ngram_size`, building
+        it on first use. It is kept up to date as tokens are appended."""
+        ngram_indices: Dict[int, NGramIndex] = self.__dict__.setdefault(
+            "_ngram_indices", {})
+        ngram_index = ngram_indices.get(ngram_size)
+        if ngram_index is None:
+            ngram_index = NGramIndex(ngram_size, self._cached_all_token_ids)
+            ngram_indices[ngram_size] = ngram_index
+        return ngram_index
+
+    def get_prompt_lookup_index(self, min_ngram_size: int,
+                                max_ngram_size: int) -> PromptLookupIndex:
+        """Return the prompt lookup index of this sequence for n-grams of
+        [min_ngram_size, max_ngram_size] tokens, building it on first use. It
+        is kept up to date as tokens are appended."""
+        prompt_lookup_indices: Dict[Tuple[int, int], PromptLookupIndex]
+        prompt_lookup_indices = self.__dict__.setdefault(
+            "_prompt_lookup_indices", {})
+        key = (min_ngram_size, max_ngram_size)
+        prompt_lookup_index = prompt_lookup_indices.get(key)
+        if prompt_lookup_index is None:
+            prompt_lookup_index = PromptLookupIndex(
+                min_ngram_size, max_ngram_size, self._cached_all_token_ids)
+            prompt_lookup_indices[key] = prompt_lookup_index
+        return prompt_lookup_index
 
     def get_len(self) -> int:
         return len(self._output_token_ids) + len(self._prompt_token_ids)
@@ -347,6 +408,8 @@ class SequenceData(msgspec.Struct,
         self._stage = delta.new_stage
         self._output_token_ids.extend(delta.new_output_token_ids)
         self._cached_all_token_ids.extend(delta.new_output_token_ids)
+        if self.__dict__:
+            self._update_token_indices(delta.new_output_token_ids)
 
     @property
     def stage(self) -> SequenceStage:
@@ -442,11 +505,15 @@ class Sequence:
         self._last_output_token_ids_offset: int = 0
         self._last_output_text_offset: int = 0
 
-        # Used for incremental detokenization
+        # Used for incremental detokenization. With a fast tokenizer the
+        # offsets index the token ids, otherwise they index self.tokens.
         self.prefix_offset = 0
         self.read_offset = 0
-        # Input + output tokens
+        # Input + output tokens, only kept for slow tokenizers.
         self.tokens: Optional[List[str]] = None
+        # Used for incremental stop string matching: the node of the stop
+        # string matcher and the length of the output text it has read.
+        self.stop_string_state: Optional[Tuple[int, int]] = None
 
     @property
     def n_blocks(self) -> int:
@@ -499,6 +566,13 @@ class Sequence:
         return self.prompt_adapter_request.prompt_adapter_id \
                         if self.prompt_adapter_request else 0
 
+    @cached_property
+    def extra_hash(self) -> Optional[int]:
+        """The hash of what the KV cache of the sequence depends on besides
+        its tokens, which keys the hashes of its blocks for prefix caching."""
+        return get_extra_hash(self.lora_int_id, self.prompt_adapter_id,
+                              [self.multi_modal_data, self.mm_processor_kwargs])
+
     def get_output_text_to_return(self, buffer_length: int,
                                   delta: bool) -> str:
         """If delta is True, only new text since the last call to
@@ -546,7 +620,7 @@ class Sequence:
         # this in the future.
         num_tokens = self.num_hashed_tokens_of_block(logical_idx)
         hashed_tokens = self.data.get_prefix_token_ids(num_tokens)
-        return hash((hashed_tokens, self.lora_int_id))
+        return hash((hashed_tokens, self.extra_hash))
 
     def num_hashed_tokens_of_block(self, logical_idx: int):
         return logical_idx * self.block_size + self.block_size
@@ -662,6 +736,8 @@ class SequenceGroup:
                      unless you are working with an encoder/decoder model.
         prompt_adapter_request: Prompt Adapter request.
         priority: User-defined priority of the request.
+        tenant: The tenant that submitted the request, used for fair-share
+            scheduling.
     """
 
     def __init__(
@@ -676,6 +752,7 @@ class SequenceGroup:
         encoder_seq: Optional[Sequence] = None,
         prompt_adapter_request: Optional[PromptAdapterRequest] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> None:
         self.request_id = request_id
         self.seqs = seqs
@@ -697,6 +774,7 @@ class SequenceGroup:
         self.prompt_adapter_request = prompt_adapter_request
         self.encoder_seq = encoder_seq
         self.priority = priority
+        self.tenant = tenant
         self.cached_request_output = None
 
     @property
@@ -1330,6 +1408,9 @@ class ExecuteModelRequest(
                                    int]] = msgspec.field(default_factory=list)
     # Blocks to copy. Source to dest block.
     blocks_to_copy: List[Tuple[int, int]] = msgspec.field(default_factory=list)
+    # Prefix cache offload transfers. List of (PrefixCacheTransfer, src, dst).
+    prefix_cache_transfers: List[Tuple[int, int, int]] = msgspec.field(
+        default_factory=list)
     # Virtual engine ID for pipeline parallel.
     virtual_engine: int = 0
     # The number of slots for lookahead decoding.
@@ -1384,6 +1465,7 @@ class ExecuteModelRequest(
             blocks_to_swap_in=self.blocks_to_swap_in.copy(),
             blocks_to_swap_out=self.blocks_to_swap_out.copy(),
             blocks_to_copy=self.blocks_to_copy.copy(),
+            prefix_cache_transfers=self.prefix_cache_transfers.copy(),
             virtual_engine=self.virtual_engine,
             num_lookahead_slots=self.num_lookahead_slots,
             running_queue_size=self.running_queue_size,
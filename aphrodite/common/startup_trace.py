@@ -0,0 +1,90 @@
+"""Wall time and peak memory of the phases of engine startup.
+
+Phases are recorded in the process that runs them, which covers the engine
+and the driver worker. Workers in other processes are not traced.
+"""
+import json
+import resource
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@dataclass
+class StartupPhase:
+    name: str
+    # Name of the phase this one is nested in.
+    parent: Optional[str]
+    # Relative to the creation of the trace.
+    start_s: float
+    duration_s: float
+    # Peak RSS of the process at the end of the phase.
+    peak_rss_mb: float
+
+
+class StartupTrace:
+    """Records the phases of startup, in the order they end."""
+
+    def __init__(self) -> None:
+        self.start_time = time.perf_counter()
+        self.phases: List[StartupPhase] = []
+        self._stack: List[str] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        parent = self._stack[-1] if self._stack else None
+        self._stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._stack.pop()
+            self.phases.append(
+                StartupPhase(name=name,
+                             parent=parent,
+                             start_s=start - self.start_time,
+                             duration_s=end - start,
+                             peak_rss_mb=_peak_rss_mb()))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_s": time.perf_counter() - self.start_time,
+            "peak_rss_mb": _peak_rss_mb(),
+            "phases": [asdict(phase) for phase in self.phases],
+        }
+
+    def dump(self, path: str) -> None:
+        """Write the trace to a JSON file, or to the log if path is "-"."""
+        trace = json.dumps(self.to_dict(), indent=2)
+        if path == "-":
+            logger.info(f"Startup trace:\n{trace}")
+            return
+        with open(path, "w") as f:
+            f.write(trace)
+        logger.info(f"Startup trace written to {path}")
+
+
+_startup_trace = StartupTrace()
+
+
+def get_startup_trace() -> StartupTrace:
+    return _startup_trace
+
+
+def startup_phase(name: str):
+    """Context manager timing a phase of startup."""
+    return _startup_trace.phase(name)
+
+
+def maybe_dump_startup_trace(path: Optional[str]) -> None:
+    if path is not None:
+        _startup_trace.dump(path)
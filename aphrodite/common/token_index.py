@@ -0,0 +1,159 @@
+"""Token indices that live alongside a sequence and are updated incrementally
+as new tokens are appended, so that sampling stages which look back over the
+whole context do not have to rescan it on every decode step."""
+from array import array
+from typing import Dict, Iterable, List, Set, Tuple
+
+from aphrodite.constants import APHRODITE_TOKEN_ID_ARRAY_TYPE
+
+
+class TokenPositionIndex:
+    """Maps every token id of a sequence to the (ascending) positions at which
+    it occurs.
+
+    Appending a token is O(1), and the most recent occurrences of a token can
+    be read without touching the rest of the sequence.
+    """
+
+    def __init__(self, token_ids: Iterable[int] = ()):
+        self._positions: Dict[int, array] = {}
+        self._num_tokens = 0
+        self.extend(token_ids)
+
+    def __len__(self) -> int:
+        return self._num_tokens
+
+    def append(self, token_id: int) -> None:
+        positions = self._positions.get(token_id)
+        if positions is None:
+            positions = array(APHRODITE_TOKEN_ID_ARRAY_TYPE)
+            self._positions[token_id] = positions
+        positions.append(self._num_tokens)
+        self._num_tokens += 1
+
+    def extend(self, token_ids: Iterable[int]) -> None:
+        for token_id in token_ids:
+            self.append(token_id)
+
+    def last_positions(self, token_id: int, count: int) -> array:
+        """Return up to `count` most recent positions of `token_id`, in
+        ascending order. A non-positive `count` returns all of them."""
+        positions = self._positions.get(token_id)
+        if positions is None:
+            return array(APHRODITE_TOKEN_ID_ARRAY_TYPE)
+        if count <= 0:
+            return positions[:]
+        return positions[-count:]
+
+
+class NGramIndex:
+    """Maps every (n-1)-token context of a sequence to the set of tokens that
+    followed it, i.e. the n-grams seen so far.
+
+    Appending a token is O(n), and the tokens that would complete an already
+    seen n-gram are read without touching the rest of the sequence.
+    """
+
+    def __init__(self, ngram_size: int, token_ids: Iterable[int] = ()):
+        assert ngram_size > 0
+        self.ngram_size = ngram_size
+        self._next_tokens: Dict[Tuple[int, ...], Set[int]] = {}
+        # The last (ngram_size - 1) tokens of the sequence.
+        self._context: Tuple[int, ...] = ()
+        self.extend(token_ids)
+
+    def append(self, token_id: int) -> None:
+        context_len = self.ngram_size - 1
+        if len(self._context) == context_len:
+            next_tokens = self._next_tokens.get(self._context)
+            if next_tokens is None:
+                next_tokens = set()
+                self._next_tokens[self._context] = next_tokens
+            next_tokens.add(token_id)
+        if context_len > 0:
+            self._context = (*self._context, token_id)[-context_len:]
+
+    def extend(self, token_ids: Iterable[int]) -> None:
+        for token_id in token_ids:
+            self.append(token_id)
+
+    def banned_tokens(self) -> Set[int]:
+        """Return the tokens that would repeat an n-gram if generated next."""
+        return self._next_tokens.get(self._context, set())
+
+
+class PromptLookupIndex:
+    """Maps every n-gram of a sequence, for each size in
+    [min_ngram_size, max_ngram_size], to the tokens that followed it, with the
+    position of their first occurrence and how often they occurred.
+
+    Appending a token is O(max_ngram_size), and the continuations of the
+    current suffix are looked up without touching the rest of the sequence.
+    """
+
+    def __init__(self,
+                 min_ngram_size: int,
+                 max_ngram_size: int,
+                 token_ids: Iterable[int] = ()):
+        assert 0 < min_ngram_size <= max_ngram_size
+        self.min_ngram_size = min_ngram_size
+        self.max_ngram_size = max_ngram_size
+        # n-gram -> flat [start, count, start, count, ...], one pair per
+        # distinct next token in order of first occurrence, where `start` is
+        # the position of that next token.
+        self._continuations: Dict[Tuple[int, ...], List[int]] = {}
+        # The last max_ngram_size tokens of the sequence.
+        self._suffix: Tuple[int, ...] = ()
+        self._tokens: List[int] = []
+        self.extend(token_ids)
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def append(self, token_id: int) -> None:
+        position = len(self._tokens)
+        suffix = self._suffix
+        for ngram_size in range(self.min_ngram_size,
+                                min(self.max_ngram_size, len(suffix)) + 1):
+            ngram = suffix[-ngram_size:]
+            entries = self._continuations.get(ngram)
+            if entries is None:
+                self._continuations[ngram] = [position, 1]
+                continue
+            for i in range(0, len(entries), 2):
+                if self._tokens[entries[i]] == token_id:
+                    entries[i + 1] += 1
+                    break
+            else:
+                entries += (position, 1)
+        self._tokens.append(token_id)
+        self._suffix = (*suffix, token_id)[-self.max_ngram_size:]
+
+    def extend(self, token_ids: Iterable[int]) -> None:
+        for token_id in token_ids:
+            self.append(token_id)
+
+    def lookup(self, num_candidates: int = 1) -> List[int]:
+        """Return the start positions of up to `num_candidates` earlier
+        continuations of the longest suffix of the sequence that was seen
+        before, the most frequent first (ties go to the earliest)."""
+        suffix = self._suffix
+        for ngram_size in range(min(self.max_ngram_size,
+                                    len(self._tokens) - 1),
+                                self.min_ngram_size - 1, -1):
+            entries = self._continuations.get(suffix[-ngram_size:])
+            if entries is None:
+                continue
+            if len(entries) == 2:
+                return entries[:1]
+            starts = sorted(range(0, len(entries), 2),
+                            key=lambda i: (-entries[i + 1], entries[i]))
+            return [entries[i] for i in starts[:num_candidates]]
+        return []
+
+    def continuation(self, start: int, length: int) -> List[int]:
+        """Return `length` tokens from `start`, repeating the last token of
+        the sequence past its end."""
+        tokens = self._tokens[start:start + length]
+        tokens += [self._tokens[-1]] * (length - len(tokens))
+        return tokens
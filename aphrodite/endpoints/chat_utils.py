@@ -2,11 +2,13 @@ import asyncio
 import codecs
 import json
 from abc import ABC, abstractmethod
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
 from functools import lru_cache, partial
 from pathlib import Path
-from typing import (Any, Awaitable, Dict, Generic, Iterable, List, Literal,
-                    Mapping, Optional, Tuple, TypeVar, Union, cast)
+from typing import (Any, Awaitable, Dict, Generic, Hashable, Iterable, List,
+                    Literal, Mapping, NamedTuple, Optional, Tuple, TypeVar,
+                    Union, cast)
 
 from loguru import logger
 # yapf conflicts with isort for this block
@@ -28,6 +30,7 @@ from transformers import PreTrainedTokenizer, PreTrainedTokenizerFast
 from typing_extensions import Required, TypeAlias, TypedDict
 
 from aphrodite.common.config import ModelConfig
+from aphrodite.lora.request import LoRARequest
 from aphrodite.multimodal import MultiModalDataDict
 from aphrodite.multimodal.utils import (async_get_and_parse_audio,
                                         async_get_and_parse_image,
@@ -35,6 +38,7 @@ from aphrodite.multimodal.utils import (async_get_and_parse_audio,
                                         get_and_parse_image)
 from aphrodite.transformers_utils.tokenizer import (AnyTokenizer,
                                                     MistralTokenizer)
+from aphrodite.transformers_utils.tokenizer_group import BaseTokenizerGroup
 
 
 class AudioURL(TypedDict, total=False):
@@ -556,3 +560,194 @@ def apply_mistral_chat_template(
         messages=messages,
         **kwargs,
     )
+
+
+class EncodedChatPrompt(NamedTuple):
+    token_ids: List[int]
+    # Index of the last special token in token_ids, or -1 if there is none,
+    # with its text and the end of that text in the prompt.
+    special_index: int
+    special_token: str
+    special_end: int
+
+
+def encode_chat_prompt(
+    tokenizer: AnyTokenizer,
+    prompt: str,
+    start: int = 0,
+    anchor: Optional[str] = None,
+) -> Optional[EncodedChatPrompt]:
+    """Tokenize `prompt[start:]` without adding special tokens.
+
+    If `anchor` is given, it is the special token that ends `prompt[:start]`.
+    Special tokens are split from the text before it is tokenized, so the
+    token ids of a rendered chat prompt that follow a special token do not
+    depend on the text before it. The anchor is tokenized in front of the
+    text and removed, so that the text gets the same token ids as within the
+    whole prompt. Returns None if the anchor is not tokenized as expected.
+    """
+    text = prompt[start:]
+    if anchor is not None:
+        text = anchor + text
+    token_ids = tokenizer(text, add_special_tokens=False).input_ids
+    if anchor is not None:
+        if (not token_ids
+                or tokenizer.convert_ids_to_tokens(token_ids[0]) != anchor):
+            return None
+        token_ids = token_ids[1:]
+
+    special_ids = tokenizer.all_special_ids
+    for i in range(len(token_ids) - 1, -1, -1):
+        if token_ids[i] in special_ids:
+            special_token = tokenizer.convert_ids_to_tokens(token_ids[i])
+            special_start = prompt.rfind(special_token, start)
+            if special_start < 0:
+                break
+            return EncodedChatPrompt(token_ids, i, special_token,
+                                     special_start + len(special_token))
+    return EncodedChatPrompt(token_ids, -1, "", 0)
+
+
+def hash_conversation_prefixes(
+        conversation: List[ConversationMessage]) -> List[int]:
+    """Return the hash of every prefix of the conversation, from the first
+    message alone to the whole conversation."""
+    prefix_hashes: List[int] = []
+    prefix_hash = 0
+    for message in conversation:
+        prefix_hash = hash(
+            (prefix_hash, json.dumps(message, sort_keys=True, default=str)))
+        prefix_hashes.append(prefix_hash)
+    return prefix_hashes
+
+
+@dataclass
+class _CachedChatPrompt:
+    prompt: str
+    prompt_token_ids: List[int]
+    # The number of token ids up to and including the last special token,
+    # the text of that token and its end in the prompt. Those token ids are
+    # reused for any prompt that starts with the same text.
+    num_prefix_tokens: int
+    anchor: str
+    prefix_len: int
+
+
+class ChatPromptCache:
+    """LRU cache of the token ids of rendered chat prompts.
+
+    Multi-turn clients resend the whole conversation with every request. The
+    cache keeps the token ids of recent prompts, keyed by the hash of their
+    messages, and a new prompt reuses the token ids of the longest prefix of
+    its messages that was cached, as long as the rendered text matches, up
+    to the last special token. Only the rest of the prompt is tokenized.
+
+    Prompts are tokenized without special tokens being added and without
+    truncation. At most `max_tokens` token ids are kept.
+    """
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+        self._entries: "OrderedDict[Tuple[Hashable, int], _CachedChatPrompt]"
+        self._entries = OrderedDict()
+        self._num_tokens = 0
+
+        self.num_queries = 0
+        self.num_hits = 0
+        self.num_prompt_tokens = 0
+        self.num_cached_tokens = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of the prompt tokens that were not tokenized again,
+        or -1 if there were none yet."""
+        if self.num_prompt_tokens == 0:
+            return -1
+        return self.num_cached_tokens / self.num_prompt_tokens
+
+    async def encode(
+        self,
+        tokenizer_group: BaseTokenizerGroup,
+        key: Hashable,
+        conversation: List[ConversationMessage],
+        prompt: str,
+        lora_request: Optional[LoRARequest] = None,
+    ) -> List[int]:
+        """Tokenize the prompt rendered from the conversation. `key`
+        identifies the tokenizer and the chat template."""
+        prefix_hashes = hash_conversation_prefixes(conversation)
+        entry = self._lookup(key, prefix_hashes, prompt)
+
+        if entry is not None and entry.prompt == prompt:
+            token_ids = list(entry.prompt_token_ids)
+            num_cached_tokens = len(token_ids)
+            new_entry = entry
+        else:
+            encoded = None
+            if entry is not None:
+                encoded = await tokenizer_group.run_async(
+                    encode_chat_prompt,
+                    prompt,
+                    entry.prefix_len,
+                    entry.anchor,
+                    lora_request=lora_request)
+            if encoded is None:
+                entry = None
+                encoded = await tokenizer_group.run_async(
+                    encode_chat_prompt, prompt, lora_request=lora_request)
+            assert encoded is not None
+
+            if entry is None:
+                prefix_token_ids: List[int] = []
+                num_prefix_tokens, anchor, prefix_len = 0, "", 0
+            else:
+                prefix_token_ids = (
+                    entry.prompt_token_ids[:entry.num_prefix_tokens])
+                num_prefix_tokens = entry.num_prefix_tokens
+                anchor, prefix_len = entry.anchor, entry.prefix_len
+            if encoded.special_index >= 0:
+                num_prefix_tokens = (len(prefix_token_ids) +
+                                     encoded.special_index + 1)
+                anchor = encoded.special_token
+                prefix_len = encoded.special_end
+
+            token_ids = prefix_token_ids + encoded.token_ids
+            num_cached_tokens = len(prefix_token_ids)
+            new_entry = _CachedChatPrompt(prompt, list(token_ids),
+                                          num_prefix_tokens, anchor,
+                                          prefix_len)
+
+        if prefix_hashes:
+            self._insert((key, prefix_hashes[-1]), new_entry)
+
+        self.num_queries += 1
+        self.num_hits += num_cached_tokens > 0
+        self.num_prompt_tokens += len(token_ids)
+        self.num_cached_tokens += num_cached_tokens
+        return token_ids
+
+    def _lookup(self, key: Hashable, prefix_hashes: List[int],
+                prompt: str) -> Optional[_CachedChatPrompt]:
+        for prefix_hash in reversed(prefix_hashes):
+            entry = self._entries.get((key, prefix_hash))
+            if entry is None:
+                continue
+            if entry.prompt == prompt or (
+                    entry.num_prefix_tokens > 0
+                    and prompt.startswith(entry.prompt[:entry.prefix_len])):
+                self._entries.move_to_end((key, prefix_hash))
+                return entry
+        return None
+
+    def _insert(self, cache_key: Tuple[Hashable, int],
+                entry: _CachedChatPrompt) -> None:
+        old_entry = self._entries.pop(cache_key, None)
+        if old_entry is not None:
+            self._num_tokens -= len(old_entry.prompt_token_ids)
+        if len(entry.prompt_token_ids) > self.max_tokens:
+            return
+        self._entries[cache_key] = entry
+        self._num_tokens += len(entry.prompt_token_ids)
+        while self._num_tokens > self.max_tokens:
+            _, evicted = self._entries.popitem(last=False)
+            self._num_tokens -= len(evicted.prompt_token_ids)
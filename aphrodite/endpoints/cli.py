@@ -4,17 +4,18 @@ import os
 import signal
 import subprocess
 import sys
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 import uvloop
 import yaml
 from loguru import logger
-from openai import OpenAI
 
 from aphrodite.common.utils import FlexibleArgumentParser
-from aphrodite.endpoints.openai.api_server import run_server
 from aphrodite.endpoints.openai.args import make_arg_parser
 
+if TYPE_CHECKING:
+    from openai import OpenAI
+
 
 def registrer_signal_handlers():
 
@@ -29,10 +30,15 @@ def serve(args: argparse.Namespace) -> None:
     # EngineArgs expects the model name to be passed as --model.
     args.model = args.model_tag
 
+    # Imported here, so that the chat and complete commands do not import
+    # the engine.
+    from aphrodite.endpoints.openai.api_server import run_server
     uvloop.run(run_server(args))
 
 
 def interactive_cli(args: argparse.Namespace) -> None:
+    from openai import OpenAI
+
     registrer_signal_handlers()
 
     base_url = args.url
@@ -53,7 +59,7 @@ def interactive_cli(args: argparse.Namespace) -> None:
         chat(args.system_prompt, model_name, openai_client)
 
 
-def complete(model_name: str, client: OpenAI) -> None:
+def complete(model_name: str, client: "OpenAI") -> None:
     print("Please enter prompt to complete:")
     while True:
         input_prompt = input("> ")
@@ -65,7 +71,7 @@ def complete(model_name: str, client: OpenAI) -> None:
 
 
 def chat(system_prompt: Optional[str], model_name: str,
-         client: OpenAI) -> None:
+         client: "OpenAI") -> None:
     conversation = []
     if system_prompt is not None:
         conversation.append({"role": "system", "content": system_prompt})
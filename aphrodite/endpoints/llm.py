@@ -1,7 +1,7 @@
 import warnings
 from contextlib import contextmanager
-from typing import (Any, ClassVar, Dict, List, Optional, Sequence, Union, cast,
-                    overload)
+from typing import (TYPE_CHECKING, Any, ClassVar, Dict, List, Optional,
+                    Sequence, Union, cast, overload)
 
 from tqdm import tqdm
 
@@ -11,10 +11,6 @@ from aphrodite.common.sampling_params import (GuidedDecodingParams,
                                               RequestOutputKind,
                                               SamplingParams)
 from aphrodite.common.utils import Counter, deprecate_kwargs, is_list_of
-from aphrodite.endpoints.chat_utils import (ChatCompletionMessageParam,
-                                            apply_hf_chat_template,
-                                            apply_mistral_chat_template,
-                                            parse_chat_messages)
 from aphrodite.engine.aphrodite_engine import AphroditeEngine
 from aphrodite.engine.args_tools import EngineArgs
 from aphrodite.inputs import PromptType, TextPrompt, TokensPrompt
@@ -28,6 +24,10 @@ from aphrodite.transformers_utils.tokenizer import (AnyTokenizer,
                                                     get_cached_tokenizer)
 from aphrodite.transformers_utils.tokenizer_group import TokenizerGroup
 
+if TYPE_CHECKING:
+    # Imports the OpenAI types, which is slow.
+    from aphrodite.endpoints.chat_utils import ChatCompletionMessageParam
+
 
 class LLM:
     """An LLM for generating texts from given prompts and sampling parameters.
@@ -358,8 +358,8 @@ class LLM:
 
     def chat(
         self,
-        messages: Union[List[ChatCompletionMessageParam],
-                        List[List[ChatCompletionMessageParam]]],
+        messages: Union[List["ChatCompletionMessageParam"],
+                        List[List["ChatCompletionMessageParam"]]],
         sampling_params: Optional[Union[SamplingParams,
                                         List[SamplingParams]]] = None,
         use_tqdm: bool = True,
@@ -405,7 +405,11 @@ class LLM:
             A list of ``RequestOutput`` objects containing the generated
             responses in the same order as the input messages.
         """
-        list_of_messages: List[List[ChatCompletionMessageParam]]
+        from aphrodite.endpoints.chat_utils import (
+            apply_hf_chat_template, apply_mistral_chat_template,
+            parse_chat_messages)
+
+        list_of_messages: List[List["ChatCompletionMessageParam"]]
 
         # Handle multi and single conversations
         if is_list_of(messages, list):
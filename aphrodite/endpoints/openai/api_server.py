@@ -13,7 +13,8 @@ from contextlib import asynccontextmanager
 from distutils.util import strtobool
 from functools import partial
 from http import HTTPStatus
-from typing import AsyncGenerator, AsyncIterator, List, Optional, Set, Tuple
+from typing import (AsyncGenerator, AsyncIterator, Dict, List, Optional, Set,
+                    Tuple)
 
 import yaml
 from fastapi import APIRouter, FastAPI, Form, Request, UploadFile
@@ -225,12 +226,42 @@ async def build_engine_client_from_engine_args(
             multiprocess.mark_process_dead(engine_process.pid)
 
 
+class ChatPromptCacheCollector:
+    """Reports the counters of the chat prompt cache of the server, which
+    lives in the server process and not in the engine."""
+
+    def __init__(self, app: FastAPI):
+        self.app = app
+
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily
+
+        serving_chat = getattr(self.app.state, "openai_serving_chat", None)
+        prompt_cache = getattr(serving_chat, "prompt_cache", None)
+        if prompt_cache is None:
+            return
+        for name, documentation, value in (
+            ("queries", "Number of chat prompts tokenized.",
+             prompt_cache.num_queries),
+            ("hits", "Number of chat prompts that reused cached token ids.",
+             prompt_cache.num_hits),
+            ("prompt_tokens", "Number of tokens of the chat prompts.",
+             prompt_cache.num_prompt_tokens),
+            ("cached_tokens",
+             "Number of tokens of the chat prompts taken from the cache.",
+             prompt_cache.num_cached_tokens),
+        ):
+            yield CounterMetricFamily(f"aphrodite:chat_prompt_cache_{name}",
+                                      documentation,
+                                      value=value)
+
+
 def mount_metrics(app: FastAPI):
     # Lazy import for prometheus multiprocessing.
     # We need to set PROMETHEUS_MULTIPROC_DIR environment variable
     # before prometheus_client is imported.
     # See https://prometheus.github.io/client_python/multiprocess/
-    from prometheus_client import (CollectorRegistry, make_asgi_app,
+    from prometheus_client import (REGISTRY, CollectorRegistry, make_asgi_app,
                                    multiprocess)
     prometheus_multiproc_dir_path = os.getenv("PROMETHEUS_MULTIPROC_DIR", None)
     if prometheus_multiproc_dir_path is not None:
@@ -238,9 +269,15 @@ def mount_metrics(app: FastAPI):
                     "as PROMETHEUS_MULTIPROC_DIR")
         registry = CollectorRegistry()
         multiprocess.MultiProcessCollector(registry)
+        registry.register(ChatPromptCacheCollector(app))
         # Add prometheus asgi middleware to route /metrics requests
         metrics_route = Mount("/metrics", make_asgi_app(registry=registry))
     else:
+        # Replace the collector of a previous app (for CI/CD)
+        for collector in list(REGISTRY._collector_to_names):
+            if isinstance(collector, ChatPromptCacheCollector):
+                REGISTRY.unregister(collector)
+        REGISTRY.register(ChatPromptCacheCollector(app))
         # Add prometheus asgi middleware to route /metrics requests
         metrics_route = Mount("/metrics", make_asgi_app())
     # Workaround for 307 Redirect for /metrics
@@ -333,8 +370,9 @@ async def unload_model(raw_request: Request):
                 (pickle.dumps(shutdown_req),), copy=False
             )
 
+            # The engine pickles the acknowledgement after a format frame.
             response = await client.output_socket.recv_multipart()
-            if pickle.loads(response[0]) != APHRODITE_RPC_SUCCESS_STR:
+            if pickle.loads(response[1]) != APHRODITE_RPC_SUCCESS_STR:
                 raise RuntimeError("Engine shutdown failed")
 
             client.output_loop.cancel()
@@ -394,7 +432,7 @@ async def load_model(
 
         original_args = api_server_args
         essential_params = [
-            'host', 'port', 'api_keys', 'admin_key',
+            'host', 'port', 'api_keys', 'api_key_tenants', 'admin_key',
             'disable_frontend_multiprocessing', 'root_path',
             'ssl_keyfile', 'ssl_certfile'
         ]
@@ -1035,7 +1073,9 @@ def build_app(args: Namespace) -> FastAPI:
         return JSONResponse(err.model_dump(),
                             status_code=HTTPStatus.BAD_REQUEST)
 
-    if token := envs.APHRODITE_API_KEY or args.api_keys:
+    token = envs.APHRODITE_API_KEY or args.api_keys
+    api_key_tenants: Dict[str, str] = args.api_key_tenants or {}
+    if token or api_key_tenants:
         admin_key = os.environ.get("APHRODITE_ADMIN_KEY") or args.admin_key
 
         if admin_key is None:
@@ -1057,24 +1097,35 @@ def build_app(args: Namespace) -> FastAPI:
 
             auth_header = request.headers.get("Authorization")
             api_key_header = request.headers.get("x-api-key")
+            # The tenant of the request is the one its API key was issued
+            # to, never a field of the request body.
+            request.state.tenant = None
 
             if request.url.path.startswith(
                 ("/v1/lora", "/v1/soft_prompt", "/v1/model")):
                 if ((admin_key is not None and (
                         api_key_header == admin_key or
                         auth_header == "Bearer " + admin_key)) or
-                    (auth_header == f"Bearer {token}" or
-                     api_key_header == token)):
+                    (token and (auth_header == f"Bearer {token}" or
+                                api_key_header == token))):
                     return await call_next(request)
                 return JSONResponse(content={"error": "Unauthorized"},
                                     status_code=401)
 
-            if (auth_header == f"Bearer {token}" or api_key_header == token or
+            if ((token and (auth_header == f"Bearer {token}"
+                            or api_key_header == token)) or
                 (admin_key is not None and
                  (api_key_header == admin_key or
                   auth_header == f"Bearer {admin_key}"))):
                 return await call_next(request)
 
+            api_key = api_key_header
+            if api_key is None and auth_header is not None:
+                api_key = auth_header.removeprefix("Bearer ")
+            if api_key in api_key_tenants:
+                request.state.tenant = api_key_tenants[api_key]
+                return await call_next(request)
+
             return JSONResponse(
                 content={"error": "Unauthorized"}, status_code=401)
 
@@ -1139,7 +1190,8 @@ def init_app_state(
         chat_template=args.chat_template,
         return_tokens_as_token_ids=args.return_tokens_as_token_ids,
         enable_auto_tools=args.enable_auto_tool_choice,
-        tool_parser=args.tool_call_parser
+        tool_parser=args.tool_call_parser,
+        prompt_cache_max_tokens=args.chat_prompt_cache_max_tokens,
     )
     state.openai_serving_completion = OpenAIServingCompletion(
         engine_client,
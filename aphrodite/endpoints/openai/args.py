@@ -79,6 +79,16 @@ def make_arg_parser(parser: FlexibleArgumentParser) -> FlexibleArgumentParser:
                         default=None,
                         help="If provided, the server will require this key "
                         "to be presented in the header.")
+    parser.add_argument("--api-key-tenants",
+                        type=json.loads,
+                        default=None,
+                        help="A JSON object mapping extra API keys to the "
+                        "tenant they are issued to, e.g. "
+                        "'{\"key-a\": \"team-a\", \"key-b\": \"team-b\"}'. "
+                        "The server accepts these keys, and the "
+                        "fair_share scheduling policy charges a request to "
+                        "the tenant of its key. Requests authenticated with "
+                        "--api-keys or --admin-key have no tenant.")
     parser.add_argument("--admin-key",
                         type=str,
                         default=None,
@@ -166,6 +176,14 @@ def make_arg_parser(parser: FlexibleArgumentParser) -> FlexibleArgumentParser:
         help="When --max-logprobs is specified, represents single tokens as"
         "strings of the form 'token_id:{token_id}' so that tokens that"
         "are not JSON-encodable can be identified.")
+    parser.add_argument(
+        "--chat-prompt-cache-max-tokens",
+        type=int,
+        default=1 << 20,
+        help="The maximum number of token ids of chat prompts to keep, so "
+        "that the token ids of a conversation's previous messages are reused "
+        "by the next request instead of tokenizing the whole conversation "
+        "again. Set to 0 to disable the cache.")
     parser.add_argument(
         "--disable-frontend-multiprocessing",
         action="store_true",
@@ -32,11 +32,7 @@ def _get_allowed_token_ids_logits_processor(
     allowed_token_ids: FrozenSet[int],
     vocab_size: int,
 ) -> LogitsProcessorFunc:
-    if not allowed_token_ids:
-        raise ValueError("Empty allowed_token_ids provided")
-    if not all(0 <= tid < vocab_size for tid in allowed_token_ids):
-        raise ValueError("allowed_token_ids contains "
-                         "out-of-vocab token id")
+    verify_allowed_token_ids(allowed_token_ids, vocab_size)
     return AllowedTokenIdsLogitsProcessor(allowed_token_ids)
 
 
@@ -50,32 +46,50 @@ def logit_bias_logits_processor(
     return logits
 
 
+def clamp_logit_bias(
+        logit_bias: Union[Dict[int, float], Dict[str, float]],
+        tokenizer: PreTrainedTokenizer) -> Dict[int, float]:
+    try:
+        # Convert token_id to integer
+        # Clamp the bias between -100 and 100 per OpenAI API spec
+        clamped_logit_bias: Dict[int, float] = {
+            int(token_id): min(100.0, max(-100.0, bias))
+            for token_id, bias in logit_bias.items()
+        }
+    except ValueError as exc:
+        raise ValueError(
+            "Found token_id in logit_bias that is not "
+            "an integer or string representing an integer") from exc
+
+    # Check if token_id is within the vocab size
+    for token_id, bias in clamped_logit_bias.items():
+        if token_id < 0 or token_id >= len(tokenizer):
+            raise ValueError("token_id in logit_bias contains "
+                             "out-of-vocab token id")
+    return clamped_logit_bias
+
+
+def verify_allowed_token_ids(allowed_token_ids: Iterable[int],
+                             vocab_size: int) -> None:
+    if not allowed_token_ids:
+        raise ValueError("Empty allowed_token_ids provided")
+    if not all(0 <= tid < vocab_size for tid in allowed_token_ids):
+        raise ValueError("allowed_token_ids contains "
+                         "out-of-vocab token id")
+
+
 def get_logits_processors(
         logit_bias: Optional[Union[Dict[int, float], Dict[str, float]]],
         allowed_token_ids: Optional[List[int]],
         tokenizer: PreTrainedTokenizer) -> List[LogitsProcessorFunc]:
+    """Logits processors applying the logit bias and allowed token ids of a
+    request one row at a time. The engine leaves both in the sampling params
+    instead, which the sampler applies to the whole batch at once."""
     logits_processors = []
     if logit_bias:
-        try:
-            # Convert token_id to integer
-            # Clamp the bias between -100 and 100 per OpenAI API spec
-            clamped_logit_bias: Dict[int, float] = {
-                int(token_id): min(100.0, max(-100.0, bias))
-                for token_id, bias in logit_bias.items()
-            }
-        except ValueError as exc:
-            raise ValueError(
-                "Found token_id in logit_bias that is not "
-                "an integer or string representing an integer") from exc
-
-        # Check if token_id is within the vocab size
-        for token_id, bias in clamped_logit_bias.items():
-            if token_id < 0 or token_id >= len(tokenizer):
-                raise ValueError("token_id in logit_bias contains "
-                                 "out-of-vocab token id")
-
         logits_processors.append(
-            partial(logit_bias_logits_processor, clamped_logit_bias))
+            partial(logit_bias_logits_processor,
+                    clamp_logit_bias(logit_bias, tokenizer)))
 
     if allowed_token_ids is not None:
         logits_processors.append(
@@ -723,7 +723,8 @@ class CompletionRequest(OpenAIBaseModel):
             output_kind=RequestOutputKind.DELTA if self.stream \
                 else RequestOutputKind.FINAL_ONLY,
             guided_decoding=guided_decoding,
-            logit_bias=self.logit_bias)
+            logit_bias=self.logit_bias,
+            allowed_token_ids=self.allowed_token_ids)
 
     def _get_guided_json_from_tool(
             self) -> Optional[Union[str, dict, BaseModel]]:
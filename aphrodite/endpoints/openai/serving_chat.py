@@ -14,7 +14,8 @@ from aphrodite.common.outputs import CompletionOutput, RequestOutput
 from aphrodite.common.sampling_params import SamplingParams
 from aphrodite.common.sequence import Logprob
 from aphrodite.common.utils import iterate_with_cancellation, random_uuid
-from aphrodite.endpoints.chat_utils import (ConversationMessage,
+from aphrodite.endpoints.chat_utils import (ChatPromptCache,
+                                            ConversationMessage,
                                             apply_hf_chat_template,
                                             apply_mistral_chat_template,
                                             load_chat_template,
@@ -35,6 +36,8 @@ from aphrodite.endpoints.openai.serving_engine import (BaseModelPath,
                                                        TextTokensPrompt)
 from aphrodite.endpoints.openai.tool_parsers import (ToolParser,
                                                      ToolParserManager)
+from aphrodite.endpoints.openai.tool_parsers.utils import (
+    complete_json_prefix)
 from aphrodite.engine.protocol import EngineClient
 from aphrodite.inputs import TokensPrompt
 from aphrodite.transformers_utils.tokenizer import (AnyTokenizer,
@@ -55,7 +58,8 @@ class OpenAIServingChat(OpenAIServing):
                  chat_template: Optional[str],
                  return_tokens_as_token_ids: bool = False,
                  enable_auto_tools: bool = False,
-                 tool_parser: Optional[str] = None):
+                 tool_parser: Optional[str] = None,
+                 prompt_cache_max_tokens: int = 0):
         super().__init__(engine_client=engine_client,
                          model_config=model_config,
                          base_model_paths=base_model_paths,
@@ -67,6 +71,9 @@ class OpenAIServingChat(OpenAIServing):
         self.response_role = response_role
         self.use_tool_use_model_template = False
         self.chat_template = load_chat_template(chat_template)
+        self.prompt_cache: Optional[ChatPromptCache] = None
+        if prompt_cache_max_tokens > 0:
+            self.prompt_cache = ChatPromptCache(prompt_cache_max_tokens)
 
         # set up tool use
         self.enable_auto_tools: bool = enable_auto_tools
@@ -118,6 +125,7 @@ class OpenAIServingChat(OpenAIServing):
 
             model_config = self.model_config
             tokenizer = await self.engine_client.get_tokenizer(lora_request)
+            chat_template = request.chat_template or self.chat_template
 
             conversation, mm_data_future = parse_chat_messages_futures(
                 request.messages, model_config, tokenizer)
@@ -126,28 +134,33 @@ class OpenAIServingChat(OpenAIServing):
                 tool.model_dump() for tool in request.tools
             ]
 
+            # The chat template is rendered by the tokenizer group, so that a
+            # pool keeps long conversations from blocking the event loop.
+            tokenizer_group = await self.engine_client.get_tokenizer_group()
             prompt: Union[str, List[int]]
             is_mistral_tokenizer = isinstance(tokenizer, MistralTokenizer)
             if is_mistral_tokenizer:
-                prompt = apply_mistral_chat_template(
-                    tokenizer,
+                prompt = await tokenizer_group.run_async(
+                    apply_mistral_chat_template,
                     messages=request.messages,
-                    chat_template=request.chat_template or self.chat_template,
+                    chat_template=chat_template,
                     add_generation_prompt=request.add_generation_prompt,
                     continue_final_message=request.continue_final_message,
                     tools=tool_dicts,
                     documents=request.documents,
+                    lora_request=lora_request,
                     **(request.chat_template_kwargs or {}),
                 )
             else:
-                prompt = apply_hf_chat_template(
-                    tokenizer,
+                prompt = await tokenizer_group.run_async(
+                    apply_hf_chat_template,
                     conversation=conversation,
-                    chat_template=request.chat_template or self.chat_template,
+                    chat_template=chat_template,
                     add_generation_prompt=request.add_generation_prompt,
                     continue_final_message=request.continue_final_message,
                     tools=tool_dicts,
                     documents=request.documents,
+                    lora_request=lora_request,
                     **(request.chat_template_kwargs or {}),
                 )
         except Exception as e:
@@ -185,13 +198,27 @@ class OpenAIServingChat(OpenAIServing):
                 request = self.tool_parser(tokenizer).adjust_request(
                     request=request)
 
-            if isinstance(prompt, str):
-                prompt_inputs = self._tokenize_prompt_input(
+            if (isinstance(prompt, str) and self.prompt_cache is not None
+                    and conversation
+                    and request.truncate_prompt_tokens is None
+                    and not request.add_special_tokens):
+                prompt_token_ids = await self.prompt_cache.encode(
+                    tokenizer_group,
+                    (lora_request.lora_int_id if lora_request else 0,
+                     chat_template),
+                    conversation,
+                    prompt,
+                    lora_request=lora_request)
+                prompt_inputs = self._validate_input(request,
+                                                     prompt_token_ids, prompt)
+            elif isinstance(prompt, str):
+                prompt_inputs = await self._tokenize_prompt_input(
                     request,
                     tokenizer,
                     prompt,
                     truncate_prompt_tokens=request.truncate_prompt_tokens,
                     add_special_tokens=request.add_special_tokens,
+                    lora_request=lora_request,
                 )
             else:
                 assert isinstance(prompt, list) and isinstance(
@@ -226,6 +253,7 @@ class OpenAIServingChat(OpenAIServing):
                 lora_request=lora_request,
                 prompt_adapter_request=prompt_adapter_request,
                 priority=request.priority,
+                tenant=self._get_tenant(request, raw_request),
             )
         except ValueError as e:
             # TODO: Use an aphrodite-specific Validation Error
@@ -448,7 +476,8 @@ class OpenAIServingChat(OpenAIServing):
                                 delta_text=delta_text,
                                 previous_token_ids=previous_token_ids,
                                 current_token_ids=current_token_ids,
-                                delta_token_ids=output.token_ids))
+                                delta_token_ids=output.token_ids,
+                                request=request))
 
                         # update the previous values for the next iteration
                         previous_texts[i] = current_text
@@ -493,28 +522,50 @@ class OpenAIServingChat(OpenAIServing):
 
                         if self._should_check_for_unstreamed_tool_arg_tokens(
                                 delta_message, output) and tool_parser:
-                            # get the expected call based on partial JSON
-                            # parsing which "autocompletes" the JSON
-                            expected_call = json.dumps(
-                                tool_parser.prev_tool_call_arr[index].get(
-                                    "arguments", {}))
-
                             # get what we've streamed so far for arguments
                             # for the current tool
                             actual_call = tool_parser.streamed_args_for_tool[
                                 index]
 
-                            # check to see if there's anything left to stream
-                            remaining_call = expected_call.replace(
-                                actual_call, "", 1)
-
-                            # set that as a delta message
-                            delta_message = DeltaMessage(tool_calls=[
-                                DeltaToolCall(index=index,
-                                              function=DeltaFunctionCall(
-                                                  arguments=remaining_call).
-                                              model_dump(exclude_none=True))
-                            ])
+                            if "arguments" in tool_parser.prev_tool_call_arr[
+                                    index]:
+                                # get the expected call based on partial JSON
+                                # parsing which "autocompletes" the JSON
+                                expected_call = json.dumps(
+                                    tool_parser.prev_tool_call_arr[index].get(
+                                        "arguments", {}))
+
+                                # check to see if there's anything left to
+                                # stream
+                                remaining_call = expected_call.replace(
+                                    actual_call, "", 1)
+                            else:
+                                # parsers that scan the arguments
+                                # incrementally only know them once they are
+                                # complete, and have streamed everything
+                                # before that. If generation stopped midway,
+                                # e.g. at max_tokens, autocomplete the
+                                # streamed arguments
+                                remaining_call = complete_json_prefix(
+                                    actual_call)
+
+                            # set that as a delta message. The arguments of
+                            # this delta are already counted as streamed, so
+                            # keep them and send the rest after them
+                            tool_call = delta_message.tool_calls[-1]
+                            if (remaining_call and tool_call.index == index
+                                    and tool_call.function):
+                                tool_call.function.arguments = (
+                                    tool_call.function.arguments or
+                                    "") + remaining_call
+                            elif remaining_call:
+                                delta_message = DeltaMessage(tool_calls=[
+                                    DeltaToolCall(
+                                        index=index,
+                                        function=DeltaFunctionCall(
+                                            arguments=remaining_call).
+                                        model_dump(exclude_none=True))
+                                ])
 
                         # Send the finish response for each request.n only once
                         choice_data = ChatCompletionResponseStreamChoice(
@@ -97,14 +97,14 @@ class OpenAIServingCompletion(OpenAIServing):
 
             tokenizer = await self.engine_client.get_tokenizer(lora_request)
 
-            prompts = list(
-                self._tokenize_prompt_input_or_inputs(
-                    request,
-                    tokenizer,
-                    request.prompt,
-                    truncate_prompt_tokens=request.truncate_prompt_tokens,
-                    add_special_tokens=request.add_special_tokens,
-                ))
+            prompts = await self._tokenize_prompt_input_or_inputs(
+                request,
+                tokenizer,
+                request.prompt,
+                truncate_prompt_tokens=request.truncate_prompt_tokens,
+                add_special_tokens=request.add_special_tokens,
+                lora_request=lora_request,
+            )
 
             for i, prompt_inputs in enumerate(prompts):
                 sampling_params = request.to_sampling_params(
@@ -127,6 +127,7 @@ class OpenAIServingCompletion(OpenAIServing):
                     lora_request=lora_request,
                     prompt_adapter_request=prompt_adapter_request,
                     priority=request.priority,
+                    tenant=self._get_tenant(request, raw_request),
                 )
 
                 generators.append(generator)
@@ -119,13 +119,13 @@ class OpenAIServingEmbedding(OpenAIServing):
             tokenizer = await self.engine_client.get_tokenizer(lora_request)
             pooling_params = request.to_pooling_params()
 
-            prompts = list(
-                self._tokenize_prompt_input_or_inputs(
-                    request,
-                    tokenizer,
-                    request.input,
-                    truncate_prompt_tokens,
-                ))
+            prompts = await self._tokenize_prompt_input_or_inputs(
+                request,
+                tokenizer,
+                request.input,
+                truncate_prompt_tokens,
+                lora_request=lora_request,
+            )
 
             for i, prompt_inputs in enumerate(prompts):
                 request_id_item = f"{request_id}-{i}"
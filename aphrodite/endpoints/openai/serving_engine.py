@@ -1,9 +1,11 @@
+import asyncio
 import json
 import pathlib
 from dataclasses import dataclass
 from http import HTTPStatus
-from typing import Iterable, Iterator, List, Optional, Tuple, TypedDict, Union
+from typing import Iterable, List, Optional, Tuple, TypedDict, Union
 
+from fastapi import Request
 from loguru import logger
 from pydantic import Field
 from transformers import PreTrainedTokenizer, PreTrainedTokenizerFast
@@ -62,6 +64,25 @@ class TextTokensPrompt(TypedDict):
     prompt_token_ids: List[int]
 
 
+def _encode_prompt(
+    tokenizer: AnyTokenizer,
+    prompt: str,
+    add_special_tokens: bool,
+    truncate_prompt_tokens: Optional[int],
+) -> Tuple[List[int], int]:
+    """Return the token ids of a prompt, truncated if requested, and the
+    number of tokens before truncation. Run by the tokenizer group, possibly
+    in another process."""
+    encoded = tokenizer(prompt, add_special_tokens=add_special_tokens)
+    num_tokens = len(encoded.input_ids)
+    if truncate_prompt_tokens is not None:
+        encoded = tokenizer(prompt,
+                            add_special_tokens=add_special_tokens,
+                            truncation=True,
+                            max_length=truncate_prompt_tokens)
+    return encoded.input_ids, num_tokens
+
+
 class OpenAIServing:
 
     def __init__(
@@ -242,33 +263,31 @@ class OpenAIServing:
             if prompt_adapter.prompt_adapter_name != prompt_adapter_name
         ]
 
-    def _normalize_prompt_text_to_input(
+    async def _normalize_prompt_text_to_input(
         self,
         request: AnyRequest,
-        tokenizer: AnyTokenizer,
         prompt: str,
         truncate_prompt_tokens: Optional[Annotated[int, Field(ge=1)]],
         add_special_tokens: bool,
+        lora_request: Optional[LoRARequest],
     ) -> TextTokensPrompt:
-        if truncate_prompt_tokens is None:
-            encoded = tokenizer(prompt, add_special_tokens=add_special_tokens)
-        else:
-            original_tokens = tokenizer(prompt,
-                                        add_special_tokens=add_special_tokens)
-            encoded = tokenizer(prompt,
-                              add_special_tokens=add_special_tokens,
-                              truncation=True,
-                              max_length=truncate_prompt_tokens)
-
-            if len(original_tokens.input_ids) > truncate_prompt_tokens:
-                tokens_removed = len(
-                    original_tokens.input_ids) - truncate_prompt_tokens
-                logger.warning(
-                    f"Prompt truncated: Removed {tokens_removed} tokens "
-                    f"({len(original_tokens.input_ids)} -> "
-                    f"{truncate_prompt_tokens})")
+        # Tokenized by the tokenizer group, so that a pool keeps long
+        # prompts from blocking the event loop.
+        tokenizer_group = await self.engine_client.get_tokenizer_group()
+        input_ids, num_tokens = await tokenizer_group.run_async(
+            _encode_prompt,
+            prompt,
+            add_special_tokens,
+            truncate_prompt_tokens,
+            lora_request=lora_request)
+
+        if (truncate_prompt_tokens is not None
+                and num_tokens > truncate_prompt_tokens):
+            tokens_removed = num_tokens - truncate_prompt_tokens
+            logger.warning(
+                f"Prompt truncated: Removed {tokens_removed} tokens "
+                f"({num_tokens} -> {truncate_prompt_tokens})")
 
-        input_ids = encoded.input_ids
         input_text = prompt
         return self._validate_input(request, input_ids, input_text)
 
@@ -336,90 +355,107 @@ class OpenAIServing:
 
         return TextTokensPrompt(prompt=input_text, prompt_token_ids=input_ids)
 
-    def _tokenize_prompt_input(
+    async def _tokenize_prompt_input(
         self,
         request: AnyRequest,
         tokenizer: AnyTokenizer,
         prompt_input: Union[str, List[int]],
         truncate_prompt_tokens: Optional[Annotated[int, Field(ge=1)]] = None,
         add_special_tokens: bool = True,
+        lora_request: Optional[LoRARequest] = None,
     ) -> TextTokensPrompt:
         """
         A simpler implementation of :meth:`_tokenize_prompt_input_or_inputs`
         that assumes single input.
         """
-        return next(
-            self._tokenize_prompt_inputs(
-                request,
-                tokenizer,
-                [prompt_input],
-                truncate_prompt_tokens=truncate_prompt_tokens,
-                add_special_tokens=add_special_tokens,
-            ))
+        prompts = await self._tokenize_prompt_inputs(
+            request,
+            tokenizer,
+            [prompt_input],
+            truncate_prompt_tokens=truncate_prompt_tokens,
+            add_special_tokens=add_special_tokens,
+            lora_request=lora_request,
+        )
+        return prompts[0]
 
-    def _tokenize_prompt_inputs(
+    async def _tokenize_prompt_inputs(
         self,
         request: AnyRequest,
         tokenizer: AnyTokenizer,
         prompt_inputs: Iterable[Union[str, List[int]]],
         truncate_prompt_tokens: Optional[Annotated[int, Field(ge=1)]] = None,
         add_special_tokens: bool = True,
-    ) -> Iterator[TextTokensPrompt]:
+        lora_request: Optional[LoRARequest] = None,
+    ) -> List[TextTokensPrompt]:
         """
         A simpler implementation of :meth:`_tokenize_prompt_input_or_inputs`
         that assumes multiple inputs.
         """
-        for text in prompt_inputs:
-            if isinstance(text, str):
-                yield self._normalize_prompt_text_to_input(
-                    request,
-                    tokenizer,
-                    prompt=text,
-                    truncate_prompt_tokens=truncate_prompt_tokens,
-                    add_special_tokens=add_special_tokens,
-                )
-            else:
-                yield self._normalize_prompt_tokens_to_input(
-                    request,
-                    tokenizer,
-                    prompt_ids=text,
-                    truncate_prompt_tokens=truncate_prompt_tokens,
-                )
+        return await self._normalize_prompt_inputs(
+            request,
+            tokenizer,
+            [(not isinstance(text, str), text) for text in prompt_inputs],
+            truncate_prompt_tokens=truncate_prompt_tokens,
+            add_special_tokens=add_special_tokens,
+            lora_request=lora_request,
+        )
 
-    def _tokenize_prompt_input_or_inputs(
+    async def _tokenize_prompt_input_or_inputs(
         self,
         request: AnyRequest,
         tokenizer: AnyTokenizer,
         input_or_inputs: Union[str, List[str], List[int], List[List[int]]],
         truncate_prompt_tokens: Optional[Annotated[int, Field(ge=1)]] = None,
         add_special_tokens: bool = True,
-    ) -> Iterator[TextTokensPrompt]:
+        lora_request: Optional[LoRARequest] = None,
+    ) -> List[TextTokensPrompt]:
         """
         Tokenize/detokenize depending on the input format.
         According to `OpenAI API <https://platform.openai.com/docs/api-reference/embeddings/create>`_
         , each input can be a string or array of tokens. Note that each request
         can pass one or more inputs.
         """
-        for prompt_input in parse_and_batch_prompt(input_or_inputs):
-            # Although our type checking is based on mypy,
-            # VSCode Pyright extension should still work properly
-            # "is True" is required for Pyright to perform type narrowing
-            # See: https://github.com/microsoft/pyright/issues/7672
-            if prompt_input["is_tokens"] is False:
-                yield self._normalize_prompt_text_to_input(
-                    request,
-                    tokenizer,
-                    prompt=prompt_input["content"],
-                    truncate_prompt_tokens=truncate_prompt_tokens,
-                    add_special_tokens=add_special_tokens,
-                )
-            else:
-                yield self._normalize_prompt_tokens_to_input(
+        return await self._normalize_prompt_inputs(
+            request,
+            tokenizer,
+            [(prompt_input["is_tokens"], prompt_input["content"])
+             for prompt_input in parse_and_batch_prompt(input_or_inputs)],
+            truncate_prompt_tokens=truncate_prompt_tokens,
+            add_special_tokens=add_special_tokens,
+            lora_request=lora_request,
+        )
+
+    async def _normalize_prompt_inputs(
+        self,
+        request: AnyRequest,
+        tokenizer: AnyTokenizer,
+        prompt_inputs: List[Tuple[bool, Union[str, List[int]]]],
+        truncate_prompt_tokens: Optional[Annotated[int, Field(ge=1)]],
+        add_special_tokens: bool,
+        lora_request: Optional[LoRARequest],
+    ) -> List[TextTokensPrompt]:
+        """Normalize (is_tokens, content) inputs, tokenizing the texts
+        concurrently."""
+
+        async def normalize(is_tokens: bool,
+                            content: Union[str, List[int]]) -> TextTokensPrompt:
+            if is_tokens:
+                return self._normalize_prompt_tokens_to_input(
                     request,
                     tokenizer,
-                    prompt_ids=prompt_input["content"],
+                    prompt_ids=content,  # type: ignore[arg-type]
                     truncate_prompt_tokens=truncate_prompt_tokens,
                 )
+            return await self._normalize_prompt_text_to_input(
+                request,
+                prompt=content,  # type: ignore[arg-type]
+                truncate_prompt_tokens=truncate_prompt_tokens,
+                add_special_tokens=add_special_tokens,
+                lora_request=lora_request,
+            )
+
+        return list(await asyncio.gather(
+            *[normalize(*prompt_input) for prompt_input in prompt_inputs]))
 
     def _log_inputs(
         self,
@@ -451,6 +487,18 @@ class OpenAIServing:
             prompt_adapter_request=prompt_adapter_request,
         )
 
+    @staticmethod
+    def _get_tenant(request: Union[ChatCompletionRequest, CompletionRequest],
+                    raw_request: Optional[Request]) -> Optional[str]:
+        """Returns the tenant a request is charged to by the fair_share
+        scheduling policy. When the server requires an API key, the
+        authentication middleware sets the tenant of the key the request was
+        authenticated with. Otherwise the client-supplied "user" field is
+        used, so any client can pick its tenant."""
+        if raw_request is not None and hasattr(raw_request.state, "tenant"):
+            return raw_request.state.tenant
+        return request.user
+
     @staticmethod
     def _get_decoded_token(logprob: Logprob,
                            token_id: int,
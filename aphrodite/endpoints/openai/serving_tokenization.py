@@ -80,20 +80,23 @@ class OpenAIServingTokenization(OpenAIServing):
                 logger.warning(
                     "Multi-modal inputs are ignored during tokenization")
 
+            tokenizer_group = await self.engine_client.get_tokenizer_group()
             if isinstance(tokenizer, MistralTokenizer):
-                prompt = apply_mistral_chat_template(
-                    tokenizer,
+                prompt = await tokenizer_group.run_async(
+                    apply_mistral_chat_template,
                     messages=request.messages,
                     chat_template=self.chat_template,
                     add_generation_prompt=request.add_generation_prompt,
+                    lora_request=lora_request,
                 )
             else:
-                prompt = apply_hf_chat_template(
-                    tokenizer,
+                prompt = await tokenizer_group.run_async(
+                    apply_hf_chat_template,
                     conversation=conversation,
                     chat_template=self.chat_template,
                     add_generation_prompt=request.add_generation_prompt,
                     continue_final_message=request.continue_final_message,
+                    lora_request=lora_request,
                 )
         else:
             prompt = request.prompt
@@ -106,11 +109,12 @@ class OpenAIServingTokenization(OpenAIServing):
 
         # Silently ignore prompt adapter since it does not affect tokenization
 
-        prompt_input = self._tokenize_prompt_input(
+        prompt_input = await self._tokenize_prompt_input(
             request,
             tokenizer,
             prompt,
             add_special_tokens=request.add_special_tokens,
+            lora_request=lora_request,
         )
         input_ids = prompt_input["prompt_token_ids"]
 
@@ -145,7 +149,7 @@ class OpenAIServingTokenization(OpenAIServing):
             raise NotImplementedError("Prompt adapter is not supported "
                                       "for tokenization")
 
-        prompt_input = self._tokenize_prompt_input(
+        prompt_input = await self._tokenize_prompt_input(
             request,
             tokenizer,
             request.tokens,
@@ -6,10 +6,12 @@ from typing import Callable, Dict, List, Optional, Sequence, Type, Union
 
 from loguru import logger
 
-from aphrodite.common.utils import is_list_of
+from aphrodite.common.utils import is_list_of, random_uuid
 from aphrodite.endpoints.openai.protocol import (ChatCompletionRequest,
-                                                 DeltaMessage,
+                                                 DeltaFunctionCall,
+                                                 DeltaMessage, DeltaToolCall,
                                                  ExtractedToolCallInformation)
+from aphrodite.endpoints.openai.tool_parsers.utils import StreamedToolCall
 from aphrodite.transformers_utils.tokenizer import AnyTokenizer
 
 
@@ -60,6 +62,7 @@ class ToolParser:
         previous_token_ids: Sequence[int],
         current_token_ids: Sequence[int],
         delta_token_ids: Sequence[int],
+        request: ChatCompletionRequest,
     ) -> Union[DeltaMessage, None]:
         """
         Instance method that should be implemented for extracting tool calls
@@ -72,6 +75,65 @@ class ToolParser:
             "AbstractToolParser.extract_tool_calls_streaming has not been "
             "implemented!")
 
+    def stream_tool_calls(
+            self,
+            tool_calls: List[StreamedToolCall]) -> Optional[DeltaMessage]:
+        """
+        Returns the delta to stream for tool calls found by a
+        ToolCallJsonScanner, or None if there is nothing new. The name of a
+        tool call is sent once it is complete, and then its arguments as they
+        are scanned. Every tool call that started since the last delta is
+        sent in order, the last one becoming the current one.
+        Also keeps prev_tool_call_arr and streamed_args_for_tool up to date.
+        """
+        delta_tool_calls: List[DeltaToolCall] = []
+        for tool_id in range(max(self.current_tool_id, 0), len(tool_calls)):
+            if tool_id > self.current_tool_id:
+                self.current_tool_id = tool_id
+                self.current_tool_name_sent = False
+                self.streamed_args_for_tool.append("")
+                self.prev_tool_call_arr.append({})
+                logger.debug(f"starting on new tool {self.current_tool_id}")
+
+            tool_call = tool_calls[tool_id]
+            if not self.current_tool_name_sent:
+                # the arguments are held back until the name is sent
+                if not tool_call.name:
+                    continue
+                self.current_tool_name_sent = True
+                self.prev_tool_call_arr[tool_id]["name"] = tool_call.name
+                arguments = self._take_arguments_delta(tool_calls)
+                delta_tool_calls.append(
+                    DeltaToolCall(index=tool_id,
+                                  type="function",
+                                  id=f"chatcmpl-tool-{random_uuid()}",
+                                  function=DeltaFunctionCall(
+                                      name=tool_call.name,
+                                      arguments=arguments or None).model_dump(
+                                          exclude_none=True)))
+            else:
+                arguments = self._take_arguments_delta(tool_calls)
+                if arguments:
+                    delta_tool_calls.append(
+                        DeltaToolCall(index=tool_id,
+                                      function=DeltaFunctionCall(
+                                          arguments=arguments).model_dump(
+                                              exclude_none=True)))
+
+        if not delta_tool_calls:
+            return None
+        return DeltaMessage(tool_calls=delta_tool_calls)
+
+    def _take_arguments_delta(self,
+                              tool_calls: List[StreamedToolCall]) -> str:
+        tool_call = tool_calls[self.current_tool_id]
+        arguments = tool_call.take_arguments_delta()
+        self.streamed_args_for_tool[self.current_tool_id] += arguments
+        if tool_call.arguments_complete:
+            self.prev_tool_call_arr[
+                self.current_tool_id]["arguments"] = tool_call.arguments
+        return arguments
+
 
 class ToolParserManager:
     tool_parsers: Dict[str, Type] = {}
@@ -4,14 +4,19 @@ import string
 import timeit
 from typing import Callable
 
+import json
+
 import c_utils
 import matplotlib.pyplot as plt
 import numpy as np
+import partial_json_parser
+from partial_json_parser.core.options import Allow
 # Import both implementations
 from utils import extract_intermediate_diff as py_diff
 from utils import find_all_indices as py_indices
 from utils import find_common_prefix as py_prefix
 from utils import find_common_suffix as py_suffix
+from utils import ToolCallJsonScanner
 
 
 def generate_random_string(length: int) -> str:
@@ -94,5 +99,82 @@ def run_benchmarks():
     plt.savefig('benchmark_results.png')
     plt.close()
 
+def generate_tool_call(length: int) -> str:
+    """Generate a tool call whose arguments serialize to about length
+    characters."""
+    arguments = {}
+    while len(json.dumps(arguments)) < length:
+        key = f"arg_{len(arguments)}"
+        arguments[key] = [generate_random_string(40), random.random(), None]
+    return json.dumps({"name": "get_weather", "arguments": arguments})
+
+def stream_partial_json(deltas) -> str:
+    """Re-parse the accumulated text on every delta, like the parsers used
+    to."""
+    flags = Allow.ALL & ~Allow.STR
+    text = ""
+    streamed = ""
+    for delta in deltas:
+        text += delta
+        try:
+            tool_call = partial_json_parser.loads(text, flags)
+        except partial_json_parser.core.exceptions.MalformedJSON:
+            continue
+        arguments = tool_call.get("arguments")
+        if not arguments:
+            continue
+        arguments_json = json.dumps(arguments)
+        if streamed:
+            streamed += c_utils.extract_intermediate_diff(arguments_json,
+                                                          streamed)
+        else:
+            streamed = arguments_json
+    return streamed
+
+def stream_scanner(deltas) -> str:
+    """Scan each delta once."""
+    scanner = ToolCallJsonScanner()
+    streamed = ""
+    for delta in deltas:
+        scanner.feed(delta)
+        for tool_call in scanner.tool_calls:
+            streamed += tool_call.take_arguments_delta()
+    return streamed
+
+def run_streaming_benchmarks():
+    # Lengths of the streamed tool calls, fed in deltas of a few characters
+    # like the detokenizer produces them.
+    sizes = [1000, 5000, 10000, 50000]
+    results = {'partial_json': [], 'scanner': []}
+
+    for size in sizes:
+        tool_call = generate_tool_call(size)
+        deltas = [tool_call[i:i + 4] for i in range(0, len(tool_call), 4)]
+
+        py_time = benchmark_function(stream_partial_json, deltas, number=1)
+        scanner_time = benchmark_function(stream_scanner, deltas, number=10)
+        results['partial_json'].append(py_time)
+        results['scanner'].append(scanner_time)
+
+        print(f"\nStreaming a {size} character tool call:")
+        print(f"  partial_json_parser: {py_time*1e3:.2f} ms")
+        print(f"  ToolCallJsonScanner: {scanner_time*1e3:.2f} ms")
+        print(f"  Speedup: {py_time / scanner_time:.2f}x")
+
+    plt.figure(figsize=(8, 5))
+    plt.plot(sizes, results['partial_json'], 'b-', label='partial_json_parser')
+    plt.plot(sizes, results['scanner'], 'r-', label='ToolCallJsonScanner')
+    plt.title('Tool Call Streaming Performance')
+    plt.xlabel('Tool Call Length')
+    plt.ylabel('Time (seconds)')
+    plt.xscale('log')
+    plt.yscale('log')
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig('streaming_benchmark_results.png')
+    plt.close()
+
 if __name__ == "__main__":
     run_benchmarks()
+    run_streaming_benchmarks()
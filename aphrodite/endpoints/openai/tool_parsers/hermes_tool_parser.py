@@ -2,20 +2,16 @@ import json
 import re
 from typing import Dict, List, Sequence, Union
 
-import partial_json_parser
 from loguru import logger
-from partial_json_parser.core.options import Allow
 
-from aphrodite.common.utils import random_uuid
 from aphrodite.endpoints.openai.protocol import (ChatCompletionRequest,
-                                                 DeltaFunctionCall,
-                                                 DeltaMessage, DeltaToolCall,
+                                                 DeltaMessage,
                                                  ExtractedToolCallInformation,
                                                  FunctionCall, ToolCall)
 from aphrodite.endpoints.openai.tool_parsers.abstract_tool_parser import (
     ToolParser, ToolParserManager)
 from aphrodite.endpoints.openai.tool_parsers.utils import (
-    extract_intermediate_diff)
+    ToolCallJsonScanner)
 from aphrodite.transformers_utils.tokenizer import (AnyTokenizer,
                                                     MistralTokenizer)
 
@@ -34,6 +30,8 @@ class Hermes2ProToolParser(ToolParser):
         self.current_tool_id: int = -1
         self.streamed_args_for_tool: List[str] = [
         ]  # map what has been streamed for each tool so far to a list
+        # one incremental JSON scanner per tool call
+        self.scanners: List[ToolCallJsonScanner] = []
         self.tool_call_start_token: str = "<tool_call>"
         self.tool_call_end_token: str = "</tool_call>"
         self.tool_call_regex = re.compile(
@@ -141,205 +139,49 @@ class Hermes2ProToolParser(ToolParser):
                 logger.debug("Generating text content! skipping tool parsing.")
                 if delta_text != self.tool_call_end_token:
                     return DeltaMessage(content=delta_text)
-            # case: if tool open & close tag counts don't match, we're doing
-            # imaginary "else" block here
-            # something with tools with this diff.
-            # flags for partial JSON parting. exported constants from
-            # "Allow" are handled via BIT MASK
-            flags = (
-                Allow.ALL
-                if self.current_tool_name_sent
-                else Allow.ALL & ~Allow.STR
-            )
             # case -- we're starting a new tool call
             if (
                 cur_tool_start_count > cur_tool_end_count
                 and cur_tool_start_count > prev_tool_start_count
             ):
-                if len(delta_token_ids) > 1:
-                    tool_call_portion = current_text.split(
-                        self.tool_call_start_token
-                    )[-1]
-                else:
-                    tool_call_portion = None
-                    delta = None
-                text_portion = None
-                # set cursors and state appropriately
-                self.current_tool_id += 1
-                self.current_tool_name_sent = False
-                self.streamed_args_for_tool.append("")
-                logger.debug(f"Starting on a new tool {self.current_tool_id}")
+                tool_call_portion = delta_text.split(
+                    self.tool_call_start_token
+                )[-1]
+                self.scanners.append(ToolCallJsonScanner())
+                logger.debug("Starting on a new tool call")
             # case -- we're updating an existing tool call
             elif (
                 cur_tool_start_count > cur_tool_end_count
                 and cur_tool_start_count == prev_tool_start_count
             ):
-                # get the portion of the text that's the tool call
-                tool_call_portion = current_text.split(
-                    self.tool_call_start_token
-                )[-1]
-                text_portion = None
+                tool_call_portion = delta_text
             # case -- the current tool call is being closed.
             elif (
                 cur_tool_start_count == cur_tool_end_count
                 and cur_tool_end_count > prev_tool_end_count
             ):
-                diff = self.prev_tool_call_arr[self.current_tool_id].get(
-                    "arguments"
-                )
-                if diff:
-                    diff = json.dumps(diff).replace(
-                        self.streamed_args_for_tool[self.current_tool_id], ""
-                    )
-                    logger.debug(
-                        f"Finishing tool and found diff that had not "
-                        f"been streamed yet: {diff}"
-                    )
-                    self.streamed_args_for_tool[self.current_tool_id] += diff
-                    return DeltaMessage(
-                        tool_calls=[
-                            DeltaToolCall(
-                                index=self.current_tool_id,
-                                function=DeltaFunctionCall(
-                                    arguments=diff
-                                ).model_dump(exclude_none=True),
-                            )
-                        ]
-                    )
+                tool_call_portion = delta_text.split(
+                    self.tool_call_end_token
+                )[0]
+                # the whole tool call may be in this delta
+                if cur_tool_start_count > prev_tool_start_count:
+                    tool_call_portion = tool_call_portion.split(
+                        self.tool_call_start_token
+                    )[-1]
+                    self.scanners.append(ToolCallJsonScanner())
             # case -- otherwise we're just generating text
             else:
                 text = delta_text.replace(self.tool_call_start_token, "")
                 text = text.replace(self.tool_call_end_token, "")
                 delta = DeltaMessage(tool_calls=[], content=text)
                 return delta
-            try:
-                current_tool_call = (
-                    partial_json_parser.loads(tool_call_portion or "{}", flags)
-                    if tool_call_portion
-                    else None
-                )
-                logger.debug(f"Parsed tool call {current_tool_call}")
-            except partial_json_parser.core.exceptions.MalformedJSON:
-                logger.debug("not enough tokens to parse into JSON yet")
-                return None
-            # case - we haven't sent the tool name yet. If it's available, send
-            #   it. otherwise, wait until it's available.
-            if not self.current_tool_name_sent:
-                function_name: Union[str, None] = current_tool_call.get("name")
-                if function_name:
-                    self.current_tool_name_sent = True
-                    return DeltaMessage(tool_calls=[
-                        DeltaToolCall(index=self.current_tool_id,
-                                      type="function",
-                                      id=f"chatcmpl-tool-{random_uuid()}",
-                                      function=DeltaFunctionCall(
-                                          name=function_name).model_dump(
-                                              exclude_none=True))
-                    ])
-                else:
-                    return None
-            # case -- otherwise, send the tool call delta
-            # if the tool call portion is None, send the delta as text
-            if tool_call_portion is None:
-                # if there's text but not tool calls, send that -
-                # otherwise None to skip chunk
-                delta = (
-                    DeltaMessage(content=delta_text)
-                    if text_portion is not None
-                    else None
-                )
-                return delta
-            # now, the nitty-gritty of tool calls
-            # now we have the portion to parse as tool call.
-            logger.debug(
-                "Trying to parse current tool call with ID "
-                f"{self.current_tool_id}"
-            )
-            # if we're starting a new tool call, push an empty object in as
-            #   a placeholder for the arguments
-            if len(self.prev_tool_call_arr) <= self.current_tool_id:
-                self.prev_tool_call_arr.append({})
-            # main logic for tool parsing here - compare prev. partially-parsed
-            #   JSON to the current partially-parsed JSON
-            prev_arguments = self.prev_tool_call_arr[self.current_tool_id].get(
-                "arguments"
-            )
-            cur_arguments = current_tool_call.get("arguments")
-            logger.debug(f"diffing old arguments: {prev_arguments}")
-            logger.debug(f"against new ones: {cur_arguments}")
-            # case -- no arguments have been created yet. skip sending a delta.
-            if not cur_arguments and not prev_arguments:
-                logger.debug(f"Skipping text {delta_text} - no arguments")
-                delta = None
-            # case -- prev arguments are defined, but non are now.
-            #   probably impossible, but not a fatal error - just keep going
-            elif not cur_arguments and prev_arguments:
-                logger.error(
-                    "should be impossible to have arguments reset "
-                    "mid-call. skipping streaming anything."
-                )
-                delta = None
-            # case -- we now have the first info about arguments available from
-            #   autocompleting the JSON
-            elif cur_arguments and not prev_arguments:
-                cur_arguments_json = json.dumps(cur_arguments)
-                logger.debug(
-                    f"finding {delta_text} in {cur_arguments_json}"
-                )
-                # get the location where previous args differ from current
-                args_delta_start_loc = cur_arguments_json.index(
-                    delta_text
-                ) + len(delta_text)
-                # use that to find the actual delta
-                arguments_delta = cur_arguments_json[:args_delta_start_loc]
-                logger.debug(
-                    f"First tokens in arguments received: {arguments_delta}"
-                )
-                delta = DeltaMessage(
-                    tool_calls=[
-                        DeltaToolCall(
-                            index=self.current_tool_id,
-                            function=DeltaFunctionCall(
-                                arguments=arguments_delta
-                            ).model_dump(exclude_none=True),
-                        )
-                    ]
-                )
-                self.streamed_args_for_tool[
-                    self.current_tool_id
-                ] += arguments_delta
-            # last case -- we have an update to existing arguments.
-            elif cur_arguments and prev_arguments:
-                cur_args_json = json.dumps(cur_arguments)
-                prev_args_json = json.dumps(prev_arguments)
-                logger.debug(f"Searching for diff between\n{cur_args_json}")
-                logger.debug(f"and\n{prev_args_json}")
-                argument_diff = extract_intermediate_diff(
-                    cur_args_json, prev_args_json
-                )
-                logger.debug(f"got argument diff {argument_diff}")
-                delta = DeltaMessage(
-                    tool_calls=[
-                        DeltaToolCall(
-                            index=self.current_tool_id,
-                            function=DeltaFunctionCall(
-                                arguments=argument_diff
-                            ).model_dump(exclude_none=True),
-                        )
-                    ]
-                )
-                self.streamed_args_for_tool[
-                    self.current_tool_id
-                ] += argument_diff
-            # handle saving the state for the current tool into
-            # the "prev" list for use in diffing for the next iteration
-            if self.current_tool_id == len(self.prev_tool_call_arr) - 1:
-                self.prev_tool_call_arr[
-                    self.current_tool_id
-                ] = current_tool_call
-            else:
-                self.prev_tool_call_arr.append(current_tool_call)
-            return delta
+            # only the new text of the tool call is scanned, the scanner
+            #   keeps its state between deltas
+            self.scanners[-1].feed(tool_call_portion)
+            return self.stream_tool_calls([
+                tool_call for scanner in self.scanners
+                for tool_call in scanner.tool_calls
+            ])
         except Exception as e:
             logger.error(f"Error trying to handle streaming tool call: {e}")
             return None  # do not stream a delta. skip this token ID.
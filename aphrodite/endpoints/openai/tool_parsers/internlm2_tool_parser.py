@@ -1,20 +1,16 @@
 import json
-from typing import Dict, Sequence, Union
+from typing import Optional, Sequence, Union
 
-import partial_json_parser
 from loguru import logger
-from partial_json_parser.core.options import Allow
 
-from aphrodite.common.utils import random_uuid
 from aphrodite.endpoints.openai.protocol import (ChatCompletionRequest,
-                                                 DeltaFunctionCall,
-                                                 DeltaMessage, DeltaToolCall,
+                                                 DeltaMessage,
                                                  ExtractedToolCallInformation,
                                                  FunctionCall, ToolCall)
 from aphrodite.endpoints.openai.tool_parsers.abstract_tool_parser import (
     ToolParser, ToolParserManager)
 from aphrodite.endpoints.openai.tool_parsers.utils import (
-    extract_intermediate_diff)
+    ToolCallJsonScanner)
 from aphrodite.transformers_utils.tokenizer import AnyTokenizer
 
 
@@ -23,6 +19,10 @@ class Internlm2ToolParser(ToolParser):
     def __init__(self, tokenizer: AnyTokenizer):
         super().__init__(tokenizer)
         self.position = 0
+        # the incremental JSON scanner of the tool call, and the end of the
+        # text it was fed
+        self.scanner: Optional[ToolCallJsonScanner] = None
+        self.scanned_len = 0
 
     def adjust_request(
         self, request: ChatCompletionRequest
@@ -51,125 +51,36 @@ class Internlm2ToolParser(ToolParser):
         delta_token_ids: Sequence[int],
         request: ChatCompletionRequest,
     ) -> Union[DeltaMessage, None]:
-        if "<|action_start|>" not in current_text:
-            self.position = len(current_text)
-            return DeltaMessage(content=delta_text)
+        if self.scanner is None:
+            if "<|action_start|>" not in current_text:
+                self.position = len(current_text)
+                return DeltaMessage(content=delta_text)
+            action_start = current_text.find(
+                "<|action_start|><|plugin|>", self.position
+            )
+            if action_start == -1:
+                return None
+            # tool calls are generated in an object in inernlm2
+            # it's not support parallel tool calls
+            self.scanner = ToolCallJsonScanner()
+            self.scanned_len = action_start + len(
+                "<|action_start|><|plugin|>"
+            )
+            text = current_text[self.position:action_start]
+            self.position = action_start
+            if len(text) > 0:
+                return DeltaMessage(content=text)
         # if the tool call is sended, return a empty delta message
         # to make sure the finish_reason will be send correctly.
         if self.current_tool_id > 0:
             return DeltaMessage(content="")
-        last_pos = self.position
-        if "<|action_start|><|plugin|>" not in current_text[last_pos:]:
-            return None
-        new_delta = current_text[last_pos:]
-        text, action = new_delta.split("<|action_start|><|plugin|>")
-        if len(text) > 0:
-            self.position = self.position + len(text)
-            return DeltaMessage(content=text)
-        action = action.strip()
-        action = action.split("<|action_end|>".strip())[0]
-        # bit mask flags for partial JSON parsing. If the name hasn't been
-        # sent yet, don't allow sending
-        # an incomplete string since OpenAI only ever (as far as I have
-        # seen) allows sending the entire tool/ function name at once.
-        flags = (
-            Allow.ALL if self.current_tool_name_sent else Allow.ALL & ~Allow.STR
-        )
         try:
-            parsable_arr = action
-            # tool calls are generated in an object in inernlm2
-            # it's not support parallel tool calls
-            try:
-                tool_call_arr: Dict = partial_json_parser.loads(
-                    parsable_arr, flags
-                )
-            except partial_json_parser.core.exceptions.MalformedJSON:
-                logger.debug("not enough tokens to parse into JSON yet")
-                return None
-            # if the current tool name hasn't been sent, send if available
-            # - otherwise send nothing
-            if not self.current_tool_name_sent:
-                function_name = tool_call_arr.get("name")
-                if function_name:
-                    self.current_tool_id = self.current_tool_id + 1
-                    delta = DeltaMessage(
-                        tool_calls=[
-                            DeltaToolCall(
-                                index=self.current_tool_id,
-                                type="function",
-                                id=f"chatcmpl-tool-{random_uuid()}",
-                                function=DeltaFunctionCall(
-                                    name=function_name
-                                ).model_dump(exclude_none=True),
-                            )
-                        ]
-                    )
-                    self.current_tool_name_sent = True
-                    self.streamed_args_for_tool.append("")
-                else:
-                    delta = None
-            # now we know we're on the same tool call and we're streaming
-            # arguments
-            else:
-                prev_arguments = self.get_argments(
-                    self.prev_tool_call_arr[self.current_tool_id]
-                )
-                cur_arguments = self.get_argments(tool_call_arr)
-                # not arguments generated
-                if not cur_arguments and not prev_arguments:
-                    delta = None
-                # will never happen
-                elif not cur_arguments and prev_arguments:
-                    logger.error(
-                        "INVARIANT - impossible to have arguments reset "
-                        "mid-arguments"
-                    )
-                    delta = None
-                # first time to get parameters
-                elif cur_arguments and not prev_arguments:
-                    cur_arguments_json = json.dumps(cur_arguments)
-                    arguments_delta = cur_arguments_json[
-                        : cur_arguments_json.index(delta_text) + len(delta_text)
-                    ]
-                    delta = DeltaMessage(
-                        tool_calls=[
-                            DeltaToolCall(
-                                index=self.current_tool_id,
-                                function=DeltaFunctionCall(
-                                    arguments=arguments_delta
-                                ).model_dump(exclude_none=True),
-                            )
-                        ]
-                    )
-                    self.streamed_args_for_tool[
-                        self.current_tool_id
-                    ] += arguments_delta
-                # both prev and cur parameters, send the increase parameters
-                elif cur_arguments and prev_arguments:
-                    cur_args_json = json.dumps(cur_arguments)
-                    prev_args_json = json.dumps(prev_arguments)
-                    argument_diff = extract_intermediate_diff(
-                        cur_args_json, prev_args_json
-                    )
-                    delta = DeltaMessage(
-                        tool_calls=[
-                            DeltaToolCall(
-                                index=self.current_tool_id,
-                                function=DeltaFunctionCall(
-                                    arguments=argument_diff
-                                ).model_dump(exclude_none=True),
-                            )
-                        ]
-                    )
-                    self.streamed_args_for_tool[
-                        self.current_tool_id
-                    ] += argument_diff
-            # check to see if the name is defined and has been sent. if so,
-            # stream the name - otherwise keep waiting
-            # finish by setting old and returning None as base case
-            tool_call_arr["arguments"] = self.get_argments(tool_call_arr)
-            self.prev_tool_call_arr = [tool_call_arr]
-            return delta
+            # only the new text is scanned, the scanner keeps its state
+            # between deltas and ignores the text after the object, such as
+            # <|action_end|>
+            self.scanner.feed(current_text[self.scanned_len:])
+            self.scanned_len = len(current_text)
+            return self.stream_tool_calls(self.scanner.tool_calls)
         except Exception as e:
             logger.error(f"Error trying to handle streaming tool call: {e}")
             logger.debug(
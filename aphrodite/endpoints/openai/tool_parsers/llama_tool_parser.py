@@ -1,43 +1,19 @@
 import json
 import re
-from json import JSONDecodeError, JSONDecoder
+from json import JSONDecoder
 from typing import Dict, List, Sequence, Union
 
-import partial_json_parser
 from loguru import logger
-from partial_json_parser.core.options import Allow
 from transformers import PreTrainedTokenizerBase
 
-from aphrodite.common.utils import random_uuid
 from aphrodite.endpoints.openai.protocol import (ChatCompletionRequest,
-                                                 DeltaFunctionCall,
-                                                 DeltaMessage, DeltaToolCall,
+                                                 DeltaMessage,
                                                  ExtractedToolCallInformation,
                                                  FunctionCall, ToolCall)
 from aphrodite.endpoints.openai.tool_parsers.abstract_tool_parser import (
     ToolParser, ToolParserManager)
-from aphrodite.endpoints.openai.tool_parsers.utils import find_common_prefix
-
-
-# partial_json_parser doesn't support extra data and
-# JSONDecorder.raw_decode doesn't support partial JSON
-def partial_json_loads(input_str, flags):
-    try:
-        return (partial_json_parser.loads(input_str, flags), len(input_str))
-    except JSONDecodeError as e:
-        if "Extra data" in e.msg:
-            dec = JSONDecoder()
-            return dec.raw_decode(input_str)
-        else:
-            raise
-
-
-def is_complete_json(input_str):
-    try:
-        json.loads(input_str)
-        return True
-    except JSONDecodeError:
-        return False
+from aphrodite.endpoints.openai.tool_parsers.utils import (
+    ToolCallJsonScanner)
 
 
 @ToolParserManager.register_module("llama3_json")
@@ -58,6 +34,12 @@ class Llama3JsonToolParser(ToolParser):
         self.streamed_args_for_tool: List[
             str
         ] = []  # map what has been streamed for each tool so far to a list
+        # one incremental JSON scanner per tool call, and the positions in
+        # the text of the JSON of the last one and of the end of the text it
+        # was fed
+        self.scanners: List[ToolCallJsonScanner] = []
+        self.scan_start: int = 0
+        self.scanned_len: int = 0
         self.bot_token = "<|python_tag|>"
         self.bot_token_id = tokenizer.encode(
             self.bot_token, add_special_tokens=False
@@ -136,156 +118,35 @@ class Llama3JsonToolParser(ToolParser):
             or current_text.startswith("{")
         ):
             return DeltaMessage(content=delta_text)
-        # bit mask flags for partial JSON parsing. If the name hasn't been
-        # sent yet, don't allow sending
-        # an incomplete string since OpenAI only ever (as far as I have
-        # seen) allows sending the entire tool/ function name at once.
-        flags = (
-            Allow.ALL if self.current_tool_name_sent else Allow.ALL & ~Allow.STR
-        )
         try:
-            tool_call_arr = []
-            is_complete = []
-            try:
+            if not self.scanners:
                 # depending on the prompt format the Llama model may or may not
                 # prefix the output with the <|python_tag|> token
-                start_idx = (
+                self.scan_start = (
                     len(self.bot_token)
                     if current_text.startswith(self.bot_token)
                     else 0
                 )
-                while start_idx < len(current_text):
-                    (obj, end_idx) = partial_json_loads(
-                        current_text[start_idx:], flags
-                    )
-                    is_complete.append(
-                        is_complete_json(
-                            current_text[start_idx : start_idx + end_idx]
-                        )
-                    )
-                    start_idx += end_idx + len("; ")
-                    # depending on the prompt Llama can use
-                    # either arguments or parameters
-                    if "parameters" in obj:
-                        assert (
-                            "arguments" not in obj
-                        ), "model generated both parameters and arguments"
-                        obj["arguments"] = obj["parameters"]
-                    tool_call_arr.append(obj)
-            except partial_json_parser.core.exceptions.MalformedJSON:
-                logger.debug("not enough tokens to parse into JSON yet")
-                return None
-            # select as the current tool call the one we're on the state at
-            current_tool_call: Dict = (
-                tool_call_arr[self.current_tool_id]
-                if len(tool_call_arr) > 0
-                else {}
-            )
-            # case -- if no tokens have been streamed for the tool, e.g.
-            #   only the array brackets, stream nothing
-            if len(tool_call_arr) == 0:
-                return None
-            # case: we are starting a new tool in the array
-            #   -> array has > 0 length AND length has moved past cursor
-            elif (
-                len(tool_call_arr) > 0
-                and len(tool_call_arr) > self.current_tool_id + 1
-            ):
-                # if we're moving on to a new call, first make sure we
-                # haven't missed anything in the previous one that was
-                # auto-generated due to JSON completions, but wasn't
-                # streamed to the client yet.
-                if self.current_tool_id >= 0:
-                    cur_arguments = current_tool_call.get("arguments")
-                    if cur_arguments:
-                        cur_args_json = json.dumps(cur_arguments)
-                        sent = len(
-                            self.streamed_args_for_tool[self.current_tool_id]
-                        )
-                        argument_diff = cur_args_json[sent:]
-                        logger.debug(f"got arguments diff: {argument_diff}")
-                        delta = DeltaMessage(
-                            tool_calls=[
-                                DeltaToolCall(
-                                    index=self.current_tool_id,
-                                    function=DeltaFunctionCall(
-                                        arguments=argument_diff
-                                    ).model_dump(exclude_none=True),
-                                )
-                            ]
-                        )
-                        self.streamed_args_for_tool[
-                            self.current_tool_id
-                        ] += argument_diff
-                    else:
-                        delta = None
-                else:
-                    delta = None
-                # re-set stuff pertaining to progress in the current tool
-                self.current_tool_id = len(tool_call_arr) - 1
-                self.current_tool_name_sent = False
-                self.streamed_args_for_tool.append("")
-                logger.debug(f"starting on new tool {self.current_tool_id}")
-                return delta
-            # if the current tool name hasn't been sent, send if available
-            # - otherwise send nothing
-            elif not self.current_tool_name_sent:
-                function_name = current_tool_call.get("name")
-                if function_name:
-                    delta = DeltaMessage(
-                        tool_calls=[
-                            DeltaToolCall(
-                                index=self.current_tool_id,
-                                type="function",
-                                id=f"chatcmpl-tool-{random_uuid()}",
-                                function=DeltaFunctionCall(
-                                    name=function_name
-                                ).model_dump(exclude_none=True),
-                            )
-                        ]
-                    )
-                    self.current_tool_name_sent = True
-                else:
-                    delta = None
-            # now we know we're on the same tool call and we're streaming
-            # arguments
-            else:
-                cur_arguments = current_tool_call.get("arguments")
-                delta = None
-                if cur_arguments:
-                    sent = len(
-                        self.streamed_args_for_tool[self.current_tool_id]
-                    )
-                    cur_args_json = json.dumps(cur_arguments)
-                    prev_arguments = self.prev_tool_call_arr[
-                        self.current_tool_id
-                    ].get("arguments")
-                    argument_diff = None
-                    if is_complete[self.current_tool_id]:
-                        argument_diff = cur_args_json[sent:]
-                    elif prev_arguments:
-                        prev_args_json = json.dumps(prev_arguments)
-                        if cur_args_json != prev_args_json:
-                            prefix = find_common_prefix(
-                                prev_args_json, cur_args_json
-                            )
-                            argument_diff = prefix[sent:]
-                    if argument_diff is not None:
-                        delta = DeltaMessage(
-                            tool_calls=[
-                                DeltaToolCall(
-                                    index=self.current_tool_id,
-                                    function=DeltaFunctionCall(
-                                        arguments=argument_diff
-                                    ).model_dump(exclude_none=True),
-                                )
-                            ]
-                        )
-                        self.streamed_args_for_tool[
-                            self.current_tool_id
-                        ] += argument_diff
-            self.prev_tool_call_arr = tool_call_arr
-            return delta
+                self.scanned_len = self.scan_start
+                self.scanners.append(ToolCallJsonScanner())
+            # only the new text is scanned, the scanners keep their state
+            #   between deltas. Tool calls are separated by "; ".
+            while True:
+                scanner = self.scanners[-1]
+                scanner.feed(current_text[self.scanned_len:])
+                self.scanned_len = len(current_text)
+                if not scanner.done:
+                    break
+                next_start = self.scan_start + scanner.end + len("; ")
+                if next_start >= len(current_text):
+                    break
+                self.scan_start = next_start
+                self.scanned_len = next_start
+                self.scanners.append(ToolCallJsonScanner())
+            return self.stream_tool_calls([
+                tool_call for scanner in self.scanners
+                for tool_call in scanner.tool_calls
+            ])
         except Exception as e:
             logger.error(f"Error trying to handle streaming tool call: {e}")
             logger.debug(
@@ -2,23 +2,19 @@ import json
 import re
 from random import choices
 from string import ascii_letters, digits
-from typing import Dict, List, Sequence, Union
+from typing import Dict, List, Optional, Sequence, Union
 
-import partial_json_parser
 from loguru import logger
-from partial_json_parser.core.options import Allow
 from pydantic import Field
 
-from aphrodite.common.utils import random_uuid
 from aphrodite.endpoints.openai.protocol import (ChatCompletionRequest,
-                                                 DeltaFunctionCall,
-                                                 DeltaMessage, DeltaToolCall,
+                                                 DeltaMessage,
                                                  ExtractedToolCallInformation,
                                                  FunctionCall, ToolCall)
 from aphrodite.endpoints.openai.tool_parsers.abstract_tool_parser import (
     ToolParser, ToolParserManager)
 from aphrodite.endpoints.openai.tool_parsers.utils import (
-    extract_intermediate_diff)
+    ToolCallJsonScanner)
 from aphrodite.transformers_utils.tokenizer import (AnyTokenizer,
                                                     MistralTokenizer)
 
@@ -59,6 +55,10 @@ class MistralToolParser(ToolParser):
         self.streamed_args_for_tool: List[
             str
         ] = []  # map what has been streamed for each tool so far to a list
+        # the incremental JSON scanner of the tool call array, and the end of
+        # the text it was fed
+        self.scanner: Optional[ToolCallJsonScanner] = None
+        self.scanned_len: int = 0
         self.bot_token = "[TOOL_CALLS]"
         self.bot_token_id = self.vocab.get(self.bot_token)
         self.tool_call_regex = re.compile(r"\[{.*?}\]", re.DOTALL)
@@ -134,169 +134,17 @@ class MistralToolParser(ToolParser):
             # if it's the only token, return None, so we don't send a chat
             # completion any don't send a control token
             return None
-        # bit mask flags for partial JSON parsing. If the name hasn't been
-        # sent yet, don't allow sending
-        # an incomplete string since OpenAI only ever (as far as I have
-        # seen) allows sending the entire tool/ function name at once.
-        flags = (
-            Allow.ALL if self.current_tool_name_sent else Allow.ALL & ~Allow.STR
-        )
         try:
-            # replace BOT token with empty string, and convert single quotes
-            # to double to allow parsing as JSON since mistral uses single
-            # quotes instead of double for tool calls
-            parsable_arr = current_text.split(self.bot_token)[-1]
-            # tool calls are generated in an array, so do partial JSON
-            # parsing on the entire array
-            try:
-                tool_call_arr: List[Dict] = partial_json_parser.loads(
-                    parsable_arr, flags
-                )
-            except partial_json_parser.core.exceptions.MalformedJSON:
-                logger.debug("not enough tokens to parse into JSON yet")
-                return None
-            # select as the current tool call the one we're on the state at
-            current_tool_call: Dict = (
-                tool_call_arr[self.current_tool_id]
-                if len(tool_call_arr) > 0
-                else {}
-            )
-            # case -- if no tokens have been streamed for the tool, e.g.
-            #   only the array brackets, stream nothing
-            if len(tool_call_arr) == 0:
-                return None
-            # case: we are starting a new tool in the array
-            #   -> array has > 0 length AND length has moved past cursor
-            elif (
-                len(tool_call_arr) > 0
-                and len(tool_call_arr) > self.current_tool_id + 1
-            ):
-                # if we're moving on to a new call, first make sure we
-                # haven't missed anything in the previous one that was
-                # auto-generated due to JSON completions, but wasn't
-                # streamed to the client yet.
-                if self.current_tool_id >= 0:
-                    diff: Union[str, None] = current_tool_call.get("arguments")
-                    if diff:
-                        diff = json.dumps(diff).replace(
-                            self.streamed_args_for_tool[self.current_tool_id],
-                            "",
-                        )
-                        delta = DeltaMessage(
-                            tool_calls=[
-                                DeltaToolCall(
-                                    index=self.current_tool_id,
-                                    function=DeltaFunctionCall(
-                                        arguments=diff
-                                    ).model_dump(exclude_none=True),
-                                )
-                            ]
-                        )
-                        self.streamed_args_for_tool[
-                            self.current_tool_id
-                        ] += diff
-                    else:
-                        delta = None
-                else:
-                    delta = None
-                # re-set stuff pertaining to progress in the current tool
-                self.current_tool_id = len(tool_call_arr) - 1
-                self.current_tool_name_sent = False
-                self.streamed_args_for_tool.append("")
-                logger.debug(f"starting on new tool {self.current_tool_id}")
-                return delta
-            # case: update an existing tool - this is handled below
-            # if the current tool name hasn't been sent, send if available
-            # - otherwise send nothing
-            if not self.current_tool_name_sent:
-                function_name = current_tool_call.get("name")
-                if function_name:
-
-                    delta = DeltaMessage(tool_calls=[
-                        DeltaToolCall(index=self.current_tool_id,
-                                      type="function",
-                                      id=f"chatcmpl-tool-{random_uuid()}",
-                                      function=DeltaFunctionCall(
-                                          name=function_name).model_dump(
-                                              exclude_none=True))
-                    ])
-                    self.current_tool_name_sent = True
-                else:
-                    delta = None
-            # now we know we're on the same tool call and we're streaming
-            # arguments
-            else:
-                prev_arguments = self.prev_tool_call_arr[
-                    self.current_tool_id
-                ].get("arguments")
-                cur_arguments = current_tool_call.get("arguments")
-                new_text = delta_text.replace("'", '"')
-                if not cur_arguments and not prev_arguments:
-                    delta = None
-                elif not cur_arguments and prev_arguments:
-                    logger.error(
-                        "INVARIANT - impossible to have arguments reset "
-                        "mid-arguments"
-                    )
-                    delta = None
-                elif cur_arguments and not prev_arguments:
-                    cur_arguments_json = json.dumps(cur_arguments)
-                    logger.debug(
-                        f"finding {new_text} in {cur_arguments_json}"
-                    )
-                    arguments_delta = cur_arguments_json[
-                        : cur_arguments_json.index(new_text) + len(new_text)
-                    ]
-                    logger.debug(
-                        f"First tokens in arguments received: {arguments_delta}"
-                    )
-                    delta = DeltaMessage(
-                        tool_calls=[
-                            DeltaToolCall(
-                                index=self.current_tool_id,
-                                function=DeltaFunctionCall(
-                                    arguments=arguments_delta
-                                ).model_dump(exclude_none=True),
-                            )
-                        ]
-                    )
-                    self.streamed_args_for_tool[
-                        self.current_tool_id
-                    ] += arguments_delta
-                elif cur_arguments and prev_arguments:
-                    cur_args_json = json.dumps(cur_arguments)
-                    prev_args_json = json.dumps(prev_arguments)
-                    logger.debug(
-                        f"Searching for diff between \n{cur_args_json}\n"
-                        f"{prev_args_json}"
-                    )
-                    argument_diff = extract_intermediate_diff(
-                        cur_args_json, prev_args_json
-                    )
-                    logger.debug(f"got arguments diff: {argument_diff}")
-                    delta = DeltaMessage(
-                        tool_calls=[
-                            DeltaToolCall(
-                                index=self.current_tool_id,
-                                function=DeltaFunctionCall(
-                                    arguments=argument_diff
-                                ).model_dump(exclude_none=True),
-                            )
-                        ]
-                    )
-                    self.streamed_args_for_tool[
-                        self.current_tool_id
-                    ] += argument_diff
-                else:
-                    # try parsing it with regular JSON - if it works we're
-                    # at the end, and we need to send the difference between
-                    # tokens streamed so far and the valid JSON
-                    delta = None
-            # check to see if the name is defined and has been sent. if so,
-            # stream the name - otherwise keep waiting
-            # finish by setting old and returning None as base case
-            self.prev_tool_call_arr = tool_call_arr
-            return delta
+            # tool calls are generated in an array after the BOT token. Only
+            # the new text is scanned, the scanner keeps its state between
+            # deltas
+            if self.scanner is None:
+                self.scanner = ToolCallJsonScanner(call_depth=2)
+                self.scanned_len = (current_text.rindex(self.bot_token) +
+                                    len(self.bot_token))
+            self.scanner.feed(current_text[self.scanned_len:])
+            self.scanned_len = len(current_text)
+            return self.stream_tool_calls(self.scanner.tool_calls)
         except Exception as e:
             logger.error(f"Error trying to handle streaming tool call: {e}")
             logger.debug(
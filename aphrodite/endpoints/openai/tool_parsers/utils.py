@@ -1,3 +1,9 @@
+import enum
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+
 def find_common_prefix(s1: str, s2: str) -> str:
     """
     Finds a common prefix that is shared between two strings, if there is one.
@@ -75,3 +81,329 @@ def find_all_indices(string, substring):
             break
         indices.append(index)
     return indices
+
+
+def complete_json_prefix(prefix: str) -> str:
+    """
+    Returns the text that completes a prefix of a JSON value that ends after
+    a value, after an opening bracket or inside a string, such as the
+    arguments streamed for a tool call by a ToolCallJsonScanner. Used to
+    close the arguments of a tool call when generation stops midway.
+    e.g. complete_json_prefix('{"city": "Dal') -> '"}'
+    """
+    closers = []
+    in_string = False
+    escaped = False
+    for char in prefix:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            closers.append("}")
+        elif char == "[":
+            closers.append("]")
+        elif char in "}]":
+            closers.pop()
+    return ('"' if in_string else "") + "".join(reversed(closers))
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRING_CHARS = re.compile(r'[^"\\]+')
+_ESCAPE = re.compile(r'\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})')
+_PARTIAL_ESCAPE = re.compile(r"\\(?:u[0-9a-fA-F]{0,3})?")
+_NUMBER_CHARS = re.compile(r"[-+0-9.eE]+")
+_LITERALS = ("true", "false", "null")
+
+
+class _ScanState(enum.Enum):
+    # A value is expected.
+    VALUE = enum.auto()
+    # Right after "[": a value or "]".
+    FIRST_ITEM = enum.auto()
+    # Right after "{": a key or "}".
+    FIRST_KEY = enum.auto()
+    # After "," in an object.
+    KEY = enum.auto()
+    COLON = enum.auto()
+    # After a value: "," or the end of its container.
+    AFTER_VALUE = enum.auto()
+    STRING = enum.auto()
+    DONE = enum.auto()
+
+
+class StreamedToolCall:
+    """A tool call found by a ToolCallJsonScanner.
+
+    The arguments are re-serialized the way json.dumps() does as they are
+    scanned, so that the deltas returned by take_arguments_delta() add up to
+    json.dumps() of the complete arguments. Separators and keys are held back
+    until the value after them starts, so that the streamed arguments can be
+    completed by complete_json_prefix() if generation stops midway.
+    """
+
+    def __init__(self) -> None:
+        # Only set once the name string is complete.
+        self.name: Optional[str] = None
+        # Only set once the arguments value is complete.
+        self.arguments: Any = None
+        self.arguments_complete = False
+        self._arguments_parts: List[str] = []
+        self._num_taken_parts = 0
+
+    def take_arguments_delta(self) -> str:
+        """Return the serialized arguments scanned since the last call."""
+        delta = "".join(self._arguments_parts[self._num_taken_parts:])
+        self._num_taken_parts = len(self._arguments_parts)
+        return delta
+
+    def _complete_arguments(self) -> None:
+        self.arguments = json.loads("".join(self._arguments_parts))
+        self.arguments_complete = True
+
+
+class ToolCallJsonScanner:
+    """Scans the JSON of streamed tool calls incrementally.
+
+    Unlike re-parsing the whole text with partial_json_parser on every delta,
+    the scanner keeps its state between deltas and only scans the new text,
+    so streaming a tool call costs O(length) in total instead of
+    O(length^2). Only the text that cannot be scanned yet, e.g. a number that
+    may have more digits, is kept.
+
+    Tool calls are the objects nested in call_depth containers: 1 for a
+    single object, 2 for an array of objects. Scanning stops at the end of
+    the first JSON value; anything after it is ignored.
+
+    Args:
+        call_depth: The depth of the tool call objects.
+        arguments_keys: The keys holding the arguments of a tool call.
+    """
+
+    def __init__(self,
+                 call_depth: int = 1,
+                 arguments_keys: Tuple[str, ...] = ("arguments",
+                                                    "parameters")):
+        self.call_depth = call_depth
+        self.arguments_keys = arguments_keys
+        self.tool_calls: List[StreamedToolCall] = []
+        # The index in the fed text right after the JSON value, once it is
+        # complete.
+        self.end: Optional[int] = None
+
+        self._buffer = ""
+        # The index in the fed text of the start of the buffer.
+        self._offset = 0
+        self._state = _ScanState.VALUE
+        # "{" or "[" for each open container.
+        self._stack: List[str] = []
+        # The current key of the current tool call.
+        self._key: Optional[str] = None
+        self._string_is_key = False
+        # The characters of the current string if it is a key or the name of
+        # the current tool call, with escape sequences.
+        self._string_chars: Optional[List[str]] = None
+        # Whether the arguments of the current tool call are being scanned.
+        self._in_arguments = False
+        # The separators and key of the arguments that are held back until
+        # the next value starts.
+        self._held_back: List[str] = []
+        self._holding_back = False
+        self._failed = False
+
+    @property
+    def done(self) -> bool:
+        return self._state is _ScanState.DONE
+
+    def feed(self, text: str) -> None:
+        """Scan more text. Raises ValueError if it is not valid JSON, after
+        which the scanner ignores any further text."""
+        if self.done or self._failed:
+            return
+        buffer = self._buffer + text
+        try:
+            pos = self._scan(buffer)
+        except ValueError:
+            self._failed = True
+            raise
+        self._offset += pos
+        self._buffer = buffer[pos:]
+
+    def _emit(self, text: str) -> None:
+        if not self._in_arguments:
+            return
+        if self._holding_back:
+            self._held_back.append(text)
+            return
+        arguments_parts = self.tool_calls[-1]._arguments_parts
+        if self._held_back:
+            arguments_parts.extend(self._held_back)
+            self._held_back.clear()
+        arguments_parts.append(text)
+
+    def _scan(self, buffer: str) -> int:
+        """Scan the buffer as far as possible and return where it stopped."""
+        pos = 0
+        end = len(buffer)
+        while pos < end:
+            state = self._state
+            if state is _ScanState.STRING:
+                match = _STRING_CHARS.match(buffer, pos)
+                if match is not None:
+                    self._on_string_chars(match.group(), is_escape=False)
+                    pos = match.end()
+                elif buffer[pos] == '"':
+                    self._end_string()
+                    pos += 1
+                else:
+                    match = _ESCAPE.match(buffer, pos)
+                    if match is None:
+                        if _PARTIAL_ESCAPE.fullmatch(buffer, pos):
+                            # Wait for the rest of the escape sequence.
+                            break
+                        raise ValueError(
+                            f"Invalid escape in tool call JSON at {pos}")
+                    self._on_string_chars(match.group(), is_escape=True)
+                    pos = match.end()
+                continue
+
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos == end:
+                break
+            char = buffer[pos]
+            if state is _ScanState.VALUE or (state is _ScanState.FIRST_ITEM
+                                             and char != "]"):
+                next_pos = self._scan_value(buffer, pos)
+                if next_pos is None:
+                    # Wait for the rest of the number or literal.
+                    break
+                pos = next_pos
+            elif (char == "}" and state in (_ScanState.FIRST_KEY,
+                                            _ScanState.AFTER_VALUE)
+                  and self._stack[-1] == "{") or (
+                      char == "]" and state in (_ScanState.FIRST_ITEM,
+                                                _ScanState.AFTER_VALUE)
+                      and self._stack[-1] == "["):
+                self._close_container(char)
+                pos += 1
+            elif char == '"' and state in (_ScanState.FIRST_KEY,
+                                           _ScanState.KEY):
+                self._holding_back = True
+                self._start_string(is_key=True)
+                pos += 1
+            elif char == ":" and state is _ScanState.COLON:
+                self._emit(": ")
+                self._state = _ScanState.VALUE
+                pos += 1
+            elif char == "," and state is _ScanState.AFTER_VALUE:
+                self._holding_back = True
+                self._emit(", ")
+                self._state = (_ScanState.KEY
+                               if self._stack[-1] == "{" else _ScanState.VALUE)
+                pos += 1
+            else:
+                raise ValueError(
+                    f"Unexpected {char!r} in tool call JSON at {pos}")
+
+            if self.done:
+                self.end = self._offset + pos
+                break
+        return pos
+
+    def _scan_value(self, buffer: str, pos: int) -> Optional[int]:
+        """Scan the start of a value, or a whole number or literal. Returns
+        None if the buffer ends before the value can be scanned."""
+        if (not self._in_arguments and self._key in self.arguments_keys
+                and len(self._stack) == self.call_depth and self.tool_calls):
+            self._in_arguments = True
+        self._holding_back = False
+
+        char = buffer[pos]
+        if char == "{" or char == "[":
+            self._emit(char)
+            self._stack.append(char)
+            if char == "{":
+                self._state = _ScanState.FIRST_KEY
+                if (len(self._stack) == self.call_depth
+                        and not self._in_arguments):
+                    self.tool_calls.append(StreamedToolCall())
+                    self._key = None
+            else:
+                self._state = _ScanState.FIRST_ITEM
+            return pos + 1
+        if char == '"':
+            self._start_string(is_key=False)
+            return pos + 1
+
+        match = _NUMBER_CHARS.match(buffer, pos)
+        if match is not None:
+            if match.end() == len(buffer):
+                return None
+            # Numbers are serialized the way json.dumps() does, e.g. 1E2 as
+            # 100.0, so they are only emitted once complete.
+            self._emit(json.dumps(json.loads(match.group())))
+            self._end_value()
+            return match.end()
+        for literal in _LITERALS:
+            if buffer.startswith(literal, pos):
+                self._emit(literal)
+                self._end_value()
+                return pos + len(literal)
+            if literal.startswith(buffer[pos:pos + len(literal)]) and (
+                    pos + len(literal) > len(buffer)):
+                return None
+        raise ValueError(f"Unexpected {char!r} in tool call JSON at {pos}")
+
+    def _start_string(self, is_key: bool) -> None:
+        self._emit('"')
+        self._state = _ScanState.STRING
+        self._string_is_key = is_key
+        at_call_depth = (len(self._stack) == self.call_depth
+                         and not self._in_arguments)
+        if at_call_depth and (is_key or self._key == "name"):
+            self._string_chars = []
+        else:
+            self._string_chars = None
+
+    def _on_string_chars(self, chars: str, is_escape: bool) -> None:
+        if self._in_arguments:
+            if is_escape:
+                chars = json.loads(f'"{chars}"')
+            # Each half of an escaped surrogate pair is serialized the same
+            # way as the pair.
+            self._emit(json.dumps(chars)[1:-1])
+        elif self._string_chars is not None:
+            self._string_chars.append(chars)
+
+    def _end_string(self) -> None:
+        self._emit('"')
+        string = None
+        if self._string_chars is not None:
+            string = json.loads(f'"{"".join(self._string_chars)}"',
+                                strict=False)
+        self._string_chars = None
+        if self._string_is_key:
+            if string is not None:
+                self._key = string
+            self._state = _ScanState.COLON
+            return
+        if string is not None and self.tool_calls:
+            self.tool_calls[-1].name = string
+        self._end_value()
+
+    def _close_container(self, char: str) -> None:
+        self._emit(char)
+        self._stack.pop()
+        self._end_value()
+
+    def _end_value(self) -> None:
+        if self._in_arguments and len(self._stack) == self.call_depth:
+            self._in_arguments = False
+            self.tool_calls[-1]._complete_arguments()
+        self._state = (_ScanState.AFTER_VALUE
+                       if self._stack else _ScanState.DONE)
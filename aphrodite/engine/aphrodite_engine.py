@@ -7,7 +7,7 @@ from functools import partial
 from typing import (TYPE_CHECKING, Any, Callable, ClassVar, Deque, Dict,
                     Iterable, List, NamedTuple, Optional)
 from typing import Sequence as GenericSequence
-from typing import Set, Type, Union
+from typing import Set, Tuple, Type, Union
 
 import torch
 from loguru import logger
@@ -27,9 +27,12 @@ from aphrodite.common.sampling_params import RequestOutputKind, SamplingParams
 from aphrodite.common.sequence import (EmbeddingSequenceGroupOutput,
                                        ExecuteModelRequest, Sequence,
                                        SequenceGroup, SequenceGroupMetadata,
-                                       SequenceStatus)
+                                       SequenceOutput, SequenceStatus)
+from aphrodite.common.startup_trace import (maybe_dump_startup_trace,
+                                            startup_phase)
 from aphrodite.common.utils import Counter, Device, weak_bind
-from aphrodite.endpoints.openai.logits_processors import get_logits_processors
+from aphrodite.endpoints.openai.logits_processors import (
+    clamp_logit_bias, verify_allowed_token_ids)
 from aphrodite.engine.args_tools import EngineArgs
 from aphrodite.engine.metrics_types import StatLoggerBase, Stats
 from aphrodite.engine.output_processor.interfaces import (
@@ -305,7 +308,8 @@ class AphroditeEngine:
         self.use_cached_outputs = use_cached_outputs
 
         if not self.model_config.skip_tokenizer_init:
-            self.tokenizer = self._init_tokenizer()
+            with startup_phase("init_tokenizer"):
+                self.tokenizer = self._init_tokenizer()
             self.detokenizer = Detokenizer(self.tokenizer)
             tokenizer_group = self.get_tokenizer_group()
         else:
@@ -331,20 +335,22 @@ class AphroditeEngine:
         self.input_processor = input_registry.create_input_processor(
             model_config)
 
-        self.model_executor = executor_class(
-            model_config=model_config,
-            cache_config=cache_config,
-            parallel_config=parallel_config,
-            scheduler_config=scheduler_config,
-            device_config=device_config,
-            lora_config=lora_config,
-            speculative_config=speculative_config,
-            load_config=load_config,
-            prompt_adapter_config=prompt_adapter_config,
-        )
+        with startup_phase("init_executor"):
+            self.model_executor = executor_class(
+                model_config=model_config,
+                cache_config=cache_config,
+                parallel_config=parallel_config,
+                scheduler_config=scheduler_config,
+                device_config=device_config,
+                lora_config=lora_config,
+                speculative_config=speculative_config,
+                load_config=load_config,
+                prompt_adapter_config=prompt_adapter_config,
+            )
 
         if not self.model_config.embedding_mode:
-            self._initialize_kv_caches()
+            with startup_phase("initialize_kv_caches"):
+                self._initialize_kv_caches()
 
         if self.tokenizer:
             # Ping the tokenizer to ensure liveness if it runs in a
@@ -433,8 +439,9 @@ class AphroditeEngine:
         The workers will determine the number of blocks in both the GPU cache
         and the swap CPU cache.
         """
-        num_gpu_blocks, num_cpu_blocks = (
-            self.model_executor.determine_num_available_blocks())
+        with startup_phase("profile_run"):
+            num_gpu_blocks, num_cpu_blocks = (
+                self.model_executor.determine_num_available_blocks())
 
         if self.cache_config.num_gpu_blocks_override is not None:
             num_gpu_blocks_override = self.cache_config.num_gpu_blocks_override
@@ -444,8 +451,16 @@ class AphroditeEngine:
 
         self.cache_config.num_gpu_blocks = num_gpu_blocks
         self.cache_config.num_cpu_blocks = num_cpu_blocks
+        from aphrodite.worker.cache_engine import CacheEngine
+        (self.cache_config.num_prefix_cache_cpu_blocks,
+         self.cache_config.num_prefix_cache_disk_blocks) = (
+             CacheEngine.get_num_prefix_cache_blocks(self.cache_config,
+                                                     self.model_config,
+                                                     self.parallel_config))
 
-        self.model_executor.initialize_cache(num_gpu_blocks, num_cpu_blocks)
+        with startup_phase("initialize_cache"):
+            self.model_executor.initialize_cache(num_gpu_blocks,
+                                                 num_cpu_blocks)
 
     @classmethod
     def _get_executor_cls(cls,
@@ -515,7 +530,8 @@ class AphroditeEngine:
     ) -> "AphroditeEngine":
         """Creates an Aphrodite engine from the engine arguments."""
         # Create the engine configs.
-        engine_config = engine_args.create_engine_config()
+        with startup_phase("create_engine_config"):
+            engine_config = engine_args.create_engine_config()
         executor_class = cls._get_executor_cls(engine_config)
         # Create the LLM engine.
         engine = cls(
@@ -524,6 +540,7 @@ class AphroditeEngine:
             log_stats=not engine_args.disable_log_stats,
             stat_loggers=stat_loggers,
         )
+        maybe_dump_startup_trace(engine_args.startup_trace)
 
         return engine
 
@@ -587,6 +604,7 @@ class AphroditeEngine:
         lora_request: Optional[LoRARequest],
         prompt_adapter_request: Optional[PromptAdapterRequest],
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> None:
         self._validate_model_inputs(processed_inputs)
         # Create the sequences.
@@ -617,7 +635,8 @@ class AphroditeEngine:
                 lora_request=lora_request,
                 prompt_adapter_request=prompt_adapter_request,
                 encoder_seq=encoder_seq,
-                priority=priority)
+                priority=priority,
+                tenant=tenant)
         elif isinstance(params, PoolingParams):
             seq_group = self._create_sequence_group_with_pooling(
                 request_id,
@@ -627,7 +646,8 @@ class AphroditeEngine:
                 lora_request=lora_request,
                 prompt_adapter_request=prompt_adapter_request,
                 encoder_seq=encoder_seq,
-                priority=priority)
+                priority=priority,
+                tenant=tenant)
         else:
             raise ValueError(
                 "Either SamplingParams or PoolingParams must be provided.")
@@ -652,6 +672,7 @@ class AphroditeEngine:
         lora_request: Optional[LoRARequest] = None,
         prompt_adapter_request: Optional[PromptAdapterRequest] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> None:
         """Add a request to the engine's request pool.
 
@@ -672,6 +693,8 @@ class AphroditeEngine:
                 the current monotonic time.
             priority: The priority of the request.
                 Only applicable with priority scheduling.
+            tenant: The tenant that submitted the request.
+                Only applicable with fair_share scheduling.
 
         Details:
             - Set arrival_time to the current time if it is None.
@@ -731,6 +754,7 @@ class AphroditeEngine:
             lora_request=lora_request,
             prompt_adapter_request=prompt_adapter_request,
             priority=priority,
+            tenant=tenant,
         )
 
     def _create_sequence_group_with_sampling(
@@ -743,6 +767,7 @@ class AphroditeEngine:
         prompt_adapter_request: Optional[PromptAdapterRequest] = None,
         encoder_seq: Optional[Sequence] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> SequenceGroup:
         """Creates a SequenceGroup with SamplingParams."""
         max_logprobs = self.get_model_config().max_logprobs
@@ -773,7 +798,8 @@ class AphroditeEngine:
             lora_request=lora_request,
             prompt_adapter_request=prompt_adapter_request,
             encoder_seq=encoder_seq,
-            priority=priority)
+            priority=priority,
+            tenant=tenant)
 
         return seq_group
 
@@ -787,6 +813,7 @@ class AphroditeEngine:
         prompt_adapter_request: Optional[PromptAdapterRequest],
         encoder_seq: Optional[Sequence] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> SequenceGroup:
         """Creates a SequenceGroup with PoolingParams."""
         # Defensive copy of PoolingParams, which are used by the pooler
@@ -800,7 +827,8 @@ class AphroditeEngine:
             pooling_params=pooling_params,
             prompt_adapter_request=prompt_adapter_request,
             encoder_seq=encoder_seq,
-            priority=priority)
+            priority=priority,
+            tenant=tenant)
         return seq_group
 
     def abort_request(self, request_id: Union[str, Iterable[str]]) -> None:
@@ -970,6 +998,16 @@ class AphroditeEngine:
         else:
             indices = range(len(seq_group_metadata_list))  # type: ignore
 
+        if (self.detokenizer is not None and not request_id
+                and not has_multiple_outputs
+                and not self.model_config.embedding_mode
+                and self.speculative_config is None
+                and (is_async or not self.scheduler_config.is_multi_step)):
+            self._decode_sampled_tokens(outputs_by_sequence_group[0],
+                                        seq_group_metadata_list,
+                                        scheduler_outputs, indices, skip,
+                                        is_async)
+
         finished_before: List[int] = []
         finished_now: List[int] = []
         for i in indices:
@@ -1097,6 +1135,33 @@ class AphroditeEngine:
 
         return None
 
+    def _decode_sampled_tokens(
+            self, output: SamplerOutput,
+            seq_group_metadata_list: List[SequenceGroupMetadata],
+            scheduler_outputs: SchedulerOutputs, indices: Iterable[int],
+            skip: List[int], is_async: bool) -> None:
+        """Decode the tokens sampled for the single sequence requests of a
+        step in one batch, ahead of the output processor which goes through
+        the sequence groups one by one.
+        """
+        assert self.detokenizer is not None
+        seqs: List[Tuple[Sequence, SamplingParams,
+                         Optional[SequenceOutput]]] = []
+        for i in indices:
+            if i in skip or not seq_group_metadata_list[i].do_sample:
+                continue
+            seq_group = scheduler_outputs.scheduled_seq_groups[i].seq_group
+            params = seq_group.sampling_params
+            if (seq_group.is_finished() or params is None
+                    or not params.detokenize or params.n > 1
+                    or params.use_beam_search):
+                continue
+            # With async output processing the token is already appended.
+            sample = None if is_async else output[i].samples[0]
+            seqs.append((seq_group.seqs[0], params, sample))
+        if seqs:
+            self.detokenizer.decode_sequences(seqs)
+
     def _advance_to_next_step(
             self, output: List[SamplerOutput],
             seq_group_metadata_list: List[SequenceGroupMetadata],
@@ -1250,6 +1315,8 @@ class AphroditeEngine:
                 blocks_to_swap_in=scheduler_outputs.blocks_to_swap_in,
                 blocks_to_swap_out=scheduler_outputs.blocks_to_swap_out,
                 blocks_to_copy=scheduler_outputs.blocks_to_copy,
+                prefix_cache_transfers=scheduler_outputs.
+                prefix_cache_transfers,
                 num_lookahead_slots=scheduler_outputs.num_lookahead_slots,
                 running_queue_size=scheduler_outputs.running_queue_size,
                 finished_requests_ids=finished_requests_ids,
@@ -1471,6 +1538,16 @@ class AphroditeEngine:
             0].get_prefix_cache_hit_rate(Device.CPU)
         gpu_prefix_cache_hit_rate = self.scheduler[
             0].get_prefix_cache_hit_rate(Device.GPU)
+        gpu_prefix_cache_num_evictions = 0
+        gpu_prefix_cache_num_reuses = 0
+        gpu_prefix_cache_total_reuse_distance = 0
+        eviction_metrics = self.scheduler[0].get_prefix_cache_eviction_metrics(
+            Device.GPU)
+        if eviction_metrics is not None:
+            gpu_prefix_cache_num_evictions = eviction_metrics.num_evictions
+            gpu_prefix_cache_num_reuses = eviction_metrics.num_reuses
+            gpu_prefix_cache_total_reuse_distance = (
+                eviction_metrics.total_reuse_distance)
 
         # Iteration stats
         num_prompt_tokens_iter = 0
@@ -1601,6 +1678,10 @@ class AphroditeEngine:
             #   Prefix Cache Hit Rate
             cpu_prefix_cache_hit_rate=cpu_prefix_cache_hit_rate,
             gpu_prefix_cache_hit_rate=gpu_prefix_cache_hit_rate,
+            gpu_prefix_cache_num_evictions=gpu_prefix_cache_num_evictions,
+            gpu_prefix_cache_num_reuses=gpu_prefix_cache_num_reuses,
+            gpu_prefix_cache_total_reuse_distance=(
+                gpu_prefix_cache_total_reuse_distance),
 
             # Iteration stats
             num_prompt_tokens_iter=num_prompt_tokens_iter,
@@ -1701,10 +1782,11 @@ class AphroditeEngine:
         sampling_params: SamplingParams,
         lora_request: Optional[LoRARequest],
     ) -> SamplingParams:
-        """Constructs logits processors based on the guided_decoding,
-        logits_bias, and allowed_token_ids fields in sampling_params. Deletes
-        those fields and adds the constructed logits processors to the
-        logits_processors field. Returns the modified sampling params."""
+        """Constructs logits processors based on the guided_decoding field in
+        sampling_params. Deletes that field and adds the constructed logits
+        processors to the logits_processors field. Validates the logit_bias
+        and allowed_token_ids fields, which the sampler applies. Returns the
+        modified sampling params."""
         logits_processors = []
         if sampling_params.guided_decoding is not None:
             # Defensively copy sampling params since guided decoding logits
@@ -1729,16 +1811,17 @@ class AphroditeEngine:
             # Unset so this doesn't get passed down to the model
             sampling_params.guided_decoding = None
         if sampling_params.logit_bias or sampling_params.allowed_token_ids:
+            # Left in the sampling params, for the sampler to apply them to
+            # the whole batch at once instead of per row as logits
+            # processors.
             tokenizer = self.get_tokenizer(lora_request=lora_request)
-            processors = get_logits_processors(
-                logit_bias=sampling_params.logit_bias,
-                allowed_token_ids=sampling_params.allowed_token_ids,
-                tokenizer=tokenizer,
-            )
-            logits_processors.extend(processors)
-            # Unset so these don't get passed down to the model
-            sampling_params.logit_bias = None
-            sampling_params.allowed_token_ids = None
+            if sampling_params.logit_bias:
+                sampling_params = copy.copy(sampling_params)
+                sampling_params.logit_bias = clamp_logit_bias(
+                    sampling_params.logit_bias, tokenizer)
+            if sampling_params.allowed_token_ids:
+                verify_allowed_token_ids(sampling_params.allowed_token_ids,
+                                         len(tokenizer))
         if logits_processors:
             if sampling_params.logits_processors is None:
                 sampling_params.logits_processors = logits_processors
@@ -116,6 +116,10 @@ class EngineArgs:
     kv_cache_dtype: str = "auto"
     block_size: int = 16
     enable_prefix_caching: Optional[bool] = False
+    prefix_cache_eviction_policy: str = "lru"
+    prefix_cache_cpu_gb: float = 0
+    prefix_cache_disk_path: Optional[str] = None
+    prefix_cache_disk_gb: float = 0
     num_gpu_blocks_override: Optional[int] = None
     disable_sliding_window: bool = False
     gpu_memory_utilization: float = 0.90
@@ -146,6 +150,7 @@ class EngineArgs:
     typical_acceptance_sampler_posterior_threshold: Optional[float] = None
     typical_acceptance_sampler_posterior_alpha: Optional[float] = None
     disable_logprobs_during_spec_decoding: Optional[bool] = None
+    speculative_adaptive_length: bool = False
     # Adapter Options
     enable_lora: bool = False
     enable_lora_bias: bool = False
@@ -162,10 +167,14 @@ class EngineArgs:
     max_prompt_adapter_token: int = 0
     # Log Options
     disable_log_stats: bool = False
+    startup_trace: Optional[str] = None
     disable_async_output_proc: bool = False
     override_neuron_config: Optional[Dict[str, Any]] = None
     mm_processor_kwargs: Optional[Dict[str, Any]] = None
-    scheduling_policy: Literal["fcfs", "priority"] = "fcfs"
+    scheduling_policy: Literal["fcfs", "priority", "prefix_aware",
+                               "fair_share"] = "fcfs"
+    prefix_aware_max_wait_time: float = 10.0
+    tenant_weights: Optional[Dict[str, float]] = None
 
     def __post_init__(self):
         if self.tokenizer is None:
@@ -338,7 +347,10 @@ class EngineArgs:
                             default=EngineArgs.tokenizer_pool_type,
                             help="Category: Model Options\n"
                             "The type of tokenizer pool to use for "
-                            "asynchronous tokenization. Ignored if "
+                            "asynchronous tokenization: 'ray', or "
+                            "'process' for a local process pool that also "
+                            "tokenizes the prompts of the API server off "
+                            "the event loop. Ignored if "
                             "tokenizer_pool_size is 0.")
         parser.add_argument("--tokenizer-pool-extra-config",
                             type=str,
@@ -571,6 +583,44 @@ class EngineArgs:
             help="Category: Cache Options\n"
             "Enable automatic prefix caching.",
         )
+        parser.add_argument(
+            "--prefix-cache-eviction-policy",
+            type=str,
+            default=EngineArgs.prefix_cache_eviction_policy,
+            choices=["lru", "lfu", "gdsf"],
+            help="Category: Cache Options\n"
+            "The policy used to evict cached blocks when prefix caching is "
+            "enabled. 'lru' evicts the least recently used block, 'lfu' the "
+            "least frequently used one with aging, and 'gdsf' weighs the "
+            "frequency of a block by the number of tokens it would take to "
+            "recompute it. 'lfu' and 'gdsf' need the v2 block manager.",
+        )
+        parser.add_argument(
+            "--prefix-cache-cpu-gb",
+            type=float,
+            default=EngineArgs.prefix_cache_cpu_gb,
+            help="Category: Cache Options\n"
+            "The size (GiB) of the pinned CPU memory per GPU that blocks "
+            "evicted from the prefix cache are demoted to, so that they can "
+            "be copied back instead of recomputed. Needs "
+            "--enable-prefix-caching and the v2 block manager.",
+        )
+        parser.add_argument(
+            "--prefix-cache-disk-path",
+            type=str,
+            default=EngineArgs.prefix_cache_disk_path,
+            help="Category: Cache Options\n"
+            "A local directory for memory-mapped files that blocks evicted "
+            "from the CPU prefix cache are saved to. Needs "
+            "--prefix-cache-cpu-gb.",
+        )
+        parser.add_argument(
+            "--prefix-cache-disk-gb",
+            type=float,
+            default=EngineArgs.prefix_cache_disk_gb,
+            help="Category: Cache Options\n"
+            "The size (GiB) per GPU of the disk prefix cache.",
+        )
         parser.add_argument(
             "--num-gpu-blocks-override",
             type=int,
@@ -806,6 +856,15 @@ class EngineArgs:
             'during speculative decoding reduces latency by skipping logprob '
             'calculation in proposal sampling, target sampling, and after '
             'accepted tokens are determined.')
+        parser.add_argument(
+            '--speculative-adaptive-length',
+            action='store_true',
+            help='Category: Speculative Decoding Options\n'
+            'If set, choose the number of speculative tokens of each step, '
+            'up to --num-speculative-tokens, and the requests to speculate '
+            'on, from their acceptance rates and the measured draft and '
+            'scoring times. Requests with a low acceptance rate stop '
+            'speculating.')
         # Adapter Options
         parser.add_argument(
             "--enable-lora",
@@ -903,6 +962,15 @@ class EngineArgs:
             help="Category: Log Options\n"
             "disable logging statistics",
         )
+        parser.add_argument(
+            "--startup-trace",
+            type=str,
+            default=EngineArgs.startup_trace,
+            help="Category: Log Options\n"
+            "Write the wall time and peak RSS of each phase of engine "
+            "startup to this JSON file once the engine is ready, or log "
+            "them if set to '-'.",
+        )
         parser.add_argument(
             "--disable-async-output-proc",
             action="store_true",
@@ -917,13 +985,35 @@ class EngineArgs:
             "e.g. {\"cast_logits_dtype\": \"bloat16\"}.'")
         parser.add_argument(
             '--scheduling-policy',
-            choices=['fcfs', 'priority'],
+            choices=['fcfs', 'priority', 'prefix_aware', 'fair_share'],
             default="fcfs",
             help='The scheduling policy to use. "fcfs" (first come first served'
-            ', i.e. requests are handled in order of arrival; default) '
-            'or "priority" (requests are handled based on given '
+            ', i.e. requests are handled in order of arrival; default), '
+            '"priority" (requests are handled based on given '
             'priority (lower value means earlier handling) and time of '
-            'arrival deciding any ties).')
+            'arrival deciding any ties) or "prefix_aware" (waiting requests '
+            'with the longest prompt prefix in the prefix cache are handled '
+            'first; requires --enable-prefix-caching) or "fair_share" (the '
+            'token budget is divided across tenants by weight, see '
+            '--tenant-weights).')
+        parser.add_argument(
+            '--prefix-aware-max-wait-time',
+            type=float,
+            default=EngineArgs.prefix_aware_max_wait_time,
+            help='With the "prefix_aware" scheduling policy, requests that '
+            'have been waiting for longer than this many seconds are handled '
+            'first, in order of arrival.')
+        parser.add_argument(
+            '--tenant-weights',
+            type=json.loads,
+            default=None,
+            help='With the "fair_share" scheduling policy, the weight of each '
+            'tenant\'s share of the token budget as a JSON object, e.g. '
+            '\'{"team-a": 2, "team-b": 1}\'. With the OpenAI API server, '
+            'the tenant of a request is the one its API key is issued to '
+            '(see --api-key-tenants), or the "user" field of the request if '
+            'the server requires no API key. Unlisted tenants have a weight '
+            'of 1.')
 
         return parser
 
@@ -1018,6 +1108,10 @@ class EngineArgs:
             sliding_window=model_config.get_sliding_window(),
             enable_prefix_caching=self.enable_prefix_caching,
             cpu_offload_gb=self.cpu_offload_gb,
+            prefix_cache_eviction_policy=self.prefix_cache_eviction_policy,
+            prefix_cache_cpu_gb=self.prefix_cache_cpu_gb,
+            prefix_cache_disk_path=self.prefix_cache_disk_path,
+            prefix_cache_disk_gb=self.prefix_cache_disk_gb,
         )
 
         parallel_config = ParallelConfig(
@@ -1100,6 +1194,7 @@ class EngineArgs:
             typical_acceptance_sampler_posterior_alpha=self.
             typical_acceptance_sampler_posterior_alpha,
             disable_logprobs=self.disable_logprobs_during_spec_decoding,
+            speculative_adaptive_length=self.speculative_adaptive_length,
         )
 
         if self.num_scheduler_steps > 1:
@@ -1137,6 +1232,8 @@ class EngineArgs:
                              parallel_config.use_ray),
             single_user_mode=self.single_user_mode,
             policy=self.scheduling_policy,
+            prefix_aware_max_wait_time=self.prefix_aware_max_wait_time,
+            tenant_weights=self.tenant_weights,
         )
 
         if not HAS_TRITON and self.enable_lora:
@@ -17,6 +17,8 @@ from aphrodite.common.outputs import EmbeddingRequestOutput, RequestOutput
 from aphrodite.common.pooling_params import PoolingParams
 from aphrodite.common.sampling_params import SamplingParams
 from aphrodite.common.sequence import ExecuteModelRequest
+from aphrodite.common.startup_trace import (maybe_dump_startup_trace,
+                                            startup_phase)
 from aphrodite.common.utils import weak_bind
 from aphrodite.engine.aphrodite_engine import (AphroditeEngine,
                                                SchedulerOutputState)
@@ -33,6 +35,7 @@ from aphrodite.modeling.layers.sampler import SamplerOutput
 from aphrodite.processing.scheduler import SchedulerOutputs
 from aphrodite.prompt_adapter.request import PromptAdapterRequest
 from aphrodite.transformers_utils.tokenizer import AnyTokenizer
+from aphrodite.transformers_utils.tokenizer_group import BaseTokenizerGroup
 
 ENGINE_ITERATION_TIMEOUT_S = envs.APHRODITE_ENGINE_ITERATION_TIMEOUT_S
 
@@ -328,6 +331,8 @@ class _AsyncAphrodite(AphroditeEngine):
                 blocks_to_swap_in=scheduler_outputs.blocks_to_swap_in,
                 blocks_to_swap_out=scheduler_outputs.blocks_to_swap_out,
                 blocks_to_copy=scheduler_outputs.blocks_to_copy,
+                prefix_cache_transfers=scheduler_outputs.
+                prefix_cache_transfers,
                 virtual_engine=virtual_engine,
                 num_lookahead_slots=scheduler_outputs.num_lookahead_slots,
                 running_queue_size=scheduler_outputs.running_queue_size,
@@ -413,6 +418,7 @@ class _AsyncAphrodite(AphroditeEngine):
         lora_request: Optional[LoRARequest] = None,
         prompt_adapter_request: Optional[PromptAdapterRequest] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> None:
         """Async version of :meth:`add_request`."""
         if lora_request is not None and not self.lora_config:
@@ -454,6 +460,7 @@ class _AsyncAphrodite(AphroditeEngine):
             lora_request=lora_request,
             prompt_adapter_request=prompt_adapter_request,
             priority=priority,
+            tenant=tenant,
         )
 
     async def check_health_async(self) -> None:
@@ -622,7 +629,8 @@ class AsyncAphrodite:
         """Creates an async LLM engine from the engine arguments."""
         # Create the engine configs.
         if engine_config is None:
-            engine_config = engine_args.create_engine_config()
+            with startup_phase("create_engine_config"):
+                engine_config = engine_args.create_engine_config()
 
         executor_class = cls._get_executor_cls(engine_config)
 
@@ -638,6 +646,7 @@ class AsyncAphrodite:
             start_engine_loop=start_engine_loop,
             stat_loggers=stat_loggers,
         )
+        maybe_dump_startup_trace(engine_args.startup_trace)
         return engine
 
     @property
@@ -679,6 +688,9 @@ class AsyncAphrodite:
         return await (self.engine.get_tokenizer_group().
                       get_lora_tokenizer_async(lora_request))
 
+    async def get_tokenizer_group(self) -> BaseTokenizerGroup:
+        return self.engine.get_tokenizer_group()
+
     def start_background_loop(self) -> None:
         """Start the background loop."""
         if self.errored:
@@ -837,6 +849,7 @@ class AsyncAphrodite:
         lora_request: Optional[LoRARequest] = None,
         prompt_adapter_request: Optional[PromptAdapterRequest] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> AsyncGenerator[Union[RequestOutput, EmbeddingRequestOutput], None]:
         if not self.is_running:
             if self.start_engine_loop:
@@ -861,7 +874,8 @@ class AsyncAphrodite:
             arrival_time=arrival_time or time.time(),
             lora_request=lora_request,
             prompt_adapter_request=prompt_adapter_request,
-            priority=priority)
+            priority=priority,
+            tenant=tenant)
 
         return stream.generator()
 
@@ -873,6 +887,7 @@ class AsyncAphrodite:
         lora_request: Optional[LoRARequest] = None,
         prompt_adapter_request: Optional[PromptAdapterRequest] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> AsyncGenerator[RequestOutput, None]:
         """Generate outputs for a request.
 
@@ -890,6 +905,8 @@ class AsyncAphrodite:
                                             for generation, if any.
             priority: The priority of the request.
                 Only applicable with priority scheduling.
+            tenant: The tenant that submitted the request.
+                Only applicable with fair_share scheduling.
 
         Yields:
             The output `RequestOutput` objects from the AphroditeEngine
@@ -946,6 +963,7 @@ class AsyncAphrodite:
                 lora_request=lora_request,
                 prompt_adapter_request=prompt_adapter_request,
                 priority=priority,
+                tenant=tenant,
         ):
             yield AphroditeEngine.validate_output(output, RequestOutput)
 
@@ -956,6 +974,7 @@ class AsyncAphrodite:
         request_id: str,
         lora_request: Optional[LoRARequest] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> AsyncGenerator[EmbeddingRequestOutput, None]:
         """Generate outputs for a request from an embedding model.
 
@@ -972,6 +991,8 @@ class AsyncAphrodite:
             lora_request: LoRA request to use for generation, if any.
             priority: The priority of the request.
                 Only applicable with priority scheduling.
+            tenant: The tenant that submitted the request.
+                Only applicable with fair_share scheduling.
 
         Yields:
             The output `EmbeddingRequestOutput` objects from the AphroditeEngine
@@ -1024,6 +1045,7 @@ class AsyncAphrodite:
                 pooling_params,
                 lora_request=lora_request,
                 priority=priority,
+                tenant=tenant,
         ):
             yield AphroditeEngine.validate_output(output,
                                                   EmbeddingRequestOutput)
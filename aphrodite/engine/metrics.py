@@ -88,6 +88,21 @@ class Metrics:
             documentation="GPU prefix cache block hit rate.",
             labelnames=labelnames,
             multiprocess_mode="sum")
+        #   Prefix caching evictions. The mean reuse distance is
+        #   reuse_distance_blocks_total / reuses_total.
+        self.counter_gpu_prefix_cache_evictions = self._counter_cls(
+            name="aphrodite:gpu_prefix_cache_evictions_total",
+            documentation="Number of GPU prefix cache blocks evicted.",
+            labelnames=labelnames)
+        self.counter_gpu_prefix_cache_reuses = self._counter_cls(
+            name="aphrodite:gpu_prefix_cache_reuses_total",
+            documentation="Number of freed GPU prefix cache blocks reused.",
+            labelnames=labelnames)
+        self.counter_gpu_prefix_cache_reuse_distance = self._counter_cls(
+            name="aphrodite:gpu_prefix_cache_reuse_distance_blocks_total",
+            documentation="Sum over the reused GPU prefix cache blocks of the "
+            "number of blocks freed between the block being freed and reused.",
+            labelnames=labelnames)
 
         # Iteration stats
         self.counter_num_preemption = self._counter_cls(
@@ -461,6 +476,14 @@ class PrometheusStatLogger(StatLoggerBase):
         self.labels = labels
         self.metrics = self._metrics_cls(labelnames=list(labels.keys()),
                                          max_model_len=max_model_len)
+        # The last values of the cumulative stats, by name.
+        self._last_cumulative_values: Dict[str, int] = {}
+
+    def _get_increment(self, name: str, value: int) -> int:
+        # The increment of a cumulative stat since it was last logged.
+        last_value = self._last_cumulative_values.get(name, 0)
+        self._last_cumulative_values[name] = value
+        return max(value - last_value, 0)
 
     def _log_gauge(self, gauge, data: Union[int, float]) -> None:
         # Convenience function for logging to gauge.
@@ -501,6 +524,19 @@ class PrometheusStatLogger(StatLoggerBase):
                         stats.cpu_prefix_cache_hit_rate)
         self._log_gauge(self.metrics.gauge_gpu_prefix_cache_hit_rate,
                         stats.gpu_prefix_cache_hit_rate)
+        # The eviction counters of the stats are cumulative.
+        self._log_counter(
+            self.metrics.counter_gpu_prefix_cache_evictions,
+            self._get_increment("gpu_prefix_cache_num_evictions",
+                                stats.gpu_prefix_cache_num_evictions))
+        self._log_counter(
+            self.metrics.counter_gpu_prefix_cache_reuses,
+            self._get_increment("gpu_prefix_cache_num_reuses",
+                                stats.gpu_prefix_cache_num_reuses))
+        self._log_counter(
+            self.metrics.counter_gpu_prefix_cache_reuse_distance,
+            self._get_increment("gpu_prefix_cache_total_reuse_distance",
+                                stats.gpu_prefix_cache_total_reuse_distance))
 
         # Iteration level data
         self._log_counter(self.metrics.counter_num_preemption,
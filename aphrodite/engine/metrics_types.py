@@ -32,6 +32,10 @@ class Stats:
     #   Prefix caching block hit rate
     cpu_prefix_cache_hit_rate: float
     gpu_prefix_cache_hit_rate: float
+    #   Prefix caching evictions (GPU), cumulative
+    gpu_prefix_cache_num_evictions: int
+    gpu_prefix_cache_num_reuses: int
+    gpu_prefix_cache_total_reuse_distance: int
     # Iteration stats (should have _iter suffix)
     num_prompt_tokens_iter: int
     num_generation_tokens_iter: int
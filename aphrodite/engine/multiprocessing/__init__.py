@@ -5,6 +5,8 @@ from typing import List, Mapping, Optional, Union
 from aphrodite import PoolingParams
 from aphrodite.common.outputs import RequestOutput
 from aphrodite.common.sampling_params import SamplingParams
+from aphrodite.distributed.device_communicators.shm_broadcast import (
+    ShmRingBuffer)
 from aphrodite.inputs import PromptType
 from aphrodite.lora.request import LoRARequest
 from aphrodite.prompt_adapter.request import PromptAdapterRequest
@@ -30,6 +32,7 @@ class RPCProcessRequest:
     trace_headers: Optional[Mapping[str, str]] = None
     prompt_adapter_request: Optional[PromptAdapterRequest] = None
     priority: int = 0
+    tenant: Optional[str] = None
 
 
 @dataclass
@@ -52,6 +55,8 @@ class RPCStartupRequest(Enum):
 @dataclass
 class RPCStartupResponse:
     tracing_enabled: bool
+    # The buffer of the shared memory output transport, if it is used.
+    output_buffer: Optional[ShmRingBuffer] = None
 
 
 @dataclass
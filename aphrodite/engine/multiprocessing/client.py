@@ -2,7 +2,8 @@ import asyncio
 import copy
 import pickle
 from contextlib import contextmanager, suppress
-from typing import Any, AsyncGenerator, Dict, Iterator, Optional, Union
+from typing import (Any, AsyncGenerator, Dict, Iterator, List, Optional,
+                    Sequence, Union)
 
 import cloudpickle
 import zmq
@@ -27,11 +28,14 @@ from aphrodite.engine.multiprocessing import (APHRODITE_RPC_SUCCESS_STR,
                                               RPCProcessRequest,
                                               RPCStartupRequest,
                                               RPCStartupResponse)
+from aphrodite.engine.multiprocessing.outputs import (
+    OUTPUT_FORMAT_MSGSPEC, OUTPUT_FORMAT_SHM, RequestOutputDecoder,
+    RequestOutputDelta, SharedMemoryOutputChannel)
 from aphrodite.inputs import PromptType
 from aphrodite.lora.request import LoRARequest
 from aphrodite.prompt_adapter.request import PromptAdapterRequest
 from aphrodite.transformers_utils.tokenizer_group import (
-    init_tokenizer_from_configs)
+    BaseTokenizerGroup, init_tokenizer_from_configs)
 
 
 class MQClientClosedError(Exception):
@@ -102,6 +106,10 @@ class MQAphroditeEngineClient:
 
         # Stream for each individual request.
         self.output_queues: Dict[str, asyncio.Queue] = {}
+        self.output_decoder = RequestOutputDecoder()
+        # Set up from the startup response if the engine uses the shared
+        # memory output transport.
+        self.output_channel: Optional[SharedMemoryOutputChannel] = None
         self.output_loop = asyncio.create_task(self.run_output_handler_loop())
 
         # Loop to check health of the AphroditeEngine periodically.
@@ -168,8 +176,9 @@ class MQAphroditeEngineClient:
                                 ENGINE_DEAD_ERROR(self._errored_with))
                         return
 
-                message: Frame = await self.output_socket.recv(copy=False)
-                request_outputs = pickle.loads(message.buffer)
+                frames: List[Frame] = await self.output_socket.recv_multipart(
+                    copy=False)
+                request_outputs = self._decode_outputs(frames)
 
                 is_error = isinstance(request_outputs,
                                       (BaseException, RPCError))
@@ -209,13 +218,31 @@ class MQAphroditeEngineClient:
                     for request_output in request_outputs:
                         queue = self.output_queues.get(
                             request_output.request_id)
-                        if queue is not None:
-                            queue.put_nowait(request_output)
+                        if queue is None:
+                            continue
+                        if isinstance(request_output, RequestOutputDelta):
+                            request_output = (
+                                self.output_decoder.to_request_output(
+                                    request_output))
+                        queue.put_nowait(request_output)
 
         except asyncio.CancelledError:
             logger.debug(
                 "Shutting down MQAphroditeEngineClient output handler.")
 
+    def _decode_outputs(self, frames: Sequence[Frame]) -> Any:
+        """Decode a message of the output socket. RequestOutputs encoded
+        with msgspec are left as RequestOutputDeltas, which are only turned
+        into RequestOutputs for requests that are still waiting for them."""
+        output_format = frames[0].bytes
+        if output_format == OUTPUT_FORMAT_SHM:
+            assert self.output_channel is not None
+            with self.output_channel.read() as payload:
+                return self.output_decoder.decode(payload)
+        if output_format == OUTPUT_FORMAT_MSGSPEC:
+            return self.output_decoder.decode(frames[1].buffer)
+        return pickle.loads(frames[1].buffer)
+
     async def setup(self):
         """Setup the client before it starts sending server requests."""
 
@@ -224,6 +251,9 @@ class MQAphroditeEngineClient:
             response = await self._wait_for_server_rpc(socket)
 
             self.tracing_flag = response.tracing_enabled
+            if response.output_buffer is not None:
+                self.output_channel = SharedMemoryOutputChannel(
+                    response.output_buffer)
 
             # Start health_loop.
             self.health_loop = asyncio.create_task(
@@ -312,6 +342,9 @@ class MQAphroditeEngineClient:
     async def get_tokenizer(self, lora_request: LoRARequest):
         return await self.tokenizer.get_lora_tokenizer_async(lora_request)
 
+    async def get_tokenizer_group(self) -> BaseTokenizerGroup:
+        return self.tokenizer
+
     async def get_decoding_config(self) -> DecodingConfig:
         return self.decoding_config
 
@@ -374,6 +407,7 @@ class MQAphroditeEngineClient:
         lora_request: Optional[LoRARequest] = None,
         prompt_adapter_request: Optional[PromptAdapterRequest] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> AsyncGenerator[RequestOutput, None]:
         """Generate outputs for a request.
         Generate outputs for a request. This method is a coroutine. It adds the
@@ -391,10 +425,12 @@ class MQAphroditeEngineClient:
             priority: Priority of the request (lower means earlier handling).
                 Any priority other than 0 will lead to an error if the
                 scheduling policy is not "priority".
+            tenant: The tenant that submitted the request. Only used by the
+                "fair_share" scheduling policy.
         """
         return self._process_request(prompt, sampling_params, request_id,
                                      lora_request, prompt_adapter_request,
-                                     priority)
+                                     priority, tenant)
 
     def encode(
         self,
@@ -403,6 +439,7 @@ class MQAphroditeEngineClient:
         request_id: str,
         lora_request: Optional[LoRARequest] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> AsyncGenerator[EmbeddingRequestOutput, None]:
         """Generate outputs for a request from an embedding model.
         Generate outputs for a request. This method is a coroutine. It adds the
@@ -420,7 +457,7 @@ class MQAphroditeEngineClient:
             for the request.
         """
         return self._process_request(prompt, pooling_params, request_id,
-                                     lora_request, None, priority)
+                                     lora_request, None, priority, tenant)
 
     async def _process_request(
         self,
@@ -430,6 +467,7 @@ class MQAphroditeEngineClient:
         lora_request: Optional[LoRARequest] = None,
         prompt_adapter_request: Optional[PromptAdapterRequest] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> Union[AsyncGenerator[RequestOutput, None], AsyncGenerator[
             EmbeddingRequestOutput, None]]:
         """Send an RPCGenerateRequest to the RPCServer and stream responses."""
@@ -475,7 +513,8 @@ class MQAphroditeEngineClient:
                     request_id=request_id,
                     lora_request=lora_request,
                     prompt_adapter_request=prompt_adapter_request,
-                    priority=priority))
+                    priority=priority,
+                    tenant=tenant))
 
             # 3) Send the RPCGenerateRequest to the MQAphroditeEngine.
             parts = (request_bytes,
@@ -501,3 +540,4 @@ class MQAphroditeEngineClient:
                     await self.abort(request_id)
         finally:
             self.output_queues.pop(request_id)
+            self.output_decoder.remove_request(request_id)
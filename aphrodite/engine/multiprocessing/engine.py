@@ -5,7 +5,7 @@ import sys
 import threading
 import time
 from contextlib import contextmanager
-from typing import Iterator, List, Optional, Union
+from typing import Iterator, List, Optional, Tuple, Union
 
 import cloudpickle
 import zmq
@@ -14,8 +14,13 @@ from loguru import logger
 from aphrodite import AphroditeEngine, AsyncEngineArgs, SamplingParams
 from aphrodite.common.config import (DecodingConfig, LoRAConfig, ModelConfig,
                                      ParallelConfig, SchedulerConfig)
-from aphrodite.common.envs import APHRODITE_RPC_TIMEOUT
+from aphrodite.common.envs import (APHRODITE_MQ_OUTPUT_TRANSPORT,
+                                   APHRODITE_RPC_TIMEOUT)
 from aphrodite.common.outputs import RequestOutput
+from aphrodite.common.startup_trace import (maybe_dump_startup_trace,
+                                            startup_phase)
+from aphrodite.distributed.device_communicators.shm_broadcast import (
+    ShmRingBuffer)
 from aphrodite.engine.multiprocessing import (APHRODITE_RPC_SUCCESS_STR,
                                               ENGINE_DEAD_ERROR, IPC_DATA_EXT,
                                               IPC_HEALTH_EXT, IPC_INPUT_EXT,
@@ -26,6 +31,10 @@ from aphrodite.engine.multiprocessing import (APHRODITE_RPC_SUCCESS_STR,
                                               RPCShutdownRequest,
                                               RPCStartupRequest,
                                               RPCStartupResponse)
+from aphrodite.engine.multiprocessing.outputs import (
+    OUTPUT_BUFFER_CHUNK_BYTES, OUTPUT_BUFFER_NUM_CHUNKS, OUTPUT_FORMAT_MSGSPEC,
+    OUTPUT_FORMAT_PICKLE, OUTPUT_FORMAT_SHM, RequestOutputEncoder,
+    SharedMemoryOutputChannel)
 
 CONFIG_TYPE = Union[ModelConfig, DecodingConfig, ParallelConfig,
                     SchedulerConfig, LoRAConfig]
@@ -99,10 +108,26 @@ class MQAphroditeEngine:
         # IPC path for the data socket.
         self.data_ipc_path = f"{ipc_path}{IPC_DATA_EXT}"
 
+        # Encoding of the request outputs, see
+        # aphrodite.engine.multiprocessing.outputs.
+        transport = APHRODITE_MQ_OUTPUT_TRANSPORT
+        if transport not in ("pickle", "msgspec", "shm"):
+            raise ValueError(
+                f"Unknown APHRODITE_MQ_OUTPUT_TRANSPORT: {transport}. "
+                "Must be one of pickle, msgspec or shm.")
+        self.output_encoder: Optional[RequestOutputEncoder] = None
+        self.output_channel: Optional[SharedMemoryOutputChannel] = None
+        if transport != "pickle":
+            self.output_encoder = RequestOutputEncoder()
+        if transport == "shm":
+            self.output_channel = SharedMemoryOutputChannel(
+                ShmRingBuffer(n_reader=1,
+                              max_chunk_bytes=OUTPUT_BUFFER_CHUNK_BYTES,
+                              max_chunks=OUTPUT_BUFFER_NUM_CHUNKS))
+
         # Error state.
         self._errored_with: Optional[BaseException] = None
 
-
         # Heartbeat thread
         self.heartbeat_thread = threading.Thread(target=self._heartbeat_loop,
                                                  daemon=True)
@@ -132,17 +157,20 @@ class MQAphroditeEngine:
         from aphrodite.plugins import load_general_plugins
         load_general_plugins()
 
-        engine_config = engine_args.create_engine_config()
+        with startup_phase("create_engine_config"):
+            engine_config = engine_args.create_engine_config()
 
         executor_class = AphroditeEngine._get_executor_cls(engine_config)
 
-        return cls(
+        engine = cls(
             ipc_path=ipc_path,
             use_async_sockets=engine_config.model_config.use_async_output_proc,
             **engine_config.to_dict(),
             executor_class=executor_class,
             log_requests=not engine_args.disable_log_requests,
             log_stats=not engine_args.disable_log_stats)
+        maybe_dump_startup_trace(engine_args.startup_trace)
+        return engine
 
     def start(self):
         try:
@@ -190,7 +218,9 @@ class MQAphroditeEngine:
                 # Handle the query from the Client.
                 if request == RPCStartupRequest.IS_SERVER_READY:
                     response = RPCStartupResponse(
-                        tracing_enabled=False)
+                        tracing_enabled=False,
+                        output_buffer=None if self.output_channel is None else
+                        self.output_channel.buffer)
 
             except Exception as e:
                 response = e
@@ -274,13 +304,16 @@ class MQAphroditeEngine:
             self._send_outputs(rpc_err)
 
         try:
+            if self.output_encoder is not None:
+                self.output_encoder.add_request(request_id, request.params)
             self.engine.add_request(
                 request_id=request_id,
                 prompt=request.prompt,
                 params=request.params,
                 lora_request=request.lora_request,
                 prompt_adapter_request=request.prompt_adapter_request,
-                priority=request.priority)
+                priority=request.priority,
+                tenant=request.tenant)
 
             if self.log_requests:
                 logger.info(f"Added request {request.request_id}.")
@@ -297,9 +330,13 @@ class MQAphroditeEngine:
 
             # Remove request from the engine.
             self.engine.abort_request(request_id)
+            if self.output_encoder is not None:
+                self.output_encoder.remove_request(request_id)
 
     def _handle_abort_request(self, request: RPCAbortRequest):
         self.engine.abort_request(request.request_id)
+        if self.output_encoder is not None:
+            self.output_encoder.remove_request(request.request_id)
         if self.log_requests:
             logger.info(f"Aborted request {request.request_id}.")
 
@@ -331,8 +368,21 @@ class MQAphroditeEngine:
     def _send_outputs(self, outputs: REQUEST_OUTPUTS_T):
         """Send List of RequestOutput to RPCClient."""
         if outputs:
-            output_bytes = pickle.dumps(outputs)
-            self.output_socket.send_multipart((output_bytes, ), copy=False)
+            self.output_socket.send_multipart(self._encode_outputs(outputs),
+                                              copy=False)
+
+    def _encode_outputs(self, outputs: REQUEST_OUTPUTS_T) -> Tuple[bytes, ...]:
+        """Encode outputs as the frames of an output socket message."""
+        if (self.output_encoder is not None and isinstance(outputs, list)
+                and all(
+                    isinstance(output, RequestOutput) for output in outputs)):
+            output_bytes = self.output_encoder.encode(outputs)
+            if (self.output_channel is not None
+                    and self.output_channel.try_write(output_bytes)):
+                return (OUTPUT_FORMAT_SHM, )
+            return (OUTPUT_FORMAT_MSGSPEC, output_bytes)
+        # Errors, the shutdown acknowledgement and embedding outputs.
+        return (OUTPUT_FORMAT_PICKLE, pickle.dumps(outputs))
 
     def _send_healthy(self):
         """Send HEALTHY message to RPCClient."""
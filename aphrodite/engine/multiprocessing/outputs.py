@@ -0,0 +1,291 @@
+"""Wire format of the RequestOutputs sent from the MQAphroditeEngine to the
+MQAphroditeEngineClient.
+
+Each step's outputs are encoded with msgspec instead of pickle. For requests
+that stream cumulative outputs, only the part of the text, token ids and
+logprobs that the client has not received yet is sent, and the prompt is only
+sent with the first output, much like SequenceDataDelta does for the workers.
+The encoded outputs are sent over the output socket, or written to a shared
+memory ring buffer with only a short notification on the socket.
+"""
+import struct
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import msgspec
+
+from aphrodite.common.outputs import CompletionOutput, RequestOutput
+from aphrodite.common.pooling_params import PoolingParams
+from aphrodite.common.sampling_params import RequestOutputKind, SamplingParams
+from aphrodite.common.sequence import (PromptLogprobs, RequestMetrics,
+                                       SampleLogprobs)
+from aphrodite.distributed.device_communicators.shm_broadcast import (
+    ShmRingBuffer)
+from aphrodite.lora.request import LoRARequest
+
+# The first frame of every message on the output socket.
+OUTPUT_FORMAT_PICKLE = b"p"
+OUTPUT_FORMAT_MSGSPEC = b"m"
+# The outputs are in the next chunk of the shared memory ring buffer.
+OUTPUT_FORMAT_SHM = b"s"
+
+# Size of the shared memory ring buffer.
+OUTPUT_BUFFER_CHUNK_BYTES = 1024 * 1024
+OUTPUT_BUFFER_NUM_CHUNKS = 16
+
+# The length prefix of a chunk.
+_PAYLOAD_SIZE = struct.Struct("<I")
+
+
+class CompletionOutputDelta(
+        msgspec.Struct,
+        array_like=True,  # type: ignore[call-arg]
+        omit_defaults=True):  # type: ignore[call-arg]
+    """A CompletionOutput whose text, token ids and logprobs may only be the
+    part that follows the first `*_offset` items of the previous output with
+    the same index."""
+    index: int
+    text: str
+    token_ids: List[int]
+    cumulative_logprob: Optional[float] = None
+    logprobs: Optional[SampleLogprobs] = None
+    finish_reason: Optional[str] = None
+    stop_reason: Union[int, str, None] = None
+    text_offset: int = 0
+    token_ids_offset: int = 0
+    logprobs_offset: int = 0
+
+
+class RequestOutputDelta(
+        msgspec.Struct,
+        array_like=True,  # type: ignore[call-arg]
+        omit_defaults=True):  # type: ignore[call-arg]
+    """A RequestOutput as sent to the client."""
+    request_id: str
+    outputs: List[CompletionOutputDelta]
+    finished: bool
+    metrics: Optional[RequestMetrics] = None
+    lora_request: Optional[LoRARequest] = None
+    # Whether the next outputs of the request are sent relative to this one.
+    # The prompt is then only sent with the first output.
+    incremental: bool = False
+    prompt: Optional[str] = None
+    prompt_token_ids: Optional[List[int]] = None
+    prompt_logprobs: Optional[PromptLogprobs] = None
+    encoder_prompt: Optional[str] = None
+    encoder_prompt_token_ids: Optional[List[int]] = None
+
+
+class RequestOutputEncoder:
+    """Encodes the RequestOutputs of a step in the engine process.
+
+    Requests are sent incrementally if they stream cumulative outputs of a
+    single sequence, since the outputs of those only grow from one step to the
+    next, except for the text that stop strings may truncate. Their requests
+    must be registered with add_request() and removed with remove_request()
+    when aborted.
+    """
+
+    def __init__(self) -> None:
+        self._encoder = msgspec.msgpack.Encoder()
+        # request id -> (text, number of token ids, number of logprobs) of
+        # each output last sent, None until the first one is.
+        self._sent: Dict[str, Optional[List[Tuple[str, int, int]]]] = {}
+
+    def add_request(self, request_id: str,
+                    params: Union[SamplingParams, PoolingParams]) -> None:
+        if (isinstance(params, SamplingParams) and params.n == 1
+                and params.output_kind == RequestOutputKind.CUMULATIVE):
+            self._sent[request_id] = None
+        else:
+            self._sent.pop(request_id, None)
+
+    def remove_request(self, request_id: str) -> None:
+        self._sent.pop(request_id, None)
+
+    def encode(self, request_outputs: List[RequestOutput]) -> bytes:
+        return self._encoder.encode(
+            [self._to_delta(request_output) for request_output in
+             request_outputs])
+
+    def _to_delta(self, request_output: RequestOutput) -> RequestOutputDelta:
+        request_id = request_output.request_id
+        incremental = request_id in self._sent
+        sent = self._sent.get(request_id)
+
+        outputs: List[CompletionOutputDelta] = []
+        sent_outputs: List[Tuple[str, int, int]] = []
+        for i, output in enumerate(request_output.outputs):
+            text = output.text
+            token_ids = output.token_ids
+            logprobs = output.logprobs
+            text_offset = token_ids_offset = logprobs_offset = 0
+            if sent is not None and i < len(sent):
+                sent_text, num_token_ids, num_logprobs = sent[i]
+                if text.startswith(sent_text):
+                    text_offset = len(sent_text)
+                    text = text[text_offset:]
+                if len(token_ids) >= num_token_ids:
+                    token_ids_offset = num_token_ids
+                    token_ids = token_ids[num_token_ids:]
+                if logprobs is not None and len(logprobs) >= num_logprobs:
+                    logprobs_offset = num_logprobs
+                    logprobs = logprobs[num_logprobs:]
+            if incremental:
+                sent_outputs.append(
+                    (output.text, len(output.token_ids),
+                     0 if output.logprobs is None else len(output.logprobs)))
+            outputs.append(
+                CompletionOutputDelta(
+                    index=output.index,
+                    text=text,
+                    token_ids=token_ids,  # type: ignore[arg-type]
+                    cumulative_logprob=output.cumulative_logprob,
+                    logprobs=logprobs,
+                    finish_reason=output.finish_reason,
+                    stop_reason=output.stop_reason,
+                    text_offset=text_offset,
+                    token_ids_offset=token_ids_offset,
+                    logprobs_offset=logprobs_offset))
+
+        delta = RequestOutputDelta(request_id=request_id,
+                                   outputs=outputs,
+                                   finished=request_output.finished,
+                                   metrics=request_output.metrics,
+                                   lora_request=request_output.lora_request,
+                                   incremental=incremental)
+        if sent is None:
+            delta.prompt = request_output.prompt
+            delta.prompt_token_ids = request_output.prompt_token_ids
+            delta.prompt_logprobs = request_output.prompt_logprobs
+            delta.encoder_prompt = request_output.encoder_prompt
+            delta.encoder_prompt_token_ids = (
+                request_output.encoder_prompt_token_ids)
+
+        if incremental:
+            if request_output.finished:
+                del self._sent[request_id]
+            else:
+                self._sent[request_id] = sent_outputs
+        return delta
+
+
+class RequestOutputDecoder:
+    """Rebuilds the RequestOutputs sent by a RequestOutputEncoder in the
+    client process. Each call returns new RequestOutput objects, as
+    unpickling did.
+
+    The last output of the requests sent incrementally is kept until they
+    finish, or until remove_request() is called when the client stops
+    waiting for them.
+    """
+
+    def __init__(self) -> None:
+        self._decoder = msgspec.msgpack.Decoder(List[RequestOutputDelta])
+        self._outputs: Dict[str, RequestOutput] = {}
+
+    def decode(self, data) -> List[RequestOutputDelta]:
+        return self._decoder.decode(data)
+
+    def remove_request(self, request_id: str) -> None:
+        self._outputs.pop(request_id, None)
+
+    def to_request_output(self, delta: RequestOutputDelta) -> RequestOutput:
+        previous = self._outputs.get(delta.request_id)
+        outputs: List[CompletionOutput] = []
+        for i, output in enumerate(delta.outputs):
+            text = output.text
+            token_ids = output.token_ids
+            logprobs = output.logprobs
+            if previous is not None and i < len(previous.outputs):
+                previous_output = previous.outputs[i]
+                offset = output.text_offset
+                if offset:
+                    text = previous_output.text[:offset] + text
+                offset = output.token_ids_offset
+                if offset:
+                    token_ids = list(
+                        previous_output.token_ids[:offset]) + token_ids
+                offset = output.logprobs_offset
+                if offset:
+                    assert previous_output.logprobs is not None
+                    logprobs = previous_output.logprobs[:offset] + (
+                        logprobs or [])
+            outputs.append(
+                CompletionOutput(index=output.index,
+                                 text=text,
+                                 token_ids=token_ids,
+                                 cumulative_logprob=output.cumulative_logprob,
+                                 logprobs=logprobs,
+                                 finish_reason=output.finish_reason,
+                                 stop_reason=output.stop_reason))
+
+        prompt_source = previous if previous is not None else delta
+        request_output = RequestOutput(
+            request_id=delta.request_id,
+            prompt=prompt_source.prompt,
+            prompt_token_ids=prompt_source.prompt_token_ids,
+            prompt_logprobs=prompt_source.prompt_logprobs,
+            outputs=outputs,
+            finished=delta.finished,
+            metrics=delta.metrics,
+            lora_request=delta.lora_request,
+            encoder_prompt=prompt_source.encoder_prompt,
+            encoder_prompt_token_ids=prompt_source.encoder_prompt_token_ids)
+
+        if delta.finished or not delta.incremental:
+            self._outputs.pop(delta.request_id, None)
+        else:
+            self._outputs[delta.request_id] = request_output
+        return request_output
+
+
+class SharedMemoryOutputChannel:
+    """Passes encoded outputs from the engine to the client through a
+    ShmRingBuffer with a single reader.
+
+    The engine writes the outputs of a step to the next chunk and sends
+    OUTPUT_FORMAT_SHM on the output socket; the client reads the next chunk
+    when it receives it. Both sides start at chunk 0 and follow the metadata
+    flags of the buffer, but the writer never waits for the reader: if the
+    next chunk has not been read yet, or the outputs do not fit in a chunk,
+    try_write() returns False and the outputs are sent on the socket instead.
+    """
+
+    def __init__(self, buffer: ShmRingBuffer):
+        assert buffer.n_reader == 1
+        self.buffer = buffer
+        self._current_idx = 0
+
+    def try_write(self, payload: bytes) -> bool:
+        size = len(payload)
+        if _PAYLOAD_SIZE.size + size > self.buffer.max_chunk_bytes:
+            return False
+        with self.buffer.get_metadata(self._current_idx) as metadata:
+            written_flag, read_flag = metadata[0], metadata[1]
+            if written_flag and not read_flag:
+                return False
+            metadata[0] = 0
+            with self.buffer.get_data(self._current_idx) as buf:
+                _PAYLOAD_SIZE.pack_into(buf, 0, size)
+                buf[_PAYLOAD_SIZE.size:_PAYLOAD_SIZE.size + size] = payload
+            # Same order as MessageQueue.acquire_write.
+            metadata[1] = 0
+            metadata[0] = 1
+        self._current_idx = (self._current_idx + 1) % self.buffer.max_chunks
+        return True
+
+    @contextmanager
+    def read(self) -> Iterator[memoryview]:
+        """Yield the payload of the next chunk, which must be written. The
+        chunk is released for writing when the context exits."""
+        with self.buffer.get_metadata(self._current_idx) as metadata:
+            assert metadata[0] and not metadata[1], (
+                "Output chunk was not written")
+            with self.buffer.get_data(self._current_idx) as buf:
+                size, = _PAYLOAD_SIZE.unpack_from(buf)
+                with buf[_PAYLOAD_SIZE.size:_PAYLOAD_SIZE.size +
+                         size] as payload:
+                    yield payload
+            metadata[1] = 1
+        self._current_idx = (self._current_idx + 1) % self.buffer.max_chunks
@@ -1,4 +1,6 @@
-from typing import Callable, Optional
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
 
 from transformers import PreTrainedTokenizer
 
@@ -7,6 +9,81 @@ from aphrodite.common.sequence import Sequence, SequenceStatus
 from aphrodite.lora.request import LoRARequest
 
 
+class StopStringMatcher:
+    """An Aho-Corasick automaton that finds any of a list of stop strings in
+    a text fed to it incrementally, in time independent of the number of
+    stop strings.
+
+    The automaton is immutable: the matching state of a sequence is just the
+    index of its current node, so one matcher is shared by all the requests
+    with the same stop strings.
+    """
+
+    def __init__(self, stop: Tuple[str, ...]):
+        self.stop = stop
+        self.max_stop_len = max(map(len, stop), default=0)
+
+        # The trie of the stop strings; node 0 is the root.
+        self._goto: List[Dict[str, int]] = [{}]
+        # The indices of the stop strings that end at each node, including
+        # through its failure links.
+        self._outputs: List[List[int]] = [[]]
+        for i, stop_str in enumerate(stop):
+            node = 0
+            for char in stop_str:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._outputs.append([])
+                node = next_node
+            self._outputs[node].append(i)
+
+        # The node of the longest proper suffix of each node that is also in
+        # the trie, computed breadth-first.
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._outputs[child] = (self._outputs[child] +
+                                        self._outputs[self._fail[child]])
+                queue.append(child)
+
+    def feed(self, node: int, text: str, start: int,
+             min_end: int) -> Tuple[int, Optional[Tuple[int, int]]]:
+        """Advance the automaton from a node over text[start:].
+
+        Returns the new node and the (stop string index, end index in text)
+        of the match ending at or after min_end with the first stop string
+        in list order, at its earliest end, or None if there is none.
+        """
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        match: Optional[Tuple[int, int]] = None
+        for end in range(start + 1, len(text) + 1):
+            char = text[end - 1]
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if outputs[node] and end >= min_end:
+                i = min(outputs[node])
+                if match is None or i < match[0]:
+                    match = (i, end)
+        return node, match
+
+
+@lru_cache(maxsize=256)
+def get_stop_string_matcher(stop: Tuple[str, ...]) -> StopStringMatcher:
+    return StopStringMatcher(stop)
+
+
 class StopChecker:
     """AphroditeEngine helper class which separates out the logic involving
     stop checking. This checks things such as: whether the eos token was
@@ -97,23 +174,35 @@ class StopChecker:
         if not new_char_count:
             return None
 
-        for stop_str in sampling_params.stop:
-            stop_string_len = len(stop_str)
-            # Avoid searching already-searched text.
-            stop_index = seq.output_text.find(
-                stop_str, -new_char_count - stop_string_len)
-            if stop_index == -1:
-                continue
-
-            if sampling_params.include_stop_str_in_output:
-                # Truncate to end of stop string.
-                stop_index += stop_string_len
-                if stop_index >= len(seq.output_text):
-                    # No truncation required.
-                    return stop_str
-
-            # Truncate the output text to either the beginning
-            # or end of the stop string.
-            seq.output_text = seq.output_text[:stop_index]
-            return stop_str
-        return None
+        matcher = get_stop_string_matcher(tuple(sampling_params.stop))
+        output_text = seq.output_text
+        start = len(output_text) - new_char_count
+        if (seq.stop_string_state is not None
+                and seq.stop_string_state[1] == start):
+            node = seq.stop_string_state[0]
+            feed_start = start
+        else:
+            # Stop strings were not checked for the previous text, e.g.
+            # because of min_tokens. Only the end of it can be part of a
+            # match, and a match ending right at it is only reported now.
+            node = 0
+            feed_start = max(start - matcher.max_stop_len, 0)
+        node, match = matcher.feed(node, output_text, feed_start, start)
+        seq.stop_string_state = (node, len(output_text))
+        if match is None:
+            return None
+
+        stop_str = matcher.stop[match[0]]
+        stop_string_len = len(stop_str)
+        stop_index = match[1] - stop_string_len
+        if sampling_params.include_stop_str_in_output:
+            # Truncate to end of stop string.
+            stop_index += stop_string_len
+            if stop_index >= len(output_text):
+                # No truncation required.
+                return stop_str
+
+        # Truncate the output text to either the beginning
+        # or end of the stop string.
+        seq.output_text = output_text[:stop_index]
+        return stop_str
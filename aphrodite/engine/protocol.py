@@ -11,6 +11,7 @@ from aphrodite.lora.request import LoRARequest
 from aphrodite.modeling.layers.sampler import SamplerOutput
 from aphrodite.processing.scheduler import SchedulerOutputs
 from aphrodite.prompt_adapter.request import PromptAdapterRequest
+from aphrodite.transformers_utils.tokenizer_group import BaseTokenizerGroup
 
 
 @runtime_checkable
@@ -41,6 +42,7 @@ class EngineClient(Protocol):
         lora_request: Optional[LoRARequest] = None,
         prompt_adapter_request: Optional[PromptAdapterRequest] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> AsyncGenerator[RequestOutput, None]:
         """Generates outputs for a request"""
         ...
@@ -52,6 +54,7 @@ class EngineClient(Protocol):
         request_id: str,
         lora_request: Optional[LoRARequest] = None,
         priority: int = 0,
+        tenant: Optional[str] = None,
     ) -> AsyncGenerator[EmbeddingRequestOutput, None]:
         """Generate outputs for a request from an embedding model."""
         ...
@@ -78,6 +81,11 @@ class EngineClient(Protocol):
         """Get the appropriate Tokenizer for the request"""
         ...
 
+    async def get_tokenizer_group(self) -> BaseTokenizerGroup:
+        """Get the tokenizer group, to tokenize off the event loop if it is
+        a pool"""
+        ...
+
     async def do_log_stats(
         self,
         scheduler_outputs: Optional[SchedulerOutputs] = None,
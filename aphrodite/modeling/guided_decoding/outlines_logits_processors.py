@@ -17,9 +17,9 @@ import copy
 import json
 from collections import defaultdict
 from functools import lru_cache
-from typing import Callable, DefaultDict, Dict, List, Union
+from typing import (Any, Callable, DefaultDict, Dict, Hashable, List,
+                    Optional, Tuple, Union)
 
-import numpy as np
 import torch
 from lark import Lark
 from outlines import grammars
@@ -29,16 +29,21 @@ from outlines_core.fsm.json_schema import build_regex_from_schema
 from pydantic import BaseModel
 from transformers import PreTrainedTokenizerBase
 
+from aphrodite.modeling.guided_decoding.token_bitmask import (
+    TokenBitmaskLogitsProcessor, get_token_bitmask_cache, pack_token_bitmask)
 
-class BaseLogitsProcessor:
 
-    def __init__(self, guide: Guide):
+class BaseLogitsProcessor(TokenBitmaskLogitsProcessor):
+
+    def __init__(self, guide: Guide, guide_key: Optional[Hashable] = None):
         self._guide: Guide = guide
-        self._fsm_state: DefaultDict[int, int] = defaultdict(int)
+        # Identifies the guide across requests, to share the bitmasks of its
+        # states. None if they are not cached.
+        self._guide_key = guide_key
+        self._fsm_state: DefaultDict[int, Any] = defaultdict(int)
 
-    def __call__(self, input_ids: List[int],
-                 scores: torch.Tensor) -> torch.Tensor:
-        """Use the FSM to bias the logits before sampling the next token."""
+    def _get_next_state(self, input_ids: List[int]) -> Any:
+        """Advance the FSM with the last token and return the new state."""
         seq_id = hash(tuple(input_ids))
 
         if len(input_ids) > 0:
@@ -64,32 +69,36 @@ class BaseLogitsProcessor:
                     import_paths=[grammars.GRAMMAR_PATH],
                 )
 
-        instruction = self._guide.get_next_instruction(
-            state=self._fsm_state[seq_id])
+        return self._fsm_state[seq_id]
+
+    def _get_allowed_tokens(self, state: Any) -> List[int]:
+        instruction = self._guide.get_next_instruction(state=state)
 
         if type(instruction) == Generate:  # noqa: E721
-            allowed_tokens = instruction.tokens
+            return instruction.tokens
         elif type(instruction) == Write:  # noqa: E721
             # TODO: support fast forward tokens
-            allowed_tokens = [instruction.tokens[0]]
+            return [instruction.tokens[0]]
         else:
             raise TypeError(
                 f"Unsupported instruction type {type(instruction)}")
 
-        mask = torch.full((scores.shape[-1], ),
-                          -torch.inf,
-                          device=scores.device)
-        # The tokenizer may support more token ids than the model can generate,
-        # eg. Llama 3.2 Vision models have an `<|image|>` token with id 128256
-        # but scores.shape == torch.Size([128256])
-        # Using NumPy is faster for filtering token ids
-        allowed_tokens = np.array(allowed_tokens, dtype=np.int64)
-        allowed_tokens = torch.tensor(allowed_tokens, device=scores.device)
-        allowed_tokens = allowed_tokens.masked_select(
-            allowed_tokens < scores.shape[-1])
-        mask.index_fill_(0, allowed_tokens, 0)
-        scores.add_(mask)
-        return scores
+    def get_token_bitmask(self, input_ids: List[int],
+                          vocab_size: int) -> torch.Tensor:
+        """Use the FSM to get the tokens allowed next.
+
+        The tokenizer may support more token ids than the model can generate,
+        eg. Llama 3.2 Vision models have an `<|image|>` token with id 128256
+        but scores.shape == torch.Size([128256]), so the bitmask only covers
+        the vocab size of the scores."""
+        state = self._get_next_state(input_ids)
+        if self._guide_key is None:
+            return pack_token_bitmask(self._get_allowed_tokens(state),
+                                      vocab_size)
+        return get_token_bitmask_cache().get(
+            (self._guide_key, state, vocab_size),
+            lambda: pack_token_bitmask(self._get_allowed_tokens(state),
+                                       vocab_size))
 
 
 class RegexLogitsProcessor(BaseLogitsProcessor):
@@ -113,7 +122,8 @@ class RegexLogitsProcessor(BaseLogitsProcessor):
 
         """
         super().__init__(
-            RegexLogitsProcessor._get_guide(regex_string, tokenizer))
+            RegexLogitsProcessor._get_guide(regex_string, tokenizer),
+            guide_key=(regex_string, _get_tokenizer_key(tokenizer)))
 
 
 class JSONLogitsProcessor(RegexLogitsProcessor):
@@ -174,6 +184,12 @@ class CFGLogitsProcessor(BaseLogitsProcessor):
         self._guide = self._guide.copy()
 
 
+def _get_tokenizer_key(
+        tokenizer: PreTrainedTokenizerBase) -> Tuple[str, str, int]:
+    """Identifies the vocabulary of a tokenizer across requests."""
+    return (type(tokenizer).__name__, tokenizer.name_or_path, len(tokenizer))
+
+
 @lru_cache(maxsize=32)
 def _adapt_tokenizer(tokenizer: PreTrainedTokenizerBase):
     """Adapt Aphrodite's tokenizer to use to compile the FSM.
@@ -0,0 +1,144 @@
+"""Allowed-token masks of guided decoding, packed into int32 bitmasks.
+
+Bit `i % 32` of word `i // 32` of a bitmask is set if token `i` is allowed,
+the layout used by xgrammar. The masks of the states of a guide are cached
+across requests, since requests that share a schema go through the same
+states, and the masks of a batch are applied to the logits together.
+"""
+from abc import abstractmethod
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional, Sequence
+
+import numpy as np
+import torch
+
+import aphrodite.common.envs as envs
+from aphrodite.common.logits_processor import (BatchedLogitsProcessor,
+                                               LogitsProcessorBatch)
+
+
+def pack_token_bitmask(token_ids: Sequence[int],
+                       vocab_size: int) -> torch.Tensor:
+    """Return the bitmask of the given tokens. Token ids past the vocab size
+    are ignored."""
+    num_words = (vocab_size + 31) // 32
+    bits = np.zeros(num_words * 32, dtype=np.bool_)
+    token_ids = np.asarray(token_ids, dtype=np.int64)
+    bits[token_ids[token_ids < vocab_size]] = True
+    return torch.from_numpy(
+        np.packbits(bits, bitorder="little").view(np.int32))
+
+
+def unpack_token_bitmask(bitmask: torch.Tensor,
+                         vocab_size: int) -> torch.Tensor:
+    """Return the boolean masks of shape (..., vocab_size) of bitmasks of
+    shape (..., num_words)."""
+    shifts = torch.arange(32, dtype=torch.int32, device=bitmask.device)
+    bits = (bitmask.unsqueeze(-1) >> shifts) & 1
+    return bits.flatten(-2)[..., :vocab_size].bool()
+
+
+def apply_token_bitmasks(logits: torch.Tensor, rows: List[int],
+                         bitmasks: List[torch.Tensor]) -> torch.Tensor:
+    """Set the logits of the tokens that the bitmask of each row does not
+    allow to -inf, for all the rows at once."""
+    if not rows:
+        return logits
+    bitmask = torch.stack(bitmasks).to(logits.device, non_blocking=True)
+    allowed = unpack_token_bitmask(bitmask, logits.shape[-1])
+    if len(rows) == logits.shape[0] and rows == list(range(len(rows))):
+        return logits.masked_fill_(~allowed, -float("inf"))
+    index = torch.tensor(rows, dtype=torch.long, device=logits.device)
+    logits[index] = logits[index].masked_fill_(~allowed, -float("inf"))
+    return logits
+
+
+class TokenBitmaskCache:
+    """An LRU cache of bitmasks, keyed by guide and state."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._bitmasks: OrderedDict[Hashable, torch.Tensor] = OrderedDict()
+        self.num_queries = 0
+        self.num_hits = 0
+
+    def get(self, key: Hashable,
+            compute: Callable[[], torch.Tensor]) -> torch.Tensor:
+        """Return the cached bitmask of the key, calling compute() to get it
+        on a miss."""
+        self.num_queries += 1
+        bitmask = self._bitmasks.get(key)
+        if bitmask is not None:
+            self.num_hits += 1
+            self._bitmasks.move_to_end(key)
+            return bitmask
+        bitmask = compute()
+        if self.max_size > 0:
+            self._bitmasks[key] = bitmask
+            if len(self._bitmasks) > self.max_size:
+                self._bitmasks.popitem(last=False)
+        return bitmask
+
+    def __len__(self) -> int:
+        return len(self._bitmasks)
+
+    def clear(self) -> None:
+        self._bitmasks.clear()
+
+
+_token_bitmask_cache: Optional[TokenBitmaskCache] = None
+
+
+def get_token_bitmask_cache() -> TokenBitmaskCache:
+    """Return the bitmask cache shared by the guided decoding logits
+    processors of this process."""
+    global _token_bitmask_cache
+    if _token_bitmask_cache is None:
+        _token_bitmask_cache = TokenBitmaskCache(
+            envs.APHRODITE_GUIDED_DECODING_MASK_CACHE_SIZE)
+    return _token_bitmask_cache
+
+
+class TokenBitmaskLogitsProcessor(BatchedLogitsProcessor):
+    """A logits processor that only removes the tokens that a bitmask does
+    not allow.
+
+    The bitmasks of the rows of every such processor of a step are applied
+    to the logits at once.
+    """
+
+    @abstractmethod
+    def get_token_bitmask(self, input_ids: List[int],
+                          vocab_size: int) -> torch.Tensor:
+        """Return the bitmask of the tokens allowed after the given output
+        tokens. Must be called once per step for each sequence, like the
+        processor itself."""
+        raise NotImplementedError
+
+    def __call__(self, input_ids: List[int],
+                 scores: torch.Tensor) -> torch.Tensor:
+        vocab_size = scores.shape[-1]
+        bitmask = self.get_token_bitmask(input_ids, vocab_size)
+        allowed = unpack_token_bitmask(
+            bitmask.to(scores.device, non_blocking=True), vocab_size)
+        return scores.masked_fill_(~allowed, -float("inf"))
+
+    def apply_batch(self, logits: torch.Tensor,
+                    batch: LogitsProcessorBatch) -> None:
+        self.apply_batches(logits, [self], [batch])
+
+    @classmethod
+    def apply_batches(cls, logits: torch.Tensor,
+                      processors: List[BatchedLogitsProcessor],
+                      batches: List[LogitsProcessorBatch]) -> None:
+        rows: List[int] = []
+        bitmasks: List[torch.Tensor] = []
+        for processor, batch in zip(processors, batches):
+            assert isinstance(processor, TokenBitmaskLogitsProcessor)
+            for row, output_token_ids in zip(batch.rows,
+                                             batch.output_token_ids):
+                rows.append(row)
+                bitmasks.append(
+                    processor.get_token_bitmask(output_token_ids,
+                                                logits.shape[-1]))
+        apply_token_bitmasks(logits, rows, bitmasks)
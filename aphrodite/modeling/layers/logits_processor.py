@@ -1,10 +1,14 @@
 """A layer that compute logits from hidden_stats."""
 import inspect
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple, Type
 
 import torch
 import torch.nn as nn
 
+from aphrodite.common.logits_processor import (BatchedLogitsProcessor,
+                                               LogitsProcessorBatch)
+from aphrodite.common.sampling_params import LogitsProcessorFunc
+from aphrodite.common.sequence import SequenceData
 from aphrodite.distributed import (tensor_model_parallel_all_gather,
                                    tensor_model_parallel_gather)
 from aphrodite.modeling.layers.vocab_parallel_embedding import (
@@ -119,6 +123,8 @@ def _apply_logits_processors(
 ) -> torch.Tensor:
     found_logits_processors = False
     logits_processed = 0
+    # (logits row, sequence, logits processors) of each row to process
+    rows: List[Tuple[int, SequenceData, List[LogitsProcessorFunc]]] = []
     for seq_group in sampling_metadata.seq_groups:
         seq_ids = seq_group.seq_ids
         sampling_params = seq_group.sampling_params
@@ -129,21 +135,8 @@ def _apply_logits_processors(
 
             for seq_id, logits_row_idx in zip(seq_ids,
                                               seq_group.sample_indices):
-                logits_row = logits[logits_row_idx]
-                past_tokens_ids = seq_group.seq_data[seq_id].output_token_ids
-                prompt_tokens_ids = seq_group.seq_data[seq_id].prompt_token_ids
-
-                for logits_processor in logits_processors:
-                    parameters = inspect.signature(logits_processor).parameters
-                    if len(parameters) == 3:
-                        logits_row = logits_processor(prompt_tokens_ids,
-                                                      past_tokens_ids,
-                                                      logits_row)
-                    else:
-                        logits_row = logits_processor(past_tokens_ids,
-                                                      logits_row)
-
-                logits[logits_row_idx] = logits_row
+                rows.append((logits_row_idx, seq_group.seq_data[seq_id],
+                             logits_processors))
 
         logits_processed += len(seq_group.sample_indices) + len(
             seq_group.prompt_logprob_indices)
@@ -151,4 +144,62 @@ def _apply_logits_processors(
     if found_logits_processors:
         # verifies that no rows in logits were missed unexpectedly
         assert logits_processed == logits.shape[0]
+
+    # Stage i applies the i-th logits processor of every row, so that the
+    # rows of a batched processor are gathered while the processors of each
+    # row are still applied in order.
+    num_stages = max((len(processors) for _, _, processors in rows),
+                     default=0)
+    for stage in range(num_stages):
+        # id(processor) -> (processor, its rows)
+        batches: Dict[int, Tuple[BatchedLogitsProcessor,
+                                 LogitsProcessorBatch]] = {}
+        for logits_row_idx, seq_data, logits_processors in rows:
+            if stage >= len(logits_processors):
+                continue
+            logits_processor = logits_processors[stage]
+            past_tokens_ids = seq_data.output_token_ids
+            prompt_tokens_ids = seq_data.prompt_token_ids
+
+            if isinstance(logits_processor, BatchedLogitsProcessor):
+                if id(logits_processor) not in batches:
+                    batches[id(logits_processor)] = (logits_processor,
+                                                     LogitsProcessorBatch(
+                                                         [], [], []))
+                batch = batches[id(logits_processor)][1]
+                batch.rows.append(logits_row_idx)
+                batch.prompt_token_ids.append(prompt_tokens_ids)
+                batch.output_token_ids.append(past_tokens_ids)
+                continue
+
+            logits_row = logits[logits_row_idx]
+            parameters = inspect.signature(logits_processor).parameters
+            if len(parameters) == 3:
+                logits_row = logits_processor(prompt_tokens_ids,
+                                              past_tokens_ids, logits_row)
+            else:
+                logits_row = logits_processor(past_tokens_ids, logits_row)
+            logits[logits_row_idx] = logits_row
+
+        _apply_batched_logits_processors(logits, list(batches.values()))
+
     return logits
+
+
+def _apply_batched_logits_processors(
+    logits: torch.Tensor,
+    batches: List[Tuple[BatchedLogitsProcessor, LogitsProcessorBatch]],
+) -> None:
+    # Processors sharing an implementation of apply_batches, e.g. the guided
+    # decoding processors of different requests, are applied together.
+    groups: Dict[Any, Tuple[Type[BatchedLogitsProcessor],
+                            List[BatchedLogitsProcessor],
+                            List[LogitsProcessorBatch]]] = {}
+    for processor, batch in batches:
+        processor_cls = type(processor)
+        group = groups.setdefault(processor_cls.apply_batches.__func__,
+                                  (processor_cls, [], []))
+        group[1].append(processor)
+        group[2].append(batch)
+    for processor_cls, processors, processor_batches in groups.values():
+        processor_cls.apply_batches(logits, processors, processor_batches)
@@ -13,13 +13,14 @@ from loguru import logger
 
 import aphrodite._custom_ops as ops
 import aphrodite.common.envs as envs
-from aphrodite.common.sampling_params import SamplingType
+from aphrodite.common.sampling_params import SamplingParams, SamplingType
 from aphrodite.common.sequence import (APHRODITE_INVALID_TOKEN_ID,
                                        CompletionSequenceGroupOutput, Logprob,
                                        PromptLogprobs, SampleLogprobs,
-                                       SequenceOutput)
+                                       SequenceData, SequenceOutput)
 from aphrodite.common.utils import is_cpu
-from aphrodite.modeling.sampling_metadata import (SamplingMetadata,
+from aphrodite.modeling.sampling_metadata import (PersistentSamplingState,
+                                                  SamplingMetadata,
                                                   SamplingTensors,
                                                   SequenceGroupToSample)
 from aphrodite.spec_decode.metrics import SpecDecodeWorkerMetrics
@@ -166,6 +167,24 @@ class SamplerID(IntEnum):
     XTC = 13
 
 
+# Samplers that only remove the least likely tokens of each row, given the
+# distribution left by the previous samplers. Consecutive ones are applied
+# together by _apply_truncations.
+_TRUNCATION_SAMPLERS = (
+    SamplerID.TOP_P_TOP_K,
+    SamplerID.TOP_A,
+    SamplerID.MIN_P,
+    SamplerID.TFS,
+    SamplerID.ETA_CUTOFF,
+    SamplerID.EPSILON_CUTOFF,
+)
+# Truncation samplers that sort the logits on their own.
+_SORTING_SAMPLERS = (SamplerID.TOP_P_TOP_K, SamplerID.TFS)
+
+# A sampler, or consecutive truncation samplers applied together.
+SamplerStep = Union[SamplerID, Tuple[SamplerID, ...]]
+
+
 class Sampler(nn.Module):
     """Samples the next tokens from the model's outputs.
 
@@ -196,6 +215,14 @@ class Sampler(nn.Module):
         self.include_gpu_probs_tensor = False
         self.should_modify_greedy_probs_inplace = False
 
+        # The sampling parameters of the running sequences, kept on the
+        # device across steps. With
+        # APHRODITE_DISABLE_PERSISTENT_SAMPLING_STATE, the sampling tensors
+        # are rebuilt by SamplingTensors.from_sampling_metadata instead.
+        self._sampling_state: Optional[PersistentSamplingState] = None
+        self._use_persistent_sampling_state = (
+            not envs.APHRODITE_DISABLE_PERSISTENT_SAMPLING_STATE)
+
     def _init_sampling_tensors(
         self,
         logits: torch.Tensor,
@@ -212,13 +239,24 @@ class Sampler(nn.Module):
         # have pinned memory.
         self._sampling_tensors = None
 
+        if self._use_persistent_sampling_state:
+            state = self._sampling_state
+            if (state is None or state.vocab_size != vocab_size
+                    or state.device != logits.device
+                    or state.dtype != logits.dtype):
+                state = PersistentSamplingState(vocab_size, logits.device,
+                                                logits.dtype)
+                self._sampling_state = state
+            sampling = state.get_sampling_tensors(sampling_metadata)
+        else:
+            sampling = SamplingTensors.from_sampling_metadata(
+                sampling_metadata, vocab_size, logits.device, logits.dtype)
+
         # Initialize new sampling tensors
         (sampling_tensors, do_penalties, do_no_repeat_ngrams, do_temperatures,
          do_top_p_top_k, do_top_as, do_min_p, do_tfss, do_eta_cutoffs,
          do_epsilon_cutoffs, do_typical_ps, do_quadratic, do_xtc, do_nsigmas,
-         do_dry, do_skew, do_temp_last
-         ) = SamplingTensors.from_sampling_metadata(
-             sampling_metadata, vocab_size, logits.device, logits.dtype)
+         do_dry, do_skew, do_temp_last) = sampling
 
         self._sampling_tensors = sampling_tensors
         self._do_penalties = do_penalties
@@ -295,6 +333,8 @@ class Sampler(nn.Module):
         logits = _apply_min_tokens_penalty(logits, sampling_metadata)
         banned_tokens = _get_custom_token_bans(sampling_metadata)
         logits = _apply_token_bans(logits, banned_tokens)
+        logits = _apply_logit_bias(logits, sampling_metadata)
+        logits = _apply_allowed_token_ids(logits, sampling_metadata)
 
         sampler_order = None
         if sampling_metadata.seq_groups:
@@ -363,7 +403,44 @@ class Sampler(nn.Module):
             if do_skew: enabled_samplers.append("SKEW")
             logger.debug(f"Enabled samplers: {', '.join(enabled_samplers)}")
 
-        for sampler_id in sampler_order:
+        enabled_sampler_ids = {
+            SamplerID.DRY: do_dry,
+            SamplerID.PENALTIES: do_penalties,
+            SamplerID.NO_REPEAT_NGRAM: do_no_repeat_ngrams,
+            SamplerID.TEMPERATURE: do_temperatures,
+            SamplerID.TOP_NSIGMA: do_nsigmas,
+            SamplerID.TOP_P_TOP_K: (do_top_p_top_k
+                                    and not APHRODITE_USE_SAMPLING_KERNELS),
+            SamplerID.TOP_A: do_top_as,
+            SamplerID.MIN_P: do_min_p,
+            SamplerID.TFS: do_tfss,
+            SamplerID.ETA_CUTOFF: do_eta_cutoffs,
+            SamplerID.EPSILON_CUTOFF: do_epsilon_cutoffs,
+            SamplerID.TYPICAL_P: do_typical_ps,
+            SamplerID.QUADRATIC: do_quadratic,
+            SamplerID.XTC: do_xtc,
+        }
+        sampler_plan = _get_sampler_plan(sampler_order, enabled_sampler_ids)
+
+        for step in sampler_plan:
+            if isinstance(step, tuple):
+                if (sampling_metadata.seq_groups and
+                    sampling_metadata.seq_groups[0].is_prompt):
+                    logger.debug(
+                        "Applying " +
+                        ", ".join(SamplerID(i).name for i in step) +
+                        " with a single sort.")
+                # Without the persistent state, every row goes through the
+                # samplers, which leave the rows that don't use them as is.
+                rows = None
+                if self._use_persistent_sampling_state:
+                    assert self._sampling_state is not None
+                    rows = self._sampling_state.get_sampler_rows(step)
+                logits = _apply_truncations(logits, step, sampling_tensors,
+                                            rows)
+                continue
+
+            sampler_id = step
             if sampler_id == SamplerID.DRY and do_dry:
                 if (sampling_metadata.seq_groups and
                     sampling_metadata.seq_groups[0].is_prompt):
@@ -372,15 +449,13 @@ class Sampler(nn.Module):
                         f"{sampling_tensors.dry_multipliers}.")
                 logits = _apply_dry(
                     logits,
+                    sampling_metadata,
                     sampling_tensors.prompt_tokens,
                     sampling_tensors.output_tokens,
                     sampling_tensors.dry_multipliers,
                     sampling_tensors.dry_bases,
                     sampling_tensors.dry_allowed_lengths,
                     sampling_tensors.dry_sequence_breaker_ids,
-                    sampling_tensors.dry_ranges,
-                    sampling_tensors.dry_max_ngram,
-                    sampling_tensors.dry_max_occurrences,
                     sampling_tensors.dry_early_exit_match_len)
 
             elif sampler_id == SamplerID.PENALTIES and do_penalties:
@@ -405,10 +480,7 @@ class Sampler(nn.Module):
                     logger.debug(
                         "Applying no_repeat_ngram with no_repeat_ngram_size: "
                         f"{sampling_tensors.no_repeat_ngram_sizes}.")
-                logits = _apply_no_repeat_ngram(
-                    logits,
-                    sampling_tensors.prompt_tokens,
-                    sampling_tensors.no_repeat_ngram_sizes)
+                logits = _apply_no_repeat_ngram(logits, sampling_metadata)
 
             elif sampler_id == SamplerID.TEMPERATURE and do_temperatures:
                 if (sampling_metadata.seq_groups and
@@ -653,12 +725,69 @@ def _get_custom_token_bans(
 
 def _apply_token_bans(logits: torch.Tensor,
                       banned_tokens: List[List[int]]) -> torch.Tensor:
-    for i, banned_token_ids in enumerate(banned_tokens):
-        if i >= logits.size(0):
-            break
-        if not banned_token_ids:
+    rows: List[int] = []
+    token_ids: List[int] = []
+    for i, banned_token_ids in enumerate(banned_tokens[:logits.size(0)]):
+        if banned_token_ids:
+            rows.extend([i] * len(banned_token_ids))
+            token_ids.extend(banned_token_ids)
+    if rows:
+        index = torch.tensor([rows, token_ids], device=logits.device)
+        logits[index[0], index[1]] = -float("inf")
+    return logits
+
+
+def _apply_logit_bias(logits: torch.Tensor,
+                      sampling_metadata: SamplingMetadata) -> torch.Tensor:
+    """Add the logit_bias of each request to the rows it samples from, as a
+    single scatter-add of the (row, token, bias) entries of the batch."""
+    rows: List[int] = []
+    token_ids: List[int] = []
+    biases: List[float] = []
+    for seq_group in sampling_metadata.seq_groups:
+        logit_bias = seq_group.sampling_params.logit_bias
+        if not logit_bias:
             continue
-        logits[i, banned_token_ids] = -float("inf")
+        for row in seq_group.sample_indices:
+            rows.extend([row] * len(logit_bias))
+            token_ids.extend(logit_bias)
+            biases.extend(logit_bias.values())
+    if rows:
+        index = torch.tensor([rows, token_ids], device=logits.device)
+        logits.index_put_((index[0], index[1]),
+                          torch.tensor(biases,
+                                       dtype=logits.dtype,
+                                       device=logits.device),
+                          accumulate=True)
+    return logits
+
+
+def _apply_allowed_token_ids(
+        logits: torch.Tensor,
+        sampling_metadata: SamplingMetadata) -> torch.Tensor:
+    """Set the logits of the tokens outside of the allowed_token_ids of each
+    request to -inf, for every restricted row of the batch at once."""
+    rows: List[int] = []
+    # (index into rows, token) of each allowed token
+    mask_rows: List[int] = []
+    token_ids: List[int] = []
+    for seq_group in sampling_metadata.seq_groups:
+        allowed_token_ids = seq_group.sampling_params.allowed_token_ids
+        if not allowed_token_ids:
+            continue
+        for row in seq_group.sample_indices:
+            mask_rows.extend([len(rows)] * len(allowed_token_ids))
+            rows.append(row)
+            token_ids.extend(allowed_token_ids)
+    if rows:
+        index = torch.tensor([mask_rows, token_ids], device=logits.device)
+        allowed = torch.zeros((len(rows), logits.shape[-1]),
+                              dtype=torch.bool,
+                              device=logits.device)
+        allowed[index[0], index[1]] = True
+        row_index = torch.tensor(rows, device=logits.device)
+        logits[row_index] = logits[row_index].masked_fill_(
+            ~allowed, -float("inf"))
     return logits
 
 
@@ -766,17 +895,60 @@ def _apply_min_tokens_penalty(
     assert logits_applied == logits.shape[0]
     return logits
 
+def _get_sample_rows(
+    sampling_metadata: SamplingMetadata,
+) -> List[Tuple[Optional[SequenceData], SamplingParams]]:
+    """Map every row of the logits to the sequence it samples for.
+
+    Rows that only compute prompt logprobs map to `None`, mirroring the
+    empty token rows that `SamplingTensors` builds for them.
+    """
+    rows: List[Tuple[Optional[SequenceData], SamplingParams]] = []
+    for seq_group in sampling_metadata.seq_groups:
+        params = seq_group.sampling_params
+        if seq_group.is_prompt and params.prompt_logprobs is not None:
+            rows.extend(
+                (None, params) for _ in seq_group.prompt_logprob_indices)
+        if seq_group.do_sample:
+            rows.extend(
+                (seq_group.seq_data[seq_id], params)
+                for seq_id in seq_group.seq_ids)
+    return rows
+
+
+def _gather_token_ids(
+    prompt_token_ids: torch.Tensor,
+    output_token_ids: torch.Tensor,
+    rows: torch.Tensor,
+    prompt_lens: torch.Tensor,
+    positions: torch.Tensor,
+) -> torch.Tensor:
+    """Gather the token at each absolute sequence position of the given rows
+    of the padded prompt/output token tensors, without materializing the
+    concatenated sequences. Out-of-range positions must be masked by the
+    caller."""
+    view_shape = (rows.size(0), *([1] * (positions.dim() - 1)))
+    rows = rows.view(view_shape)
+    prompt_lens = prompt_lens.view(view_shape)
+    token_ids = prompt_token_ids[
+        rows, positions.clamp(0, prompt_token_ids.size(1) - 1)]
+    if output_token_ids.size(1) > 0:
+        output_positions = (positions - prompt_lens).clamp_(
+            0, output_token_ids.size(1) - 1)
+        token_ids = torch.where(positions < prompt_lens, token_ids,
+                                output_token_ids[rows, output_positions])
+    return token_ids
+
+
 def _apply_dry(
     logits: torch.Tensor,
+    sampling_metadata: SamplingMetadata,
     input_token_ids: torch.Tensor,
     output_token_ids: torch.Tensor,
     multipliers: torch.Tensor,
     bases: torch.Tensor,
     allowed_lengths: torch.Tensor,
     sequence_breakers_ids: torch.Tensor,
-    ranges: torch.Tensor,
-    max_ngram: torch.Tensor,
-    max_occurrences: torch.Tensor,
     early_exit_match_len: torch.Tensor,
 ) -> torch.Tensor:
     """
@@ -784,123 +956,173 @@ def _apply_dry(
 
     Reference: https://github.com/oobabooga/text-generation-webui/pull/5677 and
     https://github.com/AlpinDale/vllm/pull/1
-    """
-    VOCAB_SIZE = logits.size(-1)
-
-    applies_to = multipliers.nonzero(as_tuple=True)[0]
-    for irow in applies_to.tolist():
-        prompt_len = len(input_token_ids[irow]) - (
-            input_token_ids[irow] == VOCAB_SIZE).sum().item()
-        output_len = len(output_token_ids[irow]) - (
-            output_token_ids[irow] == VOCAB_SIZE).sum().item()
-
-        token_seq = torch.cat(
-            (input_token_ids[irow][:prompt_len],
-             output_token_ids[irow][:output_len]),
-            dim=0
-        )
-
-        range_limit = ranges[irow].item()
-        if range_limit > 0:
-            token_seq = token_seq[-range_limit:]
 
-        if token_seq.size(0) < 2:
+    The candidate match endpoints (earlier occurrences of the last token) are
+    looked up in each sequence's incrementally maintained
+    :class:`~aphrodite.common.token_index.TokenPositionIndex`, so the host
+    side work per row is bounded by `dry_max_occurrences` instead of the
+    context length. Match lengths, early exit and the penalties themselves
+    are then computed for all rows at once.
+    """
+    sample_rows = _get_sample_rows(sampling_metadata)
+
+    rows: List[int] = []
+    endpoints: List[List[int]] = []
+    seq_lens: List[int] = []
+    prompt_lens: List[int] = []
+    window_starts: List[int] = []
+    max_ngrams: List[int] = []
+    for irow, (seq_data, params) in enumerate(sample_rows):
+        if seq_data is None or params.dry_multiplier == 0:
             continue
-
-        last_token = token_seq[-1].item()
-        if last_token in sequence_breakers_ids[irow]:
+        # The longest possible match is bounded by dry_max_ngram, so such
+        # rows can never exceed the allowed length.
+        if params.dry_max_ngram <= params.dry_allowed_length:
             continue
 
-        break_mask = torch.zeros(len(token_seq),
-                                 dtype=torch.bool, device=logits.device)
-        for break_tok in sequence_breakers_ids[irow]:
-            break_mask.logical_or_(token_seq == break_tok)
-
-        curr_max_ngram = 0
-        max_ngram_val = max_ngram[irow].item()
-        for curr_max_ngram in range(min(len(break_mask), max_ngram_val + 1)):
-            if break_mask[-curr_max_ngram - 1]:
-                break
-
-        min_ngram = allowed_lengths[irow].item()
-        if curr_max_ngram <= min_ngram:
+        seq_len = seq_data.get_len()
+        window_start = 0
+        if params.dry_range > 0:
+            window_start = max(seq_len - params.dry_range, 0)
+        if seq_len - window_start - 1 <= params.dry_allowed_length:
             continue
 
-        ngram_lens = torch.zeros(
-            VOCAB_SIZE, dtype=torch.int32, device=logits.device)
-
-        endpoint_indexes_all = torch.nonzero(
-            token_seq == last_token, as_tuple=True)[0].tolist()
-        if len(endpoint_indexes_all) < 2:
+        last_token = seq_data.get_last_token_id()
+        if last_token in params.dry_sequence_breaker_ids:
             continue
-        endpoint_indexes = endpoint_indexes_all[:-1]
-
-        max_occurrences_val = max_occurrences[irow].item()
-        if len(endpoint_indexes) > max_occurrences_val:
-            endpoint_indexes = endpoint_indexes[-max_occurrences_val:]
-
-        early_exit_match_len_val = early_exit_match_len[irow].item()
-        for idx in reversed(endpoint_indexes):
-            if idx == len(token_seq) - 1:
-                continue
 
-            match_len = 0
-            for unwind in range(1, min(idx, curr_max_ngram) + 1):
-                if break_mask[idx - unwind]:
-                    break
-                if token_seq[idx - unwind] != token_seq[-unwind - 1]:
-                    break
-                match_len = unwind
-
-            if match_len > 0:
-                next_tok = token_seq[idx + 1]
-                new_len = match_len + 1
+        # NOTE: a dry_max_occurrences of 0 considers every occurrence.
+        max_occurrences = params.dry_max_occurrences
+        positions = seq_data.get_token_position_index().last_positions(
+            last_token, max_occurrences + 1 if max_occurrences > 0 else 0)
+        # Drop the last token itself and anything outside of the range.
+        row_endpoints = [pos for pos in positions[:-1] if pos >= window_start]
+        if max_occurrences > 0:
+            row_endpoints = row_endpoints[-max_occurrences:]
+        if not row_endpoints:
+            continue
 
-                ngram_lens[next_tok] = max(ngram_lens[next_tok].item(), new_len)
+        # Most recent occurrence first, which is the order early exit uses.
+        row_endpoints.reverse()
+        rows.append(irow)
+        endpoints.append(row_endpoints)
+        seq_lens.append(seq_len)
+        prompt_lens.append(seq_data.get_prompt_len())
+        window_starts.append(window_start)
+        max_ngrams.append(params.dry_max_ngram)
 
-                if new_len >= early_exit_match_len_val:
-                    break
+    if not rows:
+        return logits
 
-        penalty_mask = ngram_lens > 0
-        if penalty_mask.any():
-            scales = bases[irow] ** (ngram_lens[penalty_mask] - min_ngram)
-            logits[irow][penalty_mask] -= multipliers[irow] * scales
+    device = logits.device
+    max_unwind = min(max(max_ngrams), max(seq_lens))
+    max_endpoints = max(len(row_endpoints) for row_endpoints in endpoints)
+    endpoints_t = torch.tensor(
+        [e + [-1] * (max_endpoints - len(e)) for e in endpoints],
+        dtype=torch.long).to(device=device, non_blocking=True)
+    row_info_t = torch.tensor(
+        [rows, seq_lens, prompt_lens, window_starts, max_ngrams],
+        dtype=torch.long).to(device=device, non_blocking=True)
+    rows_t, seq_lens_t, prompt_lens_t, window_starts_t, max_ngrams_t = (
+        row_info_t.unbind(0))
+
+    breakers_t = sequence_breakers_ids[rows_t]
+
+    def is_breaker(token_ids: torch.Tensor) -> torch.Tensor:
+        breakers = breakers_t.view(len(rows), *([1] * (token_ids.dim() - 1)),
+                                   -1)
+        return (token_ids.unsqueeze(-1) == breakers).any(dim=-1)
+
+    # The number of trailing non-breaker tokens bounds the match length.
+    offsets = torch.arange(max_unwind + 1, device=device)
+    tail_positions = seq_lens_t[:, None] - 1 - offsets
+    tail_tokens = _gather_token_ids(input_token_ids, output_token_ids,
+                                    rows_t, prompt_lens_t, tail_positions)
+    tail_valid = ((tail_positions >= window_starts_t[:, None]) &
+                  ~is_breaker(tail_tokens))
+    num_trailing = tail_valid.long().cumprod(dim=-1).sum(dim=-1)
+    curr_max_ngram = torch.minimum(
+        torch.minimum(num_trailing, max_ngrams_t),
+        seq_lens_t - window_starts_t - 1)
+    row_applies = curr_max_ngram > allowed_lengths[rows_t]
+
+    # Unwind every endpoint against the tail of the sequence in lockstep.
+    unwinds = offsets[1:]
+    earlier_positions = endpoints_t[..., None] - unwinds
+    earlier_tokens = _gather_token_ids(input_token_ids, output_token_ids,
+                                       rows_t, prompt_lens_t, earlier_positions)
+    matches = ((earlier_tokens == tail_tokens[:, None, 1:]) &
+               (earlier_positions >= window_starts_t[:, None, None]) &
+               (unwinds <= curr_max_ngram[:, None, None]) &
+               ~is_breaker(earlier_tokens))
+    match_lens = matches.long().cumprod(dim=-1).sum(dim=-1)
+
+    valid = (endpoints_t >= 0) & (match_lens > 0)
+    new_lens = torch.where(valid, match_lens + 1, 0)
+
+    # Emulate the early exit: endpoints after the first one reaching
+    # dry_early_exit_match_len are not considered.
+    early_exit = valid & (new_lens >= early_exit_match_len[rows_t, None])
+    early_exit = early_exit.long()
+    considered = (early_exit.cumsum(dim=-1) - early_exit) == 0
+    new_lens = torch.where(considered & row_applies[:, None], new_lens, 0)
+
+    # Penalties grow with the match length, so the penalty of a token is the
+    # largest one among the endpoints it follows. Taking that maximum among
+    # the (few) endpoints of each row avoids any vocab-sized work.
+    next_tokens = _gather_token_ids(input_token_ids, output_token_ids,
+                                    rows_t, prompt_lens_t, endpoints_t + 1)
+    exponents = (new_lens - allowed_lengths[rows_t, None]).float()
+    penalties = (multipliers[rows_t, None].float() *
+                 bases[rows_t, None].float().pow(exponents))
+    penalties = torch.where(new_lens > 0, penalties, 0.0)
+    same_token = next_tokens[:, :, None] == next_tokens[:, None, :]
+    penalties = torch.where(same_token, penalties[:, None, :],
+                            0.0).amax(dim=-1)
+
+    # Duplicate (row, token) pairs all write the same value.
+    penalized_rows = rows_t[:, None].expand_as(next_tokens)
+    logits[penalized_rows, next_tokens] = (
+        logits[penalized_rows, next_tokens] - penalties.to(logits.dtype))
 
     return logits
 
+
 def _apply_no_repeat_ngram(
     logits: torch.Tensor,
-    input_ids: torch.Tensor,
-    ngram_size: torch.Tensor,
+    sampling_metadata: SamplingMetadata,
 ) -> torch.Tensor:
     """Apply no-repeat-ngram penalty which sets logits to -inf for tokens that
     would create a repeated n-gram.
-    """
-    if torch.all(ngram_size == 0):
-        return logits
-
-    batch_size = logits.shape[0]
-
-    for i in range(batch_size):
-        size = int(ngram_size[i].item())
-        if size == 0:
-            continue
 
-        cur_len = len(input_ids[i])
-        if cur_len < size:
+    The banned tokens of each row are read from the sequence's incrementally
+    maintained :class:`~aphrodite.common.token_index.NGramIndex`, and the
+    whole batch is masked with a single scatter.
+    """
+    banned_rows: List[int] = []
+    banned_tokens: List[int] = []
+    for irow, (seq_data, params) in enumerate(
+            _get_sample_rows(sampling_metadata)):
+        ngram_size = params.no_repeat_ngram_size
+        if seq_data is None or ngram_size == 0:
             continue
-
-        banned_tokens = _calc_banned_ngram_tokens(
-            ngram_size=size,
-            prev_input_ids=input_ids[i],
-            cur_len=cur_len-1
-        )
-
-        if banned_tokens:
-            logits[i, banned_tokens] = -float("inf")
+        row_banned_tokens = seq_data.get_ngram_index(
+            ngram_size).banned_tokens()
+        banned_rows.extend([irow] * len(row_banned_tokens))
+        banned_tokens.extend(row_banned_tokens)
+
+    if banned_tokens:
+        banned = torch.tensor([banned_rows, banned_tokens],
+                              dtype=torch.long).to(device=logits.device,
+                                                   non_blocking=True)
+        logits.index_put_((banned[0], banned[1]),
+                          torch.tensor(-float("inf"),
+                                       dtype=logits.dtype,
+                                       device=logits.device))
 
     return logits
 
+
 def _apply_top_k_top_p(
     logits: torch.Tensor,
     p: torch.Tensor,
@@ -1160,6 +1382,125 @@ def _apply_top_nsigma(
     return logits
 
 
+def _get_sampler_plan(
+        sampler_order: List[int],
+        enabled_sampler_ids: Dict[SamplerID, bool]) -> List[SamplerStep]:
+    """Return the steps that apply the enabled samplers in the given order.
+
+    Consecutive truncation samplers are grouped into a single step when
+    there are several of them or when one of them would sort the logits.
+    Disabled samplers do not change the logits, so they do not separate
+    truncation samplers.
+    """
+    plan: List[SamplerStep] = []
+    group: List[SamplerID] = []
+    for sampler_id in itertools.chain(sampler_order, [None]):
+        if sampler_id is not None:
+            sampler_id = SamplerID(sampler_id)
+            if not enabled_sampler_ids.get(sampler_id, False):
+                continue
+            if sampler_id in _TRUNCATION_SAMPLERS:
+                group.append(sampler_id)
+                continue
+        if len(group) > 1 or any(i in _SORTING_SAMPLERS for i in group):
+            plan.append(tuple(group))
+        else:
+            plan.extend(group)
+        group = []
+        if sampler_id is not None:
+            plan.append(sampler_id)
+    return plan
+
+
+def _apply_truncations(
+    logits: torch.Tensor,
+    sampler_ids: Tuple[SamplerID, ...],
+    sampling_tensors: SamplingTensors,
+    rows: Optional[torch.Tensor] = None,
+) -> torch.Tensor:
+    """Apply consecutive truncation samplers with a single sort of the
+    logits, to the given rows only if rows is not None.
+
+    Each of these samplers only removes the least likely tokens, so the
+    tokens kept are a prefix of the logits sorted in descending order, and
+    only the length of that prefix changes from one sampler to the next. The
+    probabilities of the tokens kept are the exponentials of the sorted logits
+    minus the largest one, divided by the cumulative sum of those up to the
+    end of the prefix, so one cumsum serves every sampler. Rows that do not
+    use a sampler keep their prefix.
+    """
+
+    def params(tensor: torch.Tensor) -> torch.Tensor:
+        if rows is not None:
+            tensor = tensor.index_select(0, rows)
+        return tensor.unsqueeze(dim=1)
+
+    selected = logits if rows is None else logits.index_select(0, rows)
+    num_rows, vocab_size = selected.shape
+    logits_sort, logits_idx = selected.sort(dim=-1, descending=True)
+    shifted = (logits_sort - logits_sort[:, :1]).float()
+    exp = shifted.exp()
+    exp_sum = exp.cumsum(dim=-1)
+    positions = torch.arange(vocab_size, device=logits.device)
+    num_kept = torch.full((num_rows, 1),
+                          vocab_size,
+                          dtype=torch.long,
+                          device=logits.device)
+
+    for sampler_id in sampler_ids:
+        if sampler_id == SamplerID.TOP_P_TOP_K:
+            num_kept = torch.minimum(num_kept, params(sampling_tensors.top_ks))
+        # The sum of the exponentials of the tokens kept.
+        mass = exp_sum.gather(1, num_kept - 1)
+        if sampler_id == SamplerID.TOP_P_TOP_K:
+            # Keep the tokens that the more likely ones do not reach top-p.
+            top_ps = params(sampling_tensors.top_ps)
+            kept = ((exp_sum - exp) < top_ps * mass).sum(dim=-1, keepdim=True)
+            kept = torch.where(top_ps < 1, kept, vocab_size)
+        elif sampler_id == SamplerID.TFS:
+            probs = torch.where(positions < num_kept, exp / mass, 0)
+            d2 = probs.diff().diff().abs()
+            curvature_cdf = (d2 / d2.sum(dim=-1, keepdim=True)).cumsum(dim=-1)
+            # The most likely token is always kept, the least likely one is
+            # always removed.
+            tfss = params(sampling_tensors.tfss)
+            kept = 1 + (~(curvature_cdf > tfss)).sum(dim=-1, keepdim=True)
+            kept = torch.where(tfss < 1, kept, vocab_size)
+        else:
+            # The tokens kept are those whose exponential is at least the
+            # threshold.
+            if sampler_id == SamplerID.MIN_P:
+                # The largest exponential is 1.
+                threshold = params(sampling_tensors.min_ps)
+            elif sampler_id == SamplerID.TOP_A:
+                # Top-a times the square of the top probability.
+                threshold = params(sampling_tensors.top_as) / mass
+            elif sampler_id == SamplerID.EPSILON_CUTOFF:
+                threshold = params(sampling_tensors.epsilon_cutoffs) * mass
+            elif sampler_id == SamplerID.ETA_CUTOFF:
+                in_prefix = (positions < num_kept) & (exp > 0)
+                neg_entropy = torch.where(in_prefix, exp * shifted,
+                                          0).sum(dim=-1, keepdim=True)
+                neg_entropy = neg_entropy / mass - mass.log()
+                eta_cutoffs = params(sampling_tensors.eta_cutoffs)
+                threshold = torch.min(
+                    eta_cutoffs,
+                    eta_cutoffs.sqrt() * neg_entropy.exp()) * mass
+            else:
+                raise ValueError(
+                    f"{sampler_id.name} is not a truncation sampler.")
+            kept = (exp >= threshold).sum(dim=-1, keepdim=True)
+        num_kept = torch.minimum(num_kept, kept).clamp_(min=1)
+
+    logits_sort.masked_fill_(positions >= num_kept, -float("inf"))
+    selected = torch.empty_like(logits_sort).scatter_(dim=-1,
+                                                      index=logits_idx,
+                                                      src=logits_sort)
+    if rows is None:
+        return selected
+    return logits.index_copy_(0, rows, selected)
+
+
 def _greedy_sample(
     selected_seq_groups: List[SequenceGroupToSample],
     samples: torch.Tensor,
@@ -1992,84 +2333,6 @@ def _get_next_prompt_tokens(seq_group: SequenceGroupToSample) -> List[str]:
         next_token_index_start:next_token_index_end]
     return next_prompt_tokens
 
-def _get_ngrams(
-    ngram_size: int,
-    prev_input_ids: torch.Tensor
-) -> Dict[Tuple[int, ...], List[int]]:
-    """Get dictionary of ngrams and the tokens that followed them.
-
-    Args:
-        ngram_size: Size of ngrams to track
-        prev_input_ids: 1D tensor of previous token ids
-
-    Returns:
-        Dictionary mapping ngram tuples to list of tokens that followed them
-    """
-    generated_ngrams = {}
-    gen_tokens = prev_input_ids.tolist()
-
-    for i in range(len(gen_tokens) - ngram_size + 1):
-        ngram = tuple(gen_tokens[i:i + ngram_size - 1])
-        next_token = gen_tokens[i + ngram_size - 1]
-        if ngram in generated_ngrams:
-            generated_ngrams[ngram].append(next_token)
-        else:
-            generated_ngrams[ngram] = [next_token]
-
-    return generated_ngrams
-
-def _get_generated_ngrams(
-    banned_ngrams: Dict[Tuple[int, ...], List[int]],
-    prev_input_ids: torch.Tensor,
-    ngram_size: int,
-    cur_len: int
-) -> List[int]:
-    """Get list of tokens that would create a repeated ngram if generated next.
-
-    Args:
-        banned_ngrams: Dictionary of previously seen ngrams and their next
-            tokens
-        prev_input_ids: Previous token ids
-        ngram_size: Size of ngrams to check
-        cur_len: Current position in sequence
-
-    Returns:
-        List of token ids that would create a repeat ngram
-    """
-    start_idx = cur_len + 1 - ngram_size
-    current_ngram = tuple(prev_input_ids[start_idx:cur_len].tolist())
-
-    return banned_ngrams.get(current_ngram, [])
-
-def _calc_banned_ngram_tokens(
-    ngram_size: int,
-    prev_input_ids: torch.Tensor,
-    cur_len: int
-) -> List[int]:
-    """Calculate tokens that would create repeated ngrams if generated next.
-
-    Args:
-        ngram_size: Size of ngrams to prevent repeating
-        prev_input_ids: Previous token ids in sequence
-        cur_len: Current position in sequence
-
-    Returns:
-        List of token ids that should be banned to prevent ngram repetition
-    """
-    if cur_len + 1 < ngram_size:
-        return []
-
-    generated_ngrams = _get_ngrams(ngram_size, prev_input_ids)
-
-    banned_tokens = _get_generated_ngrams(
-        generated_ngrams,
-        prev_input_ids,
-        ngram_size,
-        cur_len
-    )
-
-    return banned_tokens
-
 
 # def _apply_mirostat_v2(logits: torch.Tensor,
 #                        sampling_tensors: SamplingTensors) -> torch.Tensor:
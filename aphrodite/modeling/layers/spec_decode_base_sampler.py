@@ -29,6 +29,9 @@ class SpecDecodeBaseSampler(nn.Module):
         self.num_accepted_tokens: Optional[torch.Tensor] = None
         self.num_emitted_tokens: Optional[torch.Tensor] = None
         self.num_draft_tokens: int = 0
+        # The number of sequences speculated on, which may each emit one token
+        # more than their draft tokens.
+        self.num_spec_seqs: int = 0
 
     def init_gpu_tensors(self, device: Union[int, str]) -> None:
         assert self.num_accepted_tokens is None
@@ -111,6 +114,7 @@ class SpecDecodeBaseSampler(nn.Module):
         self.num_accepted_tokens += accepted.sum()
         self.num_emitted_tokens += (output_with_bonus_tokens != -1).sum()
         self.num_draft_tokens += batch_size * k
+        self.num_spec_seqs += batch_size
 
         return output_with_bonus_tokens
 
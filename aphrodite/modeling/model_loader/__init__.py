@@ -5,6 +5,7 @@ from torch import nn
 from aphrodite.common.config import (CacheConfig, DeviceConfig, LoadConfig,
                                      LoRAConfig, ModelConfig, ParallelConfig,
                                      SchedulerConfig)
+from aphrodite.common.startup_trace import startup_phase
 from aphrodite.modeling.model_loader.loader import (BaseModelLoader,
                                                     get_model_loader)
 from aphrodite.modeling.model_loader.utils import (get_architecture_class_name,
@@ -17,12 +18,13 @@ def get_model(*, model_config: ModelConfig, load_config: LoadConfig,
               lora_config: Optional[LoRAConfig],
               cache_config: CacheConfig) -> nn.Module:
     loader = get_model_loader(load_config)
-    return loader.load_model(model_config=model_config,
-                             device_config=device_config,
-                             lora_config=lora_config,
-                             parallel_config=parallel_config,
-                             scheduler_config=scheduler_config,
-                             cache_config=cache_config)
+    with startup_phase("load_model"):
+        return loader.load_model(model_config=model_config,
+                                 device_config=device_config,
+                                 lora_config=lora_config,
+                                 parallel_config=parallel_config,
+                                 scheduler_config=scheduler_config,
+                                 cache_config=cache_config)
 
 
 __all__ = [
@@ -40,7 +40,8 @@ from aphrodite.modeling.model_loader.weight_utils import (
     download_safetensors_index_file_from_hf, download_weights_from_hf,
     filter_duplicate_safetensors_files, filter_files_not_needed_for_inference,
     get_gguf_extra_tensor_names, get_quant_config, gguf_quant_weights_iterator,
-    initialize_dummy_weights, np_cache_weights_iterator, pt_weights_iterator,
+    initialize_dummy_weights, np_cache_weights_iterator,
+    parallel_safetensors_weights_iterator, pt_weights_iterator,
     safetensors_weights_iterator)
 from aphrodite.modeling.models import (has_inner_state, supports_lora,
                                        supports_multimodal)
@@ -203,7 +204,15 @@ class BaseModelLoader(ABC):
 
 
 class DefaultModelLoader(BaseModelLoader):
-    """Model loader that can load different file types from disk."""
+    """Model loader that can load different file types from disk.
+
+    Safetensors checkpoints are read on a thread pool if `num_threads` is set
+    in the extra config: the files are memory-mapped, and up to
+    `prefetch_bytes` of upcoming tensors are read while the current ones are
+    loaded into the model.
+    """
+
+    DEFAULT_PREFETCH_BYTES = 2 * 1024**3
 
     @dataclasses.dataclass
     class Source:
@@ -219,9 +228,18 @@ class DefaultModelLoader(BaseModelLoader):
 
     def __init__(self, load_config: LoadConfig):
         super().__init__(load_config)
-        if load_config.model_loader_extra_config:
-            raise ValueError(f"Model loader extra config is not supported for "
-                             f"load format {load_config.load_format}")
+        extra_config = ({} if load_config.model_loader_extra_config is None
+                        else dict(load_config.model_loader_extra_config))
+        self.num_threads = int(extra_config.pop("num_threads", 0))
+        self.prefetch_bytes = int(
+            extra_config.pop("prefetch_bytes", self.DEFAULT_PREFETCH_BYTES))
+        if extra_config:
+            raise ValueError(f"Unexpected extra config keys for load format "
+                             f"{load_config.load_format}: "
+                             f"{extra_config.keys()}")
+        if self.num_threads < 0 or self.prefetch_bytes <= 0:
+            raise ValueError("num_threads must be non-negative and "
+                             "prefetch_bytes must be positive.")
 
     def _maybe_download_from_modelscope(
             self, model: str, revision: Optional[str]) -> Optional[str]:
@@ -336,6 +354,9 @@ class DefaultModelLoader(BaseModelLoader):
             weights_iterator = np_cache_weights_iterator(
                 source.model_or_path, self.load_config.download_dir, hf_folder,
                 hf_weights_files)
+        elif use_safetensors and self.num_threads > 0:
+            weights_iterator = parallel_safetensors_weights_iterator(
+                hf_weights_files, self.num_threads, self.prefetch_bytes)
         elif use_safetensors:
             weights_iterator = safetensors_weights_iterator(hf_weights_files)
         else:
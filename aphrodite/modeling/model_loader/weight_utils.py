@@ -3,9 +3,13 @@ import fnmatch
 import glob
 import hashlib
 import json
+import mmap
 import os
+import struct
 import tempfile
-from collections import defaultdict
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import (Any, Callable, Dict, Generator, Iterable, List, Optional,
                     Tuple, Union)
 
@@ -398,6 +402,132 @@ def safetensors_weights_iterator(
                 yield name, param
 
 
+_SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "F8_E4M3": torch.float8_e4m3fn,
+    "F8_E5M2": torch.float8_e5m2,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+# Upcoming tensors are read in chunks of this size by the thread pool.
+_PREFETCH_CHUNK_BYTES = 16 * 1024 * 1024
+
+_prefetch_buffer = threading.local()
+
+
+def _mmap_safetensors_file(
+        st_file: str) -> List[Tuple[str, torch.Tensor, int, int]]:
+    """Memory-map a safetensors file and return tensors viewing its data, in
+    the order they are stored, with the offset and size of their data."""
+    with open(st_file, "rb") as f:
+        # Copy-on-write, so that the buffer is writable for torch. Nothing
+        # is ever written to it.
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    header_size, = struct.unpack("<Q", buffer[:8])
+    header = json.loads(buffer[8:8 + header_size])
+    header.pop("__metadata__", None)
+    data_start = 8 + header_size
+
+    tensors: List[Tuple[str, torch.Tensor, int, int]] = []
+    for name, info in sorted(header.items(),
+                             key=lambda item: item[1]["data_offsets"][0]):
+        dtype = _SAFETENSORS_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        if start == end:
+            tensor = torch.empty(info["shape"], dtype=dtype)
+        else:
+            tensor = torch.frombuffer(buffer,
+                                      dtype=dtype,
+                                      count=(end - start) // dtype.itemsize,
+                                      offset=data_start + start).view(
+                                          info["shape"])
+        tensors.append((name, tensor, data_start + start, end - start))
+    return tensors
+
+
+def _read_ahead(fd: int, offset: int, nbytes: int) -> None:
+    """Read a range of a file, to bring it into the page cache."""
+    buffer = getattr(_prefetch_buffer, "buffer", None)
+    if buffer is None:
+        buffer = _prefetch_buffer.buffer = bytearray(_PREFETCH_CHUNK_BYTES)
+    view = memoryview(buffer)
+    end = offset + nbytes
+    while offset < end:
+        read = os.preadv(fd, [view[:min(len(view), end - offset)]], offset)
+        if read == 0:
+            break
+        offset += read
+
+
+def parallel_safetensors_weights_iterator(
+    hf_weights_files: List[str],
+    num_threads: int,
+    prefetch_bytes: int,
+) -> Generator[Tuple[str, torch.Tensor], None, None]:
+    """Iterate over the weights in the model safetensor files, reading ahead
+    on a thread pool.
+
+    All the files are memory-mapped and the tensors view the mapped data,
+    like the tensors of `safe_open`. While the caller loads the current
+    tensors into the model, `num_threads` threads read up to
+    `prefetch_bytes` of the upcoming ones into the page cache, so that the
+    caller's copies do not wait on the disk. Tensors are yielded in the order
+    they are stored in each file, so that the reads are sequential.
+    """
+    files = [os.open(st_file, os.O_RDONLY) for st_file in hf_weights_files]
+    tensors = [(fd, *tensor) for fd, st_file in zip(files, hf_weights_files)
+               for tensor in _mmap_safetensors_file(st_file)]
+    pending: deque = deque()
+    pending_bytes = 0
+    next_idx = 0
+    try:
+        with ThreadPoolExecutor(
+                max_workers=num_threads,
+                thread_name_prefix="weight_prefetch") as executor:
+            try:
+                while pending or next_idx < len(tensors):
+                    # Always keep at least one tensor in flight.
+                    while next_idx < len(tensors):
+                        fd, name, tensor, offset, nbytes = tensors[next_idx]
+                        if pending and pending_bytes + nbytes > prefetch_bytes:
+                            break
+                        futures = [
+                            executor.submit(
+                                _read_ahead, fd, chunk_offset,
+                                min(_PREFETCH_CHUNK_BYTES,
+                                    offset + nbytes - chunk_offset))
+                            for chunk_offset in range(
+                                offset, offset + nbytes, _PREFETCH_CHUNK_BYTES)
+                        ]
+                        pending.append((name, tensor, nbytes, futures))
+                        pending_bytes += nbytes
+                        # Drop the view, so that the mapping of a file is
+                        # released once the caller is done with its tensors.
+                        tensors[next_idx] = None  # type: ignore
+                        next_idx += 1
+
+                    name, tensor, nbytes, futures = pending.popleft()
+                    for future in futures:
+                        future.result()
+                    pending_bytes -= nbytes
+                    yield name, tensor
+            finally:
+                for _, _, _, futures in pending:
+                    for future in futures:
+                        future.cancel()
+    finally:
+        for fd in files:
+            os.close(fd)
+
+
 def pt_weights_iterator(
     hf_weights_files: List[str]
 ) -> Generator[Tuple[str, torch.Tensor], None, None]:
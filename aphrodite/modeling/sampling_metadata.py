@@ -1,10 +1,12 @@
+import weakref
 from array import array
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import torch
 
-from aphrodite.common.sampling_params import SamplingParams, SamplingType
+from aphrodite.common.sampling_params import (SamplerID, SamplingParams,
+                                              SamplingType)
 from aphrodite.common.sequence import SequenceData, SequenceGroupMetadata
 from aphrodite.common.utils import (PyObjectCache, async_tensor_h2d,
                                     is_pin_memory_available,
@@ -355,6 +357,108 @@ def _prepare_seq_groups(
             num_prompts)
 
 
+# Bits of the flags returned by _get_sampling_flags, in the order in which
+# SamplingTensors.from_sampling_metadata returns them.
+_DO_PENALTIES = 1 << 0
+_DO_NO_REPEAT_NGRAMS = 1 << 1
+_DO_TEMPERATURES = 1 << 2
+_DO_TOP_P_TOP_K = 1 << 3
+_DO_TOP_AS = 1 << 4
+_DO_MIN_P = 1 << 5
+_DO_TFSS = 1 << 6
+_DO_ETA_CUTOFFS = 1 << 7
+_DO_EPSILON_CUTOFFS = 1 << 8
+_DO_TYPICAL_PS = 1 << 9
+_DO_QUADRATIC = 1 << 10
+_DO_XTC = 1 << 11
+_DO_NSIGMAS = 1 << 12
+_DO_DRY = 1 << 13
+_DO_SKEWS = 1 << 14
+_DO_TEMP_LAST = 1 << 15
+_NUM_SAMPLING_FLAGS = 16
+
+# The flag of the parameters that each sampler in the sampler order uses.
+_SAMPLER_FLAGS = {
+    SamplerID.DRY: _DO_DRY,
+    SamplerID.PENALTIES: _DO_PENALTIES,
+    SamplerID.NO_REPEAT_NGRAM: _DO_NO_REPEAT_NGRAMS,
+    SamplerID.TEMPERATURE: _DO_TEMPERATURES,
+    SamplerID.TOP_NSIGMA: _DO_NSIGMAS,
+    SamplerID.TOP_P_TOP_K: _DO_TOP_P_TOP_K,
+    SamplerID.TOP_A: _DO_TOP_AS,
+    SamplerID.MIN_P: _DO_MIN_P,
+    SamplerID.TFS: _DO_TFSS,
+    SamplerID.ETA_CUTOFF: _DO_ETA_CUTOFFS,
+    SamplerID.EPSILON_CUTOFF: _DO_EPSILON_CUTOFFS,
+    SamplerID.TYPICAL_P: _DO_TYPICAL_PS,
+    SamplerID.QUADRATIC: _DO_QUADRATIC,
+    SamplerID.XTC: _DO_XTC,
+}
+
+
+def _get_top_k(params: SamplingParams, vocab_size: int) -> int:
+    # k should not be greater than the vocab size.
+    top_k = min(params.top_k, vocab_size)
+    return vocab_size if top_k == -1 else top_k
+
+
+def _get_temperature(params: SamplingParams) -> float:
+    if params.temperature < _SAMPLING_EPS:
+        # NOTE: Zero temperature means deterministic sampling
+        # (i.e., greedy sampling or beam search).
+        # Set the temperature to 1 to avoid division by zero.
+        return 1.0
+    return params.temperature
+
+
+def _get_sampling_flags(params: SamplingParams, vocab_size: int) -> int:
+    """Return the samplers that the given parameters need, as _DO_* bits."""
+    flags = 0
+    if (_get_temperature(params) != 1.0 or params.dynatemp_min > _SAMPLING_EPS
+            or params.dynatemp_max > _SAMPLING_EPS):
+        flags |= _DO_TEMPERATURES
+    if (params.top_p < 1.0 - _SAMPLING_EPS
+            or _get_top_k(params, vocab_size) != vocab_size):
+        flags |= _DO_TOP_P_TOP_K
+    if params.top_a > 0.0:
+        flags |= _DO_TOP_AS
+    if params.min_p > _SAMPLING_EPS:
+        flags |= _DO_MIN_P
+    if (abs(params.presence_penalty) >= _SAMPLING_EPS
+            or abs(params.frequency_penalty) >= _SAMPLING_EPS
+            or params.repetition_penalty > 1.0):
+        flags |= _DO_PENALTIES
+    if params.no_repeat_ngram_size > 0:
+        flags |= _DO_NO_REPEAT_NGRAMS
+    if params.tfs < 1.0 - _SAMPLING_EPS:
+        flags |= _DO_TFSS
+    if params.eta_cutoff > _SAMPLING_EPS:
+        flags |= _DO_ETA_CUTOFFS
+    if params.epsilon_cutoff > _SAMPLING_EPS:
+        flags |= _DO_EPSILON_CUTOFFS
+    if params.typical_p < 1.0 - _SAMPLING_EPS:
+        flags |= _DO_TYPICAL_PS
+    if (params.smoothing_factor > _SAMPLING_EPS
+            or params.smoothing_curve > 1.0):
+        flags |= _DO_QUADRATIC
+    if params.xtc_probability > _SAMPLING_EPS:
+        flags |= _DO_XTC
+    if params.nsigma > _SAMPLING_EPS:
+        flags |= _DO_NSIGMAS
+    if params.dry_multiplier > _SAMPLING_EPS:
+        flags |= _DO_DRY
+    if abs(params.skew) > _SAMPLING_EPS:
+        flags |= _DO_SKEWS
+    if params.temperature_last:
+        flags |= _DO_TEMP_LAST
+    return flags
+
+
+def _unpack_sampling_flags(flags: int) -> Tuple[bool, ...]:
+    return tuple(
+        bool(flags & (1 << i)) for i in range(_NUM_SAMPLING_FLAGS))
+
+
 @dataclass
 class SamplingTensors:
     """Tensors for sampling."""
@@ -402,6 +506,13 @@ class SamplingTensors:
         dtype: torch.dtype,
     ) -> Tuple["SamplingTensors", bool, bool, bool, bool, bool, bool, bool,
                bool, bool, bool, bool, bool, bool, bool, bool, bool]:
+        """Builds the sampling tensors of a batch from scratch, followed by
+        whether each sampler is needed, in the order of the _DO_* flags.
+
+        The sampler uses PersistentSamplingState instead, unless
+        APHRODITE_DISABLE_PERSISTENT_SAMPLING_STATE is set. This is also the
+        reference its results are tested against.
+        """
         prompt_tokens: List[array] = []
         output_tokens: List[array] = []
         top_ks: List[int] = []
@@ -436,62 +547,16 @@ class SamplingTensors:
         dry_early_exit_match_len: List[int] = []
         skews: List[float] = []
 
-        do_penalties = False
-        do_no_repeat_ngrams = False
-        do_temperatures = False
-        do_top_p_top_k = False
-        do_top_as = False
-        do_min_p = False
-        do_tfss = False
-        do_eta_cutoffs = False
-        do_epsilon_cutoffs = False
-        do_typical_ps = False
-        do_quadratic = False
-        do_xtc = False
-        do_nsigmas = False
-        do_dry = False
-        do_skews = False
-        do_temp_last = False
+        flags = 0
 
         assert sampling_metadata.seq_groups is not None
         for seq_group in sampling_metadata.seq_groups:
             seq_ids = seq_group.seq_ids
             params = seq_group.sampling_params
 
-            # k should not be greater than the vocab size.
-            top_k = min(params.top_k, vocab_size)
-            top_k = vocab_size if top_k == -1 else top_k
-
-            temperature = params.temperature
-            if temperature < _SAMPLING_EPS:
-                # NOTE: Zero temperature means deterministic sampling
-                # (i.e., greedy sampling or beam search).
-                # Set the temperature to 1 to avoid division by zero.
-                temperature = 1.0
-
-            do_temperatures |= (temperature != 1.0 or
-                                params.dynatemp_min > _SAMPLING_EPS or
-                                params.dynatemp_max > _SAMPLING_EPS)
-            do_top_p_top_k |= (params.top_p < 1.0 - _SAMPLING_EPS or
-                               top_k != vocab_size)
-            do_top_as |= params.top_a > 0.0
-            do_min_p |= params.min_p > _SAMPLING_EPS
-            do_penalties |= (abs(params.presence_penalty) >= _SAMPLING_EPS or
-                             abs(params.frequency_penalty) >= _SAMPLING_EPS or
-                             params.repetition_penalty > 1.0)
-            do_no_repeat_ngrams |= params.no_repeat_ngram_size > 0
-            do_tfss |= params.tfs < 1.0 - _SAMPLING_EPS
-            do_eta_cutoffs |= params.eta_cutoff > _SAMPLING_EPS
-            do_epsilon_cutoffs |= params.epsilon_cutoff > _SAMPLING_EPS
-            do_typical_ps |= params.typical_p < 1.0 - _SAMPLING_EPS
-            do_quadratic |= (params.smoothing_factor > _SAMPLING_EPS or
-                             params.smoothing_curve > 1.0)
-            do_xtc |= params.xtc_probability > _SAMPLING_EPS
-            do_nsigmas |= params.nsigma > _SAMPLING_EPS
-            do_dry |= params.dry_multiplier > _SAMPLING_EPS
-            do_skews |= abs(params.skew) > _SAMPLING_EPS
-
-            do_temp_last |= params.temperature_last
+            top_k = _get_top_k(params, vocab_size)
+            temperature = _get_temperature(params)
+            flags |= _get_sampling_flags(params, vocab_size)
 
             wants_prompt_logprobs = params.prompt_logprobs is not None
 
@@ -538,11 +603,11 @@ class SamplingTensors:
                 params.dry_early_exit_match_len] * n_seqs
             skews += [params.skew] * n_seqs
 
-        if do_penalties or do_dry or do_no_repeat_ngrams:
+        if flags & (_DO_PENALTIES | _DO_DRY):
             for seq_group in sampling_metadata.seq_groups:
                 seq_ids = seq_group.seq_ids
-                if (seq_group.is_prompt
-                        and params.prompt_logprobs is not None):
+                if (seq_group.is_prompt and
+                        seq_group.sampling_params.prompt_logprobs is not None):
                     prefill_len = len(seq_group.prompt_logprob_indices)
                     prompt_tokens.extend(
                         array(APHRODITE_TOKEN_ID_ARRAY_TYPE)
@@ -593,24 +658,7 @@ class SamplingTensors:
             vocab_size,
             device,
             dtype)
-        return (
-            sampling_tensors,
-            do_penalties,
-            do_no_repeat_ngrams,
-            do_temperatures,
-            do_top_p_top_k,
-            do_top_as,
-            do_min_p,
-            do_tfss,
-            do_eta_cutoffs,
-            do_epsilon_cutoffs,
-            do_typical_ps,
-            do_quadratic,
-            do_xtc,
-            do_nsigmas,
-            do_dry,
-            do_skews,
-            do_temp_last)
+        return (sampling_tensors, *_unpack_sampling_flags(flags))
 
     @classmethod
     def from_lists(
@@ -806,9 +854,10 @@ class SamplingTensors:
             dtype=torch.int,
             pin_memory=pin_memory,
         )
+        # Pad with -1 so that the padding never matches a real token.
         dry_sequence_breakers_t = torch.tensor(
-            [seq + [0] * (max(len(s) for s in
-                              dry_sequence_breaker_ids) - len(seq))
+            [seq + [-1] * (max(len(s) for s in
+                               dry_sequence_breaker_ids) - len(seq))
              for seq in dry_sequence_breaker_ids],
             device="cpu",
             dtype=torch.long,
@@ -897,3 +946,447 @@ class SamplingTensors:
             prompt_tokens=prompt_t.to(device=device, non_blocking=True),
             output_tokens=output_t.to(device=device, non_blocking=True),
         )
+
+
+# The scalar parameters kept by PersistentSamplingState, in the order of the
+# rows of its parameter tensors.
+_FLOAT_PARAMS = ("temperatures", "dynatemp_mins", "dynatemp_maxs",
+                 "dynatemp_exps", "top_ps", "top_as", "min_ps",
+                 "presence_penalties", "frequency_penalties",
+                 "repetition_penalties", "tfss", "eta_cutoffs",
+                 "epsilon_cutoffs", "typical_ps", "smoothing_factors",
+                 "smoothing_curves", "xtc_thresholds", "xtc_probabilities",
+                 "nsigmas", "dry_multipliers", "dry_bases", "skews")
+_INT_PARAMS = ("temperature_lasts", "top_ks", "no_repeat_ngram_sizes",
+               "dry_allowed_lengths", "dry_ranges", "dry_max_ngram",
+               "dry_max_occurrences", "dry_early_exit_match_len")
+
+
+def _get_float_params(params: SamplingParams) -> List[float]:
+    return [
+        _get_temperature(params), params.dynatemp_min, params.dynatemp_max,
+        params.dynatemp_exponent, params.top_p, params.top_a, params.min_p,
+        params.presence_penalty, params.frequency_penalty,
+        params.repetition_penalty, params.tfs, params.eta_cutoff,
+        params.epsilon_cutoff, params.typical_p, params.smoothing_factor,
+        params.smoothing_curve, params.xtc_threshold, params.xtc_probability,
+        params.nsigma, params.dry_multiplier, params.dry_base, params.skew
+    ]
+
+
+def _get_int_params(params: SamplingParams, vocab_size: int) -> List[int]:
+    return [
+        int(params.temperature_last),
+        _get_top_k(params, vocab_size), params.no_repeat_ngram_size,
+        params.dry_allowed_length, params.dry_range, params.dry_max_ngram,
+        params.dry_max_occurrences, params.dry_early_exit_match_len
+    ]
+
+
+# The narrowest the token rows of PersistentSamplingState shrink to.
+_MIN_TOKEN_COLUMNS = 256
+
+
+class PersistentSamplingState:
+    """Builds the sampling tensors of a batch from parameters that are kept
+    on the device across steps.
+
+    SamplingTensors.from_sampling_metadata rebuilds the list of every
+    parameter of the batch and copies it to the device on every step, even
+    though the sampling parameters of a running sequence never change. Here
+    every sequence owns a slot of preallocated parameter tensors, written once
+    when it joins the batch, and a step only copies the slot of each row and
+    gathers the rows. The prompt and output tokens used by the penalties and
+    DRY are kept per slot the same way: a step only copies the tokens that
+    were appended since the sequence was last sampled.
+
+    Slots are keyed by the SequenceData of the sequence, which a slot keeps a
+    weak reference to, and are written again if the SamplingParams change.
+    The slot of a sequence is released once its SequenceData is freed, i.e.
+    once its request finished. The slots of sequences that are no longer
+    scheduled, e.g. preempted ones, are reclaimed when no slot is left, and
+    the tensors grow when every slot is in use by the batch. The token
+    tensors shrink when they are more than four times as wide as the longest
+    sequence of the batch, so that their size follows the batch instead of
+    the longest sequence ever sampled.
+
+    Args:
+        vocab_size: The vocabulary size, used for top-k and to pad tokens.
+        device: The device of the logits.
+        dtype: The dtype of the logits.
+        num_slots: The initial number of slots.
+    """
+
+    def __init__(self,
+                 vocab_size: int,
+                 device: torch.device,
+                 dtype: torch.dtype,
+                 num_slots: int = 64):
+        self.vocab_size = vocab_size
+        self.device = device
+        self.dtype = dtype
+        self._pin_memory = is_pin_memory_available()
+        self._step = 0
+
+        # Slot 0 is never assigned: its token rows stay empty, for the rows
+        # that only compute prompt logprobs.
+        capacity = num_slots + 1
+        # id(SequenceData) -> slot
+        self._slots: Dict[int, int] = {}
+        self._free_slots: List[int] = list(range(capacity - 1, 0, -1))
+        self._seq_data: List[Optional[weakref.ref]] = [None] * capacity
+        # The key of each slot in self._slots.
+        self._keys: List[int] = [0] * capacity
+        # The slots whose SequenceData was freed. Appended to by the weak
+        # reference callbacks, which may run in any thread.
+        self._released_slots: List[int] = []
+        self._params: List[Optional[SamplingParams]] = [None] * capacity
+        self._flags: List[int] = [0] * capacity
+        self._num_breakers: List[int] = [0] * capacity
+        self._last_step: List[int] = [0] * capacity
+        # The number of tokens in the token rows of each slot, and the output
+        # token array they were copied from. -1 if the rows are stale.
+        self._num_prompt_tokens: List[int] = [0] * capacity
+        self._num_output_tokens: List[int] = [0] * capacity
+        self._output_token_ids: List[Optional[array]] = [None] * capacity
+        # The flags of each row of the last batch.
+        self._row_flags: List[int] = []
+
+        self._float_params = torch.zeros((len(_FLOAT_PARAMS), capacity),
+                                         dtype=dtype,
+                                         device=device)
+        self._int_params = torch.zeros((len(_INT_PARAMS), capacity),
+                                       dtype=torch.int,
+                                       device=device)
+        # Padded with -1 so that the padding never matches a real token.
+        self._breakers = torch.full((capacity, 0),
+                                    -1,
+                                    dtype=torch.long,
+                                    device=device)
+        self._prompt_tokens = torch.full((capacity, 0),
+                                         vocab_size,
+                                         dtype=torch.long,
+                                         device=device)
+        self._output_tokens = torch.full((capacity, 0),
+                                         vocab_size,
+                                         dtype=torch.long,
+                                         device=device)
+
+    @property
+    def num_slots(self) -> int:
+        return len(self._seq_data) - 1
+
+    def get_sampling_tensors(
+        self, sampling_metadata: SamplingMetadata
+    ) -> Tuple[SamplingTensors, bool, bool, bool, bool, bool, bool, bool,
+               bool, bool, bool, bool, bool, bool, bool, bool, bool]:
+        """Same as SamplingTensors.from_sampling_metadata."""
+        self._step += 1
+        if self._released_slots:
+            self._free_released_slots()
+        flags = 0
+        max_num_breakers = 0
+        # The slot of the parameters and of the tokens of each row.
+        param_slots: List[int] = []
+        token_slots: List[int] = []
+        new_slots: List[int] = []
+
+        assert sampling_metadata.seq_groups is not None
+        for seq_group in sampling_metadata.seq_groups:
+            params = seq_group.sampling_params
+            num_prompt_rows = 0
+            if seq_group.is_prompt and params.prompt_logprobs is not None:
+                num_prompt_rows = len(seq_group.prompt_logprob_indices)
+            if not num_prompt_rows and not seq_group.do_sample:
+                flags |= _get_sampling_flags(params, self.vocab_size)
+                continue
+
+            seq_ids = seq_group.seq_ids
+            if num_prompt_rows:
+                slot = self._get_slot(seq_ids[0], seq_group, new_slots)
+                param_slots.extend([slot] * num_prompt_rows)
+                token_slots.extend([0] * num_prompt_rows)
+            if seq_group.do_sample:
+                assert len(seq_group.sample_indices) >= len(seq_ids)
+                for seq_id in seq_ids:
+                    slot = self._get_slot(seq_id, seq_group, new_slots)
+                    param_slots.append(slot)
+                    token_slots.append(slot)
+            flags |= self._flags[slot]
+            max_num_breakers = max(max_num_breakers, self._num_breakers[slot])
+
+        if new_slots:
+            self._write_params(new_slots)
+        self._row_flags = [self._flags[slot] for slot in param_slots]
+
+        index = torch.tensor([param_slots, token_slots],
+                             dtype=torch.long,
+                             device="cpu",
+                             pin_memory=self._pin_memory).to(
+                                 device=self.device, non_blocking=True)
+        param_index, token_index = index.unbind(0)
+        tensors: Dict[str, torch.Tensor] = dict(
+            zip(_FLOAT_PARAMS,
+                self._float_params.index_select(1, param_index).unbind(0)))
+        tensors.update(
+            zip(_INT_PARAMS,
+                self._int_params.index_select(1, param_index).unbind(0)))
+        tensors["temperature_lasts"] = tensors["temperature_lasts"].bool()
+        tensors["dry_sequence_breaker_ids"] = self._breakers[:, :(
+            max_num_breakers)].index_select(0, param_index)
+
+        if flags & (_DO_PENALTIES | _DO_DRY):
+            max_prompt_len, max_output_len = self._update_tokens(token_slots)
+            tensors["prompt_tokens"] = self._prompt_tokens[:, :(
+                max_prompt_len)].index_select(0, token_index)
+            tensors["output_tokens"] = self._output_tokens[:, :(
+                max_output_len)].index_select(0, token_index)
+        else:
+            empty_tensor = torch.empty(0, device=self.device, dtype=torch.long)
+            tensors["prompt_tokens"] = empty_tensor
+            tensors["output_tokens"] = empty_tensor
+
+        return (SamplingTensors(**tensors), *_unpack_sampling_flags(flags))
+
+    def get_sampler_rows(
+            self, sampler_ids: Iterable[int]) -> Optional[torch.Tensor]:
+        """Return the rows of the last batch that use any of the given
+        samplers, or None if all of them do."""
+        flags = 0
+        for sampler_id in sampler_ids:
+            flags |= _SAMPLER_FLAGS[sampler_id]
+        rows = [
+            i for i, row_flags in enumerate(self._row_flags)
+            if row_flags & flags
+        ]
+        if len(rows) == len(self._row_flags):
+            return None
+        return self._to_device(rows, torch.long)
+
+    def _get_slot(self, seq_id: int, seq_group: SequenceGroupToSample,
+                  new_slots: List[int]) -> int:
+        seq_data = seq_group.seq_data[seq_id]
+        params = seq_group.sampling_params
+        slot = self._slots.get(id(seq_data))
+        if slot is not None:
+            seq_data_ref = self._seq_data[slot]
+            if seq_data_ref is None or seq_data_ref() is not seq_data:
+                # The id of a freed SequenceData was reused.
+                self._free_slot(id(seq_data), slot)
+                slot = None
+        if slot is None:
+            slot = self._allocate_slot()
+            self._slots[id(seq_data)] = slot
+            self._keys[slot] = id(seq_data)
+            released_slots = self._released_slots
+            self._seq_data[slot] = weakref.ref(
+                seq_data,
+                lambda _, slot=slot: released_slots.append(slot))
+        elif self._params[slot] is params:
+            self._last_step[slot] = self._step
+            return slot
+
+        self._params[slot] = params
+        self._flags[slot] = _get_sampling_flags(params, self.vocab_size)
+        self._num_breakers[slot] = len(params.dry_sequence_breaker_ids)
+        self._last_step[slot] = self._step
+        self._num_prompt_tokens[slot] = -1
+        self._num_output_tokens[slot] = -1
+        self._output_token_ids[slot] = None
+        new_slots.append(slot)
+        return slot
+
+    def _allocate_slot(self) -> int:
+        if not self._free_slots:
+            # Reclaim the slots of the sequences that are not in this batch.
+            for key, slot in list(self._slots.items()):
+                if self._last_step[slot] < self._step:
+                    self._free_slot(key, slot)
+        if not self._free_slots:
+            self._grow()
+        return self._free_slots.pop()
+
+    def _free_slot(self, key: int, slot: int) -> None:
+        del self._slots[key]
+        self._seq_data[slot] = None
+        self._params[slot] = None
+        self._output_token_ids[slot] = None
+        self._free_slots.append(slot)
+
+    def _free_released_slots(self) -> None:
+        # The list is shared with the callbacks, so it is emptied in place.
+        released_slots = self._released_slots[:]
+        del self._released_slots[:len(released_slots)]
+        for slot in released_slots:
+            seq_data_ref = self._seq_data[slot]
+            # The slot may have been reclaimed, and assigned to another
+            # sequence, before the SequenceData was freed.
+            if seq_data_ref is None or seq_data_ref() is not None:
+                continue
+            self._free_slot(self._keys[slot], slot)
+
+    def _grow(self) -> None:
+        old_capacity = len(self._seq_data)
+        capacity = 2 * old_capacity
+        num_new = capacity - old_capacity
+        self._free_slots.extend(range(capacity - 1, old_capacity - 1, -1))
+        for slot_list, value in ((self._seq_data, None), (self._keys, 0),
+                                 (self._params, None),
+                                 (self._flags, 0), (self._num_breakers, 0),
+                                 (self._last_step, 0),
+                                 (self._num_prompt_tokens, 0),
+                                 (self._num_output_tokens, 0),
+                                 (self._output_token_ids, None)):
+            slot_list.extend([value] * num_new)
+
+        self._float_params = torch.cat(
+            [self._float_params,
+             self._float_params.new_zeros((len(_FLOAT_PARAMS), num_new))],
+            dim=1)
+        self._int_params = torch.cat(
+            [self._int_params,
+             self._int_params.new_zeros((len(_INT_PARAMS), num_new))],
+            dim=1)
+        self._breakers = self._resize(self._breakers, capacity,
+                                      self._breakers.size(1), -1)
+        self._prompt_tokens = self._resize(self._prompt_tokens, capacity,
+                                           self._prompt_tokens.size(1),
+                                           self.vocab_size)
+        self._output_tokens = self._resize(self._output_tokens, capacity,
+                                           self._output_tokens.size(1),
+                                           self.vocab_size)
+
+    @staticmethod
+    def _resize(tensor: torch.Tensor, num_rows: int, num_cols: int,
+                pad: int) -> torch.Tensor:
+        """Return a copy of a 2D tensor grown to the given shape."""
+        resized = tensor.new_full((num_rows, num_cols), pad)
+        resized[:tensor.size(0), :tensor.size(1)] = tensor
+        return resized
+
+    def _ensure_columns(self, tensor: torch.Tensor, num_cols: int,
+                        pad: int) -> torch.Tensor:
+        if tensor.size(1) >= num_cols:
+            return tensor
+        return self._resize(tensor, tensor.size(0),
+                            max(num_cols, 2 * tensor.size(1)), pad)
+
+    def _write_params(self, slots: List[int]) -> None:
+        params = [self._params[slot] for slot in slots]
+        slots_t = self._to_device(slots, torch.long)
+        self._float_params.index_copy_(
+            1, slots_t,
+            self._to_device([_get_float_params(p) for p in params],
+                            self.dtype).t())
+        self._int_params.index_copy_(
+            1, slots_t,
+            self._to_device(
+                [_get_int_params(p, self.vocab_size) for p in params],
+                torch.int).t())
+
+        num_breakers = max(self._num_breakers[slot] for slot in slots)
+        self._breakers = self._ensure_columns(self._breakers, num_breakers,
+                                              -1)
+        if self._breakers.size(1) > 0:
+            width = self._breakers.size(1)
+            self._breakers.index_copy_(
+                0, slots_t,
+                self._to_device([
+                    p.dry_sequence_breaker_ids + [-1] *
+                    (width - len(p.dry_sequence_breaker_ids)) for p in params
+                ], torch.long))
+
+    def _update_tokens(self, token_slots: List[int]) -> Tuple[int, int]:
+        """Copy the tokens appended to the sequences of the given slots since
+        they were last sampled. Returns the longest prompt and output."""
+        max_prompt_len = 0
+        max_output_len = 0
+        stale_prompt_slots: List[int] = []
+        stale_output_slots: List[int] = []
+        # (slot, position, token) of each token to copy.
+        prompt_updates: List[List[int]] = [[], [], []]
+        output_updates: List[List[int]] = [[], [], []]
+        for slot in set(token_slots):
+            if slot == 0:
+                continue
+            seq_data_ref = self._seq_data[slot]
+            assert seq_data_ref is not None
+            seq_data = seq_data_ref()
+            assert seq_data is not None
+
+            prompt_token_ids = seq_data.prompt_token_ids_array
+            num_prompt_tokens = len(prompt_token_ids)
+            max_prompt_len = max(max_prompt_len, num_prompt_tokens)
+            if self._num_prompt_tokens[slot] != num_prompt_tokens:
+                stale_prompt_slots.append(slot)
+                self._append_updates(prompt_updates, slot, prompt_token_ids,
+                                     0)
+                self._num_prompt_tokens[slot] = num_prompt_tokens
+
+            output_token_ids = seq_data.output_token_ids_array
+            num_output_tokens = len(output_token_ids)
+            max_output_len = max(max_output_len, num_output_tokens)
+            start = self._num_output_tokens[slot]
+            if (self._output_token_ids[slot] is not output_token_ids
+                    or start < 0 or start > num_output_tokens):
+                # The output tokens were replaced.
+                stale_output_slots.append(slot)
+                start = 0
+            self._append_updates(output_updates, slot, output_token_ids,
+                                 start)
+            self._num_output_tokens[slot] = num_output_tokens
+            self._output_token_ids[slot] = output_token_ids
+
+        self._prompt_tokens = self._copy_tokens(self._prompt_tokens,
+                                                max_prompt_len,
+                                                stale_prompt_slots,
+                                                prompt_updates)
+        self._output_tokens = self._copy_tokens(self._output_tokens,
+                                                max_output_len,
+                                                stale_output_slots,
+                                                output_updates)
+        self._prompt_tokens = self._maybe_shrink_tokens(
+            self._prompt_tokens, max_prompt_len, self._num_prompt_tokens)
+        self._output_tokens = self._maybe_shrink_tokens(
+            self._output_tokens, max_output_len, self._num_output_tokens)
+        return max_prompt_len, max_output_len
+
+    @staticmethod
+    def _maybe_shrink_tokens(tokens: torch.Tensor, max_len: int,
+                             num_tokens: List[int]) -> torch.Tensor:
+        """Shrink token rows that are much wider than the longest sequence of
+        the batch. The rows of the sequences that no longer fit are marked
+        stale, to be copied again if they are sampled again."""
+        num_cols = 2 * max(max_len, _MIN_TOKEN_COLUMNS)
+        if tokens.size(1) <= 2 * num_cols:
+            return tokens
+        for slot, slot_num_tokens in enumerate(num_tokens):
+            if slot_num_tokens > num_cols:
+                num_tokens[slot] = -1
+        return tokens[:, :num_cols].clone()
+
+    @staticmethod
+    def _append_updates(updates: List[List[int]], slot: int,
+                        token_ids: array, start: int) -> None:
+        num_tokens = len(token_ids) - start
+        if num_tokens <= 0:
+            return
+        updates[0].extend([slot] * num_tokens)
+        updates[1].extend(range(start, len(token_ids)))
+        updates[2].extend(token_ids[start:])
+
+    def _copy_tokens(self, tokens: torch.Tensor, max_len: int,
+                     stale_slots: List[int],
+                     updates: List[List[int]]) -> torch.Tensor:
+        tokens = self._ensure_columns(tokens, max_len, self.vocab_size)
+        if stale_slots:
+            tokens.index_fill_(0, self._to_device(stale_slots, torch.long),
+                               self.vocab_size)
+        if updates[0]:
+            slots_t, positions_t, token_ids_t = self._to_device(
+                updates, torch.long).unbind(0)
+            tokens[slots_t, positions_t] = token_ids_t
+        return tokens
+
+    def _to_device(self, data: list, dtype: torch.dtype) -> torch.Tensor:
+        return async_tensor_h2d(data, dtype, self.device, self._pin_memory)
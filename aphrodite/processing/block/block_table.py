@@ -27,6 +27,9 @@ class BlockTable:
             blocks to keep around for each sequance. If None, all blocks
             are kept (eg., when sliding window is not used).
             It should at least fit the sliding window size of the model.
+        extra_hash (Optional[int], optional): The extra hash of the sequence,
+            e.g. of its LoRA and multi-modal inputs, which keys the content
+            hashes of its blocks for prefix caching besides the tokens.
 
     Attributes:
         _block_size (int): The maximum number of tokens that can be stored in a
@@ -45,9 +48,11 @@ class BlockTable:
         block_allocator: DeviceAwareBlockAllocator,
         _blocks: Optional[List[Block]] = None,
         max_block_sliding_window: Optional[int] = None,
+        extra_hash: Optional[int] = None,
     ):
         self._block_size = block_size
         self._allocator = block_allocator
+        self._extra_hash = extra_hash
         if _blocks is None:
             _blocks = []
         self._blocks: BlockList = BlockList(_blocks)
@@ -188,7 +193,9 @@ class BlockTable:
             assert len(self._blocks) > 0
             self._blocks.append(
                 self._allocator.allocate_mutable_block(
-                    prev_block=self._blocks[-1], device=device))
+                    prev_block=self._blocks[-1],
+                    device=device,
+                    extra_hash=self._extra_hash))
 
     def fork(self) -> "BlockTable":
         """Creates a new BlockTable instance with a copy of the blocks from the
@@ -211,6 +218,7 @@ class BlockTable:
             block_allocator=self._allocator,
             _blocks=forked_blocks,
             max_block_sliding_window=self._max_block_sliding_window,
+            extra_hash=self._extra_hash,
         )
 
     def free(self) -> None:
@@ -276,8 +284,10 @@ class BlockTable:
         if block_token_ids:
             blocks.extend(
                 self._allocator.allocate_immutable_blocks(
-                    prev_block, block_token_ids=block_token_ids,
-                    device=device))
+                    prev_block,
+                    block_token_ids=block_token_ids,
+                    device=device,
+                    extra_hash=self._extra_hash))
             prev_block = blocks[-1]
 
         if tail_token_ids:
@@ -285,7 +295,9 @@ class BlockTable:
             cur_token_ids = tail_token_ids[0]
 
             block = self._allocator.allocate_mutable_block(
-                prev_block=prev_block, device=device)
+                prev_block=prev_block,
+                device=device,
+                extra_hash=self._extra_hash)
             block.append_token_ids(cur_token_ids)
 
             blocks.append(block)
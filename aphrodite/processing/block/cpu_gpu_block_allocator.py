@@ -6,8 +6,10 @@ from aphrodite.processing.block.interfaces import (Block, BlockAllocator,
                                                    DeviceAwareBlockAllocator)
 from aphrodite.processing.block.naive_block import (NaiveBlock,
                                                     NaiveBlockAllocator)
+from aphrodite.processing.block.offload import PrefixCacheOffloader
 from aphrodite.processing.block.prefix_caching_block import (
     PrefixCachingBlockAllocator)
+from aphrodite.processing.evictor_v2 import EvictionMetricData, EvictionPolicy
 
 
 class CpuGpuBlockAllocator(DeviceAwareBlockAllocator):
@@ -28,6 +30,8 @@ class CpuGpuBlockAllocator(DeviceAwareBlockAllocator):
         num_gpu_blocks: int,
         num_cpu_blocks: int,
         block_size: int,
+        eviction_policy: EvictionPolicy = EvictionPolicy.LRU,
+        offloader: Optional[PrefixCacheOffloader] = None,
     ) -> DeviceAwareBlockAllocator:
         """Creates a CpuGpuBlockAllocator instance with the specified
         configuration.
@@ -46,6 +50,10 @@ class CpuGpuBlockAllocator(DeviceAwareBlockAllocator):
             num_cpu_blocks (int): The number of blocks to allocate for CPU
                 memory.
             block_size (int): The size of each block in number of tokens.
+            eviction_policy (EvictionPolicy): The policy used to evict cached
+                blocks of the "prefix_caching" allocators.
+            offloader (Optional[PrefixCacheOffloader]): Where the
+                "prefix_caching" GPU allocator demotes evicted blocks to.
 
         Returns:
             DeviceAwareBlockAllocator: A CpuGpuBlockAllocator instance with the
@@ -78,12 +86,15 @@ class CpuGpuBlockAllocator(DeviceAwareBlockAllocator):
                 num_blocks=num_gpu_blocks,
                 block_size=block_size,
                 block_ids=gpu_block_ids,
+                eviction_policy=eviction_policy,
+                offloader=offloader,
             )
 
             cpu_allocator = PrefixCachingBlockAllocator(
                 num_blocks=num_cpu_blocks,
                 block_size=block_size,
                 block_ids=cpu_block_ids,
+                eviction_policy=eviction_policy,
             )
         else:
             raise ValueError(f"Unknown allocator type {allocator_type=}")
@@ -119,23 +130,31 @@ class CpuGpuBlockAllocator(DeviceAwareBlockAllocator):
                 self.allocate_mutable_block(None, Device.GPU))
         return self._null_block
 
-    def allocate_mutable_block(self, prev_block: Optional[Block],
-                               device: Device) -> Block:
+    def allocate_mutable_block(self,
+                               prev_block: Optional[Block],
+                               device: Device,
+                               extra_hash: Optional[int] = None) -> Block:
         """Allocates a new mutable block on the specified device.
 
         Args:
             prev_block (Optional[Block]): The previous block to in the sequence.
                 Used for prefix hashing.
             device (Device): The device on which to allocate the new block.
+            extra_hash (Optional[int]): The extra hash of the sequence of the
+                block, which keys its content hash besides its tokens.
 
         Returns:
             Block: The newly allocated mutable block.
         """
-        return self._allocators[device].allocate_mutable_block(prev_block)
-
-    def allocate_immutable_blocks(self, prev_block: Optional[Block],
-                                  block_token_ids: List[List[int]],
-                                  device: Optional[Device]) -> List[Block]:
+        return self._allocators[device].allocate_mutable_block(
+            prev_block, extra_hash=extra_hash)
+
+    def allocate_immutable_blocks(
+            self,
+            prev_block: Optional[Block],
+            block_token_ids: List[List[int]],
+            device: Optional[Device],
+            extra_hash: Optional[int] = None) -> List[Block]:
         """Allocates a new group of immutable blocks with the provided block
         token IDs on the specified device.
 
@@ -145,17 +164,21 @@ class CpuGpuBlockAllocator(DeviceAwareBlockAllocator):
             block_token_ids (List[int]): The list of block token IDs to be
                 stored in the new blocks.
             device (Device): The device on which to allocate the new block.
+            extra_hash (Optional[int]): The extra hash of the sequence of the
+                block, which keys its content hash besides its tokens.
 
         Returns:
             List[Block]: The newly allocated list of immutable blocks
                 containing the provided block token IDs.
         """
         return self._allocators[device].allocate_immutable_blocks(
-            prev_block, block_token_ids)
+            prev_block, block_token_ids, extra_hash=extra_hash)
 
-    def allocate_immutable_block(self, prev_block: Optional[Block],
+    def allocate_immutable_block(self,
+                                 prev_block: Optional[Block],
                                  token_ids: List[int],
-                                 device: Device) -> Block:
+                                 device: Device,
+                                 extra_hash: Optional[int] = None) -> Block:
         """Allocates a new immutable block with the provided token IDs on the
         specified device.
 
@@ -165,13 +188,15 @@ class CpuGpuBlockAllocator(DeviceAwareBlockAllocator):
             token_ids (List[int]): The list of token IDs to be stored in the new
                 block.
             device (Device): The device on which to allocate the new block.
+            extra_hash (Optional[int]): The extra hash of the sequence of the
+                block, which keys its content hash besides its tokens.
 
         Returns:
             Block: The newly allocated immutable block containing the provided
                 token IDs.
         """
         return self._allocators[device].allocate_immutable_block(
-            prev_block, token_ids)
+            prev_block, token_ids, extra_hash=extra_hash)
 
     def free(self, block: Block) -> None:
         """Frees the memory occupied by the given block.
@@ -328,6 +353,18 @@ class CpuGpuBlockAllocator(DeviceAwareBlockAllocator):
         assert device in self._allocators
         return self._allocators[device].get_prefix_cache_hit_rate()
 
+    def get_num_cached_blocks(self, block_hashes: List[int],
+                              device: Device) -> int:
+        assert device in self._allocators
+        return self._allocators[device].get_num_cached_blocks(block_hashes)
+
+    def get_prefix_cache_eviction_metrics(
+            self, device: Device) -> Optional[EvictionMetricData]:
+        """Prefix cache eviction counters. None means not supported or
+        disabled."""
+        assert device in self._allocators
+        return self._allocators[device].get_prefix_cache_eviction_metrics()
+
     def get_and_reset_swaps(self) -> List[Tuple[int, int]]:
         """Returns and clears the mapping of source to destination block IDs.
         Will be called after every swapping operations for now, and after every
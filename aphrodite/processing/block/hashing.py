@@ -0,0 +1,145 @@
+"""Content hashes of the blocks of a sequence, for prefix caching.
+
+The hash of a block is a 64-bit rolling hash of the tokens of the sequence
+up to the end of the block:
+
+    hash[i] = hash[i - 1] * MULTIPLIER + mix(tokens of block i)  (mod 2^64)
+
+where hash[-1] is derived from the extra hash of the sequence, which keys
+what its KV cache depends on besides the tokens: its LoRA, prompt adapter
+and multi-modal inputs. The recurrence is linear, so the hashes of all the
+blocks of a prompt are computed in one pass with NumPy, and a block that
+fills up during decoding only hashes its own tokens. The hashes are stable
+across processes, unlike hash() of a tuple of tokens.
+"""
+import hashlib
+from array import array
+from typing import Any, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+_MASK = (1 << 64) - 1
+# Odd, so that it has an inverse modulo 2^64.
+_MULTIPLIER = 0x9E3779B97F4A7C15
+_MULTIPLIER_INV = pow(_MULTIPLIER, -1, 1 << 64)
+# Makes the contribution of a token depend on its position in the block.
+_POSITION_KEY = np.uint64(0xD6E8FEB86659FD93)
+# hash[-1] of the sequences without an extra hash.
+_NO_EXTRA_HASH_SEED = 0x2545F4914F6CDD1D
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """The splitmix64 finalizer, on an array of uint64."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _hash_block_contents(block_token_ids: np.ndarray) -> np.ndarray:
+    """The hash of the tokens of each block, of an array of token ids of
+    shape (num_blocks, block_size)."""
+    block_size = block_token_ids.shape[1]
+    positions = np.arange(block_size, dtype=np.uint64) * _POSITION_KEY
+    mixed = _mix(block_token_ids.astype(np.uint64) + positions)
+    return _mix(mixed.sum(axis=1, dtype=np.uint64))
+
+
+def _get_seed(prev_block_hash: Optional[int],
+              extra_hash: Optional[int]) -> int:
+    if prev_block_hash is not None:
+        return prev_block_hash
+    if extra_hash is None:
+        return _NO_EXTRA_HASH_SEED
+    return int(_mix(np.array([extra_hash & _MASK], dtype=np.uint64))[0])
+
+
+def hash_block_tokens(prev_block_hash: Optional[int],
+                      cur_block_token_ids: Sequence[int],
+                      extra_hash: Optional[int] = None) -> int:
+    """The hash of a full block, given the hash of the previous block, or
+    None and the extra hash of the sequence for its first block."""
+    contents = _hash_block_contents(
+        np.array(cur_block_token_ids, dtype=np.int64).reshape(1, -1))
+    return (_get_seed(prev_block_hash, extra_hash) * _MULTIPLIER +
+            int(contents[0])) & _MASK
+
+
+def hash_token_blocks(prev_block_hash: Optional[int],
+                      token_ids: Sequence[int],
+                      block_size: int,
+                      extra_hash: Optional[int] = None) -> List[int]:
+    """The hashes of the full blocks of the given tokens, in one pass. The
+    tokens start at a block boundary, after the block of prev_block_hash, or
+    at the start of the sequence if it is None. A trailing partial block is
+    not hashed."""
+    num_blocks = len(token_ids) // block_size
+    if num_blocks == 0:
+        return []
+    num_tokens = num_blocks * block_size
+    if isinstance(token_ids, array):
+        # The token ids of SequenceData, read in place.
+        tokens = np.frombuffer(token_ids, dtype=token_ids.typecode,
+                               count=num_tokens)
+    elif isinstance(token_ids, np.ndarray):
+        tokens = token_ids[:num_tokens]
+    else:
+        # Much faster than np.asarray() for lists.
+        tokens = np.fromiter(token_ids, dtype=np.int64, count=num_tokens)
+    contents = _hash_block_contents(tokens.reshape(num_blocks, block_size))
+
+    # hash[i] = M^(i + 1) * (seed + sum(contents[j] * M^-(j + 1), j <= i))
+    multiplier_inv_pows = np.full(num_blocks, _MULTIPLIER_INV, dtype=np.uint64)
+    multiplier_inv_pows = np.cumprod(multiplier_inv_pows, dtype=np.uint64)
+    multiplier_pows = np.full(num_blocks, _MULTIPLIER, dtype=np.uint64)
+    multiplier_pows = np.cumprod(multiplier_pows, dtype=np.uint64)
+    seed = np.uint64(_get_seed(prev_block_hash, extra_hash))
+    sums = np.cumsum(contents * multiplier_inv_pows, dtype=np.uint64) + seed
+    return (multiplier_pows * sums).tolist()
+
+
+def _update_with(hasher: "hashlib._Hash", value: Any) -> None:
+    """Feed a multi-modal input to the hasher, by content."""
+    if isinstance(value, (list, tuple)):
+        hasher.update(f"{type(value).__name__}{len(value)}".encode())
+        for item in value:
+            _update_with(hasher, item)
+        return
+    if isinstance(value, dict):
+        hasher.update(f"dict{len(value)}".encode())
+        for key in sorted(value, key=str):
+            hasher.update(str(key).encode())
+            _update_with(hasher, value[key])
+        return
+
+    # Imported lazily, to not import PIL and torch for text-only models.
+    import torch
+    from PIL import Image
+    if isinstance(value, Image.Image):
+        hasher.update(f"image{value.mode}{value.size}".encode())
+        hasher.update(value.tobytes())
+    elif isinstance(value, torch.Tensor):
+        value = value.detach().cpu()
+        hasher.update(f"tensor{value.dtype}{tuple(value.shape)}".encode())
+        hasher.update(value.contiguous().view(torch.uint8).numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        hasher.update(f"ndarray{value.dtype}{value.shape}".encode())
+        hasher.update(np.ascontiguousarray(value).tobytes())
+    else:
+        hasher.update(f"{type(value).__name__}:{value!r}".encode())
+
+
+def get_extra_hash(lora_int_id: int = 0,
+                   prompt_adapter_id: int = 0,
+                   multi_modal_inputs: Iterable[Any] = ()) -> Optional[int]:
+    """The extra hash of a sequence, from its LoRA and prompt adapter ids and
+    its multi-modal inputs. None if it has none of them, so that the blocks
+    of the base model are shared by all such sequences."""
+    multi_modal_inputs = [value for value in multi_modal_inputs if value]
+    if not lora_int_id and not prompt_adapter_id and not multi_modal_inputs:
+        return None
+    hasher = hashlib.blake2b(digest_size=8)
+    hasher.update(f"{lora_int_id}:{prompt_adapter_id}".encode())
+    _update_with(hasher, multi_modal_inputs)
+    return int.from_bytes(hasher.digest(), "little")
@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 from typing import Dict, FrozenSet, List, Optional, Protocol, Tuple
 
 from aphrodite.common.utils import Device
+from aphrodite.processing.evictor_v2 import EvictionMetricData
 
 BlockId = int
 
@@ -81,9 +82,17 @@ class Block(ABC):
             block_size: int,
             allocator: "BlockAllocator",
             block_id: Optional[int] = None,
+            extra_hash: Optional[int] = None,
         ) -> "Block":
             pass
 
+    @property
+    def extra_hash(self) -> Optional[int]:
+        """The extra hash of the sequence of the block, which keys its content
+        hash besides its tokens, e.g. the LoRA of the sequence. See
+        aphrodite.processing.block.hashing."""
+        return None
+
     @property
     @abstractmethod
     def content_hash(self) -> Optional[int]:
@@ -99,18 +108,24 @@ class Block(ABC):
 class BlockAllocator(ABC):
 
     @abstractmethod
-    def allocate_mutable_block(self, prev_block: Optional[Block]) -> Block:
+    def allocate_mutable_block(self,
+                               prev_block: Optional[Block],
+                               extra_hash: Optional[int] = None) -> Block:
         pass
 
     @abstractmethod
-    def allocate_immutable_block(self, prev_block: Optional[Block],
-                                 token_ids: List[int]) -> Block:
+    def allocate_immutable_block(self,
+                                 prev_block: Optional[Block],
+                                 token_ids: List[int],
+                                 extra_hash: Optional[int] = None) -> Block:
         pass
 
     @abstractmethod
     def allocate_immutable_blocks(
-            self, prev_block: Optional[Block],
-            block_token_ids: List[List[int]]) -> List[Block]:
+            self,
+            prev_block: Optional[Block],
+            block_token_ids: List[List[int]],
+            extra_hash: Optional[int] = None) -> List[Block]:
         pass
 
     @abstractmethod
@@ -189,6 +204,19 @@ class BlockAllocator(ABC):
         """Prefix cache hit rate. -1 means not supported or disabled."""
         pass
 
+    @abstractmethod
+    def get_num_cached_blocks(self, block_hashes: List[int]) -> int:
+        """Return the length of the longest prefix of the given chain of block
+        content hashes that is in the prefix cache."""
+        pass
+
+    @abstractmethod
+    def get_prefix_cache_eviction_metrics(
+            self) -> Optional[EvictionMetricData]:
+        """Prefix cache eviction counters. None means not supported or
+        disabled."""
+        pass
+
     class NoFreeBlocksError(ValueError):
         pass
 
@@ -196,20 +224,27 @@ class BlockAllocator(ABC):
 class DeviceAwareBlockAllocator(ABC):
 
     @abstractmethod
-    def allocate_mutable_block(self, prev_block: Optional[Block],
-                               device: Device) -> Block:
+    def allocate_mutable_block(self,
+                               prev_block: Optional[Block],
+                               device: Device,
+                               extra_hash: Optional[int] = None) -> Block:
         pass
 
     @abstractmethod
-    def allocate_immutable_block(self, prev_block: Optional[Block],
+    def allocate_immutable_block(self,
+                                 prev_block: Optional[Block],
                                  token_ids: List[int],
-                                 device: Device) -> Block:
+                                 device: Device,
+                                 extra_hash: Optional[int] = None) -> Block:
         pass
 
     @abstractmethod
-    def allocate_immutable_blocks(self, prev_block: Optional[Block],
-                                  block_token_ids: List[List[int]],
-                                  device: Device) -> List[Block]:
+    def allocate_immutable_blocks(
+            self,
+            prev_block: Optional[Block],
+            block_token_ids: List[List[int]],
+            device: Device,
+            extra_hash: Optional[int] = None) -> List[Block]:
         pass
 
     @abstractmethod
@@ -284,3 +319,17 @@ class DeviceAwareBlockAllocator(ABC):
     def get_prefix_cache_hit_rate(self, device: Device) -> float:
         """Prefix cache hit rate. -1 means not supported or disabled."""
         pass
+
+    @abstractmethod
+    def get_num_cached_blocks(self, block_hashes: List[int],
+                              device: Device) -> int:
+        """Return the length of the longest prefix of the given chain of block
+        content hashes that is in the prefix cache."""
+        pass
+
+    @abstractmethod
+    def get_prefix_cache_eviction_metrics(
+            self, device: Device) -> Optional[EvictionMetricData]:
+        """Prefix cache eviction counters. None means not supported or
+        disabled."""
+        pass
@@ -65,7 +65,8 @@ class NaiveBlockAllocator(BlockAllocator):
     def allocate_immutable_block(self,
                                  prev_block: Optional[Block],
                                  token_ids: List[int],
-                                 device: Optional[Device] = None) -> Block:
+                                 device: Optional[Device] = None,
+                                 extra_hash: Optional[int] = None) -> Block:
         """Allocates a new immutable block with the given token IDs, linked to
         the previous block.
 
@@ -74,12 +75,15 @@ class NaiveBlockAllocator(BlockAllocator):
                 None, then the block to be allocated is the first block in the
                 sequence.
             token_ids (List[int]): The token IDs to be stored in the new block.
+            extra_hash (Optional[int]): The extra hash of the sequence of the
+                block, which keys its content hash besides its tokens.
 
         Returns:
             Block: The newly allocated immutable block.
         """
         assert device is None
-        block = self.allocate_mutable_block(prev_block=prev_block)
+        block = self.allocate_mutable_block(prev_block=prev_block,
+                                            extra_hash=extra_hash)
         block.append_token_ids(token_ids)
         return block
 
@@ -87,7 +91,8 @@ class NaiveBlockAllocator(BlockAllocator):
             self,
             prev_block: Optional[Block],
             block_token_ids: List[List[int]],
-            device: Optional[Device] = None) -> List[Block]:
+            device: Optional[Device] = None,
+            extra_hash: Optional[int] = None) -> List[Block]:
         assert device is None
         num_blocks = len(block_token_ids)
 
@@ -101,20 +106,24 @@ class NaiveBlockAllocator(BlockAllocator):
                 prev_block=prev_block,
                 token_ids=block_token_ids[i],
                 block_size=self._block_size,
-                physical_block_id=block_ids[i])
+                physical_block_id=block_ids[i],
+                extra_hash=extra_hash)
             blocks.append(prev_block)
 
         return blocks
 
     def allocate_mutable_block(self,
                                prev_block: Optional[Block],
-                               device: Optional[Device] = None) -> Block:
+                               device: Optional[Device] = None,
+                               extra_hash: Optional[int] = None) -> Block:
         """Allocates a new mutable block, linked to the previous block.
 
         Args:
             prev_block (Optional[Block]): The previous block in the sequence. If
                 None, then the block to be allocated is the first block in the
                 sequence.
+            extra_hash (Optional[int]): The extra hash of the sequence of the
+                block, which keys its content hash besides its tokens.
 
         Returns:
             Block: The newly allocated mutable block.
@@ -124,7 +133,8 @@ class NaiveBlockAllocator(BlockAllocator):
         block = self._block_pool.init_block(prev_block=prev_block,
                                             token_ids=[],
                                             block_size=self._block_size,
-                                            physical_block_id=block_id)
+                                            physical_block_id=block_id,
+                                            extra_hash=extra_hash)
         return block
 
     def _allocate_block_id(self) -> BlockId:
@@ -179,7 +189,8 @@ class NaiveBlockAllocator(BlockAllocator):
                 prev_block=prev_block,
                 token_ids=block.token_ids,
                 block_size=self._block_size,
-                physical_block_id=block.block_id)
+                physical_block_id=block.block_id,
+                extra_hash=block.extra_hash)
 
             forked_blocks.append(forked_block)
             prev_block = forked_blocks[-1]
@@ -315,10 +326,12 @@ class NaiveBlockAllocator(BlockAllocator):
             # existing "block" object
             if block.is_full:
                 tmp_block = self.allocate_immutable_block(
-                    prev_block=block.prev_block, token_ids=block.token_ids)
+                    prev_block=block.prev_block,
+                    token_ids=block.token_ids,
+                    extra_hash=block.extra_hash)
             else:
                 tmp_block = self.allocate_mutable_block(
-                    prev_block=block.prev_block)
+                    prev_block=block.prev_block, extra_hash=block.extra_hash)
                 tmp_block.append_token_ids(block.token_ids)
 
             block_id = tmp_block.block_id
@@ -330,6 +343,12 @@ class NaiveBlockAllocator(BlockAllocator):
     def get_prefix_cache_hit_rate(self) -> float:
         return -1
 
+    def get_num_cached_blocks(self, block_hashes: List[int]) -> int:
+        return 0
+
+    def get_prefix_cache_eviction_metrics(self) -> None:
+        return None
+
 
 class NaiveBlock(Block):
     """An implementation of the Block class that does not support prefix
@@ -351,6 +370,8 @@ class NaiveBlock(Block):
             made.
         _cow_target (Optional[Block], optional): The copy-on-write target block.
             If not provided, it defaults to self.
+        extra_hash (Optional[int], optional): The extra hash of the sequence
+            of the block. Only kept so that forks and swaps preserve it.
     """
 
     def __init__(self,
@@ -359,13 +380,15 @@ class NaiveBlock(Block):
                  block_size: int,
                  allocator: BlockAllocator,
                  block_id: Optional[int] = None,
-                 _cow_target: Optional[Block] = None):
+                 _cow_target: Optional[Block] = None,
+                 extra_hash: Optional[int] = None):
         self._token_ids: List[int] = []
         self._block_size = block_size
         self._prev_block = prev_block
         self._block_id = block_id
         self._allocator = allocator
         self._cow_target = _cow_target if _cow_target is not None else self
+        self._extra_hash = extra_hash
 
         self._append_token_ids_no_cow(token_ids)
 
@@ -445,6 +468,10 @@ class NaiveBlock(Block):
     def prev_block(self) -> Optional["Block"]:
         return self._prev_block
 
+    @property
+    def extra_hash(self) -> Optional[int]:
+        return self._extra_hash
+
     @property
     def content_hash(self) -> Optional[int]:
         return None
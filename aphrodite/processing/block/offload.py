@@ -0,0 +1,165 @@
+"""Offloading of evicted prefix cache blocks to CPU memory and disk."""
+import enum
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Set, Tuple
+
+PrefixHash = int
+
+
+class PrefixCacheTransfer(enum.IntEnum):
+    """The kinds of block transfers issued by a PrefixCacheOffloader. Workers
+    run the transfers of a step grouped by kind, in this order."""
+    # CPU pool block -> disk block.
+    SAVE = 0
+    # GPU block -> CPU pool block.
+    DEMOTE = 1
+    # Disk block -> CPU pool block.
+    LOAD = 2
+    # CPU pool block -> GPU block.
+    PROMOTE = 3
+
+
+class PrefixCacheOffloader:
+    """Keeps the content of GPU prefix cache blocks after they are evicted, so
+    that a later request with the same prefix can copy them back instead of
+    recomputing them.
+
+    Evicted blocks are demoted to a pool of CPU blocks, and blocks evicted
+    from the CPU pool are saved to a pool of disk blocks if there is one. Both
+    pools are keyed by content hash and evict in LRU order. A block is always
+    promoted back to the GPU through the CPU pool.
+
+    This class only does the bookkeeping: the copies are recorded as
+    (PrefixCacheTransfer, src, dst) tuples, returned by
+    get_and_reset_transfers() once per scheduling step and run by the workers
+    before the model. The CPU and disk blocks that a step reads or writes are
+    pinned until the end of the step so that the transfers of one step never
+    depend on their order within a kind.
+
+    Args:
+        num_cpu_blocks (int): The number of blocks in the CPU pool.
+        num_disk_blocks (int): The number of blocks in the disk pool. 0
+            disables it.
+    """
+
+    def __init__(self, num_cpu_blocks: int, num_disk_blocks: int = 0):
+        assert num_cpu_blocks > 0
+        # content hash -> block id, in LRU order.
+        self._cpu_blocks: OrderedDict[PrefixHash, int] = OrderedDict()
+        self._disk_blocks: OrderedDict[PrefixHash, int] = OrderedDict()
+        self._free_cpu_blocks: Deque[int] = deque(range(num_cpu_blocks))
+        self._free_disk_blocks: Deque[int] = deque(range(num_disk_blocks))
+
+        self._pinned_cpu_blocks: Set[int] = set()
+        self._pinned_disk_blocks: Set[int] = set()
+        self._promoted_gpu_blocks: Set[int] = set()
+        self._transfers: List[Tuple[int, int, int]] = []
+
+        self.num_demotions = 0
+        self.num_promotions = 0
+
+    def __contains__(self, content_hash: PrefixHash) -> bool:
+        return (content_hash in self._cpu_blocks
+                or content_hash in self._disk_blocks)
+
+    def demote(self, gpu_block_id: int, content_hash: PrefixHash) -> None:
+        """Copy an evicted GPU block to the CPU pool, unless it is already
+        there or every CPU block is in use by this step."""
+        if gpu_block_id in self._promoted_gpu_blocks:
+            # Its content is only written by this step's transfers.
+            return
+        if content_hash in self._cpu_blocks:
+            self._cpu_blocks.move_to_end(content_hash)
+            return
+        cpu_block_id = self._allocate_cpu_block()
+        if cpu_block_id is None:
+            return
+        self._transfers.append(
+            (PrefixCacheTransfer.DEMOTE, gpu_block_id, cpu_block_id))
+        self._cpu_blocks[content_hash] = cpu_block_id
+        self._pinned_cpu_blocks.add(cpu_block_id)
+        self.num_demotions += 1
+
+    def reserve(self, content_hash: PrefixHash) -> bool:
+        """Make sure that a block is in the CPU pool until the end of the
+        step, loading it from disk if needed. Returns False if the block is
+        not offloaded or cannot be loaded.
+
+        Must be called before allocating the GPU block to promote it to,
+        since that allocation may demote other blocks.
+        """
+        cpu_block_id = self._cpu_blocks.get(content_hash)
+        if cpu_block_id is not None:
+            self._cpu_blocks.move_to_end(content_hash)
+            self._pinned_cpu_blocks.add(cpu_block_id)
+            return True
+
+        disk_block_id = self._disk_blocks.get(content_hash)
+        if disk_block_id is None:
+            return False
+        # Pin the disk block first so that saving the CPU block evicted to
+        # make room does not overwrite it.
+        self._disk_blocks.move_to_end(content_hash)
+        self._pinned_disk_blocks.add(disk_block_id)
+        cpu_block_id = self._allocate_cpu_block()
+        if cpu_block_id is None:
+            return False
+        self._transfers.append(
+            (PrefixCacheTransfer.LOAD, disk_block_id, cpu_block_id))
+        self._cpu_blocks[content_hash] = cpu_block_id
+        self._pinned_cpu_blocks.add(cpu_block_id)
+        return True
+
+    def promote(self, content_hash: PrefixHash, gpu_block_id: int) -> None:
+        """Copy a block reserved in the CPU pool back to a GPU block."""
+        cpu_block_id = self._cpu_blocks[content_hash]
+        assert cpu_block_id in self._pinned_cpu_blocks
+        self._transfers.append(
+            (PrefixCacheTransfer.PROMOTE, cpu_block_id, gpu_block_id))
+        self._promoted_gpu_blocks.add(gpu_block_id)
+        self.num_promotions += 1
+
+    def get_and_reset_transfers(self) -> List[Tuple[int, int, int]]:
+        """Return the transfers of this step and unpin its blocks."""
+        transfers = self._transfers
+        self._transfers = []
+        self._pinned_cpu_blocks.clear()
+        self._pinned_disk_blocks.clear()
+        self._promoted_gpu_blocks.clear()
+        return transfers
+
+    def _allocate_cpu_block(self) -> Optional[int]:
+        if self._free_cpu_blocks:
+            return self._free_cpu_blocks.popleft()
+        evicted = self._evict_lru(self._cpu_blocks, self._pinned_cpu_blocks)
+        if evicted is None:
+            return None
+        content_hash, cpu_block_id = evicted
+        self._save(content_hash, cpu_block_id)
+        return cpu_block_id
+
+    def _save(self, content_hash: PrefixHash, cpu_block_id: int) -> None:
+        if content_hash in self._disk_blocks:
+            self._disk_blocks.move_to_end(content_hash)
+            return
+        if self._free_disk_blocks:
+            disk_block_id = self._free_disk_blocks.popleft()
+        else:
+            evicted = self._evict_lru(self._disk_blocks,
+                                      self._pinned_disk_blocks)
+            if evicted is None:
+                return
+            disk_block_id = evicted[1]
+        self._transfers.append(
+            (PrefixCacheTransfer.SAVE, cpu_block_id, disk_block_id))
+        self._disk_blocks[content_hash] = disk_block_id
+
+    @staticmethod
+    def _evict_lru(
+            blocks: "OrderedDict[PrefixHash, int]",
+            pinned: Set[int]) -> Optional[Tuple[PrefixHash, int]]:
+        for content_hash, block_id in blocks.items():
+            if block_id not in pinned:
+                del blocks[content_hash]
+                return content_hash, block_id
+        return None
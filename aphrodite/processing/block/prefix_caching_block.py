@@ -1,8 +1,10 @@
 """Token blocks."""
 
+import itertools
 from os.path import commonprefix
 from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 
+from aphrodite.processing.block import hashing
 from aphrodite.processing.block.common import (CacheMetricData,
                                                CopyOnWriteTracker,
                                                get_all_blocks_recursively)
@@ -10,7 +12,9 @@ from aphrodite.processing.block.interfaces import (Block, BlockAllocator,
                                                    BlockId, Device)
 from aphrodite.processing.block.naive_block import (BlockPool, NaiveBlock,
                                                     NaiveBlockAllocator)
-from aphrodite.processing.evictor_v2 import (EvictionPolicy, Evictor,
+from aphrodite.processing.block.offload import PrefixCacheOffloader
+from aphrodite.processing.evictor_v2 import (EvictionMetricData,
+                                             EvictionPolicy, Evictor,
                                              make_evictor)
 
 PrefixHash = int
@@ -58,6 +62,8 @@ class PrefixCachingBlockAllocator(BlockAllocator):
         block_ids(Optional[Iterable[int]], optional): An optional iterable of
             block IDs. If not provided, block IDs will be assigned sequentially
             from 0 to num_blocks - 1.
+        offloader (Optional[PrefixCacheOffloader], optional): Where evicted
+            blocks are demoted to, and promoted back from on a cache miss.
     """
 
     def __init__(
@@ -66,6 +72,7 @@ class PrefixCachingBlockAllocator(BlockAllocator):
         block_size: int,
         block_ids: Optional[Iterable[int]] = None,
         eviction_policy: EvictionPolicy = EvictionPolicy.LRU,
+        offloader: Optional[PrefixCacheOffloader] = None,
     ):
         if block_ids is None:
             block_ids = range(num_blocks)
@@ -105,6 +112,7 @@ class PrefixCachingBlockAllocator(BlockAllocator):
         # Evitor used to maintain how we want to handle those computed blocks
         # if we find memory pressure is high.
         self.evictor: Evictor = make_evictor(eviction_policy)
+        self._offloader = offloader
 
         # We share the refcounter between allocators. This allows us to promote
         # blocks originally allocated in the hashless allocator to immutable
@@ -125,6 +133,7 @@ class PrefixCachingBlockAllocator(BlockAllocator):
         allocator: BlockAllocator,
         block_id: Optional[int] = None,
         computed: bool = False,
+        extra_hash: Optional[int] = None,
     ) -> Block:
         # Bind block to self.
         allocator = self
@@ -136,30 +145,45 @@ class PrefixCachingBlockAllocator(BlockAllocator):
             block_id=block_id,
             allocator=allocator,
             computed=computed,
+            extra_hash=extra_hash,
         )
 
     def allocate_immutable_block(self,
                                  prev_block: Optional[Block],
                                  token_ids: List[int],
-                                 device: Optional[Device] = None) -> Block:
+                                 device: Optional[Device] = None,
+                                 extra_hash: Optional[int] = None) -> Block:
         """Allocates an immutable block with the given token IDs, reusing cached
         blocks if possible.
 
         Args:
             prev_block (Optional[Block]): The previous block in the sequence.
             token_ids (List[int]): The token IDs to be stored in the block.
+            extra_hash (Optional[int]): The extra hash of the sequence of the
+                block, which keys its content hash besides its tokens.
 
         Returns:
             Block: The allocated immutable block.
         """
         assert device is None
+        return self._allocate_immutable_block(prev_block, token_ids,
+                                              extra_hash, None)
+
+    def _allocate_immutable_block(self, prev_block: Optional[Block],
+                                  token_ids: List[int],
+                                  extra_hash: Optional[int],
+                                  content_hash: Optional[int]) -> Block:
         assert_prefix_caching_block_or_none(prev_block)
 
         # First, try to create a block that points to cached data
         block = self._block_pool.init_block(prev_block=prev_block,
                                             token_ids=token_ids,
                                             block_size=self._block_size,
-                                            physical_block_id=None)
+                                            physical_block_id=None,
+                                            extra_hash=extra_hash)
+        if content_hash is not None:
+            assert isinstance(block, PrefixCachingBlock)
+            block._cached_content_hash = content_hash
         assert block.content_hash is not None
 
         cached_block_id = self._cached_blocks.get(block.content_hash, None)
@@ -168,36 +192,75 @@ class PrefixCachingBlockAllocator(BlockAllocator):
             block.block_id = cached_block_id
             self._incr_refcount_cached_block(block)
             return block
+
+        if (self._offloader is not None
+                and self._offloader.reserve(block.content_hash)):
+            self.metric_data.query(hit=True)
+            self._promote_offloaded_block(block)
+            return block
+
         self.metric_data.query(hit=False)
         self._block_pool.free_block(block)
 
         # No cached block => Allocate a new block
-        block = self.allocate_mutable_block(prev_block)
+        block = self.allocate_mutable_block(prev_block, extra_hash=extra_hash)
         block.append_token_ids(token_ids)
         return block
 
+    def _promote_offloaded_block(self, block: Block) -> None:
+        """Allocate a block id for an offloaded block and have its content
+        copied back, so that it is cached and computed like a cache hit."""
+        assert self._offloader is not None
+        assert block.content_hash is not None
+
+        block_id = self._allocate_block_id()
+        self._offloader.promote(block.content_hash, block_id)
+
+        self._cached_blocks[block.content_hash] = block_id
+        self._block_tracker[block_id].computed = True
+        block.block_id = block_id
+        block.computed = True
+
     def allocate_immutable_blocks(
             self,
             prev_block: Optional[Block],
             block_token_ids: List[List[int]],
-            device: Optional[Device] = None) -> List[Block]:
+            device: Optional[Device] = None,
+            extra_hash: Optional[int] = None) -> List[Block]:
+        assert device is None
+        if not block_token_ids:
+            return []
+
+        # Hash the blocks in one pass, instead of one block at a time.
+        prev_block_hash = None
+        if prev_block is not None:
+            prev_block_hash = prev_block.content_hash
+            assert prev_block_hash is not None
+        token_ids = list(itertools.chain.from_iterable(block_token_ids))
+        content_hashes = hashing.hash_token_blocks(prev_block_hash, token_ids,
+                                                   self._block_size,
+                                                   extra_hash)
+        assert len(content_hashes) == len(block_token_ids)
+
         blocks = []
-        for token_ids in block_token_ids:
-            prev_block = self.allocate_immutable_block(prev_block=prev_block,
-                                                       token_ids=token_ids,
-                                                       device=device)
+        for token_ids, content_hash in zip(block_token_ids, content_hashes):
+            prev_block = self._allocate_immutable_block(
+                prev_block, token_ids, extra_hash, content_hash)
             blocks.append(prev_block)
         return blocks
 
     def allocate_mutable_block(self,
                                prev_block: Optional[Block],
-                               device: Optional[Device] = None) -> Block:
+                               device: Optional[Device] = None,
+                               extra_hash: Optional[int] = None) -> Block:
         """Allocates a mutable block. If there are no free blocks, this will
         evict unused cached blocks.
 
         Args:
             prev_block (Block): The previous block in the sequence.
                 None is not allowed unlike it is super class.
+            extra_hash (Optional[int]): The extra hash of the sequence of the
+                block, which keys its content hash besides its tokens.
 
         Returns:
             Block: The allocated mutable block.
@@ -209,7 +272,8 @@ class PrefixCachingBlockAllocator(BlockAllocator):
         block = self._block_pool.init_block(prev_block=prev_block,
                                             token_ids=[],
                                             block_size=self._block_size,
-                                            physical_block_id=block_id)
+                                            physical_block_id=block_id,
+                                            extra_hash=extra_hash)
         assert not block.computed
         assert block.content_hash is None
         return block
@@ -316,6 +380,8 @@ class PrefixCachingBlockAllocator(BlockAllocator):
         assert _block_id == block_id
 
         self._cached_blocks.pop(content_hash_to_evict)
+        if self._offloader is not None:
+            self._offloader.demote(block_id, content_hash_to_evict)
 
         self._refcounter.incr(block_id)
         self._track_block_id(block_id, computed=False)
@@ -381,7 +447,8 @@ class PrefixCachingBlockAllocator(BlockAllocator):
                 prev_block=prev_block,
                 token_ids=block.token_ids,
                 block_size=self._block_size,
-                physical_block_id=block_id)
+                physical_block_id=block_id,
+                extra_hash=block.extra_hash)
 
             forked_blocks.append(forked_block)
             prev_block = forked_blocks[-1]
@@ -418,6 +485,21 @@ class PrefixCachingBlockAllocator(BlockAllocator):
     def get_prefix_cache_hit_rate(self) -> float:
         return self.metric_data.get_hit_rate()
 
+    def get_prefix_cache_eviction_metrics(self) -> EvictionMetricData:
+        return self.evictor.metric_data
+
+    def get_num_cached_blocks(self, block_hashes: List[int]) -> int:
+        """Blocks offloaded to CPU memory or disk count as cached, since
+        allocating them promotes them back instead of recomputing them.
+        """
+        num_cached_blocks = 0
+        for block_hash in block_hashes:
+            if (block_hash not in self._cached_blocks and
+                (self._offloader is None or block_hash not in self._offloader)):
+                break
+            num_cached_blocks += 1
+        return num_cached_blocks
+
     def is_block_cached(self, block: Block) -> bool:
         assert block.content_hash is not None
         if block.content_hash in self._cached_blocks:
@@ -628,10 +710,12 @@ class PrefixCachingBlockAllocator(BlockAllocator):
             # existing "block" object
             if block.is_full:
                 tmp_block = self.allocate_immutable_block(
-                    prev_block=block.prev_block, token_ids=block.token_ids)
+                    prev_block=block.prev_block,
+                    token_ids=block.token_ids,
+                    extra_hash=block.extra_hash)
             else:
                 tmp_block = self.allocate_mutable_block(
-                    prev_block=block.prev_block)
+                    prev_block=block.prev_block, extra_hash=block.extra_hash)
                 tmp_block.append_token_ids(block.token_ids)
 
             block_id = tmp_block.block_id
@@ -658,6 +742,9 @@ class PrefixCachingBlock(Block):
             caching block allocator associated with this block.
         block_id (Optional[int], optional): The physical block index
             of this block. Defaults to None.
+        extra_hash (Optional[int], optional): The extra hash of the sequence
+            of the block, e.g. of its LoRA and multi-modal inputs, which keys
+            the content hash besides the tokens. Defaults to None.
     """
 
     def __init__(
@@ -668,6 +755,7 @@ class PrefixCachingBlock(Block):
         allocator: BlockAllocator,
         block_id: Optional[int] = None,
         computed: bool = False,
+        extra_hash: Optional[int] = None,
     ):
         assert isinstance(allocator, PrefixCachingBlockAllocator), (
             "Currently this class is only tested with "
@@ -681,6 +769,7 @@ class PrefixCachingBlock(Block):
         self._allocator = allocator
         self._last_accessed: float = _DEFAULT_LAST_ACCESSED_TIME
         self._computed = computed
+        self._extra_hash = extra_hash
 
         # On the first time, we create the block object, and next we only
         # reinitialize it
@@ -690,13 +779,15 @@ class PrefixCachingBlock(Block):
                 token_ids=token_ids,
                 block_size=block_size,
                 block_id=block_id,
-                allocator=self._allocator)
+                allocator=self._allocator,
+                extra_hash=extra_hash)
         else:
             self._block = NaiveBlock(prev_block=prev_block,
                                      token_ids=token_ids,
                                      block_size=block_size,
                                      block_id=block_id,
-                                     allocator=self._allocator)
+                                     allocator=self._allocator,
+                                     extra_hash=extra_hash)
 
         self._update_num_tokens_total()
 
@@ -790,6 +881,10 @@ class PrefixCachingBlock(Block):
     def prev_block(self) -> Optional[Block]:
         return self._prev_block
 
+    @property
+    def extra_hash(self) -> Optional[int]:
+        return self._extra_hash
+
     @property
     def content_hash(self) -> Optional[int]:
         """Return the content-based hash of the current block, or None if it is
@@ -820,17 +915,22 @@ class PrefixCachingBlock(Block):
         self._cached_content_hash = PrefixCachingBlock.hash_block_tokens(
             is_first_block,
             prev_block_hash,
-            cur_block_token_ids=self.token_ids)
+            cur_block_token_ids=self.token_ids,
+            extra_hash=self._extra_hash)
         return self._cached_content_hash
 
     @staticmethod
-    def hash_block_tokens(is_first_block: bool, prev_block_hash: Optional[int],
-                          cur_block_token_ids: List[int]) -> int:
+    def hash_block_tokens(is_first_block: bool,
+                          prev_block_hash: Optional[int],
+                          cur_block_token_ids: List[int],
+                          extra_hash: Optional[int] = None) -> int:
         """Computes a hash value corresponding to the contents of a block and
         the contents of the preceding block(s). The hash value is used for
         prefix caching.
 
-        NOTE: Content-based hashing does not yet support LoRA.
+        The hash is stable across processes. Use
+        aphrodite.processing.block.hashing.hash_token_blocks to hash the blocks
+        of a whole prompt at once.
 
         Parameters:
         - is_first_block (bool): A flag indicating if the block is the first in
@@ -839,12 +939,16 @@ class PrefixCachingBlock(Block):
             if this is the first block.
         - cur_block_token_ids (List[int]): A list of token ids in the current
             block. The current block is assumed to be full.
+        - extra_hash (Optional[int]): The extra hash of the sequence, e.g. of
+            its LoRA and multi-modal inputs. Only used for the first block, as
+            the hashes of the next blocks chain from it.
 
         Returns:
         - int: The computed hash value for the block.
         """
         assert (prev_block_hash is None) == is_first_block
-        return hash((is_first_block, prev_block_hash, *cur_block_token_ids))
+        return hashing.hash_block_tokens(prev_block_hash, cur_block_token_ids,
+                                         extra_hash)
 
 
 class ComputedBlocksTracker:
@@ -238,6 +238,9 @@ class BlockSpaceManagerV1(BlockSpaceManager):
         watermark: float = 0.01,
         sliding_window: Optional[int] = None,
         enable_caching: bool = False,
+        eviction_policy: str = "lru",
+        num_offload_cpu_blocks: int = 0,
+        num_offload_disk_blocks: int = 0,
     ) -> None:
         self.block_size = block_size
         self.num_total_gpu_blocks = num_gpu_blocks
@@ -246,6 +249,14 @@ class BlockSpaceManagerV1(BlockSpaceManager):
         if enable_caching and sliding_window is not None:
             raise NotImplementedError(
                 "Sliding window is not allowed with prefix caching enabled!")
+        if enable_caching and eviction_policy != "lru":
+            raise NotImplementedError(
+                f"The {eviction_policy} prefix cache eviction policy is only "
+                "supported by the v2 block manager.")
+        if enable_caching and num_offload_cpu_blocks > 0:
+            raise NotImplementedError(
+                "Offloading the prefix cache is only supported by the v2 "
+                "block manager.")
 
         self.block_sliding_window = None
         if sliding_window is not None:
@@ -738,3 +749,13 @@ class BlockSpaceManagerV1(BlockSpaceManager):
         if device == Device.CPU:
             return self.cpu_allocator.get_prefix_cache_hit_rate()
         raise ValueError(f"Invalid device: {device}")
+
+    def get_prefix_cache_eviction_metrics(self, device: Device) -> None:
+        return None
+
+    def get_num_cached_tokens(self, seq: Sequence) -> int:
+        return 0
+
+    def get_and_reset_prefix_cache_transfers(
+            self) -> List[Tuple[int, int, int]]:
+        return []
@@ -8,11 +8,14 @@ from aphrodite.common.utils import Device
 from aphrodite.processing.block.block_table import BlockTable
 from aphrodite.processing.block.cpu_gpu_block_allocator import (
     CpuGpuBlockAllocator)
+from aphrodite.processing.block.hashing import hash_token_blocks
 from aphrodite.processing.block.interfaces import Block
+from aphrodite.processing.block.offload import PrefixCacheOffloader
 from aphrodite.processing.block.prefix_caching_block import (
     ComputedBlocksTracker, LastAccessBlocksTracker)
 from aphrodite.processing.block.utils import (
     check_no_caching_or_swa_for_blockmgr_encdec)
+from aphrodite.processing.evictor_v2 import EvictionMetricData, EvictionPolicy
 from aphrodite.processing.interfaces import AllocStatus, BlockSpaceManager
 
 SeqId = int
@@ -54,6 +57,13 @@ class BlockSpaceManagerV2(BlockSpaceManager):
             window. Defaults to None.
         enable_caching (bool, optional): Flag indicating whether caching is
             enabled. Defaults to False.
+        eviction_policy (str, optional): The policy used to evict cached
+            blocks, one of "lru", "lfu" or "gdsf". Defaults to "lru".
+        num_offload_cpu_blocks (int, optional): The number of CPU blocks that
+            evicted cached blocks are demoted to. Defaults to 0 (disabled).
+        num_offload_disk_blocks (int, optional): The number of disk blocks
+            that blocks evicted from the CPU ones are saved to. Defaults to 0
+            (disabled).
     """
 
     def __init__(
@@ -64,6 +74,9 @@ class BlockSpaceManagerV2(BlockSpaceManager):
         watermark: float = 0.01,
         sliding_window: Optional[int] = None,
         enable_caching: bool = False,
+        eviction_policy: str = "lru",
+        num_offload_cpu_blocks: int = 0,
+        num_offload_disk_blocks: int = 0,
     ) -> None:
         self.block_size = block_size
         self.num_total_gpu_blocks = num_gpu_blocks
@@ -89,11 +102,18 @@ class BlockSpaceManagerV2(BlockSpaceManager):
 
         self.watermark_blocks = int(watermark * num_gpu_blocks)
 
+        self._offloader: Optional[PrefixCacheOffloader] = None
+        if enable_caching and num_offload_cpu_blocks > 0:
+            self._offloader = PrefixCacheOffloader(num_offload_cpu_blocks,
+                                                   num_offload_disk_blocks)
+
         self.block_allocator = CpuGpuBlockAllocator.create(
             allocator_type="prefix_caching" if enable_caching else "naive",
             num_gpu_blocks=num_gpu_blocks,
             num_cpu_blocks=num_cpu_blocks,
             block_size=block_size,
+            eviction_policy=EvictionPolicy[eviction_policy.upper()],
+            offloader=self._offloader,
         )
 
         self.block_tables: Dict[SeqId, BlockTable] = {}
@@ -104,6 +124,17 @@ class BlockSpaceManagerV2(BlockSpaceManager):
         self._last_access_blocks_tracker = LastAccessBlocksTracker(
             self.block_allocator)
 
+        # Content hashes of the full blocks of sequences that are not
+        # allocated yet, so that get_num_cached_tokens() only hashes each
+        # block once while they wait.
+        self._unallocated_block_hashes: Dict[SeqId, List[int]] = {}
+        # The number of leading blocks of each of these sequences found in
+        # the prefix cache, with the number of evictions at that time. A
+        # cached prefix can only shrink when blocks are evicted, so until
+        # then only the blocks after it are looked up again.
+        self._num_unallocated_cached_blocks: Dict[SeqId, Tuple[int,
+                                                               int]] = {}
+
     def can_allocate(self,
                      seq_group: SequenceGroup,
                      num_lookahead_slots: int = 0) -> AllocStatus:
@@ -146,6 +177,7 @@ class BlockSpaceManagerV2(BlockSpaceManager):
             block_size=self.block_size,
             block_allocator=self.block_allocator,
             max_block_sliding_window=self.max_block_sliding_window,
+            extra_hash=seq.extra_hash if self.enable_caching else None,
         )
         if seq.get_token_ids():
             # Add blocks to the block table only if the sequence is non empty.
@@ -163,6 +195,8 @@ class BlockSpaceManagerV2(BlockSpaceManager):
         # NOTE: Here we assume that all sequences in the group have the same
         # prompt.
         seq = waiting_seqs[0]
+        self._unallocated_block_hashes.pop(seq.seq_id, None)
+        self._num_unallocated_cached_blocks.pop(seq.seq_id, None)
         block_table: BlockTable = self._allocate_sequence(seq)
         self.block_tables[seq.seq_id] = block_table
 
@@ -242,6 +276,8 @@ class BlockSpaceManagerV2(BlockSpaceManager):
 
     def free(self, seq: Sequence) -> None:
         seq_id = seq.seq_id
+        self._unallocated_block_hashes.pop(seq_id, None)
+        self._num_unallocated_cached_blocks.pop(seq_id, None)
 
         if seq_id not in self.block_tables:
             # Already freed or haven't been scheduled yet.
@@ -447,6 +483,57 @@ class BlockSpaceManagerV2(BlockSpaceManager):
     def get_prefix_cache_hit_rate(self, device: Device) -> float:
         return self.block_allocator.get_prefix_cache_hit_rate(device)
 
+    def get_num_cached_tokens(self, seq: Sequence) -> int:
+        if not self.enable_caching:
+            return 0
+
+        # The last token is always computed, so a block holding it is never
+        # served from the cache.
+        num_full_blocks = (seq.get_len() - 1) // self.block_size
+        block_hashes = self._unallocated_block_hashes.setdefault(
+            seq.seq_id, [])
+        # Preempted sequences come back with more tokens.
+        del block_hashes[num_full_blocks:]
+        if len(block_hashes) < num_full_blocks:
+            start = len(block_hashes) * self.block_size
+            end = num_full_blocks * self.block_size
+            # Only the tokens of the blocks to hash are copied.
+            prompt_len = seq.get_prompt_len()
+            token_ids = seq.data.prompt_token_ids_array[start:end]
+            if end > prompt_len:
+                token_ids += seq.data.output_token_ids_array[
+                    max(start - prompt_len, 0):end - prompt_len]
+            block_hashes.extend(
+                hash_token_blocks(block_hashes[-1] if block_hashes else None,
+                                  token_ids, self.block_size,
+                                  seq.extra_hash))
+
+        eviction_metrics = self.get_prefix_cache_eviction_metrics(Device.GPU)
+        assert eviction_metrics is not None
+        num_evictions = eviction_metrics.num_evictions
+        num_cached_blocks = 0
+        if seq.seq_id in self._num_unallocated_cached_blocks:
+            last_num_evictions, last_num_cached_blocks = (
+                self._num_unallocated_cached_blocks[seq.seq_id])
+            if last_num_evictions == num_evictions:
+                num_cached_blocks = min(last_num_cached_blocks,
+                                        len(block_hashes))
+        num_cached_blocks += self.block_allocator.get_num_cached_blocks(
+            block_hashes[num_cached_blocks:], Device.GPU)
+        self._num_unallocated_cached_blocks[seq.seq_id] = (num_evictions,
+                                                           num_cached_blocks)
+        return num_cached_blocks * self.block_size
+
+    def get_prefix_cache_eviction_metrics(
+            self, device: Device) -> Optional[EvictionMetricData]:
+        return self.block_allocator.get_prefix_cache_eviction_metrics(device)
+
+    def get_and_reset_prefix_cache_transfers(
+            self) -> List[Tuple[int, int, int]]:
+        if self._offloader is None:
+            return []
+        return self._offloader.get_and_reset_transfers()
+
     def _can_swap(self,
                   seq_group: SequenceGroup,
                   device: Device,
@@ -1,6 +1,8 @@
 import enum
+import heapq
 from abc import ABC, abstractmethod
-from typing import OrderedDict, Tuple
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 
 
 class EvictionPolicy(enum.Enum):
@@ -8,6 +10,25 @@ class EvictionPolicy(enum.Enum):
        Evictor subclass.
     """
     LRU = enum.auto()
+    LFU = enum.auto()
+    GDSF = enum.auto()
+
+
+@dataclass
+class EvictionMetricData:
+    """Counters kept by an Evictor.
+
+    The reuse distance of a block is the number of blocks that were added to
+    the evictor between the block being freed and it being reused.
+    """
+    num_evictions: int = 0
+    num_reuses: int = 0
+    total_reuse_distance: int = 0
+
+    def get_mean_reuse_distance(self) -> float:
+        if self.num_reuses == 0:
+            return 0.0
+        return self.total_reuse_distance / self.num_reuses
 
 
 class Evictor(ABC):
@@ -51,6 +72,11 @@ class Evictor(ABC):
     def num_blocks(self) -> int:
         pass
 
+    @property
+    @abstractmethod
+    def metric_data(self) -> EvictionMetricData:
+        pass
+
 
 class BlockMetaData():
     """Data structure for storing key data describe cached block, so that
@@ -65,68 +91,168 @@ class BlockMetaData():
         self.content_hash = content_hash
         self.num_hashed_tokens = num_hashed_tokens
         self.last_accessed = last_accessed
+        # Set by heap-backed evictors: the insertion order of the block, used
+        # to break ties, and its live heap entry.
+        self.added_at = 0
+        self.heap_entry: Optional[Tuple] = None
 
 
-class LRUEvictor(Evictor):
-    """Evicts in a least-recently-used order using the last_accessed timestamp
-    that's recorded in the PhysicalTokenBlock. If there are multiple blocks with
-    the same last_accessed time, then the one with the largest num_hashed_tokens
-    will be evicted. If two blocks each have the lowest last_accessed time and
-    highest num_hashed_tokens value, then one will be chose arbitrarily
+class HeapEvictor(Evictor):
+    """Base class of evictors that keep their candidates in a binary heap
+    ordered by a per-block priority, so that eviction is O(log n).
+
+    Updated blocks are pushed again rather than moved, and stale heap entries
+    are skipped on eviction. The heap is rebuilt when stale entries outnumber
+    live ones. Ties on priority go to the block with the oldest
+    last_accessed, then to the one with the most hashed tokens, then to the
+    one added first.
     """
 
     def __init__(self):
-        self.free_table: OrderedDict[int, BlockMetaData] = OrderedDict()
+        self.free_table: Dict[int, BlockMetaData] = {}
+        self._heap: List[Tuple] = []
+        self._num_added = 0
+        self._metric_data = EvictionMetricData()
 
     def __contains__(self, block_id: int) -> bool:
         return block_id in self.free_table
 
+    @abstractmethod
+    def _priority(self, block: BlockMetaData) -> float:
+        """Return the priority of a block; the lowest is evicted first."""
+        pass
+
+    def _on_evict(self, block: BlockMetaData, priority: float) -> None:
+        pass
+
+    def _push(self, block_id: int, block: BlockMetaData) -> None:
+        entry = (self._priority(block), block.last_accessed,
+                 -block.num_hashed_tokens, block.added_at, block_id)
+        block.heap_entry = entry
+        heapq.heappush(self._heap, entry)
+        if len(self._heap) > 2 * len(self.free_table) + 64:
+            self._heap = [
+                b.heap_entry for b in self.free_table.values()
+                if b.heap_entry is not None
+            ]
+            heapq.heapify(self._heap)
+
     def evict(self) -> Tuple[int, int]:
         if len(self.free_table) == 0:
             raise ValueError("No usable cache memory left")
 
-        evicted_block, evicted_block_id = None, None
-        # The blocks with the lowest timestamps should be placed consecutively
-        # at the start of OrderedDict. Loop through all these blocks to
-        # find the one with maximum number of hashed tokens.
-        for _id, block in self.free_table.items():
-            if evicted_block is None:
-                evicted_block, evicted_block_id = block, _id
-                continue
-            if evicted_block.last_accessed < block.last_accessed:
+        while True:
+            entry = heapq.heappop(self._heap)
+            block_id = entry[-1]
+            block = self.free_table.get(block_id)
+            if block is not None and block.heap_entry is entry:
                 break
-            if evicted_block.num_hashed_tokens < block.num_hashed_tokens:
-                evicted_block, evicted_block_id = block, _id
-
-        assert evicted_block is not None
-        assert evicted_block_id is not None
 
-        self.free_table.pop(evicted_block_id)
+        self.free_table.pop(block_id)
+        self._metric_data.num_evictions += 1
+        self._on_evict(block, entry[0])
 
-        return evicted_block_id, evicted_block.content_hash
+        return block_id, block.content_hash
 
     def add(self, block_id: int, content_hash: int, num_hashed_tokens: int,
             last_accessed: float):
-        self.free_table[block_id] = BlockMetaData(content_hash,
-                                                  num_hashed_tokens,
-                                                  last_accessed)
+        block = BlockMetaData(content_hash, num_hashed_tokens, last_accessed)
+        block.added_at = self._num_added
+        self._num_added += 1
+        self.free_table[block_id] = block
+        self._push(block_id, block)
 
     def update(self, block_id: int, last_accessed: float):
-        self.free_table[block_id].last_accessed = last_accessed
+        block = self.free_table[block_id]
+        block.last_accessed = last_accessed
+        self._push(block_id, block)
 
     def remove(self, block_id: int):
         if block_id not in self.free_table:
             raise ValueError(
                 "Attempting to remove block that's not in the evictor")
-        self.free_table.pop(block_id)
+        block = self.free_table.pop(block_id)
+        block.heap_entry = None
+        self._metric_data.num_reuses += 1
+        self._metric_data.total_reuse_distance += (self._num_added -
+                                                   block.added_at - 1)
 
     @property
     def num_blocks(self) -> int:
         return len(self.free_table)
 
+    @property
+    def metric_data(self) -> EvictionMetricData:
+        return self._metric_data
+
+
+class LRUEvictor(HeapEvictor):
+    """Evicts in a least-recently-used order using the last_accessed timestamp
+    that's recorded in the PhysicalTokenBlock. If there are multiple blocks with
+    the same last_accessed time, then the one with the largest num_hashed_tokens
+    will be evicted. If two blocks each have the lowest last_accessed time and
+    highest num_hashed_tokens value, then the one added first is evicted.
+    """
+
+    def _priority(self, block: BlockMetaData) -> float:
+        return block.last_accessed
+
+
+class LFUEvictor(HeapEvictor):
+    """Evicts the least-frequently-used block, with dynamic aging (LFU-DA).
+
+    The frequency of a content hash is the number of times a block holding it
+    was freed, i.e. the number of sequences that used it, and it is kept
+    across reuses until the content is evicted. A block's priority is its
+    frequency plus the cache age, which is raised to the priority of every
+    evicted block, so that blocks that were popular long ago do not stay
+    cached forever.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._age = 0.0
+        self._frequencies: Dict[int, int] = {}
+
+    def _weight(self, block: BlockMetaData) -> float:
+        return 1.0
+
+    def _priority(self, block: BlockMetaData) -> float:
+        frequency = self._frequencies.get(block.content_hash, 0)
+        return self._age + frequency * self._weight(block)
+
+    def _on_evict(self, block: BlockMetaData, priority: float) -> None:
+        self._age = max(self._age, priority)
+        self._frequencies.pop(block.content_hash, None)
+
+    def add(self, block_id: int, content_hash: int, num_hashed_tokens: int,
+            last_accessed: float):
+        self._frequencies[content_hash] = self._frequencies.get(
+            content_hash, 0) + 1
+        super().add(block_id, content_hash, num_hashed_tokens, last_accessed)
+
+
+class GDSFEvictor(LFUEvictor):
+    """Evicts by Greedy-Dual-Size-Frequency: a block's priority is the cache
+    age plus its frequency weighted by the cost of recomputing it over its
+    size.
+
+    All blocks have the same size, and the cost of recomputing a block grows
+    with the number of tokens it attends to, so the weight is the block's
+    num_hashed_tokens. Frequently shared blocks deep into long prompts are
+    kept over short ones that are cheap to prefill again.
+    """
+
+    def _weight(self, block: BlockMetaData) -> float:
+        return float(block.num_hashed_tokens)
+
 
 def make_evictor(eviction_policy: EvictionPolicy) -> Evictor:
     if eviction_policy == EvictionPolicy.LRU:
         return LRUEvictor()
+    elif eviction_policy == EvictionPolicy.LFU:
+        return LFUEvictor()
+    elif eviction_policy == EvictionPolicy.GDSF:
+        return GDSFEvictor()
     else:
         raise ValueError(f"Unknown cache eviction policy: {eviction_policy}")
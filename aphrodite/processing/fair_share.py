@@ -0,0 +1,133 @@
+"""Weighted fair queuing of sequence groups across tenants."""
+import heapq
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from aphrodite.common.sequence import SequenceGroup
+
+# Requests without a tenant share this one.
+ANONYMOUS_TENANT = ""
+
+
+def get_tenant(seq_group: SequenceGroup) -> str:
+    return seq_group.tenant or ANONYMOUS_TENANT
+
+
+class FairShareTracker:
+    """Tracks how much of the scheduling budget each tenant has received.
+
+    Every tenant has a virtual time: the number of tokens scheduled for it
+    divided by its weight. Waiting requests are admitted from the tenant with
+    the lowest virtual time first, so that over time each tenant with pending
+    work gets a share of the token budget proportional to its weight.
+    Tenants that have no requests left are forgotten, and start again from
+    the lowest virtual time of the others when they come back, so being idle
+    does not earn credit.
+
+    Args:
+        weights (Optional[Dict[str, float]]): The weight of each tenant.
+            Tenants that are not listed have a weight of 1.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        self._weights = weights or {}
+        self._virtual_times: Dict[str, float] = {}
+        self._min_virtual_time = 0.0
+
+    def get_weight(self, tenant: str) -> float:
+        return self._weights.get(tenant, 1.0)
+
+    def get_virtual_time(self, tenant: str) -> float:
+        return self._virtual_times.get(tenant, self._min_virtual_time)
+
+    def update_tenants(self, tenants: Set[str]) -> None:
+        """Set the tenants that currently have requests."""
+        for tenant in list(self._virtual_times):
+            if tenant not in tenants:
+                del self._virtual_times[tenant]
+        if self._virtual_times:
+            self._min_virtual_time = min(self._virtual_times.values())
+        for tenant in tenants:
+            self._virtual_times.setdefault(tenant, self._min_virtual_time)
+
+    def charge(self, tenant: str, num_tokens: int) -> None:
+        """Account tokens scheduled for a tenant."""
+        self._virtual_times[tenant] = (self.get_virtual_time(tenant) +
+                                       num_tokens / self.get_weight(tenant))
+
+    def order(
+        self, seq_groups: Iterable[SequenceGroup],
+        get_num_tokens: Callable[[SequenceGroup], int]
+    ) -> Deque[SequenceGroup]:
+        """Interleave sequence groups by tenant, in the order in which they
+        would be admitted if each of them was charged its number of tokens.
+        The groups of a tenant keep their relative order.
+
+        Args:
+            seq_groups: The sequence groups to order.
+            get_num_tokens: Returns the number of tokens that scheduling a
+                sequence group would charge to its tenant.
+        """
+        queues: Dict[str, Deque[SequenceGroup]] = defaultdict(deque)
+        for seq_group in seq_groups:
+            queues[get_tenant(seq_group)].append(seq_group)
+        if len(queues) <= 1:
+            return deque(seq_group for queue in queues.values()
+                         for seq_group in queue)
+
+        # (virtual time, first seen, tenant)
+        heap: List[Tuple[float, int, str]] = [
+            (self.get_virtual_time(tenant), i, tenant)
+            for i, tenant in enumerate(queues)
+        ]
+        heapq.heapify(heap)
+        ordered: Deque[SequenceGroup] = deque()
+        while heap:
+            virtual_time, i, tenant = heapq.heappop(heap)
+            queue = queues[tenant]
+            seq_group = queue.popleft()
+            ordered.append(seq_group)
+            if queue:
+                virtual_time += (get_num_tokens(seq_group) /
+                                 self.get_weight(tenant))
+                heapq.heappush(heap, (virtual_time, i, tenant))
+        return ordered
+
+    def get_loads(self, seq_groups: Iterable[SequenceGroup],
+                  tenants: Iterable[str] = ()) -> Dict[str, float]:
+        """Return the number of sequence groups held by each tenant divided by
+        its share of them. A load above 1 means that the tenant holds more
+        than its share.
+
+        Args:
+            seq_groups: The sequence groups holding resources, e.g. the
+                running ones.
+            tenants: Tenants to include even if they hold no groups, because
+                they are waiting for some.
+        """
+        counts: Dict[str, int] = defaultdict(int)
+        for seq_group in seq_groups:
+            counts[get_tenant(seq_group)] += 1
+        for tenant in tenants:
+            counts.setdefault(tenant, 0)
+        total_count = sum(counts.values())
+        if total_count == 0:
+            return dict(counts)
+        total_weight = sum(self.get_weight(tenant) for tenant in counts)
+        return {
+            tenant: count * total_weight /
+            (total_count * self.get_weight(tenant))
+            for tenant, count in counts.items()
+        }
+
+    def get_over_share_tenant(
+            self,
+            seq_groups: Iterable[SequenceGroup],
+            tenants: Iterable[str] = ()) -> Optional[str]:
+        """Return the tenant that is the most over its share of the given
+        sequence groups, or None if every tenant is within its share."""
+        loads = self.get_loads(seq_groups, tenants)
+        tenant = max(loads, key=loads.__getitem__, default=None)
+        if tenant is None or loads[tenant] <= 1:
+            return None
+        return tenant
@@ -1,6 +1,6 @@
 import enum
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
 from typing import Sequence as GenericSequence
 from typing import Tuple
 
@@ -8,6 +8,7 @@ from loguru import logger
 
 from aphrodite.common.sequence import Sequence, SequenceGroup
 from aphrodite.common.utils import Device
+from aphrodite.processing.evictor_v2 import EvictionMetricData
 
 
 class AllocStatus(enum.Enum):
@@ -131,3 +132,24 @@ class BlockSpaceManager(ABC):
     def get_prefix_cache_hit_rate(self, device: Device) -> float:
         """Prefix cache hit rate. -1 means not supported or disabled."""
         pass
+
+    @abstractmethod
+    def get_num_cached_tokens(self, seq: Sequence) -> int:
+        """Return the number of tokens of a sequence that is not allocated yet
+        which would be served from the prefix cache if it were allocated
+        now."""
+        pass
+
+    @abstractmethod
+    def get_prefix_cache_eviction_metrics(
+            self, device: Device) -> Optional[EvictionMetricData]:
+        """Prefix cache eviction counters. None means not supported or
+        disabled."""
+        pass
+
+    @abstractmethod
+    def get_and_reset_prefix_cache_transfers(
+            self) -> List[Tuple[int, int, int]]:
+        """Return and clear the prefix cache block transfers issued since the
+        last call, as (PrefixCacheTransfer, src, dst) tuples."""
+        pass
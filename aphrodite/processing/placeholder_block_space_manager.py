@@ -88,3 +88,13 @@ class PlaceholderBlockSpaceManager(BlockSpaceManager):
 
     def get_prefix_cache_hit_rate(self, device: Device) -> float:
         return -1
+
+    def get_prefix_cache_eviction_metrics(self, device: Device) -> None:
+        return None
+
+    def get_num_cached_tokens(self, seq: Sequence) -> int:
+        return 0
+
+    def get_and_reset_prefix_cache_transfers(
+            self) -> List[Tuple[int, int, int]]:
+        return []
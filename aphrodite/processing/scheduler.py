@@ -16,6 +16,8 @@ from aphrodite.common.sequence import (Sequence, SequenceData, SequenceGroup,
                                        SequenceStatus)
 from aphrodite.common.utils import Device, PyObjectCache
 from aphrodite.lora.request import LoRARequest
+from aphrodite.processing.evictor_v2 import EvictionMetricData
+from aphrodite.processing.fair_share import FairShareTracker, get_tenant
 from aphrodite.processing.interfaces import AllocStatus, BlockSpaceManager
 from aphrodite.prompt_adapter.request import PromptAdapterRequest
 
@@ -132,6 +134,10 @@ class SchedulerOutputs:
     # The number of requests in the running queue
     running_queue_size: int
     preempted: int
+    # Prefix cache blocks to offload or bring back. List of
+    # (PrefixCacheTransfer, src, dst).
+    prefix_cache_transfers: List[Tuple[int, int, int]] = field(
+        default_factory=list)
 
     def __post_init__(self):
         # Swap in and swap out should never happen at the same time.
@@ -146,7 +152,8 @@ class SchedulerOutputs:
     def is_empty(self) -> bool:
         # NOTE: We do not consider the ignored sequence groups.
         return (not self.scheduled_seq_groups and not self.blocks_to_swap_in
-                and not self.blocks_to_swap_out and not self.blocks_to_copy)
+                and not self.blocks_to_swap_out and not self.blocks_to_copy
+                and not self.prefix_cache_transfers)
 
     def _sort_by_lora_ids(self):
         self.scheduled_seq_groups = sorted(
@@ -332,7 +339,11 @@ class Scheduler:
             num_gpu_blocks=num_gpu_blocks,
             num_cpu_blocks=num_cpu_blocks,
             sliding_window=self.cache_config.sliding_window,
-            enable_caching=self.cache_config.enable_prefix_caching)
+            enable_caching=self.cache_config.enable_prefix_caching,
+            eviction_policy=self.cache_config.prefix_cache_eviction_policy,
+            num_offload_cpu_blocks=self.cache_config.num_prefix_cache_cpu_blocks,
+            num_offload_disk_blocks=(
+                self.cache_config.num_prefix_cache_disk_blocks))
 
         # Sequence groups in the WAITING state.
         # Contain new prefill or preempted requests.
@@ -343,6 +354,11 @@ class Scheduler:
         # Sequence groups in the SWAPPED state.
         # Contain decode requests that are swapped out.
         self.swapped: Deque[SequenceGroup] = deque()
+        # Token budget received by each tenant, for the fair_share policy.
+        self._fair_share: Optional[FairShareTracker] = None
+        if self.scheduler_config.policy == "fair_share":
+            self._fair_share = FairShareTracker(
+                self.scheduler_config.tenant_weights)
         # Sequence groups finished requests ids since last step iteration.
         # It lets the model know that any state associated with these requests
         # can and must be released after the current step.
@@ -478,6 +494,10 @@ class Scheduler:
     def get_prefix_cache_hit_rate(self, device: Device) -> float:
         return self.block_manager.get_prefix_cache_hit_rate(device)
 
+    def get_prefix_cache_eviction_metrics(
+            self, device: Device) -> Optional[EvictionMetricData]:
+        return self.block_manager.get_prefix_cache_eviction_metrics(device)
+
     def get_num_unfinished_seq_groups(self) -> int:
         return len(self.waiting) + len(self.running) + len(self.swapped)
 
@@ -575,7 +595,8 @@ class Scheduler:
                 cont_loop = True
                 if running_queue:
                     # Preempt the lowest-priority sequence group.
-                    victim_seq_group = running_queue.pop()
+                    victim_seq_group = self._pop_preemption_victim(
+                        running_queue)
                 else:
                     # No other sequence group can be preempted.
                     # Preempt the current sequence group.
@@ -773,6 +794,27 @@ class Scheduler:
         """
         return seq_group.priority, seq_group.arrival_time
 
+    def _get_prefix_aware_priority(
+            self, seq_group: SequenceGroup,
+            now: float) -> Tuple[bool, int, float]:
+        """ Get the priority of a waiting sequence group with the prefix_aware
+        policy.
+        Highest preference to groups that have been waiting for longer than
+        the starvation bound, followed by the number of prompt tokens in the
+        prefix cache, followed by arrival time.
+        Args:
+            seq_group: The sequence group input.
+            now: The current time.
+        Returns:
+            The priority of the sequence group.
+        """
+        waiting_time = now - seq_group.arrival_time
+        if waiting_time > self.scheduler_config.prefix_aware_max_wait_time:
+            return False, 0, seq_group.arrival_time
+        seq = seq_group.get_seqs(status=SequenceStatus.WAITING)[0]
+        num_cached_tokens = self.block_manager.get_num_cached_tokens(seq)
+        return True, -num_cached_tokens, seq_group.arrival_time
+
     def _schedule_priority_preemption(
         self,
         budget: SchedulingBudget,
@@ -830,6 +872,84 @@ class Scheduler:
 
         return force_preemption_count
 
+    def _pop_preemption_victim(
+            self, running_queue: Deque[SequenceGroup]) -> SequenceGroup:
+        """Pop the sequence group to preempt when there is no room to keep
+        all of them running. This is the last one, unless the fair_share
+        policy is used and a tenant holds more than its share of the running
+        queue, in which case it is the last one of that tenant.
+        """
+        if self._fair_share is not None:
+            tenant = self._fair_share.get_over_share_tenant(running_queue)
+            if tenant is not None:
+                return self._pop_last_of_tenant(running_queue, tenant)
+        return running_queue.pop()
+
+    @staticmethod
+    def _pop_last_of_tenant(queue: Deque[SequenceGroup],
+                            tenant: str) -> SequenceGroup:
+        for i in range(len(queue) - 1, -1, -1):
+            seq_group = queue[i]
+            if get_tenant(seq_group) == tenant:
+                del queue[i]
+                return seq_group
+        raise ValueError(f"No sequence group of tenant {tenant!r} in queue.")
+
+    def _schedule_fair_share_preemption(
+        self,
+        budget: SchedulingBudget,
+    ) -> int:
+        """Force preempt requests from the running queue if the first waiting
+        request cannot be scheduled, its tenant is within its share of the
+        running queue and another tenant is over its share.
+        Fair-share preemption is used with the fair_share policy.
+        Args:
+            budget: The scheduling budget. The argument is in-place updated
+                when any requests are scheduled.
+        Returns:
+            A count of fair-share preemptions.
+        """
+        assert self._fair_share is not None
+        if not self.waiting:
+            return 0
+
+        seq_group = self.waiting[0]
+        tenant = get_tenant(seq_group)
+        num_new_seqs = seq_group.get_max_num_running_seqs()
+        num_new_tokens = self._get_num_new_tokens(seq_group,
+                                                  SequenceStatus.WAITING,
+                                                  False, budget)
+        blocks_to_swap_out: List[Tuple[int, int]] = []
+        force_preemption_count = 0
+        while self.running:
+            # The shares include the waiting request, as if it was running.
+            loads = self._fair_share.get_loads([*self.running, seq_group])
+            victim_tenant = max(loads, key=loads.__getitem__)
+            if loads[tenant] > 1 or loads[victim_tenant] <= 1:
+                break
+            # Only preempt if waiting sequence cannot be allocated
+            can_allocate = self.block_manager.can_allocate(seq_group)
+            if (num_new_tokens and can_allocate == AllocStatus.OK
+                    and budget.can_schedule(num_new_tokens=num_new_tokens,
+                                            num_new_seqs=num_new_seqs)):
+                break
+            # Adjust budget to remove the victim sequence group
+            vseq_group = self._pop_last_of_tenant(self.running, victim_tenant)
+            num_running_tokens = self._get_num_new_tokens(
+                vseq_group, SequenceStatus.RUNNING, False, budget)
+            budget.subtract_num_batched_tokens(vseq_group.request_id,
+                                               num_running_tokens)
+            num_running_seqs = vseq_group.get_max_num_running_seqs()
+            budget.subtract_num_seqs(vseq_group.request_id, num_running_seqs)
+            # Preempt out the victim sequence group
+            self._preempt(vseq_group, blocks_to_swap_out,
+                          PreemptionMode.RECOMPUTE)
+            # It goes back behind the waiting request it made room for.
+            self.waiting.insert(1, vseq_group)
+            force_preemption_count += 1
+
+        return force_preemption_count
+
     def _schedule_prefills(
         self,
         budget: SchedulingBudget,
@@ -862,6 +982,18 @@ class Scheduler:
         ignored_seq_groups: List[SequenceGroup] = []
         seq_groups: List[SequenceGroup] = []
 
+        if self.scheduler_config.policy == "prefix_aware":
+            # The cache changes every step, so the order is recomputed.
+            now = time.time()
+            self.waiting = deque(
+                sorted(self.waiting,
+                       key=lambda seq_group: self._get_prefix_aware_priority(
+                           seq_group, now)))
+        elif self._fair_share is not None:
+            self.waiting = self._fair_share.order(
+                self.waiting,
+                lambda seq_group: seq_group.seqs[0].data.
+                get_num_uncomputed_tokens())
         waiting_queue = self.waiting
 
         leftover_waiting_sequences: Deque[SequenceGroup] = deque()
@@ -1003,6 +1135,9 @@ class Scheduler:
         if len(prefills.seq_groups
                ) == 0 and self.scheduler_config.policy == "priority":
             self._schedule_priority_preemption(budget)
+        elif len(prefills.seq_groups
+                 ) == 0 and self.scheduler_config.policy == "fair_share":
+            self._schedule_fair_share_preemption(budget)
 
         # Don't schedule decodes if prefills are scheduled.
         # NOTE: If `_schedule_prefills` doesn't enable chunking, self.running
@@ -1157,10 +1292,24 @@ class Scheduler:
 
     def _schedule(self) -> SchedulerOutputs:
         """Schedule queued requests."""
+        if self._fair_share is not None:
+            self._fair_share.update_tenants(
+                set(
+                    get_tenant(seq_group)
+                    for queue in (self.waiting, self.running, self.swapped)
+                    for seq_group in queue))
         if self.scheduler_config.chunked_prefill_enabled:
-            return self._schedule_chunked_prefill()
+            scheduler_outputs = self._schedule_chunked_prefill()
         else:
-            return self._schedule_default()
+            scheduler_outputs = self._schedule_default()
+        if self._fair_share is not None:
+            for scheduled_seq_group in scheduler_outputs.scheduled_seq_groups:
+                self._fair_share.charge(
+                    get_tenant(scheduled_seq_group.seq_group),
+                    scheduled_seq_group.token_chunk_size)
+        scheduler_outputs.prefix_cache_transfers = (
+            self.block_manager.get_and_reset_prefix_cache_transfers())
+        return scheduler_outputs
 
     def _can_append_slots(self, seq_group: SequenceGroup,
                           enable_chunking: bool) -> bool:
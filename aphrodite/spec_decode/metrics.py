@@ -73,6 +73,7 @@ class AsyncMetricsCollector:
         self._aggregate_num_emitted_tokens = torch.tensor(
             0, dtype=torch.long, device="cpu", pin_memory=pin_memory)
         self._aggregate_num_draft_tokens = 0
+        self._aggregate_num_spec_seqs = 0
 
         self._rejsample_metrics_collect_interval_s = collect_interval_s
         self._last_metrics_collect_time = self._timer()
@@ -124,10 +125,12 @@ class AsyncMetricsCollector:
                 non_blocking=True)
             self._aggregate_num_emitted_tokens.copy_(
                 self.spec_decode_sampler.num_emitted_tokens, non_blocking=True)
-            # Number of draft tokens is calculated on CPU, so no copy is
-            # required.
+            # Number of draft tokens and speculated sequences are calculated
+            # on CPU, so no copy is required.
             self._aggregate_num_draft_tokens = (
                 self.spec_decode_sampler.num_draft_tokens)
+            self._aggregate_num_spec_seqs = (
+                self.spec_decode_sampler.num_spec_seqs)
 
         aggregate_metrics_ready = torch.cuda.Event()
         aggregate_metrics_ready.record(self._copy_stream)
@@ -140,8 +143,9 @@ class AsyncMetricsCollector:
         """Create metrics object from statistics copied asynchronously.
 
         Args:
-            k: int. The number of speculative tokens; used to determine system
-                efficiency.
+            k: int. The number of speculative tokens, reported in the metrics.
+                It may vary across steps if the speculation length is
+                adaptive.
             ready_event: torch.cuda.Event. The CUDA event recording when the
                 async GPU->CPU copy is complete.
         """
@@ -154,9 +158,10 @@ class AsyncMetricsCollector:
         accepted_tokens = self._aggregate_num_accepted_tokens.item()
         emitted_tokens = self._aggregate_num_emitted_tokens.item()
         draft_tokens = self._aggregate_num_draft_tokens
+        num_spec_seqs = self._aggregate_num_spec_seqs
 
         max_num_emitted_tokens = self.get_max_num_emitted_tokens(
-            draft_tokens, k)
+            draft_tokens, num_spec_seqs)
 
         if draft_tokens > 0:
             draft_acceptance_rate = accepted_tokens / draft_tokens
@@ -178,22 +183,14 @@ class AsyncMetricsCollector:
         )
 
     @staticmethod
-    def get_max_num_emitted_tokens(draft_tokens: int, k: int) -> int:
+    def get_max_num_emitted_tokens(draft_tokens: int,
+                                   num_spec_seqs: int) -> int:
         """Calculate the number of emitted tokens, assuming all tokens are
         accepted.
 
-        This is equal to the number of sequences that have been speculated on,
-        times (speculation len + 1). The +1 comes from the bonus token.
+        This is equal to the number of draft tokens, plus one bonus token per
+        sequence that has been speculated on. The speculation length may vary
+        across steps, so the sequences are counted rather than derived from
+        the number of draft tokens.
         """
-        # Determine the number of sequences that have been speculated on. Since
-        # the batch size can be variable, we divide by k.
-        assert draft_tokens % k == 0
-        total_num_spec_seqs = draft_tokens // k
-
-        # A single sequence may emit k accepted tokens and one bonus token in
-        # the best case.
-        num_emitted_per_seq_if_all_accepted = k + 1
-
-        # The max num of emitted tokens is the number of speculated sequences
-        # times the max emitted per seq.
-        return total_num_spec_seqs * num_emitted_per_seq_if_all_accepted
+        return draft_tokens + num_spec_seqs
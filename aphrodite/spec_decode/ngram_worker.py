@@ -60,84 +60,60 @@ class NGramWorker(NonLLMProposerWorkerBase):
         """
         self._raise_if_unsupported(execute_model_req)
 
-        has_spec_out = False
-        token_id_list: List[Optional[torch.Tensor]] = []
-        token_prob_list: List[Optional[torch.Tensor]] = []
-        for idx, seq_group_metadata in enumerate(
-                execute_model_req.seq_group_metadata_list):
-            seq_data = next(iter(seq_group_metadata.seq_data.values()))
-
-            seq_len = seq_data.get_len()
-            # When seq_len is less than 3072 (3K), we use CPU to perform
-            # the ngram match. Otherwise, we use the device specified in
-            # the model config (normally GPU). 3072 is a rough threshold
-            # based on profiling on H100, and it can be adjusted based
-            # on the actual performance on different hardware.
-            cur_device = "cpu" if seq_len < 3072 else self.device
-            input_ids = torch.as_tensor(seq_data.get_token_ids(),
-                                        dtype=torch.long,
-                                        device=cur_device)
-            input_length = seq_data.get_len()
-
-            for ngram_size in range(
-                    min(self.ngram_prompt_lookup_max, input_length - 1),
-                    self.ngram_prompt_lookup_min - 1,
-                    -1,
-            ):
-                ngram_tensor = input_ids[-ngram_size:]
-                if ngram_size == 1:
-                    # Do not match itself and do not use unfold and all
-                    matches = (input_ids[:-1] == ngram_tensor)
-                else:
-                    windows = input_ids.unfold(dimension=0,
-                                               size=ngram_size,
-                                               step=1)
-                    # Do not match itself
-                    matches = (windows[:-1] == ngram_tensor).all(dim=-1)
-
-                # first_match includes "values" (bool), indicating whether
-                # the match is found, and "indices", indicating the index
-                # of the first match.
-                first_match = matches.max(dim=-1)
-                if first_match.values.item():
-                    proposal_start_idx = first_match.indices.add_(ngram_size)
-                    spec_indices = (
-                        proposal_start_idx).repeat(sample_len) + torch.arange(
-                            sample_len, device=cur_device)
-                    spec_indices.clamp_(max=input_ids.shape[-1] - 1)
-                    res = input_ids.gather(dim=-1,
-                                           index=spec_indices).to(self.device)
-                    token_id_list.append(res)
-                    token_prob_list.append(
-                        torch.nn.functional.one_hot(
-                            res,
-                            num_classes=self.vocab_size).to(torch.float32))
-                    has_spec_out = True
-                    break
-            else:
-                token_id_list.append(None)
-                token_prob_list.append(None)
-
-        if not has_spec_out:
+        proposal_rows: List[int] = []
+        proposals: List[List[int]] = []
+        for idx, candidates in enumerate(
+                self.get_candidate_proposals(execute_model_req, sample_len)):
+            if candidates:
+                proposal_rows.append(idx)
+                proposals.append(candidates[0])
+
+        if not proposals:
             return None, False
 
-        outputs: List[Optional[SamplerOutput]] = []
-        for idx in range(len(execute_model_req.seq_group_metadata_list)):
-            if token_id_list[idx] is None:
-                outputs.append(None)
-            else:
-                outputs.append(
-                    SamplerOutput(
-                        outputs=None,
-                        sampled_token_probs=token_prob_list[idx],
-                        logprobs=torch.zeros((sample_len, self.vocab_size),
-                                             dtype=torch.float32,
-                                             device=self.device),
-                        sampled_token_ids=token_id_list[idx],
-                    ))
+        token_ids = torch.tensor(proposals,
+                                 dtype=torch.long,
+                                 device=self.device)
+        token_probs = torch.nn.functional.one_hot(
+            token_ids, num_classes=self.vocab_size).to(torch.float32)
+        logprobs = torch.zeros_like(token_probs)
+
+        outputs: List[Optional[SamplerOutput]] = [None] * len(
+            execute_model_req.seq_group_metadata_list)
+        for i, idx in enumerate(proposal_rows):
+            outputs[idx] = SamplerOutput(
+                outputs=None,
+                sampled_token_probs=token_probs[i],
+                logprobs=logprobs[i],
+                sampled_token_ids=token_ids[i],
+            )
 
         return outputs, False
 
+    def get_candidate_proposals(
+        self,
+        execute_model_req: ExecuteModelRequest,
+        sample_len: int,
+        num_candidates: int = 1,
+    ) -> List[List[List[int]]]:
+        """Return, per SequenceGroupMetadata, up to num_candidates proposals
+        of sample_len tokens, the most frequent continuation first.
+
+        The lookup runs on the CPU against a per-sequence index that is
+        updated as tokens are appended, so its cost does not depend on the
+        length of the sequence.
+        """
+        candidate_proposals: List[List[List[int]]] = []
+        for seq_group_metadata in execute_model_req.seq_group_metadata_list:
+            seq_data = next(iter(seq_group_metadata.seq_data.values()))
+            index = seq_data.get_prompt_lookup_index(
+                self.ngram_prompt_lookup_min, self.ngram_prompt_lookup_max)
+            candidate_proposals.append([
+                index.continuation(start, sample_len)
+                for start in index.lookup(num_candidates)
+            ])
+        return candidate_proposals
+
     def get_spec_proposals(
         self,
         execute_model_req: ExecuteModelRequest,
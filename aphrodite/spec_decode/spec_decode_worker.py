@@ -29,9 +29,12 @@ from aphrodite.spec_decode.mlp_speculator_worker import MLPSpeculatorWorker
 from aphrodite.spec_decode.mqa_scorer import MQAScorer
 from aphrodite.spec_decode.multi_step_worker import MultiStepWorker
 from aphrodite.spec_decode.ngram_worker import NGramWorker
-from aphrodite.spec_decode.proposer_worker_base import ProposerWorkerBase
+from aphrodite.spec_decode.proposer_worker_base import (
+    NonLLMProposerWorkerBase, ProposerWorkerBase)
 from aphrodite.spec_decode.smaller_tp_proposer_worker import (
     SmallerTpProposerWorker)
+from aphrodite.spec_decode.speculation_length import (
+    SpeculationLengthController)
 from aphrodite.spec_decode.target_model_runner import TargetModelRunner
 from aphrodite.spec_decode.util import (Timer, create_logprobs_output,
                                         create_sequence_group_output,
@@ -83,6 +86,8 @@ def create_spec_worker(*args, **kwargs) -> "SpecDecodeWorker":
         typical_acceptance_sampler_posterior_alpha,
         disable_logprobs=speculative_config.disable_logprobs,
         disable_log_stats=speculative_config.disable_log_stats,
+        adaptive_speculation_length=speculative_config.
+        speculative_adaptive_length,
     )
 
     return spec_decode_worker
@@ -122,6 +127,7 @@ class SpecDecodeWorker(LoraNotSupportedWorkerBase):
         typical_acceptance_sampler_posterior_alpha: float,
         disable_logprobs: bool,
         disable_log_stats: bool,
+        adaptive_speculation_length: bool = False,
     ) -> "SpecDecodeWorker":
 
         allow_zero_draft_token_step = True
@@ -206,7 +212,8 @@ class SpecDecodeWorker(LoraNotSupportedWorkerBase):
             disable_log_stats=disable_log_stats,
             disable_by_batch_size=disable_by_batch_size,
             spec_decode_sampler=spec_decode_sampler,
-            allow_zero_draft_token_step=allow_zero_draft_token_step)
+            allow_zero_draft_token_step=allow_zero_draft_token_step,
+            adaptive_speculation_length=adaptive_speculation_length)
 
     def __init__(
         self,
@@ -219,6 +226,7 @@ class SpecDecodeWorker(LoraNotSupportedWorkerBase):
         metrics_collector: Optional[AsyncMetricsCollector] = None,
         disable_by_batch_size: Optional[int] = None,
         allow_zero_draft_token_step: Optional[bool] = True,
+        adaptive_speculation_length: bool = False,
     ):
         """
         Create a SpecDecodeWorker.
@@ -249,6 +257,10 @@ class SpecDecodeWorker(LoraNotSupportedWorkerBase):
             allow_zero_draft_token_step: whether to allow a step where the draft
                 model generates no draft token; should disallow when the tp of
                 draft model is larger than 1
+            adaptive_speculation_length: If set to True, choose the number of
+                speculative tokens of each step, up to the number of lookahead
+                slots, and the requests to speculate on, from their acceptance
+                rates and the measured stage times.
         """
         self.proposer_worker = proposer_worker
         self.scorer_worker = scorer_worker
@@ -282,6 +294,12 @@ class SpecDecodeWorker(LoraNotSupportedWorkerBase):
         self._disable_logprobs = disable_logprobs
         self._disable_log_stats = disable_log_stats
 
+        self._adaptive_speculation_length = adaptive_speculation_length
+        # Created on the first speculative step, as the maximum number of
+        # speculative tokens is the number of lookahead slots of the steps.
+        self._speculation_length_controller: Optional[
+            SpeculationLengthController] = None
+
     def init_device(self) -> None:
         """Initialize both scorer and proposer models.
         """
@@ -394,6 +412,11 @@ class SpecDecodeWorker(LoraNotSupportedWorkerBase):
         self._track_finished_requests(execute_model_req)
         disable_all_speculation = self._should_disable_all_speculation(
             execute_model_req)
+        skipped_seq_groups: List[Tuple[SequenceGroupMetadata,
+                                       Optional[int]]] = []
+        if not disable_all_speculation:
+            skipped_seq_groups = self._maybe_choose_speculation_length(
+                execute_model_req)
         num_lookahead_slots = execute_model_req.num_lookahead_slots
 
         # Speculative decoding is disabled in the following cases:
@@ -435,11 +458,18 @@ class SpecDecodeWorker(LoraNotSupportedWorkerBase):
         self._maybe_disable_speculative_tokens(
             disable_all_speculation, execute_model_req.seq_group_metadata_list)
 
-        if no_spec:
-            return self._run_no_spec(execute_model_req,
-                                     skip_proposer=disable_all_speculation)
-        return self._run_speculative_decoding_step(execute_model_req,
-                                                   num_lookahead_slots)
+        try:
+            if no_spec:
+                return self._run_no_spec(execute_model_req,
+                                         skip_proposer=disable_all_speculation)
+            return self._run_speculative_decoding_step(execute_model_req,
+                                                       num_lookahead_slots)
+        finally:
+            # Speculation is only skipped for this step.
+            for seq_group_metadata, num_speculative_tokens in (
+                    skipped_seq_groups):
+                seq_group_metadata.num_speculative_tokens = (
+                    num_speculative_tokens)
 
     @torch.inference_mode()
     def start_worker_execution_loop(self) -> None:
@@ -469,6 +499,60 @@ class SpecDecodeWorker(LoraNotSupportedWorkerBase):
             # this state within spec decode worker.
             seq_group_metadata.num_speculative_tokens = 0
 
+    def _maybe_choose_speculation_length(
+        self, execute_model_req: ExecuteModelRequest
+    ) -> List[Tuple[SequenceGroupMetadata, Optional[int]]]:
+        """If the speculation length is adaptive, set the number of lookahead
+        slots of the step to the chosen number of speculative tokens, and
+        disable speculation for the requests not to speculate on.
+
+        Returns the sequence groups that speculation is disabled for in this
+        step only, with their previous num_speculative_tokens.
+        """
+        if (not self._adaptive_speculation_length
+                or execute_model_req.num_lookahead_slots == 0):
+            return []
+
+        controller = self._speculation_length_controller
+        if controller is None:
+            # Proposers with a KV cache cannot skip a request for a step, as
+            # their KV cache would miss its tokens.
+            controller = SpeculationLengthController(
+                execute_model_req.num_lookahead_slots,
+                allow_no_speculation=isinstance(self.proposer_worker,
+                                                NonLLMProposerWorkerBase))
+            self._speculation_length_controller = controller
+
+        seq_group_metadata_list = execute_model_req.seq_group_metadata_list
+        candidates: List[SequenceGroupMetadata] = []
+        for seq_group_metadata in seq_group_metadata_list:
+            # The metadata may be rebuilt at each step, so the requests
+            # skipped for good are kept by the controller.
+            if controller.is_dropped(seq_group_metadata.request_id):
+                seq_group_metadata.num_speculative_tokens = 0
+            elif seq_group_metadata.num_speculative_tokens != 0:
+                candidates.append(seq_group_metadata)
+        if not candidates:
+            return []
+        k, speculate = controller.choose(
+            [sgm.request_id for sgm in candidates],
+            len(seq_group_metadata_list))
+        execute_model_req.num_lookahead_slots = k
+
+        skipped_seq_groups: List[Tuple[SequenceGroupMetadata,
+                                       Optional[int]]] = []
+        for seq_group_metadata, speculate_seq_group in zip(
+                candidates, speculate):
+            if speculate_seq_group:
+                continue
+            if controller.allow_no_speculation:
+                skipped_seq_groups.append(
+                    (seq_group_metadata,
+                     seq_group_metadata.num_speculative_tokens))
+            # Otherwise, speculation is disabled for the request for good.
+            seq_group_metadata.num_speculative_tokens = 0
+        return skipped_seq_groups
+
     def _serialize_sampler_output_no_logprobs(
             self, execute_model_req: ExecuteModelRequest,
             sampler_output: SamplerOutput) -> SamplerOutput:
@@ -667,13 +751,45 @@ class SpecDecodeWorker(LoraNotSupportedWorkerBase):
                        scoring_timer.elapsed_time_ms,
                        verification_timer.elapsed_time_ms)
 
-        return self._create_output_sampler_list(
+        sampler_output_list = self._create_output_sampler_list(
             execute_model_req.seq_group_metadata_list,
             accepted_token_ids,
             target_logprobs=target_logprobs,
             k=execute_model_req.num_lookahead_slots,
             stage_times=stage_times)
 
+        if self._speculation_length_controller is not None:
+            self._observe_speculation_step(
+                execute_model_req, proposals, accepted_token_ids,
+                proposal_timer.elapsed_time_ms,
+                scoring_timer.elapsed_time_ms +
+                verification_timer.elapsed_time_ms)
+
+        return sampler_output_list
+
+    def _observe_speculation_step(self, execute_model_req: ExecuteModelRequest,
+                                  proposals: SpeculativeProposals,
+                                  accepted_token_ids: torch.Tensor,
+                                  proposal_time_ms: float,
+                                  scoring_time_ms: float) -> None:
+        """Feed the acceptance of the proposals of each request and the stage
+        times of the step to the speculation length controller."""
+        assert self._speculation_length_controller is not None
+        k = execute_model_req.num_lookahead_slots
+        seq_group_metadata_list = execute_model_req.seq_group_metadata_list
+        proposal_lens = proposals.proposal_lens.tolist()
+        # The accepted token ids were copied to the CPU to create the output.
+        num_emitted_tokens = (accepted_token_ids != -1).sum(dim=1).tolist()
+        self._speculation_length_controller.observe_acceptance(
+            [sgm.request_id for sgm in seq_group_metadata_list],
+            proposal_lens, num_emitted_tokens)
+
+        num_spec_seqs = sum(proposal_len > 0 for proposal_len in proposal_lens)
+        num_scored_tokens = (len(seq_group_metadata_list) +
+                             num_spec_seqs * k)
+        self._speculation_length_controller.observe_step_times(
+            k, num_scored_tokens, proposal_time_ms, scoring_time_ms)
+
     @nvtx_range("spec_decode_worker._verify_tokens")
     def _verify_tokens(
         self,
@@ -843,6 +959,9 @@ class SpecDecodeWorker(LoraNotSupportedWorkerBase):
         if maybe_rejsample_metrics is not None:
             sampler_output_list[
                 0].spec_decode_worker_metrics = maybe_rejsample_metrics
+            if self._speculation_length_controller is not None:
+                self._speculation_length_controller.observe_acceptance_rate(
+                    maybe_rejsample_metrics.draft_acceptance_rate)
 
             # Log time spent in each stage periodically.
             # This is periodic because the rejection sampler emits metrics
@@ -977,6 +1096,9 @@ class SpecDecodeWorker(LoraNotSupportedWorkerBase):
             for seq_id in self._request_id_seq_id_mapping[finished_request]:
                 self._seq_with_bonus_token_in_last_step.discard(seq_id)
             del self._request_id_seq_id_mapping[finished_request]
+            if self._speculation_length_controller is not None:
+                self._speculation_length_controller.remove_request(
+                    finished_request)
 
     def _track_sequences_with_bonus_tokens(
             self, seq_ids: List[int],
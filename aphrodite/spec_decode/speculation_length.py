@@ -0,0 +1,224 @@
+"""Choice of the number of speculative tokens of each step.
+
+The controller keeps an estimate of the acceptance rate of each request, the
+probability that the scorer accepts a proposed token given that it accepted
+the ones before it, and a model of the time of a speculative step:
+
+    time(k) = k * draft_time_per_token + scoring_time(num_scored_tokens)
+
+where scoring_time is fitted online as a line in the number of tokens that
+the scorer runs: k + 1 per speculated sequence, one per other sequence. A
+request with acceptance rate a emits (1 - a^(k + 1)) / (1 - a) tokens in
+expectation in a step of k speculative tokens, so each step the controller
+picks the k, and the requests to speculate on, that maximize the expected
+number of emitted tokens per ms.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+# The number of speculative steps to observe before choosing k.
+_MIN_NUM_STEPS = 8
+
+
+class _DecayedLinearFit:
+    """A least squares fit of y = intercept + slope * x, weighting older
+    observations down by the decay at each new one."""
+
+    def __init__(self, decay: float):
+        self.decay = decay
+        self.num_observations = 0
+        self._sums = np.zeros(5)  # w, x, y, xx, xy
+
+    def add(self, x: float, y: float) -> None:
+        self._sums *= self.decay
+        self._sums += (1.0, x, y, x * x, x * y)
+        self.num_observations += 1
+
+    def get(self) -> Tuple[float, float]:
+        """Return the intercept and the slope, which are non-negative."""
+        w, sx, sy, sxx, sxy = self._sums
+        if w == 0:
+            return 0.0, 0.0
+        variance = w * sxx - sx * sx
+        # The slope is unknown if x barely varied, e.g. under a constant
+        # batch size and k.
+        slope = 0.0
+        if variance > 1e-6 * w * sxx:
+            slope = max((w * sxy - sx * sy) / variance, 0.0)
+        intercept = max((sy - slope * sx) / w, 0.0)
+        return intercept, slope
+
+
+class _RequestAcceptance:
+    __slots__ = ("num_accepted", "num_trials")
+
+    def __init__(self):
+        # The number of accepted proposed tokens, and of the proposed tokens
+        # that the scorer accepted or rejected, as opposed to the ones after
+        # a rejected token. Both are decayed at each step.
+        self.num_accepted = 0.0
+        self.num_trials = 0.0
+
+
+class SpeculationLengthController:
+    """Chooses the number of speculative tokens of each step, and the
+    requests to speculate on, from the acceptance rates of the requests and
+    the measured times of the draft and scoring stages.
+
+    Args:
+        max_num_speculative_tokens: The largest k to choose, i.e. the number
+            of lookahead slots the scheduler allocates.
+        allow_no_speculation: Whether the proposer can skip requests, or the
+            whole batch, for a step. Proposers that keep a KV cache cannot:
+            k is at least 1 and the requests they skip are skipped for good,
+            as their KV cache would miss the tokens of the skipped steps.
+        prior_acceptance_rate: The acceptance rate of a request before it is
+            observed. Replaced by the rate collected by the metrics collector
+            once there is one.
+        prior_weight: The number of observed tokens the prior counts as.
+        decay: The weight of the observations of a step at the next one.
+        min_num_trials: The number of observed tokens of a request before it
+            is skipped for good, when requests cannot be skipped for a step.
+        exploration_interval: Every this many steps, speculate on all the
+            requests, so that skipped requests are observed again.
+    """
+
+    def __init__(self,
+                 max_num_speculative_tokens: int,
+                 allow_no_speculation: bool,
+                 prior_acceptance_rate: float = 0.5,
+                 prior_weight: float = 2.0,
+                 decay: float = 0.9,
+                 min_num_trials: float = 8.0,
+                 exploration_interval: int = 32):
+        assert max_num_speculative_tokens > 0
+        self.max_num_speculative_tokens = max_num_speculative_tokens
+        self.allow_no_speculation = allow_no_speculation
+        self.prior_acceptance_rate = prior_acceptance_rate
+        self.prior_weight = prior_weight
+        self.decay = decay
+        self.min_num_trials = min_num_trials
+        self.exploration_interval = exploration_interval
+
+        self._requests: Dict[str, _RequestAcceptance] = {}
+        # The requests skipped for good, when requests cannot be skipped for
+        # a step.
+        self._dropped_request_ids: Set[str] = set()
+        self._scoring_time = _DecayedLinearFit(decay)
+        self._draft_time_per_token_ms: Optional[float] = None
+        self._num_steps = 0
+
+    def get_acceptance_rate(self, request_id: str) -> float:
+        acceptance = self._requests.get(request_id)
+        num_accepted = num_trials = 0.0
+        if acceptance is not None:
+            num_accepted = acceptance.num_accepted
+            num_trials = acceptance.num_trials
+        return ((num_accepted + self.prior_weight * self.prior_acceptance_rate)
+                / (num_trials + self.prior_weight))
+
+    def is_dropped(self, request_id: str) -> bool:
+        """Whether speculation is disabled for the request for good."""
+        return request_id in self._dropped_request_ids
+
+    def choose(self, request_ids: List[str],
+               batch_size: int) -> Tuple[int, List[bool]]:
+        """Return k and whether to speculate on each of the given requests,
+        out of a batch of batch_size sequences (including the ones that
+        speculation is disabled for)."""
+        self._num_steps += 1
+        max_k = self.max_num_speculative_tokens
+        if (self._scoring_time.num_observations < _MIN_NUM_STEPS
+                or self._draft_time_per_token_ms is None
+                or self._num_steps % self.exploration_interval == 0):
+            return max_k, [True] * len(request_ids)
+        if not request_ids:
+            return 0, []
+
+        acceptance_rates = np.array(
+            [self.get_acceptance_rate(r) for r in request_ids])
+        # Speculating on m requests, it is best to take the m with the
+        # highest acceptance rates.
+        order = np.argsort(-acceptance_rates, kind="stable")
+        ks = np.arange(1, max_k + 1)
+        # gains[m - 1, k - 1]: the expected number of tokens accepted in the
+        # top m requests, with k speculative tokens.
+        accepted_powers = acceptance_rates[order, None]**ks[None, :]
+        gains = np.cumsum(np.cumsum(accepted_powers, axis=1), axis=0)
+        ms = np.arange(1, len(request_ids) + 1)[:, None]
+
+        intercept, slope = self._scoring_time.get()
+        times_ms = (ks * self._draft_time_per_token_ms + intercept + slope *
+                    (batch_size + ms * ks))
+        tokens_per_ms = (batch_size + gains) / np.maximum(times_ms, 1e-6)
+        m, k = np.unravel_index(np.argmax(tokens_per_ms),
+                                tokens_per_ms.shape)
+        m, k = int(m) + 1, int(k) + 1
+
+        if self.allow_no_speculation:
+            no_speculation_time_ms = intercept + slope * batch_size
+            if (batch_size / max(no_speculation_time_ms, 1e-6)
+                    >= tokens_per_ms[m - 1, k - 1]):
+                return 0, [False] * len(request_ids)
+            speculate = np.zeros(len(request_ids), dtype=bool)
+            speculate[order[:m]] = True
+            return k, speculate.tolist()
+
+        # Skip only the requests that were observed enough, as they are
+        # skipped for good.
+        speculate = np.ones(len(request_ids), dtype=bool)
+        for i in order[m:]:
+            acceptance = self._requests.get(request_ids[i])
+            if (acceptance is not None
+                    and acceptance.num_trials >= self.min_num_trials):
+                speculate[i] = False
+                self._dropped_request_ids.add(request_ids[i])
+        return k, speculate.tolist()
+
+    def observe_acceptance(self, request_ids: List[str],
+                           proposal_lens: List[int],
+                           num_emitted_tokens: List[int]) -> None:
+        """Record the number of tokens emitted for each request in a step,
+        given its number of proposed tokens."""
+        for request_id, proposal_len, num_emitted in zip(
+                request_ids, proposal_lens, num_emitted_tokens):
+            if proposal_len == 0:
+                continue
+            # The last emitted token is the bonus token, or the one that
+            # replaces the first rejected token.
+            num_accepted = max(num_emitted - 1, 0)
+            acceptance = self._requests.get(request_id)
+            if acceptance is None:
+                acceptance = self._requests[request_id] = _RequestAcceptance()
+            acceptance.num_accepted = (self.decay * acceptance.num_accepted +
+                                       num_accepted)
+            acceptance.num_trials = (self.decay * acceptance.num_trials +
+                                     num_accepted +
+                                     (num_accepted < proposal_len))
+
+    def observe_step_times(self, k: int, num_scored_tokens: int,
+                           proposal_time_ms: float,
+                           scoring_time_ms: float) -> None:
+        """Record the times of the stages of a speculative step, the scoring
+        time including the verification of the proposals."""
+        if k <= 0:
+            return
+        draft_time_per_token_ms = proposal_time_ms / k
+        if self._draft_time_per_token_ms is None:
+            self._draft_time_per_token_ms = draft_time_per_token_ms
+        else:
+            self._draft_time_per_token_ms = (
+                self.decay * self._draft_time_per_token_ms +
+                (1 - self.decay) * draft_time_per_token_ms)
+        self._scoring_time.add(num_scored_tokens, scoring_time_ms)
+
+    def observe_acceptance_rate(self, acceptance_rate: float) -> None:
+        """Use the acceptance rate of all the requests as the prior of the
+        new ones."""
+        if 0.0 <= acceptance_rate <= 1.0:
+            self.prior_acceptance_rate = acceptance_rate
+
+    def remove_request(self, request_id: str) -> None:
+        self._requests.pop(request_id, None)
+        self._dropped_request_ids.discard(request_id)
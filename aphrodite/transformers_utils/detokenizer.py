@@ -1,18 +1,33 @@
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 
 from transformers import PreTrainedTokenizer, PreTrainedTokenizerFast
 
 from aphrodite.common.sequence import (APHRODITE_INVALID_TOKEN_ID, Logprob,
-                                       SamplingParams, Sequence, SequenceGroup)
+                                       SamplingParams, Sequence, SequenceGroup,
+                                       SequenceOutput)
 from aphrodite.transformers_utils.tokenizer_group.base_tokenizer_group import (
     BaseTokenizerGroup)
 
 
+class DecodedToken(NamedTuple):
+    """The text of the next token of a sequence, decoded ahead of time."""
+    # The length of the sequence once the token is appended.
+    seq_len: int
+    text: str
+    prefix_offset: int
+    read_offset: int
+    # The text of the other tokens in the logprobs of the step.
+    logprob_texts: Dict[int, str]
+
+
 class Detokenizer:
     """Provides methods to decode the output of a model into text."""
 
     def __init__(self, tokenizer_group: BaseTokenizerGroup):
         self.tokenizer_group = tokenizer_group
+        # seq_id -> the next token of the sequence, decoded by
+        # decode_sequences().
+        self._decoded_tokens: Dict[int, DecodedToken] = {}
 
     def get_tokenizer_for_seq(self,
                               sequence: Sequence) -> "PreTrainedTokenizer":
@@ -92,6 +107,39 @@ class Detokenizer:
             else:
                 prev_tokens.extend(next_iter_tokens)
 
+    def decode_sequences(
+        self, seqs: List[Tuple[Sequence, SamplingParams,
+                               Optional[SequenceOutput]]]
+    ) -> None:
+        """Decodes the next token of many sequences with one tokenizer call
+        per tokenizer. The following decode_sequence_inplace() calls for
+        these sequences use the results instead of decoding them one by one.
+
+        Only sequences with a fast tokenizer are decoded in batch.
+
+        Args:
+            seqs: The sequences to decode, with the sampling parameters used
+                to generate them and the output whose token will be appended
+                to them, or None if it is already appended.
+        """
+        self._decoded_tokens.clear()
+        batches: Dict[Tuple[int, bool],
+                      Tuple[PreTrainedTokenizerFast,
+                            List[Tuple[Sequence,
+                                       Optional[SequenceOutput]]]]] = {}
+        for seq, prms, output in seqs:
+            tokenizer = self.get_tokenizer_for_seq(seq)
+            if not isinstance(tokenizer, PreTrainedTokenizerFast):
+                continue
+            key = (id(tokenizer), prms.skip_special_tokens)
+            batches.setdefault(key, (tokenizer, []))[1].append((seq, output))
+
+        for (_, skip_special_tokens), (tokenizer, batch) in batches.items():
+            decoded_tokens = decode_next_tokens(tokenizer, batch,
+                                                skip_special_tokens)
+            for (seq, _), decoded_token in zip(batch, decoded_tokens):
+                self._decoded_tokens[seq.seq_id] = decoded_token
+
     def decode_sequence_inplace(self, seq: Sequence,
                                 prms: SamplingParams) -> int:
         """Decodes the new token for a sequence. In-place operation.
@@ -103,9 +151,39 @@ class Detokenizer:
         Returns:
             The number of characters added to the output text.
         """
+        tokenizer = self.get_tokenizer_for_seq(seq)
+        if not isinstance(tokenizer, PreTrainedTokenizerFast):
+            return self._decode_tokens_inplace(seq, prms, tokenizer)
+
+        decoded_token = self._decoded_tokens.pop(seq.seq_id, None)
+        if decoded_token is None or decoded_token.seq_len != seq.get_len():
+            decoded_token, = decode_next_tokens(tokenizer, [(seq, None)],
+                                                prms.skip_special_tokens)
+
+        # Decode logprobs
+        logprobs = seq.output_logprobs[-1]
+        if logprobs:
+            token_id_generated_this_iteration = seq.get_last_token_id()
+            for token_id, sample_logprob in logprobs.items():
+                if token_id == token_id_generated_this_iteration:
+                    sample_logprob.decoded_token = decoded_token.text
+                elif token_id in decoded_token.logprob_texts:
+                    sample_logprob.decoded_token = (
+                        decoded_token.logprob_texts[token_id])
+
+        seq.prefix_offset = decoded_token.prefix_offset
+        seq.read_offset = decoded_token.read_offset
+        seq.output_text += decoded_token.text
+
+        return len(decoded_token.text)
+
+    def _decode_tokens_inplace(
+            self, seq: Sequence, prms: SamplingParams,
+            tokenizer: "PreTrainedTokenizer") -> int:
+        """Decodes the new token for a sequence with a slow tokenizer, which
+        has to go through the token strings of the sequence."""
         all_input_ids = seq.get_token_ids()
         token_id_generated_this_iteration = all_input_ids[-1]
-        tokenizer = self.get_tokenizer_for_seq(seq)
 
         # Convert prompt token IDs to tokens if necessary.
         # Do it here so that we don't have to repeat this
@@ -232,6 +310,94 @@ def convert_prompt_ids_to_tokens(
     return new_tokens, prefix_offset, read_offset
 
 
+def _get_new_text(prefix_text: str, text: str) -> Optional[str]:
+    if len(text) <= len(prefix_text) or text.endswith("�"):
+        # utf-8 char at the end means it's a potential unfinished byte sequence
+        # from byte fallback tokenization.
+        return None
+    return text[len(prefix_text):]
+
+
+def decode_next_tokens(
+    tokenizer: PreTrainedTokenizerFast,
+    seqs: List[Tuple[Sequence, Optional[SequenceOutput]]],
+    skip_special_tokens: bool = False,
+) -> List[DecodedToken]:
+    """Incrementally decodes the next token of many sequences with a single
+    batched call to the Rust tokenizer, which does not hold the GIL.
+
+    Unlike detokenize_incrementally(), the prefix and read offsets of the
+    sequences index their token ids, so the only per sequence state is the
+    two offsets: the token strings of the sequence are never kept.
+
+    Args:
+        tokenizer: The tokenizer to use.
+        seqs: The sequences to decode, with the output whose token will be
+            appended to them, or None if it is already appended.
+        skip_special_tokens: Whether to skip special tokens.
+    """
+    # For each sequence: the prefix window, the window with the new token and
+    # a window for each other token of the logprobs.
+    windows: List[List[int]] = []
+    # (seq_len, prefix_offset, read_offset, logprob token ids)
+    plans: List[Tuple[int, int, int, List[int]]] = []
+    for seq, output in seqs:
+        token_ids = seq.get_token_ids()
+        prefix_offset, read_offset = seq.prefix_offset, seq.read_offset
+        if read_offset == 0:
+            # This is the first token of the sequence.
+            read_offset = seq.get_prompt_len()
+            prefix_offset = max(
+                read_offset - INITIAL_INCREMENTAL_DETOKENIZATION_OFFSET, 0)
+
+        if output is None:
+            seq_len = len(token_ids)
+            new_token_id = token_ids[-1]
+            prev_window = token_ids[prefix_offset:-1]
+            logprobs = seq.output_logprobs[-1]
+        else:
+            seq_len = len(token_ids) + 1
+            new_token_id = output.output_token
+            prev_window = token_ids[prefix_offset:]
+            logprobs = output.logprobs
+
+        logprob_token_ids = [
+            token_id for token_id, logprob in logprobs.items()
+            if (token_id != new_token_id and logprob.decoded_token is None
+                and token_id != APHRODITE_INVALID_TOKEN_ID)
+        ] if logprobs else []
+        windows.append(token_ids[prefix_offset:read_offset])
+        windows.append(prev_window + [new_token_id])
+        windows.extend(prev_window + [token_id]
+                       for token_id in logprob_token_ids)
+        plans.append((seq_len, prefix_offset, read_offset, logprob_token_ids))
+
+    texts = tokenizer.backend_tokenizer.decode_batch(
+        windows, skip_special_tokens=skip_special_tokens)
+
+    decoded_tokens: List[DecodedToken] = []
+    i = 0
+    for seq_len, prefix_offset, read_offset, logprob_token_ids in plans:
+        prefix_text = texts[i]
+        new_text = _get_new_text(prefix_text, texts[i + 1])
+        logprob_texts = {
+            token_id: _get_new_text(prefix_text, text) or ""
+            for token_id, text in zip(logprob_token_ids,
+                                      texts[i + 2:i + 2 +
+                                            len(logprob_token_ids)])
+        }
+        i += 2 + len(logprob_token_ids)
+        if new_text is None:
+            decoded_tokens.append(
+                DecodedToken(seq_len, "", prefix_offset, read_offset,
+                             logprob_texts))
+        else:
+            decoded_tokens.append(
+                DecodedToken(seq_len, new_text, read_offset, seq_len,
+                             logprob_texts))
+    return decoded_tokens
+
+
 # Based on
 # https://github.com/huggingface/text-generation-inference/blob/v0.9.4/server/text_generation_server/models/model.py#L62C9-L62C15
 # under Apache 2.0 license
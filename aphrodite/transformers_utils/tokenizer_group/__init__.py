@@ -2,18 +2,11 @@ from typing import Optional, Type
 
 from aphrodite.common.config import (ModelConfig, ParallelConfig,
                                      SchedulerConfig, TokenizerPoolConfig)
-from aphrodite.executor.ray_utils import ray
 
 from .base_tokenizer_group import AnyTokenizer, BaseTokenizerGroup
+from .process_tokenizer_group import ProcessTokenizerGroupPool
 from .tokenizer_group import TokenizerGroup
 
-if ray:
-    from aphrodite.transformers_utils.tokenizer_group.ray_tokenizer_group import (  # noqa E501
-        RayTokenizerGroupPool)
-else:
-    RayTokenizerGroupPool = None  # type: ignore
-
-
 def init_tokenizer_from_configs(model_config: ModelConfig,
                                 scheduler_config: SchedulerConfig,
                                 parallel_config: ParallelConfig,
@@ -39,11 +32,17 @@ def get_tokenizer_group(tokenizer_pool_config: Optional[TokenizerPoolConfig],
             tokenizer_pool_config.pool_type, BaseTokenizerGroup):
         tokenizer_cls = tokenizer_pool_config.pool_type
     elif tokenizer_pool_config.pool_type == "ray":
-        if RayTokenizerGroupPool is None:
+        # Imported here, since importing Ray is slow.
+        from aphrodite.executor.ray_utils import ray
+        if not ray:
             raise ImportError(
                 "RayTokenizerGroupPool is not available. Please install "
                 "the ray package to use the Ray tokenizer group pool.")
+        from aphrodite.transformers_utils.tokenizer_group.ray_tokenizer_group import (  # noqa E501
+            RayTokenizerGroupPool)
         tokenizer_cls = RayTokenizerGroupPool
+    elif tokenizer_pool_config.pool_type == "process":
+        tokenizer_cls = ProcessTokenizerGroupPool
     else:
         raise ValueError(
             f"Unknown pool type: {tokenizer_pool_config.pool_type}")
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Union
+from typing import Any, Callable, List, Optional, TypeVar, Union
 
 from transformers import PreTrainedTokenizer, PreTrainedTokenizerFast
 
@@ -8,6 +8,8 @@ from aphrodite.lora.request import LoRARequest
 
 AnyTokenizer = Union[PreTrainedTokenizer, PreTrainedTokenizerFast]
 
+T = TypeVar("T")
+
 
 class BaseTokenizerGroup(ABC):
     """A group of tokenizers that can be used for LoRA adapters."""
@@ -63,6 +65,20 @@ class BaseTokenizerGroup(ABC):
         """Get a tokenizer for a LoRA request."""
         pass
 
+    async def run_async(self,
+                        fn: Callable[..., T],
+                        *args: Any,
+                        lora_request: Optional[LoRARequest] = None,
+                        **kwargs: Any) -> T:
+        """Return `fn(tokenizer, *args, **kwargs)`, where `tokenizer` is the
+        tokenizer for the LoRA request.
+
+        Pools may run `fn` in another process, so it must be a module-level
+        function and its arguments and result must be picklable.
+        """
+        tokenizer = await self.get_lora_tokenizer_async(lora_request)
+        return fn(tokenizer, *args, **kwargs)
+
     def check_health(self):
         """Raise exception if the tokenizer group is unhealthy."""
         return
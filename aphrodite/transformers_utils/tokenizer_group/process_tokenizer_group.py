@@ -0,0 +1,199 @@
+import asyncio
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from aphrodite.common.config import TokenizerPoolConfig
+from aphrodite.executor.multiproc_worker_utils import get_mp_context
+from aphrodite.lora.request import LoRARequest
+from aphrodite.transformers_utils.tokenizer_group.base_tokenizer_group import (
+    AnyTokenizer, BaseTokenizerGroup, T)
+from aphrodite.transformers_utils.tokenizer_group.tokenizer_group import (
+    TokenizerGroup)
+
+# The TokenizerGroup of each worker. Thread-local, since the Rust tokenizers
+# cannot be used from several threads at once.
+_worker = threading.local()
+
+
+def _init_worker(worker_cls: Type[TokenizerGroup],
+                 tokenizer_config: Dict[str, Any]) -> None:
+    _worker.tokenizer_group = worker_cls(**tokenizer_config)
+
+
+def _encode(prompt: str, request_id: Optional[str],
+            lora_request: Optional[LoRARequest]) -> List[int]:
+    return _worker.tokenizer_group.encode(prompt=prompt,
+                                          request_id=request_id,
+                                          lora_request=lora_request)
+
+
+def _call_with_tokenizer(fn: Callable[..., T], lora_request: Optional[
+        LoRARequest], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> T:
+    tokenizer = _worker.tokenizer_group.get_lora_tokenizer(lora_request)
+    return fn(tokenizer, *args, **kwargs)
+
+
+def _ping() -> bool:
+    return True
+
+
+def _is_free_threaded() -> bool:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+class ProcessTokenizerGroupPool(BaseTokenizerGroup):
+    """A pool of worker processes holding TokenizerGroups, to tokenize
+    without blocking the event loop or requiring Ray.
+
+    At most `max_pending` calls are submitted to the workers at once, and
+    the others wait on the event loop, so that a burst of long prompts does
+    not pile up in the pool. The workers are threads instead of processes if
+    `use_threads` is set, which is the default on free-threaded Python
+    builds.
+
+    Both are read from the extra config of the pool, `max_pending` defaulting
+    to 4 times the pool size.
+    """
+
+    # Class to use for workers making up the pool.
+    _worker_cls = TokenizerGroup
+
+    @classmethod
+    def from_config(cls, tokenizer_pool_config: Optional[TokenizerPoolConfig],
+                    **init_kwargs) -> "ProcessTokenizerGroupPool":
+        if not tokenizer_pool_config:
+            raise ValueError("tokenizer_pool_config must not be None.")
+        extra_config = tokenizer_pool_config.extra_config
+        init_kwargs["pool_size"] = tokenizer_pool_config.pool_size
+        init_kwargs["max_pending"] = extra_config.get("max_pending")
+        init_kwargs["use_threads"] = extra_config.get("use_threads")
+        return cls(**init_kwargs)
+
+    def __init__(self,
+                 tokenizer_id: str,
+                 enable_lora: bool,
+                 max_num_seqs: int,
+                 max_input_length: Optional[int],
+                 pool_size: int,
+                 max_pending: Optional[int] = None,
+                 use_threads: Optional[bool] = None,
+                 **tokenizer_config):
+        # Store a local copy of the TokenizerGroup for quick access
+        # to underlying HF tokenizers.
+        self._tokenizer_config = {
+            "tokenizer_id": tokenizer_id,
+            "enable_lora": enable_lora,
+            "max_num_seqs": max_num_seqs,
+            "max_input_length": max_input_length,
+            **tokenizer_config
+        }
+        self._local_tokenizer_group = self._worker_cls(
+            **self._tokenizer_config)
+
+        self.pool_size = pool_size
+        self.max_pending = max_pending or 4 * pool_size
+        if use_threads is None:
+            use_threads = _is_free_threaded()
+        initargs = (self._worker_cls, self._tokenizer_config)
+        self._executor: Executor
+        if use_threads:
+            self._executor = ThreadPoolExecutor(max_workers=pool_size,
+                                                initializer=_init_worker,
+                                                initargs=initargs)
+        else:
+            self._executor = ProcessPoolExecutor(max_workers=pool_size,
+                                                 mp_context=get_mp_context(),
+                                                 initializer=_init_worker,
+                                                 initargs=initargs)
+        self._pending: Optional[asyncio.Semaphore] = None
+
+        # If set, the pool is broken. Will reraise on the next
+        # check_health call.
+        self._exception: Optional[BaseException] = None
+
+    def _ensure_semaphore_initialized(self) -> asyncio.Semaphore:
+        if self._pending is None:
+            self._pending = asyncio.Semaphore(self.max_pending)
+        return self._pending
+
+    def _submit(self, fn: Callable[..., T], *args: Any) -> T:
+        self.check_health()
+        try:
+            return self._executor.submit(fn, *args).result()
+        except BrokenProcessPool as e:
+            self._set_broken(e)
+            raise
+
+    async def _submit_async(self, fn: Callable[..., T], *args: Any) -> T:
+        self.check_health()
+        async with self._ensure_semaphore_initialized():
+            try:
+                return await asyncio.wrap_future(
+                    self._executor.submit(fn, *args))
+            except BrokenProcessPool as e:
+                self._set_broken(e)
+                raise
+
+    def _set_broken(self, e: BaseException) -> None:
+        if self._exception is None:
+            self._exception = e
+
+    def ping(self) -> bool:
+        return self._submit(_ping)
+
+    def encode(self,
+               prompt: str,
+               request_id: Optional[str] = None,
+               lora_request: Optional[LoRARequest] = None) -> List[int]:
+        """Encode a prompt in one of the workers. This is blocking."""
+        return self._submit(_encode, prompt, request_id, lora_request)
+
+    async def encode_async(
+            self,
+            prompt: str,
+            request_id: Optional[str] = None,
+            lora_request: Optional[LoRARequest] = None) -> List[int]:
+        """Encode a prompt in one of the workers, waiting for a free spot if
+        too many calls are pending. This is non-blocking."""
+        return await self._submit_async(_encode, prompt, request_id,
+                                        lora_request)
+
+    async def run_async(self,
+                        fn: Callable[..., T],
+                        *args: Any,
+                        lora_request: Optional[LoRARequest] = None,
+                        **kwargs: Any) -> T:
+        return await self._submit_async(_call_with_tokenizer, fn,
+                                        lora_request, args, kwargs)
+
+    def get_max_input_len(self,
+                          lora_request: Optional[LoRARequest] = None
+                          ) -> Optional[int]:
+        """Get the maximum input length for the LoRA request."""
+        return self._local_tokenizer_group.get_max_input_len(lora_request)
+
+    def get_lora_tokenizer(
+        self,
+        lora_request: Optional[LoRARequest] = None,
+    ) -> AnyTokenizer:
+        return self._local_tokenizer_group.get_lora_tokenizer(lora_request)
+
+    async def get_lora_tokenizer_async(
+        self,
+        lora_request: Optional[LoRARequest] = None,
+    ) -> AnyTokenizer:
+        return await self._local_tokenizer_group.get_lora_tokenizer_async(
+            lora_request)
+
+    def check_health(self):
+        if self._exception:
+            raise RuntimeError(
+                "TokenizerGroupPool is unhealthy.") from self._exception
+
+    def __del__(self):
+        if hasattr(self, "_executor"):
+            self._executor.shutdown(wait=False)
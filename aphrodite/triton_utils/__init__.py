@@ -1,11 +1,28 @@
+import importlib
+
 from aphrodite.triton_utils.importing import HAS_TRITON
 
 __all__ = ["HAS_TRITON"]
 
 if HAS_TRITON:
 
-    from aphrodite.triton_utils.custom_cache_manager import (
-        maybe_set_triton_cache_manager)
-    from aphrodite.triton_utils.libentry import libentry
+    # Imported on first access, since importing triton is slow and most
+    # users of this package only check HAS_TRITON.
+    _LAZY_IMPORTS = {
+        "maybe_set_triton_cache_manager":
+        "aphrodite.triton_utils.custom_cache_manager",
+        "libentry": "aphrodite.triton_utils.libentry",
+    }
+
+    def __getattr__(name: str):
+        if name in _LAZY_IMPORTS:
+            value = getattr(importlib.import_module(_LAZY_IMPORTS[name]),
+                            name)
+            # Replaces the libentry submodule, which importing it set as an
+            # attribute of this package.
+            globals()[name] = value
+            return value
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}")
 
     __all__ += ["maybe_set_triton_cache_manager", "libentry"]
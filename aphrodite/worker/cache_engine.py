@@ -1,13 +1,102 @@
 """CacheEngine class for managing the KV cache."""
-from typing import List
+import math
+import os
+import tempfile
+import weakref
+from typing import Callable, List, Optional, Tuple
 
 import torch
 
 from aphrodite.attention import get_attn_backend
 from aphrodite.common.config import (CacheConfig, DeviceConfig, ModelConfig,
                                      ParallelConfig)
-from aphrodite.common.utils import (STR_DTYPE_TO_TORCH_DTYPE, get_dtype_size,
-                                    is_pin_memory_available)
+from aphrodite.common.utils import (STR_DTYPE_TO_TORCH_DTYPE, GiB_bytes,
+                                    get_dtype_size, is_pin_memory_available)
+from aphrodite.processing.block.offload import PrefixCacheTransfer
+
+
+class PrefixCacheStore:
+    """Holds the content of prefix cache blocks offloaded from the GPU cache:
+    a pinned CPU pool and, optionally, a pool backed by a memory-mapped file
+    in `disk_path`.
+
+    Which blocks go where is decided by the scheduler's PrefixCacheOffloader;
+    this class only runs the transfers it issued.
+    """
+
+    def __init__(
+        self,
+        get_kv_cache_shape: Callable[[int], Tuple[int, ...]],
+        num_layers: int,
+        dtype: torch.dtype,
+        num_cpu_blocks: int,
+        num_disk_blocks: int = 0,
+        disk_path: Optional[str] = None,
+    ) -> None:
+        # The dimension of the KV cache that indexes blocks depends on the
+        # attention backend.
+        shape_1, shape_2 = get_kv_cache_shape(1), get_kv_cache_shape(2)
+        self.block_dim = next(i for i, (a, b) in enumerate(zip(
+            shape_1, shape_2)) if a != b)
+
+        pin_memory = is_pin_memory_available()
+        self.cpu_cache = [
+            torch.zeros(get_kv_cache_shape(num_cpu_blocks),
+                        dtype=dtype,
+                        pin_memory=pin_memory) for _ in range(num_layers)
+        ]
+
+        self.disk_cache: List[torch.Tensor] = []
+        if num_disk_blocks > 0:
+            assert disk_path is not None
+            os.makedirs(disk_path, exist_ok=True)
+            fd, path = tempfile.mkstemp(prefix="prefix_cache_",
+                                        suffix=".bin",
+                                        dir=disk_path)
+            os.close(fd)
+            weakref.finalize(self, os.remove, path)
+            disk_shape = get_kv_cache_shape(num_disk_blocks)
+            disk_cache = torch.from_file(path,
+                                         shared=True,
+                                         size=num_layers *
+                                         math.prod(disk_shape),
+                                         dtype=dtype)
+            self.disk_cache = list(
+                disk_cache.view(num_layers, *disk_shape).unbind(0))
+
+    def transfer(self, gpu_cache: List[torch.Tensor],
+                 transfers: torch.Tensor) -> None:
+        """Run (PrefixCacheTransfer, src, dst) transfers, grouped by kind."""
+        for kind in PrefixCacheTransfer:
+            selected = transfers[transfers[:, 0] == kind]
+            if selected.numel() == 0:
+                continue
+            if kind == PrefixCacheTransfer.SAVE:
+                # A disk block may be saved to twice in a step; the last save
+                # wins.
+                selected = self._last_per_dst(selected)
+            src_cache, dst_cache = {
+                PrefixCacheTransfer.SAVE: (self.cpu_cache, self.disk_cache),
+                PrefixCacheTransfer.DEMOTE: (gpu_cache, self.cpu_cache),
+                PrefixCacheTransfer.LOAD: (self.disk_cache, self.cpu_cache),
+                PrefixCacheTransfer.PROMOTE: (self.cpu_cache, gpu_cache),
+            }[kind]
+            for src, dst in zip(src_cache, dst_cache):
+                blocks = src.index_select(self.block_dim,
+                                          selected[:, 1].to(src.device))
+                dst.index_copy_(self.block_dim, selected[:, 2].to(dst.device),
+                                blocks.to(dst.device))
+
+    @staticmethod
+    def _last_per_dst(transfers: torch.Tensor) -> torch.Tensor:
+        rows: List[int] = []
+        seen = set()
+        dsts = transfers[:, 2].tolist()
+        for i in range(len(dsts) - 1, -1, -1):
+            if dsts[i] not in seen:
+                seen.add(dsts[i])
+                rows.append(i)
+        return transfers[sorted(rows)]
 
 
 class CacheEngine:
@@ -64,6 +153,23 @@ class CacheEngine:
             self.num_gpu_blocks, self.device_config.device_type)
         self.cpu_cache = self._allocate_kv_cache(self.num_cpu_blocks, "cpu")
 
+        # Initialize the prefix cache offload tiers.
+        self.prefix_cache_store: Optional[PrefixCacheStore] = None
+        num_prefix_cache_cpu_blocks, num_prefix_cache_disk_blocks = (
+            self.get_num_prefix_cache_blocks(cache_config, model_config,
+                                             parallel_config))
+        if num_prefix_cache_cpu_blocks > 0:
+            self.prefix_cache_store = PrefixCacheStore(
+                lambda num_blocks: self.attn_backend.get_kv_cache_shape(
+                    num_blocks, self.block_size, self.num_kv_heads, self.
+                    head_size),
+                self.num_attention_layers,
+                self.dtype,
+                num_prefix_cache_cpu_blocks,
+                num_prefix_cache_disk_blocks,
+                cache_config.prefix_cache_disk_path,
+            )
+
     def _allocate_kv_cache(
         self,
         num_blocks: int,
@@ -98,6 +204,33 @@ class CacheEngine:
     def copy(self, src_to_dsts: torch.Tensor) -> None:
         self.attn_backend.copy_blocks(self.gpu_cache, src_to_dsts)
 
+    def transfer_prefix_cache_blocks(self, transfers: torch.Tensor) -> None:
+        assert self.prefix_cache_store is not None
+        self.prefix_cache_store.transfer(self.gpu_cache, transfers)
+
+    @staticmethod
+    def get_num_prefix_cache_blocks(
+        cache_config: CacheConfig,
+        model_config: ModelConfig,
+        parallel_config: ParallelConfig,
+    ) -> Tuple[int, int]:
+        """Return the number of CPU and disk blocks per virtual engine that
+        evicted prefix cache blocks are offloaded to."""
+        if (not cache_config.enable_prefix_caching
+                or cache_config.prefix_cache_cpu_gb <= 0):
+            return 0, 0
+        cache_block_size = CacheEngine.get_cache_block_size(
+            cache_config, model_config, parallel_config)
+        pipeline_parallel_size = parallel_config.pipeline_parallel_size
+        num_cpu_blocks = int(cache_config.prefix_cache_cpu_gb * GiB_bytes //
+                             cache_block_size) // pipeline_parallel_size
+        num_disk_blocks = 0
+        if cache_config.prefix_cache_disk_path is not None:
+            num_disk_blocks = int(cache_config.prefix_cache_disk_gb *
+                                  GiB_bytes //
+                                  cache_block_size) // pipeline_parallel_size
+        return num_cpu_blocks, num_disk_blocks
+
     @staticmethod
     def get_cache_block_size(
         cache_config: CacheConfig,
@@ -15,6 +15,7 @@ from aphrodite.common.utils import STR_DTYPE_TO_TORCH_DTYPE
 from aphrodite.distributed import (ensure_model_parallel_initialized,
                                    init_distributed_environment)
 from aphrodite.modeling import set_random_seed
+from aphrodite.worker.cache_engine import CacheEngine, PrefixCacheStore
 from aphrodite.worker.cpu_enc_dec_model_runner import (
     CPUEncoderDecoderModelRunner)
 from aphrodite.worker.cpu_model_runner import CPUModelRunner
@@ -28,7 +29,7 @@ class CPUCacheEngine:
 
     This class is responsible for initializing and managing CPU KV
     caches. It also provides methods for performing KV cache operations, such
-    as copying.
+    as copying and prefix cache offload transfers.
     """
 
     def __init__(self, cache_config: CacheConfig, model_config: ModelConfig,
@@ -67,6 +68,24 @@ class CPUCacheEngine:
         # Initialize the cache.
         self.cpu_cache = self._allocate_kv_cache(self.num_cpu_blocks)
 
+        # Initialize the prefix cache offload tiers.
+        self.prefix_cache_store: Optional[PrefixCacheStore] = None
+        num_prefix_cache_cpu_blocks, num_prefix_cache_disk_blocks = (
+            CacheEngine.get_num_prefix_cache_blocks(cache_config,
+                                                    model_config,
+                                                    parallel_config))
+        if num_prefix_cache_cpu_blocks > 0:
+            self.prefix_cache_store = PrefixCacheStore(
+                lambda num_blocks: self.attn_backend.get_kv_cache_shape(
+                    num_blocks, self.block_size, self.num_heads, self.
+                    head_size),
+                self.num_layers,
+                self.dtype,
+                num_prefix_cache_cpu_blocks,
+                num_prefix_cache_disk_blocks,
+                cache_config.prefix_cache_disk_path,
+            )
+
     def _allocate_kv_cache(
         self,
         num_blocks: int,
@@ -89,6 +108,10 @@ class CPUCacheEngine:
     def copy(self, src_to_dsts: Dict[int, List[int]]) -> None:
         self.attn_backend.copy_blocks(self.cpu_cache, src_to_dsts)
 
+    def transfer_prefix_cache_blocks(self, transfers: torch.Tensor) -> None:
+        assert self.prefix_cache_store is not None
+        self.prefix_cache_store.transfer(self.cpu_cache, transfers)
+
     @staticmethod
     def get_cache_block_size(
         block_size: int,
@@ -294,10 +317,15 @@ class CPUWorker(LoraNotSupportedWorkerBase, LocalOrDistributedWorkerBase):
         self,
         worker_input: WorkerInput,
     ) -> None:
+        cache_engine = self.cache_engine[worker_input.virtual_engine]
+        # Prefix cache transfers go first, as on the GPU worker.
+        if (worker_input.prefix_cache_transfers is not None
+                and worker_input.prefix_cache_transfers.numel() > 0):
+            cache_engine.transfer_prefix_cache_blocks(
+                worker_input.prefix_cache_transfers)
         if (worker_input.blocks_to_copy is not None
                 and worker_input.blocks_to_copy.numel() > 0):
-            self.cache_engine[worker_input.virtual_engine].copy(
-                worker_input.blocks_to_copy)
+            cache_engine.copy(worker_input.blocks_to_copy)
 
     @torch.inference_mode()
     def prepare_worker_input(
@@ -309,11 +337,16 @@ class CPUWorker(LoraNotSupportedWorkerBase, LocalOrDistributedWorkerBase):
         blocks_to_copy = torch.tensor(execute_model_req.blocks_to_copy,
                                       device="cpu",
                                       dtype=torch.int64).view(-1, 2)
+        prefix_cache_transfers = torch.tensor(
+            execute_model_req.prefix_cache_transfers,
+            device="cpu",
+            dtype=torch.int64).view(-1, 3)
         assert len(execute_model_req.blocks_to_swap_in) == 0
         assert len(execute_model_req.blocks_to_swap_out) == 0
         return WorkerInput(
             num_seq_groups=num_seq_groups,
             blocks_to_copy=blocks_to_copy,
+            prefix_cache_transfers=prefix_cache_transfers,
             virtual_engine=virtual_engine,
         )
 
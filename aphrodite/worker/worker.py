@@ -16,6 +16,7 @@ from aphrodite.common.sequence import (ExecuteModelRequest,
                                        IntermediateTensors,
                                        SequenceGroupMetadata,
                                        SequenceGroupMetadataDelta)
+from aphrodite.common.startup_trace import startup_phase
 from aphrodite.distributed import (ensure_model_parallel_initialized,
                                    get_tensor_model_parallel_rank,
                                    init_distributed_environment,
@@ -283,7 +284,8 @@ class Worker(LocalOrDistributedWorkerBase):
 
     def _warm_up_model(self) -> None:
         if not self.model_config.enforce_eager:
-            self.model_runner.capture_model(self.gpu_cache)
+            with startup_phase("capture_cuda_graphs"):
+                self.model_runner.capture_model(self.gpu_cache)
         # Reset the seed to ensure that the random state is not affected by
         # the model initialization and profiling.
         set_random_seed(self.model_config.seed)
@@ -316,18 +318,30 @@ class Worker(LocalOrDistributedWorkerBase):
         blocks_to_copy = torch.tensor(execute_model_req.blocks_to_copy,
                                       device=self.device,
                                       dtype=torch.int64).view(-1, 2)
+        # `prefix_cache_transfers` is a cpu tensor of
+        # (PrefixCacheTransfer, src, dst) rows.
+        prefix_cache_transfers = torch.tensor(
+            execute_model_req.prefix_cache_transfers,
+            device="cpu",
+            dtype=torch.int64).view(-1, 3)
 
         return WorkerInput(num_seq_groups=num_seq_groups,
                            blocks_to_swap_in=blocks_to_swap_in,
                            blocks_to_swap_out=blocks_to_swap_out,
                            blocks_to_copy=blocks_to_copy,
+                           prefix_cache_transfers=prefix_cache_transfers,
                            virtual_engine=virtual_engine,
                            num_steps=num_steps)
 
     @torch.inference_mode()
     def execute_worker(self, worker_input: WorkerInput) -> None:
         virtual_engine = worker_input.virtual_engine
-        # Issue cache operations.
+        # Issue cache operations. Prefix cache transfers go first since blocks
+        # demoted by them may be overwritten by the swaps.
+        if (worker_input.prefix_cache_transfers is not None
+                and worker_input.prefix_cache_transfers.numel() > 0):
+            self.cache_engine[virtual_engine].transfer_prefix_cache_blocks(
+                worker_input.prefix_cache_transfers)
         if (worker_input.blocks_to_swap_in is not None
                 and worker_input.blocks_to_swap_in.numel() > 0):
             self.cache_engine[virtual_engine].swap_in(
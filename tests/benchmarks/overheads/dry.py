@@ -0,0 +1,219 @@
+"""Benchmark the per-step cost of DRY sampling against the previous
+per-row Python implementation, across context lengths and batch sizes."""
+import random
+import time
+from typing import List
+
+import torch
+
+from aphrodite.common.sampling_params import SamplingParams
+from aphrodite.common.sequence import SequenceData, SequenceGroupMetadata
+from aphrodite.common.utils import FlexibleArgumentParser
+from aphrodite.modeling.layers.sampler import _apply_dry
+from aphrodite.modeling.sampling_metadata import (SamplingMetadata,
+                                                  SamplingTensors)
+
+
+def apply_dry_legacy(
+    logits: torch.Tensor,
+    input_token_ids: torch.Tensor,
+    output_token_ids: torch.Tensor,
+    multipliers: torch.Tensor,
+    bases: torch.Tensor,
+    allowed_lengths: torch.Tensor,
+    sequence_breakers_ids: torch.Tensor,
+    ranges: torch.Tensor,
+    max_ngram: torch.Tensor,
+    max_occurrences: torch.Tensor,
+    early_exit_match_len: torch.Tensor,
+) -> torch.Tensor:
+    """The per-row DRY loop that `_apply_dry` replaced, kept as the
+    baseline for this benchmark."""
+    VOCAB_SIZE = logits.size(-1)
+
+    applies_to = multipliers.nonzero(as_tuple=True)[0]
+    for irow in applies_to.tolist():
+        prompt_len = len(input_token_ids[irow]) - (
+            input_token_ids[irow] == VOCAB_SIZE).sum().item()
+        output_len = len(output_token_ids[irow]) - (
+            output_token_ids[irow] == VOCAB_SIZE).sum().item()
+
+        token_seq = torch.cat(
+            (input_token_ids[irow][:prompt_len],
+             output_token_ids[irow][:output_len]),
+            dim=0
+        )
+
+        range_limit = ranges[irow].item()
+        if range_limit > 0:
+            token_seq = token_seq[-range_limit:]
+
+        if token_seq.size(0) < 2:
+            continue
+
+        last_token = token_seq[-1].item()
+        if last_token in sequence_breakers_ids[irow]:
+            continue
+
+        break_mask = torch.zeros(len(token_seq),
+                                 dtype=torch.bool, device=logits.device)
+        for break_tok in sequence_breakers_ids[irow]:
+            break_mask.logical_or_(token_seq == break_tok)
+
+        curr_max_ngram = 0
+        max_ngram_val = max_ngram[irow].item()
+        for curr_max_ngram in range(min(len(break_mask), max_ngram_val + 1)):
+            if break_mask[-curr_max_ngram - 1]:
+                break
+
+        min_ngram = allowed_lengths[irow].item()
+        if curr_max_ngram <= min_ngram:
+            continue
+
+        ngram_lens = torch.zeros(
+            VOCAB_SIZE, dtype=torch.int32, device=logits.device)
+
+        endpoint_indexes_all = torch.nonzero(
+            token_seq == last_token, as_tuple=True)[0].tolist()
+        if len(endpoint_indexes_all) < 2:
+            continue
+        endpoint_indexes = endpoint_indexes_all[:-1]
+
+        max_occurrences_val = max_occurrences[irow].item()
+        if len(endpoint_indexes) > max_occurrences_val:
+            endpoint_indexes = endpoint_indexes[-max_occurrences_val:]
+
+        early_exit_match_len_val = early_exit_match_len[irow].item()
+        for idx in reversed(endpoint_indexes):
+            if idx == len(token_seq) - 1:
+                continue
+
+            match_len = 0
+            for unwind in range(1, min(idx, curr_max_ngram) + 1):
+                if break_mask[idx - unwind]:
+                    break
+                if token_seq[idx - unwind] != token_seq[-unwind - 1]:
+                    break
+                match_len = unwind
+
+            if match_len > 0:
+                next_tok = token_seq[idx + 1]
+                new_len = match_len + 1
+
+                ngram_lens[next_tok] = max(ngram_lens[next_tok].item(), new_len)
+
+                if new_len >= early_exit_match_len_val:
+                    break
+
+        penalty_mask = ngram_lens > 0
+        if penalty_mask.any():
+            scales = bases[irow] ** (ngram_lens[penalty_mask] - min_ngram)
+            logits[irow][penalty_mask] -= multipliers[irow] * scales
+
+    return logits
+
+
+def make_batch(batch_size: int, context_len: int, vocab_size: int,
+               device: str) -> List[SequenceGroupMetadata]:
+    """Build decode-stage sequence groups whose contexts contain plenty of
+    repetition, which is the expensive case for DRY."""
+    # A small pool of phrases makes repeated n-grams common.
+    phrases = [[random.randrange(vocab_size) for _ in range(8)]
+               for _ in range(64)]
+    seq_group_metadata_list = []
+    for i in range(batch_size):
+        tokens: List[int] = []
+        while len(tokens) < context_len:
+            tokens.extend(random.choice(phrases))
+        prompt_len = context_len // 2
+        seq_data = SequenceData.from_seqs(tokens[:prompt_len],
+                                          tokens[prompt_len:context_len])
+        seq_data.update_num_computed_tokens(context_len - 1)
+        seq_group_metadata_list.append(
+            SequenceGroupMetadata(
+                request_id=f"bench_{i}",
+                is_prompt=False,
+                seq_data={i: seq_data},
+                sampling_params=SamplingParams(dry_multiplier=0.8,
+                                               dry_sequence_breaker_ids=[0]),
+                block_tables={i: [1]},
+            ))
+    return seq_group_metadata_list
+
+
+@torch.inference_mode()
+def run_benchmark(batch_size: int, context_len: int, num_steps: int,
+                  vocab_size: int, device: str) -> None:
+    seq_group_metadata_list = make_batch(batch_size, context_len, vocab_size,
+                                         device)
+    sampling_metadata = SamplingMetadata.prepare(
+        seq_group_metadata_list,
+        seq_lens=[context_len] * batch_size,
+        query_lens=[1] * batch_size,
+        device=device,
+        pin_memory=False)
+    logits = torch.randn(batch_size, vocab_size, device=device)
+    (t, *_) = SamplingTensors.from_sampling_metadata(sampling_metadata,
+                                                     vocab_size, device,
+                                                     logits.dtype)
+
+    def legacy_step():
+        apply_dry_legacy(logits.clone(), t.prompt_tokens, t.output_tokens,
+                         t.dry_multipliers, t.dry_bases,
+                         t.dry_allowed_lengths, t.dry_sequence_breaker_ids,
+                         t.dry_ranges, t.dry_max_ngram,
+                         t.dry_max_occurrences, t.dry_early_exit_match_len)
+
+    def batched_step():
+        _apply_dry(logits.clone(), sampling_metadata, t.prompt_tokens,
+                   t.output_tokens, t.dry_multipliers, t.dry_bases,
+                   t.dry_allowed_lengths, t.dry_sequence_breaker_ids,
+                   t.dry_early_exit_match_len)
+
+    def time_step(step_fn, steps: int) -> float:
+        step_fn()  # warmup, also builds the per-sequence token index.
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for _ in range(steps):
+            step_fn()
+        if device.startswith("cuda"):
+            torch.cuda.synchronize()
+        return (time.perf_counter() - start) / steps * 1000
+
+    batched_ms = time_step(batched_step, num_steps)
+    # The legacy loop is slow enough that a couple of steps suffice.
+    legacy_ms = time_step(legacy_step, max(1, num_steps // 10))
+    print(f"context_len={context_len:>6} batch_size={batch_size:>4} "
+          f"legacy={legacy_ms:10.2f} ms/step batched={batched_ms:8.2f} "
+          f"ms/step speedup={legacy_ms / batched_ms:8.1f}x")
+
+
+def main(args):
+    random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    for context_len in args.context_lens:
+        for batch_size in args.batch_sizes:
+            run_benchmark(batch_size, context_len, args.num_steps,
+                          args.vocab_size, args.device)
+
+
+if __name__ == "__main__":
+    parser = FlexibleArgumentParser(
+        description="Benchmark the per-step latency of DRY sampling.")
+    parser.add_argument("--context-lens",
+                        type=int,
+                        nargs="+",
+                        default=[1024, 8192, 32768])
+    parser.add_argument("--batch-sizes",
+                        type=int,
+                        nargs="+",
+                        default=[1, 16, 64, 256])
+    parser.add_argument("--num-steps", type=int, default=20)
+    parser.add_argument("--vocab-size", type=int, default=32000)
+    parser.add_argument("--device",
+                        type=str,
+                        default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,99 @@
+"""Benchmark the per-step cost of masking the logits of guided decoding
+requests, by building a mask from the allowed tokens of each row versus
+applying the cached bitmasks of the batch at once."""
+import random
+import time
+from typing import List
+
+import torch
+
+from aphrodite.common.utils import FlexibleArgumentParser
+from aphrodite.modeling.guided_decoding.token_bitmask import (
+    TokenBitmaskCache, apply_token_bitmasks, pack_token_bitmask)
+
+
+@torch.inference_mode()
+def run_benchmark(batch_size: int, vocab_size: int, num_states: int,
+                  num_allowed: int, num_steps: int, device: str) -> None:
+    # The allowed tokens of the states of a schema, shared by the batch.
+    allowed_tokens = [
+        random.sample(range(vocab_size), random.randint(1, num_allowed))
+        for _ in range(num_states)
+    ]
+    steps = [[random.randrange(num_states) for _ in range(batch_size)]
+             for _ in range(num_steps)]
+    cache = TokenBitmaskCache(max_size=num_states)
+    logits = torch.randn(batch_size, vocab_size, device=device)
+
+    def per_row(logits: torch.Tensor, states: List[int]) -> None:
+        for row, state in enumerate(states):
+            mask = torch.full((vocab_size, ),
+                              -float("inf"),
+                              device=logits.device)
+            mask[allowed_tokens[state]] = 0
+            logits[row] += mask
+
+    def batched(logits: torch.Tensor, states: List[int]) -> None:
+        bitmasks = [
+            cache.get(state,
+                      lambda state=state: pack_token_bitmask(
+                          allowed_tokens[state], vocab_size))
+            for state in states
+        ]
+        apply_token_bitmasks(logits, list(range(batch_size)), bitmasks)
+
+    def time_steps(apply) -> float:
+        total = 0.0
+        for states in steps:
+            step_logits = logits.clone()
+            if device.startswith("cuda"):
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            apply(step_logits, states)
+            if device.startswith("cuda"):
+                torch.cuda.synchronize()
+            total += time.perf_counter() - start
+        return total / num_steps * 1000
+
+    per_row_ms = time_steps(per_row)
+    batched_ms = time_steps(batched)
+    print(f"vocab_size={vocab_size:>6} batch_size={batch_size:>4} "
+          f"num_states={num_states:>4} "
+          f"per_row={per_row_ms:8.2f} ms/step "
+          f"batched={batched_ms:8.2f} ms/step "
+          f"speedup={per_row_ms / batched_ms:5.1f}x "
+          f"hit_rate={cache.num_hits / cache.num_queries:.2f}")
+
+
+def main(args):
+    random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    for batch_size in args.batch_sizes:
+        run_benchmark(batch_size, args.vocab_size, args.num_states,
+                      args.num_allowed, args.num_steps, args.device)
+
+
+if __name__ == "__main__":
+    parser = FlexibleArgumentParser(
+        description="Benchmark guided decoding masks built per row versus "
+        "cached bitmasks applied to the batch at once.")
+    parser.add_argument("--batch-sizes",
+                        type=int,
+                        nargs="+",
+                        default=[8, 32, 128])
+    parser.add_argument("--vocab-size", type=int, default=128256)
+    parser.add_argument("--num-states",
+                        type=int,
+                        default=64,
+                        help="Number of states of the shared schema.")
+    parser.add_argument("--num-allowed",
+                        type=int,
+                        default=20000,
+                        help="Maximum number of tokens allowed by a state.")
+    parser.add_argument("--num-steps", type=int, default=20)
+    parser.add_argument("--device",
+                        type=str,
+                        default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
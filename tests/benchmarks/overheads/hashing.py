@@ -1,8 +1,13 @@
 import cProfile
 import pstats
+import random
+import time
+from array import array
 
 from aphrodite import LLM, SamplingParams
 from aphrodite.common.utils import FlexibleArgumentParser
+from aphrodite.processing.block.hashing import (get_extra_hash,
+                                                hash_token_blocks)
 
 # A very long prompt, total number of tokens is about 15k.
 LONG_PROMPT = ["You are an expert in large language models, aren't you?"
@@ -10,7 +15,45 @@ LONG_PROMPT = ["You are an expert in large language models, aren't you?"
 LONG_PROMPT = ' '.join(LONG_PROMPT)
 
 
+def benchmark_block_hashing(num_tokens: int, block_size: int,
+                            num_iters: int) -> None:
+    """Time hashing the blocks of a prompt for prefix caching, one tuple of
+    tokens at a time versus all the blocks at once, without a model."""
+    token_ids = [random.randrange(150_000) for _ in range(num_tokens)]
+    # How SequenceData stores the tokens.
+    token_ids_array = array("l", token_ids)
+    extra_hash = get_extra_hash(lora_int_id=1)
+
+    def per_block():
+        block_hashes = []
+        for start in range(0, num_tokens - block_size + 1, block_size):
+            block_hashes.append(
+                hash((not block_hashes,
+                      block_hashes[-1] if block_hashes else None,
+                      *token_ids[start:start + block_size])))
+        return block_hashes
+
+    def batched():
+        return hash_token_blocks(None, token_ids_array, block_size,
+                                 extra_hash)
+
+    for name, hash_blocks in [("per_block", per_block), ("batched", batched)]:
+        hash_blocks()
+        start = time.perf_counter()
+        for _ in range(num_iters):
+            hash_blocks()
+        elapsed_ms = (time.perf_counter() - start) / num_iters * 1000
+        print(f"{name:>9}: {elapsed_ms:8.3f} ms per {num_tokens}-token "
+              f"prompt (block_size={block_size})")
+
+
 def main(args):
+    if args.hashing_only:
+        random.seed(0)
+        benchmark_block_hashing(args.num_tokens, args.block_size,
+                                args.num_iters)
+        return
+
     llm = LLM(
         model=args.model,
         enforce_eager=True,
@@ -59,5 +102,12 @@ if __name__ == "__main__":
     parser.add_argument('--use-v2-block-manager',
                         action='store_true',
                         help='Use BlockSpaceMangerV2')
+    parser.add_argument('--hashing-only',
+                        action='store_true',
+                        help='Only time hashing the blocks of a prompt of '
+                        '--num-tokens tokens, without a model.')
+    parser.add_argument('--num-tokens', type=int, default=100_000)
+    parser.add_argument('--block-size', type=int, default=16)
+    parser.add_argument('--num-iters', type=int, default=20)
     args = parser.parse_args()
     main(args)
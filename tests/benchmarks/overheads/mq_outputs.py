@@ -0,0 +1,109 @@
+"""Benchmark the per-step cost of sending the request outputs of the
+multiprocessing engine to the server, pickled as a whole versus encoded
+incrementally with msgspec, across numbers of concurrent streams."""
+import pickle
+import random
+import time
+
+from aphrodite.common.outputs import CompletionOutput, RequestOutput
+from aphrodite.common.sampling_params import SamplingParams
+from aphrodite.common.sequence import Logprob, RequestMetrics
+from aphrodite.common.utils import FlexibleArgumentParser
+from aphrodite.engine.multiprocessing.outputs import (RequestOutputDecoder,
+                                                      RequestOutputEncoder)
+
+
+def make_output(request_id: str, prompt_len: int, output_len: int,
+                logprobs: bool) -> RequestOutput:
+    token_ids = tuple(random.randrange(32000) for _ in range(output_len))
+    return RequestOutput(
+        request_id=request_id,
+        prompt="word " * prompt_len,
+        prompt_token_ids=[random.randrange(32000) for _ in range(prompt_len)],
+        prompt_logprobs=None,
+        outputs=[
+            CompletionOutput(index=0,
+                             text="word " * output_len,
+                             token_ids=token_ids,
+                             cumulative_logprob=-1.0,
+                             logprobs=[{
+                                 token_id: Logprob(-0.5, 1, "word ")
+                             } for token_id in token_ids]
+                             if logprobs else None)
+        ],
+        finished=False,
+        metrics=RequestMetrics(arrival_time=0.0,
+                               last_token_time=0.0,
+                               first_scheduled_time=0.0,
+                               first_token_time=0.0,
+                               time_in_queue=0.0))
+
+
+def run_benchmark(num_streams: int, prompt_len: int, output_len: int,
+                  num_steps: int, logprobs: bool) -> None:
+    # The outputs of each step, as the engine would produce them.
+    steps = [[
+        make_output(str(i), prompt_len, output_len + step, logprobs)
+        for i in range(num_streams)
+    ] for step in range(num_steps)]
+
+    start = time.perf_counter()
+    num_bytes = 0
+    for outputs in steps:
+        data = pickle.dumps(outputs)
+        num_bytes += len(data)
+        pickle.loads(data)
+    pickle_ms = (time.perf_counter() - start) / num_steps * 1000
+    pickle_kb = num_bytes / num_steps / 1024
+
+    encoder = RequestOutputEncoder()
+    decoder = RequestOutputDecoder()
+    params = SamplingParams()
+    for i in range(num_streams):
+        encoder.add_request(str(i), params)
+    # The first step sends the prompts.
+    for delta in decoder.decode(encoder.encode(steps[0])):
+        decoder.to_request_output(delta)
+    start = time.perf_counter()
+    num_bytes = 0
+    for outputs in steps[1:]:
+        data = encoder.encode(outputs)
+        num_bytes += len(data)
+        for delta in decoder.decode(data):
+            decoder.to_request_output(delta)
+    msgspec_ms = (time.perf_counter() - start) / (num_steps - 1) * 1000
+    msgspec_kb = num_bytes / (num_steps - 1) / 1024
+
+    print(f"streams={num_streams:>4} output_len={output_len:>5} "
+          f"logprobs={logprobs!s:>5} "
+          f"pickle={pickle_ms:7.2f} ms/step {pickle_kb:8.1f} KiB "
+          f"msgspec={msgspec_ms:7.2f} ms/step {msgspec_kb:8.1f} KiB "
+          f"speedup={pickle_ms / msgspec_ms:5.1f}x")
+
+
+def main(args):
+    random.seed(args.seed)
+    for logprobs in (False, True):
+        for output_len in args.output_lens:
+            for num_streams in args.num_streams:
+                run_benchmark(num_streams, args.prompt_len, output_len,
+                              args.num_steps, logprobs)
+
+
+if __name__ == "__main__":
+    parser = FlexibleArgumentParser(
+        description="Benchmark the encoding of the request outputs sent by "
+        "the multiprocessing engine.")
+    parser.add_argument("--num-streams",
+                        type=int,
+                        nargs="+",
+                        default=[16, 64, 256])
+    parser.add_argument("--output-lens",
+                        type=int,
+                        nargs="+",
+                        default=[128, 1024])
+    parser.add_argument("--prompt-len", type=int, default=1024)
+    parser.add_argument("--num-steps", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,176 @@
+"""Benchmark the per-step cost of the truncation samplers on batches that mix
+sampling presets, applied one after the other to every row versus grouped by
+the sampler plan, which sorts the logits once per group and only truncates
+the rows that use the group."""
+import random
+import time
+from typing import Callable, Dict, List
+
+import torch
+
+from aphrodite.common.sampling_params import SamplingParams
+from aphrodite.common.sequence import SequenceData, SequenceGroupMetadata
+from aphrodite.common.utils import FlexibleArgumentParser
+from aphrodite.modeling.layers.sampler import (SamplerID, _apply_epsilon_cutoff,
+                                               _apply_eta_cutoff,
+                                               _apply_min_p, _apply_tfs,
+                                               _apply_top_a,
+                                               _apply_top_k_top_p,
+                                               _apply_truncations,
+                                               _get_sampler_plan)
+from aphrodite.modeling.sampling_metadata import (PersistentSamplingState,
+                                                  SamplingMetadata,
+                                                  SamplingTensors)
+
+PRESETS = {
+    "greedy": SamplingParams(temperature=0.0),
+    "min_p": SamplingParams(temperature=1.0, min_p=0.05),
+    "top_p_top_k": SamplingParams(temperature=0.7, top_p=0.9, top_k=40),
+    "creative": SamplingParams(temperature=1.2, top_a=0.2, tfs=0.95),
+    "cutoffs": SamplingParams(temperature=0.9,
+                              min_p=0.02,
+                              eta_cutoff=3e-4,
+                              epsilon_cutoff=3e-4),
+}
+
+SAMPLER_ORDERS = {
+    "default": [
+        SamplerID.TOP_P_TOP_K, SamplerID.TOP_A, SamplerID.MIN_P,
+        SamplerID.TFS, SamplerID.ETA_CUTOFF, SamplerID.EPSILON_CUTOFF
+    ],
+    "min_p_first": [
+        SamplerID.MIN_P, SamplerID.TOP_P_TOP_K, SamplerID.TFS,
+        SamplerID.TOP_A, SamplerID.EPSILON_CUTOFF, SamplerID.ETA_CUTOFF
+    ],
+}
+
+APPLY_SAMPLER: Dict[SamplerID, Callable[[torch.Tensor, SamplingTensors],
+                                        torch.Tensor]] = {
+    SamplerID.TOP_P_TOP_K:
+    lambda logits, t: _apply_top_k_top_p(logits, t.top_ps, t.top_ks),
+    SamplerID.TOP_A: lambda logits, t: _apply_top_a(logits, t.top_as.clone()),
+    SamplerID.MIN_P: lambda logits, t: _apply_min_p(logits, t.min_ps.clone()),
+    SamplerID.TFS: lambda logits, t: _apply_tfs(logits, t.tfss),
+    SamplerID.ETA_CUTOFF:
+    lambda logits, t: _apply_eta_cutoff(logits, t.eta_cutoffs),
+    SamplerID.EPSILON_CUTOFF:
+    lambda logits, t: _apply_epsilon_cutoff(logits, t.epsilon_cutoffs),
+}
+
+
+def make_batch(batch_size: int,
+               presets: List[str]) -> List[SequenceGroupMetadata]:
+    seq_group_metadata_list: List[SequenceGroupMetadata] = []
+    for i in range(batch_size):
+        seq_data = SequenceData.from_seqs([1, 2, 3])
+        seq_group_metadata_list.append(
+            SequenceGroupMetadata(
+                request_id=f"bench_{i}",
+                is_prompt=False,
+                seq_data={i: seq_data},
+                sampling_params=PRESETS[random.choice(presets)],
+                block_tables={i: [0]},
+            ))
+    return seq_group_metadata_list
+
+
+@torch.inference_mode()
+def run_benchmark(batch_size: int, vocab_size: int, presets: List[str],
+                  order_name: str, num_steps: int, device: str) -> None:
+    seq_group_metadata_list = make_batch(batch_size, presets)
+    sampling_metadata = SamplingMetadata.prepare(seq_group_metadata_list,
+                                                 seq_lens=[3] * batch_size,
+                                                 query_lens=[1] * batch_size,
+                                                 device=device,
+                                                 pin_memory=False)
+    state = PersistentSamplingState(vocab_size, torch.device(device),
+                                    torch.float32)
+    (sampling_tensors, _, _, _, do_top_p_top_k, do_top_as, do_min_p, do_tfss,
+     do_eta_cutoffs, do_epsilon_cutoffs, *_) = state.get_sampling_tensors(
+         sampling_metadata)
+    enabled = {
+        SamplerID.TOP_P_TOP_K: do_top_p_top_k,
+        SamplerID.TOP_A: do_top_as,
+        SamplerID.MIN_P: do_min_p,
+        SamplerID.TFS: do_tfss,
+        SamplerID.ETA_CUTOFF: do_eta_cutoffs,
+        SamplerID.EPSILON_CUTOFF: do_epsilon_cutoffs,
+    }
+    order = SAMPLER_ORDERS[order_name]
+    plan = _get_sampler_plan(order, enabled)
+    logits = torch.randn(batch_size, vocab_size, device=device) * 3
+
+    def sequential(logits: torch.Tensor) -> torch.Tensor:
+        for sampler_id in order:
+            if enabled[sampler_id]:
+                logits = APPLY_SAMPLER[sampler_id](logits, sampling_tensors)
+        return logits
+
+    def planned(logits: torch.Tensor) -> torch.Tensor:
+        for step in plan:
+            if isinstance(step, tuple):
+                logits = _apply_truncations(logits, step, sampling_tensors,
+                                            state.get_sampler_rows(step))
+            else:
+                logits = APPLY_SAMPLER[step](logits, sampling_tensors)
+        return logits
+
+    def time_steps(apply) -> float:
+        apply(logits.clone())
+        total = 0.0
+        for _ in range(num_steps):
+            step_logits = logits.clone()
+            if device.startswith("cuda"):
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            apply(step_logits)
+            if device.startswith("cuda"):
+                torch.cuda.synchronize()
+            total += time.perf_counter() - start
+        return total / num_steps * 1000
+
+    sequential_ms = time_steps(sequential)
+    planned_ms = time_steps(planned)
+    print(f"vocab_size={vocab_size:>6} batch_size={batch_size:>4} "
+          f"presets={'+'.join(presets):<32} order={order_name:<11} "
+          f"sequential={sequential_ms:8.2f} ms/step "
+          f"planned={planned_ms:8.2f} ms/step "
+          f"speedup={sequential_ms / planned_ms:5.1f}x")
+
+
+def main(args):
+    random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    for presets in args.mixes:
+        for order_name in SAMPLER_ORDERS:
+            for batch_size in args.batch_sizes:
+                run_benchmark(batch_size, args.vocab_size,
+                              presets.split("+"), order_name, args.num_steps,
+                              args.device)
+
+
+if __name__ == "__main__":
+    parser = FlexibleArgumentParser(
+        description="Benchmark the truncation samplers applied one after "
+        "the other versus grouped by the sampler plan.")
+    parser.add_argument("--mixes",
+                        type=str,
+                        nargs="+",
+                        default=[
+                            "greedy+min_p+top_p_top_k",
+                            "min_p+top_p_top_k+creative+cutoffs",
+                        ],
+                        help="Presets mixed in each batch, joined by '+'. "
+                        f"Choices: {', '.join(PRESETS)}.")
+    parser.add_argument("--batch-sizes",
+                        type=int,
+                        nargs="+",
+                        default=[8, 32, 128])
+    parser.add_argument("--vocab-size", type=int, default=128256)
+    parser.add_argument("--num-steps", type=int, default=10)
+    parser.add_argument("--device",
+                        type=str,
+                        default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
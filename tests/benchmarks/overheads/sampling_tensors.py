@@ -0,0 +1,117 @@
+"""Benchmark the per-step cost of building the sampling tensors of a decode
+batch, rebuilt from lists on every step versus gathered from the persistent
+sampling state."""
+import random
+import time
+from typing import List
+
+import torch
+
+from aphrodite.common.sampling_params import SamplingParams
+from aphrodite.common.sequence import SequenceData, SequenceGroupMetadata
+from aphrodite.common.utils import FlexibleArgumentParser
+from aphrodite.modeling.sampling_metadata import (PersistentSamplingState,
+                                                  SamplingMetadata,
+                                                  SamplingTensors)
+
+
+def make_batch(batch_size: int, context_len: int, vocab_size: int,
+               penalties: bool) -> List[SequenceGroupMetadata]:
+    seq_group_metadata_list: List[SequenceGroupMetadata] = []
+    for i in range(batch_size):
+        prompt = [random.randrange(vocab_size) for _ in range(context_len)]
+        seq_data = SequenceData.from_seqs(prompt)
+        seq_data.update_num_computed_tokens(context_len)
+        sampling_params = SamplingParams(
+            temperature=random.choice([0.0, 0.7, 1.0]),
+            top_p=random.choice([0.9, 1.0]),
+            top_k=random.choice([-1, 40]),
+            repetition_penalty=1.1 if penalties else 1.0)
+        seq_group_metadata_list.append(
+            SequenceGroupMetadata(
+                request_id=f"bench_{i}",
+                is_prompt=False,
+                seq_data={i: seq_data},
+                sampling_params=sampling_params,
+                block_tables={i: [0]},
+            ))
+    return seq_group_metadata_list
+
+
+@torch.inference_mode()
+def run_benchmark(batch_size: int, context_len: int, num_steps: int,
+                  vocab_size: int, penalties: bool, device: str) -> None:
+    seq_group_metadata_list = make_batch(batch_size, context_len, vocab_size,
+                                         penalties)
+    state = PersistentSamplingState(vocab_size, torch.device(device),
+                                    torch.float16)
+
+    def time_steps(build) -> float:
+        total = 0.0
+        for _ in range(num_steps):
+            for seq_group_metadata in seq_group_metadata_list:
+                for seq_data in seq_group_metadata.seq_data.values():
+                    seq_data.append_token_id(random.randrange(vocab_size),
+                                             0.0)
+            sampling_metadata = SamplingMetadata.prepare(
+                seq_group_metadata_list,
+                seq_lens=[context_len] * batch_size,
+                query_lens=[1] * batch_size,
+                device=device,
+                pin_memory=False)
+            if device.startswith("cuda"):
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+            build(sampling_metadata)
+            if device.startswith("cuda"):
+                torch.cuda.synchronize()
+            total += time.perf_counter() - start
+        return total / num_steps * 1000
+
+    rebuild_ms = time_steps(lambda sampling_metadata: SamplingTensors.
+                            from_sampling_metadata(sampling_metadata,
+                                                   vocab_size, device,
+                                                   torch.float16))
+    # The first step writes every slot, the following ones only gather.
+    state.get_sampling_tensors(sampling_metadata=SamplingMetadata.prepare(
+        seq_group_metadata_list,
+        seq_lens=[context_len] * batch_size,
+        query_lens=[1] * batch_size,
+        device=device,
+        pin_memory=False))
+    persistent_ms = time_steps(state.get_sampling_tensors)
+    print(f"context_len={context_len:>6} batch_size={batch_size:>4} "
+          f"penalties={penalties!s:>5} rebuild={rebuild_ms:8.2f} ms/step "
+          f"persistent={persistent_ms:8.2f} ms/step "
+          f"speedup={rebuild_ms / persistent_ms:6.1f}x")
+
+
+def main(args):
+    random.seed(args.seed)
+    for penalties in (False, True):
+        for context_len in args.context_lens:
+            for batch_size in args.batch_sizes:
+                run_benchmark(batch_size, context_len, args.num_steps,
+                              args.vocab_size, penalties, args.device)
+
+
+if __name__ == "__main__":
+    parser = FlexibleArgumentParser(
+        description="Benchmark the per-step cost of building the sampling "
+        "tensors.")
+    parser.add_argument("--context-lens",
+                        type=int,
+                        nargs="+",
+                        default=[512, 4096])
+    parser.add_argument("--batch-sizes",
+                        type=int,
+                        nargs="+",
+                        default=[16, 64, 256])
+    parser.add_argument("--num-steps", type=int, default=20)
+    parser.add_argument("--vocab-size", type=int, default=32000)
+    parser.add_argument("--device",
+                        type=str,
+                        default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args)
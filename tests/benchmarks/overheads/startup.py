@@ -0,0 +1,75 @@
+"""Benchmark engine startup on the CPU backend, with a tiny Llama model and
+dummy weights, and print the time and peak RSS of each phase of the startup
+trace. Each invocation measures a single cold start, imports excluded."""
+import json
+import os
+import tempfile
+import time
+
+from transformers import LlamaConfig
+
+from aphrodite.common.utils import FlexibleArgumentParser
+from aphrodite.engine.aphrodite_engine import AphroditeEngine
+from aphrodite.engine.args_tools import EngineArgs
+
+
+def make_tiny_model(directory: str) -> str:
+    LlamaConfig(architectures=["LlamaForCausalLM"],
+                vocab_size=32000,
+                hidden_size=256,
+                intermediate_size=688,
+                num_hidden_layers=4,
+                num_attention_heads=4,
+                num_key_value_heads=4,
+                max_position_embeddings=2048).save_pretrained(directory)
+    return directory
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        model = args.model or make_tiny_model(tmpdir)
+        trace_path = args.output_json or os.path.join(tmpdir, "trace.json")
+        engine_args = EngineArgs(model=model,
+                                 device=args.device,
+                                 load_format="dummy",
+                                 skip_tokenizer_init=args.model is None,
+                                 enforce_eager=args.enforce_eager,
+                                 max_model_len=args.max_model_len,
+                                 disable_log_stats=True,
+                                 startup_trace=trace_path)
+        start = time.perf_counter()
+        engine = AphroditeEngine.from_engine_args(engine_args)
+        elapsed = time.perf_counter() - start
+        del engine
+
+        with open(trace_path) as f:
+            trace = json.load(f)
+
+    print(f"{'phase':<40} {'start s':>9} {'time s':>9} {'peak RSS MiB':>13}")
+    for phase in trace["phases"]:
+        name = phase["name"]
+        if phase["parent"] is not None:
+            name = f"  {phase['parent']}/{name}"
+        print(f"{name:<40} {phase['start_s']:9.3f} {phase['duration_s']:9.3f} "
+              f"{phase['peak_rss_mb']:13.1f}")
+    print(f"{'from_engine_args':<40} {'':>9} {elapsed:9.3f} "
+          f"{trace['peak_rss_mb']:13.1f}")
+
+
+if __name__ == "__main__":
+    parser = FlexibleArgumentParser(
+        description="Benchmark the startup of the engine.")
+    parser.add_argument("--model",
+                        type=str,
+                        default=None,
+                        help="Model to start with dummy weights. A tiny "
+                        "Llama model is used if not given.")
+    parser.add_argument("--device", type=str, default="cpu")
+    parser.add_argument("--max-model-len", type=int, default=2048)
+    parser.add_argument("--enforce-eager", action="store_true")
+    parser.add_argument("--output-json",
+                        type=str,
+                        default=None,
+                        help="Also keep the startup trace in this file.")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,103 @@
+"""Benchmark reading a safetensors checkpoint into a model, tensor by tensor
+versus with the upcoming tensors read ahead on a thread pool. The page cache
+of the files is dropped before each run, so that the reads hit the disk."""
+import glob
+import os
+import tempfile
+import time
+from functools import partial
+from typing import Dict
+
+import torch
+from safetensors.torch import save_file
+
+from aphrodite.common.utils import FlexibleArgumentParser
+from aphrodite.modeling.model_loader.weight_utils import (
+    parallel_safetensors_weights_iterator, safetensors_weights_iterator)
+
+
+def make_checkpoint(directory: str, num_files: int,
+                    file_bytes: int) -> None:
+    numel = 4096 * 4096
+    num_tensors = max(1, file_bytes // (numel * 2))
+    for i in range(num_files):
+        tensors = {
+            f"layers.{i}.{j}.weight": torch.randn(4096, 4096,
+                                                  dtype=torch.float16)
+            for j in range(num_tensors)
+        }
+        save_file(tensors, os.path.join(directory,
+                                        f"model-{i}.safetensors"))
+
+
+def drop_page_cache(files) -> None:
+    for path in files:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def run_benchmark(files, iterator_fn, device: str) -> float:
+    # Stand-in for the parameters of the model and their weight_loader.
+    params: Dict[str, torch.Tensor] = {}
+    drop_page_cache(files)
+    start = time.perf_counter()
+    for name, tensor in iterator_fn():
+        param = params.get(name)
+        if param is None:
+            param = params[name] = torch.empty_like(tensor, device=device)
+        param.copy_(tensor)
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+    return time.perf_counter() - start
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        directory = args.model_dir
+        if directory is None:
+            directory = tmpdir
+            make_checkpoint(directory, args.num_files,
+                            args.file_size_mb * 1024 * 1024)
+        files = sorted(glob.glob(os.path.join(directory, "*.safetensors")))
+        num_bytes = sum(os.path.getsize(f) for f in files)
+
+        serial_s = run_benchmark(
+            files, lambda: safetensors_weights_iterator(files), args.device)
+        print(f"serial:              {serial_s:7.2f} s "
+              f"{num_bytes / serial_s / 1024**3:6.2f} GiB/s")
+        for num_threads in args.num_threads:
+            parallel_s = run_benchmark(
+                files,
+                partial(parallel_safetensors_weights_iterator, files,
+                        num_threads, args.prefetch_mb * 1024 * 1024),
+                args.device)
+            print(f"parallel threads={num_threads:>3}: {parallel_s:7.2f} s "
+                  f"{num_bytes / parallel_s / 1024**3:6.2f} GiB/s "
+                  f"speedup={serial_s / parallel_s:5.2f}x")
+
+
+if __name__ == "__main__":
+    parser = FlexibleArgumentParser(
+        description="Benchmark the loading of safetensors checkpoints.")
+    parser.add_argument("--model-dir",
+                        type=str,
+                        default=None,
+                        help="Directory of a safetensors checkpoint. A "
+                        "random one is written to a temporary directory if "
+                        "not given.")
+    parser.add_argument("--num-files", type=int, default=4)
+    parser.add_argument("--file-size-mb", type=int, default=1024)
+    parser.add_argument("--num-threads",
+                        type=int,
+                        nargs="+",
+                        default=[4, 8, 16])
+    parser.add_argument("--prefetch-mb", type=int, default=2048)
+    parser.add_argument("--device",
+                        type=str,
+                        default="cuda" if torch.cuda.is_available() else "cpu")
+    args = parser.parse_args()
+    main(args)
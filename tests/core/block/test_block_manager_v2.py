@@ -488,3 +488,34 @@ def test_sliding_window(block_size, prompt_len, num_slots_to_append,
             check_used(0, sliding_blocks + 1)
         else:
             check_used(sliding_blocks, sliding_blocks + 1)
+
+
+def test_get_num_cached_tokens_follows_cache():
+    """The cached prefix of a waiting sequence grows as its blocks are cached
+    and shrinks when they are evicted."""
+    block_size = 4
+    block_manager = BlockSpaceManagerV2(block_size=block_size,
+                                        num_gpu_blocks=4,
+                                        num_cpu_blocks=0,
+                                        enable_caching=True)
+    waiting, _ = create_dummy_prompt("0",
+                                     prompt_length=9,
+                                     block_size=block_size)
+    assert block_manager.get_num_cached_tokens(waiting) == 0
+
+    _, sharing = create_dummy_prompt("1",
+                                     prompt_length=9,
+                                     block_size=block_size)
+    block_manager.allocate(sharing)
+    assert block_manager.get_num_cached_tokens(waiting) == 2 * block_size
+
+    # Freed blocks stay cached until they are evicted.
+    block_manager.free(sharing.get_seqs()[0])
+    assert block_manager.get_num_cached_tokens(waiting) == 2 * block_size
+
+    _, unrelated = create_dummy_prompt("2",
+                                       prompt_length=16,
+                                       block_size=block_size,
+                                       prompt_tokens=list(range(100, 116)))
+    block_manager.allocate(unrelated)
+    assert block_manager.get_num_cached_tokens(waiting) == 0
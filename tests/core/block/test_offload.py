@@ -0,0 +1,88 @@
+from aphrodite.processing.block.offload import (PrefixCacheOffloader,
+                                                PrefixCacheTransfer)
+from aphrodite.processing.block.prefix_caching_block import (
+    PrefixCachingBlockAllocator)
+
+SAVE = PrefixCacheTransfer.SAVE
+DEMOTE = PrefixCacheTransfer.DEMOTE
+LOAD = PrefixCacheTransfer.LOAD
+PROMOTE = PrefixCacheTransfer.PROMOTE
+
+
+def test_offloader_demotes_saves_and_loads():
+    offloader = PrefixCacheOffloader(num_cpu_blocks=1, num_disk_blocks=1)
+    offloader.demote(gpu_block_id=5, content_hash=100)
+    assert 100 in offloader
+    assert offloader.get_and_reset_transfers() == [(DEMOTE, 5, 0)]
+
+    # The CPU pool is full, so demoting another block saves the first one to
+    # disk.
+    offloader.demote(gpu_block_id=6, content_hash=200)
+    assert offloader.get_and_reset_transfers() == [(SAVE, 0, 0),
+                                                   (DEMOTE, 6, 0)]
+
+    # Loading the first block back from disk drops the second one, since the
+    # only disk block is being read by this step.
+    assert offloader.reserve(100)
+    offloader.promote(100, gpu_block_id=7)
+    assert offloader.get_and_reset_transfers() == [(LOAD, 0, 0),
+                                                   (PROMOTE, 0, 7)]
+    assert 200 not in offloader
+    assert offloader.num_demotions == 2
+    assert offloader.num_promotions == 1
+
+    assert not offloader.reserve(300)
+
+
+def test_offloader_pins_blocks_used_by_step():
+    offloader = PrefixCacheOffloader(num_cpu_blocks=1)
+    offloader.demote(gpu_block_id=5, content_hash=100)
+    # The only CPU block is being written by this step.
+    offloader.demote(gpu_block_id=6, content_hash=200)
+    assert offloader.get_and_reset_transfers() == [(DEMOTE, 5, 0)]
+    assert 200 not in offloader
+
+    assert offloader.reserve(100)
+    offloader.promote(100, gpu_block_id=7)
+    # A block promoted by this step has no content to demote yet.
+    offloader.demote(gpu_block_id=7, content_hash=100)
+    assert offloader.get_and_reset_transfers() == [(PROMOTE, 0, 7)]
+
+
+def test_allocator_promotes_evicted_blocks():
+    block_size = 4
+    offloader = PrefixCacheOffloader(num_cpu_blocks=4)
+    allocator = PrefixCachingBlockAllocator(num_blocks=2,
+                                            block_size=block_size,
+                                            offloader=offloader)
+
+    # Fill the GPU cache with a two block prefix and free it.
+    first = allocator.allocate_immutable_blocks(None, [[0, 1, 2, 3],
+                                                       [4, 5, 6, 7]])
+    first_block_ids = [block.block_id for block in first]
+    for block in reversed(first):
+        allocator.free(block)
+    assert offloader.get_and_reset_transfers() == []
+
+    # Another prefix evicts it to the CPU pool.
+    second = allocator.allocate_immutable_blocks(None, [[8, 9, 10, 11],
+                                                        [12, 13, 14, 15]])
+    transfers = offloader.get_and_reset_transfers()
+    assert sorted(src for _, src, _ in transfers) == sorted(first_block_ids)
+    assert all(kind == DEMOTE for kind, _, _ in transfers)
+    for block in reversed(second):
+        allocator.free(block)
+
+    # The first prefix is a cache hit again, and computed.
+    again = allocator.allocate_immutable_blocks(None, [[0, 1, 2, 3],
+                                                       [4, 5, 6, 7]])
+    block_ids = [block.block_id for block in again]
+    assert allocator.get_computed_block_ids([], block_ids,
+                                            skip_last_block_id=False) == (
+                                                block_ids)
+    transfers = offloader.get_and_reset_transfers()
+    assert [(kind, dst) for kind, _, dst in transfers
+            if kind == PROMOTE] == [(PROMOTE, block_id)
+                                    for block_id in block_ids]
+    # Two hits out of six lookups.
+    assert allocator.get_prefix_cache_hit_rate() == 2 / 6
@@ -735,6 +735,52 @@ class TestPrefixCachingBlockAllocator:
             [], block_ids, skip_last_block_id=False)
         assert len(computed_block_ids) == common_blocks
 
+    @staticmethod
+    @pytest.mark.parametrize("block_size", [1, 16])
+    def test_allocate_immutable_blocks_with_extra_hash(block_size: int):
+        """Blocks allocated at once have the hashes of blocks allocated one at
+        a time, and are only shared by sequences with the same extra hash."""
+        num_blocks = 8
+        allocator = PrefixCachingBlockAllocator(num_blocks=num_blocks * 4,
+                                                block_size=block_size)
+        token_ids = list(range(num_blocks * block_size))
+        block_token_ids = [
+            token_ids[i:i + block_size]
+            for i in range(0, len(token_ids), block_size)
+        ]
+
+        blocks = {}
+        for extra_hash in [None, 1, 2]:
+            blocks[extra_hash] = allocator.allocate_immutable_blocks(
+                prev_block=None,
+                block_token_ids=block_token_ids,
+                extra_hash=extra_hash)
+            prev_block_hash = None
+            for block in blocks[extra_hash]:
+                prev_block_hash = PrefixCachingBlock.hash_block_tokens(
+                    prev_block_hash is None, prev_block_hash, block.token_ids,
+                    extra_hash)
+                assert block.content_hash == prev_block_hash
+                assert block.extra_hash == extra_hash
+
+        block_ids = {
+            extra_hash: {block.block_id
+                         for block in blocks[extra_hash]}
+            for extra_hash in blocks
+        }
+        assert not block_ids[None] & block_ids[1]
+        assert not block_ids[1] & block_ids[2]
+
+        # The same prefix with the same extra hash hits the cache.
+        head = allocator.allocate_immutable_blocks(
+            prev_block=None, block_token_ids=block_token_ids[:2], extra_hash=1)
+        tail = allocator.allocate_immutable_blocks(
+            prev_block=head[-1],
+            block_token_ids=block_token_ids[2:],
+            extra_hash=1)
+        assert [block.block_id for block in head + tail
+                ] == [block.block_id for block in blocks[1]]
+
     @staticmethod
     def create_immutable_chain(
         block_size: int,
@@ -0,0 +1,87 @@
+import random
+
+import pytest
+
+from aphrodite.processing.evictor_v2 import (EvictionPolicy, GDSFEvictor,
+                                             LFUEvictor, LRUEvictor,
+                                             make_evictor)
+
+
+@pytest.mark.parametrize("seed", list(range(10)))
+def test_lru_evictor_matches_linear_scan(seed: int):
+    """The heap-backed LRU evictor evicts the block with the oldest
+    last_accessed, then the most hashed tokens, then the first added."""
+    random.seed(seed)
+    evictor = LRUEvictor()
+    reference = {}
+    order = 0
+    for _ in range(500):
+        op = random.random()
+        if op < 0.5 or not reference:
+            block_id = random.randrange(10_000)
+            if block_id in reference:
+                continue
+            last_accessed = float(random.randrange(20))
+            num_hashed_tokens = 16 * random.randrange(1, 5)
+            evictor.add(block_id, block_id + 1, num_hashed_tokens,
+                        last_accessed)
+            reference[block_id] = [last_accessed, num_hashed_tokens, order]
+            order += 1
+        elif op < 0.65:
+            block_id = random.choice(list(reference))
+            last_accessed = float(random.randrange(20))
+            evictor.update(block_id, last_accessed)
+            reference[block_id][0] = last_accessed
+        elif op < 0.75:
+            block_id = random.choice(list(reference))
+            evictor.remove(block_id)
+            del reference[block_id]
+        else:
+            expected = min(reference,
+                           key=lambda b: (reference[b][0], -reference[b][1],
+                                          reference[b][2]))
+            assert evictor.evict() == (expected, expected + 1)
+            del reference[expected]
+        assert evictor.num_blocks == len(reference)
+
+
+def test_lfu_evictor_ages_out_frequent_blocks():
+    evictor = LFUEvictor()
+    # Content 100 was freed three times, content 200 once.
+    for _ in range(3):
+        evictor.add(0, 100, 16, 0.0)
+        evictor.remove(0)
+    evictor.add(0, 100, 16, 0.0)
+    evictor.add(1, 200, 16, 1.0)
+    assert evictor.evict() == (1, 200)
+
+    # Evicting raised the cache age, so new blocks catch up with block 0.
+    evictor.add(2, 300, 16, 2.0)
+    evictor.add(3, 400, 16, 3.0)
+    assert evictor.evict() == (2, 300)
+    evictor.remove(3)
+    evictor.add(3, 400, 16, 3.0)
+    assert evictor.evict() == (0, 100)
+
+
+def test_gdsf_evictor_weighs_recompute_cost():
+    evictor = GDSFEvictor()
+    evictor.add(0, 100, 64, 0.0)
+    evictor.add(1, 200, 16, 1.0)
+    # Block 1 is more recent but cheaper to recompute.
+    assert evictor.evict() == (1, 200)
+
+
+def test_evictor_metrics():
+    evictor = make_evictor(EvictionPolicy.LRU)
+    for block_id in range(4):
+        evictor.add(block_id, block_id, 16, float(block_id))
+    # Three blocks were added after block 0 before it is reused.
+    evictor.remove(0)
+    evictor.remove(3)
+    assert evictor.evict() == (1, 1)
+
+    metric_data = evictor.metric_data
+    assert metric_data.num_evictions == 1
+    assert metric_data.num_reuses == 2
+    assert metric_data.get_mean_reuse_distance() == 1.5
@@ -0,0 +1,54 @@
+from aphrodite.processing.fair_share import FairShareTracker
+
+from .utils import create_dummy_prompt
+
+
+def _create_seq_groups(tenant: str, num_seq_groups: int, start: int):
+    seq_groups = []
+    for i in range(start, start + num_seq_groups):
+        _, seq_group = create_dummy_prompt(str(i), prompt_length=10)
+        seq_group.tenant = tenant
+        seq_groups.append(seq_group)
+    return seq_groups
+
+
+def test_order_interleaves_tenants_by_weight():
+    tracker = FairShareTracker({"a": 2})
+    seq_groups = _create_seq_groups("a", 4, 0) + _create_seq_groups("b", 4, 4)
+    ordered = tracker.order(seq_groups, lambda seq_group: 10)
+    assert [seq_group.tenant for seq_group in ordered
+            ] == ["a", "b", "a", "a", "b", "a", "b", "b"]
+    # Each tenant keeps its own order.
+    assert [seq_group.request_id for seq_group in ordered
+            if seq_group.tenant == "a"] == ["0", "1", "2", "3"]
+
+
+def test_order_prefers_tenant_with_less_service():
+    tracker = FairShareTracker()
+    tracker.update_tenants({"a", "b"})
+    tracker.charge("a", 100)
+    seq_groups = _create_seq_groups("a", 2, 0) + _create_seq_groups("b", 2, 2)
+    ordered = tracker.order(seq_groups, lambda seq_group: 10)
+    assert [seq_group.tenant for seq_group in ordered] == ["b", "b", "a", "a"]
+
+
+def test_idle_tenants_do_not_earn_credit():
+    tracker = FairShareTracker()
+    tracker.update_tenants({"a", "b"})
+    tracker.charge("a", 100)
+    tracker.charge("b", 50)
+    # b leaves and comes back.
+    tracker.update_tenants({"a"})
+    tracker.update_tenants({"a", "b"})
+    assert tracker.get_virtual_time("b") == 100
+
+
+def test_over_share_tenant():
+    tracker = FairShareTracker({"a": 3})
+    seq_groups = _create_seq_groups("a", 3, 0) + _create_seq_groups("b", 1, 3)
+    assert tracker.get_over_share_tenant(seq_groups) is None
+    seq_groups += _create_seq_groups("b", 1, 4)
+    assert tracker.get_over_share_tenant(seq_groups) == "b"
+    # A waiting tenant counts towards the shares.
+    assert tracker.get_over_share_tenant(seq_groups[:3]) is None
+    assert tracker.get_over_share_tenant(seq_groups[:3], ["b"]) == "a"
@@ -1021,3 +1021,111 @@ def test_scheduling_budget():
     assert budget.num_curr_seqs == 0
     budget.subtract_num_seqs(seq_group.request_id, 2)
     assert budget.num_curr_seqs == 0
+
+
+@pytest.mark.parametrize("prefix_aware_max_wait_time, expected_request_id",
+                         [(10.0, "2"), (0.0, "1")])
+def test_prefix_aware_policy(prefix_aware_max_wait_time: float,
+                             expected_request_id: str):
+    """Waiting requests sharing a cached prefix are scheduled first, unless
+    the others have waited for too long."""
+    block_size = 4
+    cache_config = CacheConfig(swap_space=1.0,
+                               block_size=block_size,
+                               enable_prefix_caching=True,
+                               cache_dtype="auto")
+    cache_config.num_cpu_blocks = 16
+    cache_config.num_gpu_blocks = 16
+    scheduler_config = SchedulerConfig(
+        max_model_len=16,
+        max_num_seqs=4,
+        max_num_batched_tokens=16,
+        cache_config=cache_config,
+        policy="prefix_aware",
+        prefix_aware_max_wait_time=prefix_aware_max_wait_time)
+    scheduler = Scheduler(scheduler_config, cache_config, None)
+
+    shared_prefix = list(range(2 * block_size))
+    _, seq_group = create_dummy_prompt("0",
+                                       prompt_length=9,
+                                       block_size=block_size,
+                                       prompt_tokens=shared_prefix + [50])
+    scheduler.add_seq_group(seq_group)
+    _, out = schedule_and_update_computed_tokens(scheduler)
+    assert get_sequence_groups(out) == [seq_group]
+
+    # Only one of the next two prompts fits in the token budget.
+    _, unrelated = create_dummy_prompt("1",
+                                       prompt_length=9,
+                                       block_size=block_size,
+                                       prompt_tokens=list(range(100, 109)))
+    scheduler.add_seq_group(unrelated)
+    _, sharing = create_dummy_prompt("2",
+                                     prompt_length=9,
+                                     block_size=block_size,
+                                     prompt_tokens=shared_prefix + [60])
+    scheduler.add_seq_group(sharing)
+    assert scheduler.block_manager.get_num_cached_tokens(
+        sharing.get_seqs()[0]) == 2 * block_size
+    assert scheduler.block_manager.get_num_cached_tokens(
+        unrelated.get_seqs()[0]) == 0
+
+    _, out = schedule_and_update_computed_tokens(scheduler)
+    assert [seq_group.request_id
+            for seq_group in get_sequence_groups(out)] == [expected_request_id]
+
+
+def _create_fair_share_scheduler(num_gpu_blocks: int) -> Scheduler:
+    cache_config = CacheConfig(swap_space=1.0, block_size=4, cache_dtype="auto")
+    cache_config.num_cpu_blocks = 16
+    cache_config.num_gpu_blocks = num_gpu_blocks
+    scheduler_config = SchedulerConfig(max_model_len=16,
+                                       max_num_seqs=16,
+                                       max_num_batched_tokens=16,
+                                       policy="fair_share")
+    return Scheduler(scheduler_config, cache_config, None)
+
+
+def _add_tenant_seq_group(scheduler: Scheduler, request_id: str,
+                          tenant: str) -> SequenceGroup:
+    _, seq_group = create_dummy_prompt(request_id,
+                                       prompt_length=3,
+                                       block_size=4)
+    seq_group.tenant = tenant
+    scheduler.add_seq_group(seq_group)
+    return seq_group
+
+
+def test_fair_share_policy_admits_other_tenants():
+    """A tenant with many waiting requests does not delay the others."""
+    scheduler = _create_fair_share_scheduler(num_gpu_blocks=16)
+    for i in range(8):
+        _add_tenant_seq_group(scheduler, str(i), "noisy")
+    quiet = _add_tenant_seq_group(scheduler, "8", "quiet")
+
+    # Only five prompts fit in the token budget.
+    _, out = schedule_and_update_computed_tokens(scheduler)
+    scheduled = get_sequence_groups(out)
+    assert len(scheduled) == 5
+    assert quiet in scheduled
+
+
+def test_fair_share_policy_preempts_tenant_over_share():
+    scheduler = _create_fair_share_scheduler(num_gpu_blocks=3)
+    noisy = [
+        _add_tenant_seq_group(scheduler, str(i), "noisy") for i in range(3)
+    ]
+    _, out = schedule_and_update_computed_tokens(scheduler)
+    assert get_sequence_groups(out) == noisy
+    append_new_token(out, 1)
+
+    # The cache is full, so the last request of the tenant over its share
+    # makes room for the new one.
+    quiet = _add_tenant_seq_group(scheduler, "3", "quiet")
+    _, out = schedule_and_update_computed_tokens(scheduler)
+    assert get_sequence_groups(out) == noisy[:2]
+    assert list(scheduler.waiting) == [quiet, noisy[2]]
+    append_new_token(out, 1)
+
+    _, out = schedule_and_update_computed_tokens(scheduler)
+    assert get_sequence_groups(out) == [quiet]
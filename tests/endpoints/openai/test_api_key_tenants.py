@@ -0,0 +1,61 @@
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+from aphrodite.common.utils import FlexibleArgumentParser
+from aphrodite.endpoints.openai.api_server import build_app
+from aphrodite.endpoints.openai.args import make_arg_parser
+from aphrodite.endpoints.openai.protocol import CompletionRequest
+from aphrodite.endpoints.openai.serving_engine import OpenAIServing
+
+
+@pytest.fixture
+def client():
+    args = make_arg_parser(FlexibleArgumentParser()).parse_args([
+        "--api-keys", "key", "--api-key-tenants",
+        '{"key-a": "team-a", "key-b": "team-b"}'
+    ])
+    app = build_app(args)
+
+    @app.post("/v1/tenant")
+    async def get_tenant(raw_request: Request):
+        request = CompletionRequest(**await raw_request.json())
+        return {"tenant": OpenAIServing._get_tenant(request, raw_request)}
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("headers,tenant", [
+    ({"Authorization": "Bearer key-a"}, "team-a"),
+    ({"x-api-key": "key-b"}, "team-b"),
+    ({"Authorization": "Bearer key"}, None),
+])
+def test_tenant_from_api_key(client, headers, tenant):
+    """The tenant comes from the API key, not from the "user" field."""
+    response = client.post("/v1/tenant",
+                           headers=headers,
+                           json={
+                               "model": "model",
+                               "prompt": "hello",
+                               "user": "team-c",
+                           })
+    assert response.status_code == 200
+    assert response.json() == {"tenant": tenant}
+
+
+def test_unknown_api_key_is_rejected(client):
+    response = client.post("/v1/tenant",
+                           headers={"Authorization": "Bearer key-c"},
+                           json={
+                               "model": "model",
+                               "prompt": "hello"
+                           })
+    assert response.status_code == 401
+
+
+def test_tenant_from_user_without_api_keys():
+    """Without API keys, the "user" field is the only tenant there is."""
+    request = CompletionRequest(model="model", prompt="hello", user="team-a")
+    raw_request = Request({"type": "http", "headers": []})
+    assert OpenAIServing._get_tenant(request, raw_request) == "team-a"
+    assert OpenAIServing._get_tenant(request, None) == "team-a"
@@ -1,14 +1,18 @@
 import asyncio
+import json
 from contextlib import suppress
 from dataclasses import dataclass
 from unittest.mock import MagicMock
 
 from aphrodite.common.config import MultiModalConfig
-from aphrodite.endpoints.openai.protocol import ChatCompletionRequest
+from aphrodite.common.outputs import CompletionOutput, RequestOutput
+from aphrodite.endpoints.openai.protocol import (ChatCompletionRequest,
+                                                 RequestResponseMetadata)
 from aphrodite.endpoints.openai.serving_chat import OpenAIServingChat
 from aphrodite.endpoints.openai.serving_engine import BaseModelPath
 from aphrodite.engine.async_aphrodite import AsyncAphrodite
 from aphrodite.transformers_utils.tokenizer import get_tokenizer
+from aphrodite.transformers_utils.tokenizer_group import TokenizerGroup
 
 MODEL_NAME = "openai-community/gpt2"
 CHAT_TEMPLATE = "Dummy chat template for testing {}"
@@ -56,6 +60,8 @@ def test_async_serving_chat_init():
 def test_serving_chat_should_set_correct_max_tokens():
     mock_engine = MagicMock(spec=AsyncAphrodite)
     mock_engine.get_tokenizer.return_value = get_tokenizer(MODEL_NAME)
+    mock_engine.get_tokenizer_group.return_value = TokenizerGroup(
+        MODEL_NAME, enable_lora=False, max_num_seqs=1, max_input_length=None)
 
     serving_chat = OpenAIServingChat(mock_engine,
                                      MockModelConfig(),
@@ -84,3 +90,82 @@ def test_serving_chat_should_set_correct_max_tokens():
         asyncio.run(serving_chat.create_chat_completion(req))
 
     assert mock_engine.generate.call_args.args[1].max_tokens == 10
+
+
+def test_serving_chat_autocompletes_truncated_tool_call():
+    """The final delta of a tool call cut off by max_tokens inside an
+    argument string closes the streamed arguments."""
+    vocab = {"<tool_call>": 1, "</tool_call>": 2}
+    tokenizer = MagicMock()
+    tokenizer.get_vocab.return_value = vocab
+    serving_chat = OpenAIServingChat(MockEngine(),
+                                     MockModelConfig(),
+                                     BASE_MODEL_PATHS,
+                                     response_role="assistant",
+                                     chat_template=CHAT_TEMPLATE,
+                                     lora_modules=None,
+                                     prompt_adapters=None,
+                                     request_logger=None,
+                                     enable_auto_tools=True,
+                                     tool_parser="hermes")
+    request = ChatCompletionRequest(
+        model=MODEL_NAME,
+        messages=[{
+            "role": "user",
+            "content": "What is the weather in Dallas?"
+        }],
+        tools=[{
+            "type": "function",
+            "function": {
+                "name": "get_current_weather",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "city": {
+                            "type": "string"
+                        }
+                    }
+                }
+            }
+        }],
+        stream=True)
+    deltas = [("<tool_call>", [1]), ('{"name": "get_current_weather", ', [0]),
+              ('"arguments": {"unit": "fahrenheit", ', [0]),
+              ('"city": "Dal', [0])]
+
+    async def result_generator():
+        for i, (text, token_ids) in enumerate(deltas):
+            finish_reason = "length" if i == len(deltas) - 1 else None
+            yield RequestOutput(request_id="request",
+                                prompt=None,
+                                prompt_token_ids=[0],
+                                prompt_logprobs=None,
+                                outputs=[
+                                    CompletionOutput(
+                                        index=0,
+                                        text=text,
+                                        token_ids=token_ids,
+                                        cumulative_logprob=None,
+                                        logprobs=None,
+                                        finish_reason=finish_reason)
+                                ],
+                                finished=finish_reason is not None)
+
+    async def stream():
+        return [
+            chunk async for chunk in
+            serving_chat.chat_completion_stream_generator(
+                request, result_generator(), "request", [], tokenizer,
+                RequestResponseMetadata(request_id="request"))
+        ]
+
+    chunks = [
+        json.loads(chunk[len("data: "):])
+        for chunk in asyncio.run(stream()) if chunk != "data: [DONE]\n\n"
+    ]
+    arguments = "".join(
+        tool_call["function"].get("arguments", "") for chunk in chunks
+        for choice in chunk["choices"]
+        for tool_call in choice["delta"].get("tool_calls", []))
+    assert json.loads(arguments) == {"unit": "fahrenheit", "city": "Dal"}
+    assert chunks[-1]["choices"][0]["finish_reason"] == "tool_calls"
@@ -1,18 +1,25 @@
 import warnings
-from typing import Optional
+from typing import List, Optional
 
 import pytest
 from PIL import Image
 
 from aphrodite.assets.image import ImageAsset
 from aphrodite.common.config import ModelConfig
-from aphrodite.endpoints.chat_utils import (parse_chat_messages,
+from aphrodite.endpoints.chat_utils import (ChatPromptCache,
+                                            ConversationMessage,
+                                            apply_hf_chat_template,
+                                            parse_chat_messages,
                                             parse_chat_messages_futures)
 from aphrodite.multimodal import MultiModalDataDict
 from aphrodite.multimodal.utils import encode_image_base64
 from aphrodite.transformers_utils.tokenizer_group import TokenizerGroup
 
 PHI3V_MODEL_ID = "microsoft/Phi-3.5-vision-instruct"
+CHAT_MODEL_IDS = [
+    "TinyLlama/TinyLlama-1.1B-Chat-v1.0",
+    "NousResearch/Meta-Llama-3-8B-Instruct",
+]
 
 
 @pytest.fixture(scope="module")
@@ -387,3 +394,80 @@ def test_parse_chat_messages_rejects_too_many_images_across_messages(
                     "text": "What about these two?"
                 }]
             }], phi3v_model_config, phi3v_tokenizer)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("model_id", CHAT_MODEL_IDS)
+async def test_chat_prompt_cache(model_id):
+    tokenizer_group = TokenizerGroup(
+        tokenizer_id=model_id,
+        enable_lora=False,
+        max_num_seqs=1,
+        max_input_length=None,
+    )
+    tokenizer = tokenizer_group.get_lora_tokenizer()
+    cache = ChatPromptCache(max_tokens=100000)
+
+    conversation: List[ConversationMessage] = [{
+        "role": "system",
+        "content": "You are a helpful assistant."
+    }]
+    for turn in range(5):
+        conversation.append({
+            "role": "user",
+            "content": f"Question {turn}: what is {turn} + {turn}?\n"
+        })
+        # The second request is a regeneration of the same turn.
+        for _ in range(2):
+            prompt = apply_hf_chat_template(tokenizer,
+                                            conversation,
+                                            chat_template=None,
+                                            add_generation_prompt=True)
+            token_ids = await cache.encode(tokenizer_group, model_id,
+                                           conversation, prompt)
+            assert token_ids == tokenizer(prompt,
+                                          add_special_tokens=False).input_ids
+        conversation.append({
+            "role": "assistant",
+            "content": f" {turn} + {turn} = {2 * turn}."
+        })
+
+    assert cache.num_queries == 10
+    # Only the first prompt is tokenized from scratch.
+    assert cache.num_hits == 9
+    assert 0.5 < cache.hit_rate < 1
+
+
+@pytest.mark.asyncio
+async def test_chat_prompt_cache_eviction():
+    model_id = CHAT_MODEL_IDS[0]
+    tokenizer_group = TokenizerGroup(
+        tokenizer_id=model_id,
+        enable_lora=False,
+        max_num_seqs=1,
+        max_input_length=None,
+    )
+    tokenizer = tokenizer_group.get_lora_tokenizer()
+    cache = ChatPromptCache(max_tokens=100)
+
+    for i in range(10):
+        conversation: List[ConversationMessage] = [{
+            "role": "user",
+            "content": f"Conversation {i}"
+        }]
+        prompt = apply_hf_chat_template(tokenizer,
+                                        conversation,
+                                        chat_template=None,
+                                        add_generation_prompt=True)
+        await cache.encode(tokenizer_group, model_id, conversation, prompt)
+        assert 0 < cache._num_tokens <= cache.max_tokens
+    assert len(cache._entries) < 10
+
+    # Prompts longer than the cache are not kept.
+    conversation = [{"role": "user", "content": "word " * 200}]
+    prompt = apply_hf_chat_template(tokenizer,
+                                    conversation,
+                                    chat_template=None,
+                                    add_generation_prompt=True)
+    await cache.encode(tokenizer_group, model_id, conversation, prompt)
+    assert cache._num_tokens <= cache.max_tokens
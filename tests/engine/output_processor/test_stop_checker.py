@@ -1,3 +1,5 @@
+import random
+from typing import List, Optional, Tuple
 from unittest.mock import MagicMock
 
 import pytest
@@ -5,7 +7,8 @@ from transformers import PreTrainedTokenizer
 
 from aphrodite.common.sampling_params import SamplingParams
 from aphrodite.common.sequence import Logprob, Sequence, SequenceStatus
-from aphrodite.engine.output_processor.stop_checker import StopChecker
+from aphrodite.engine.output_processor.stop_checker import (
+    StopChecker, get_stop_string_matcher)
 
 
 def sequence_with_eos(text: str, eos_token: str,
@@ -83,3 +86,77 @@ def test_stop_on_eos_token(text_wo_eos: str, eos_token: str, eos_token_id: int,
     else:
         assert seq.status == SequenceStatus.FINISHED_STOPPED
         assert seq.output_text == text_wo_eos
+
+
+def _find_stop_string(text: str, new_char_count: int,
+                      stop: List[str]) -> Optional[Tuple[str, int]]:
+    """Search each stop string in turn in the end of the text."""
+    for stop_str in stop:
+        stop_index = text.find(stop_str, -new_char_count - len(stop_str))
+        if stop_index != -1:
+            return stop_str, stop_index
+    return None
+
+
+@pytest.mark.parametrize("seed", list(range(10)))
+@pytest.mark.parametrize("include_stop_str_in_output", [True, False])
+@pytest.mark.skip_global_cleanup
+def test_stop_strings_match_linear_search(seed: int,
+                                          include_stop_str_in_output: bool):
+    """The stop string matcher finds the same stop string as searching each
+    of them in turn, while being fed the output text a few chars at a time.
+    """
+    random.seed(seed)
+    stop = [
+        "".join(random.choices("ab", k=random.randint(1, 4)))
+        for _ in range(5)
+    ]
+    min_tokens = random.randint(0, 8)
+    sampling_params = SamplingParams(
+        stop=stop,
+        min_tokens=min_tokens,
+        include_stop_str_in_output=include_stop_str_in_output)
+    stop_checker = StopChecker(max_model_len=1024,
+                               get_tokenizer_for_seq=MagicMock())
+
+    seq = Sequence(seq_id=0,
+                   inputs={"prompt_token_ids": [0]},
+                   block_size=16,
+                   eos_token_id=0)
+    while seq.status == SequenceStatus.WAITING:
+        new_text = "".join(random.choices("abc", k=random.randint(0, 3)))
+        seq.append_token_id(1, {1: Logprob(0.0)})
+        seq.output_text += new_text
+        text = seq.output_text
+
+        stop_checker.maybe_stop_sequence(seq, len(new_text), sampling_params)
+        expected = None
+        if new_text and seq.get_output_len() >= min_tokens:
+            expected = _find_stop_string(text, len(new_text), stop)
+        if expected is None:
+            assert seq.stop_reason is None
+            assert seq.output_text == text
+            if seq.get_output_len() == sampling_params.max_tokens:
+                break
+            continue
+
+        stop_str, stop_index = expected
+        assert seq.status == SequenceStatus.FINISHED_STOPPED
+        assert seq.stop_reason == stop_str
+        if include_stop_str_in_output:
+            stop_index += len(stop_str)
+        assert seq.output_text == text[:stop_index]
+
+
+@pytest.mark.skip_global_cleanup
+def test_stop_string_matcher_is_shared():
+    stop = ("</s>", "\nUser:", "\nAssistant:")
+    matcher = get_stop_string_matcher(stop)
+    assert get_stop_string_matcher(tuple(list(stop))) is matcher
+
+    node, match = matcher.feed(0, "Hello\nUs", 0, 0)
+    assert match is None
+    # Another request goes through the same automaton.
+    assert matcher.feed(0, "Hi</s>", 0, 0)[1] == (0, 6)
+    _, match = matcher.feed(node, "Hello\nUser: hi", len("Hello\nUs"), 0)
+    assert match == (1, len("Hello\nUser:"))
@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from aphrodite.common.startup_trace import StartupTrace
+
+
+def test_startup_trace(tmp_path):
+    trace = StartupTrace()
+    with trace.phase("init_executor"), trace.phase("load_model"):
+        pass
+    with pytest.raises(RuntimeError), trace.phase("initialize_kv_caches"):
+        raise RuntimeError
+
+    # Phases are recorded when they end, failed ones included.
+    assert [(phase.name, phase.parent) for phase in trace.phases] == [
+        ("load_model", "init_executor"),
+        ("init_executor", None),
+        ("initialize_kv_caches", None),
+    ]
+    load_model, init_executor, _ = trace.phases
+    assert init_executor.start_s <= load_model.start_s
+    assert load_model.duration_s <= init_executor.duration_s
+    assert load_model.peak_rss_mb > 0
+
+    path = tmp_path / "trace.json"
+    trace.dump(str(path))
+    dumped = json.loads(path.read_text())
+    assert dumped["total_s"] >= init_executor.duration_s
+    assert [phase["name"] for phase in dumped["phases"]
+            ] == ["load_model", "init_executor", "initialize_kv_caches"]
@@ -7,6 +7,8 @@ from aphrodite.modeling.guided_decoding import (
     get_guided_decoding_logits_processor)
 from aphrodite.modeling.guided_decoding.outlines_logits_processors import (
     JSONLogitsProcessor, RegexLogitsProcessor)
+from aphrodite.modeling.guided_decoding.token_bitmask import (
+    get_token_bitmask_cache)
 
 
 def test_guided_logits_processors(sample_regex, sample_json_schema):
@@ -35,6 +37,22 @@ def test_guided_logits_processors(sample_regex, sample_json_schema):
     assert not torch.allclose(tensor, original_tensor)
 
 
+def test_guided_logits_processors_share_bitmasks(sample_regex):
+    """Processors of the same regex reuse the bitmasks of its states."""
+    tokenizer = AutoTokenizer.from_pretrained('HuggingFaceH4/zephyr-7b-beta')
+    cache = get_token_bitmask_cache()
+    cache.clear()
+    first = RegexLogitsProcessor(sample_regex, tokenizer)
+    second = RegexLogitsProcessor(sample_regex, tokenizer)
+
+    first_bitmask = first.get_token_bitmask([], 32000)
+    num_cached = len(cache)
+    second_bitmask = second.get_token_bitmask([], 32000)
+    assert len(cache) == num_cached
+    assert cache.num_hits >= 1
+    assert torch.equal(first_bitmask, second_bitmask)
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize("backend",
                          ["outlines", "lm-format-enforcer", "xgrammar"])
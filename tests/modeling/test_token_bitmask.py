@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+import torch
+
+from aphrodite.common.sequence import SequenceData
+from aphrodite.modeling.guided_decoding.token_bitmask import (
+    TokenBitmaskCache, TokenBitmaskLogitsProcessor, apply_token_bitmasks,
+    pack_token_bitmask, unpack_token_bitmask)
+from aphrodite.modeling.layers.logits_processor import (
+    _apply_logits_processors)
+
+
+class AllowedTokensLogitsProcessor(TokenBitmaskLogitsProcessor):
+    """Allows the tokens after the last output token."""
+
+    def __init__(self, num_allowed: int):
+        self.num_allowed = num_allowed
+        self.num_calls = 0
+
+    def get_token_bitmask(self, input_ids: List[int],
+                          vocab_size: int) -> torch.Tensor:
+        self.num_calls += 1
+        last = input_ids[-1] if input_ids else 0
+        return pack_token_bitmask(
+            range(last + 1, last + 1 + self.num_allowed), vocab_size)
+
+
+@pytest.mark.parametrize("vocab_size", [1, 31, 32, 33, 1000])
+def test_pack_unpack(vocab_size: int):
+    torch.manual_seed(vocab_size)
+    allowed = torch.rand(vocab_size) < 0.3
+    token_ids = allowed.nonzero().flatten().tolist()
+    bitmask = pack_token_bitmask(token_ids + [vocab_size, vocab_size + 40],
+                                 vocab_size)
+    assert bitmask.dtype == torch.int32
+    assert bitmask.shape == ((vocab_size + 31) // 32, )
+    assert torch.equal(unpack_token_bitmask(bitmask, vocab_size), allowed)
+
+
+@pytest.mark.parametrize("rows", [[0, 1, 2, 3], [2], [3, 0]])
+def test_apply_token_bitmasks(rows: List[int]):
+    vocab_size = 100
+    logits = torch.randn(4, vocab_size)
+    bitmasks = [
+        pack_token_bitmask(range(row, vocab_size, row + 2), vocab_size)
+        for row in rows
+    ]
+    expected = logits.clone()
+    for row, bitmask in zip(rows, bitmasks):
+        processor = AllowedTokensLogitsProcessor(0)
+        processor.get_token_bitmask = lambda *_, bitmask=bitmask: bitmask
+        processor([], expected[row])
+    actual = apply_token_bitmasks(logits, rows, bitmasks)
+    assert torch.equal(actual, expected)
+
+
+def test_token_bitmask_cache():
+    cache = TokenBitmaskCache(max_size=2)
+    for key in ["a", "b", "a", "c", "b"]:
+        bitmask = cache.get(key, lambda key=key: torch.tensor([ord(key)]))
+        assert bitmask.item() == ord(key)
+    # "b" was evicted by "c", as "a" had been used after it.
+    assert (cache.num_queries, cache.num_hits) == (5, 1)
+    assert len(cache) == 2
+
+    disabled = TokenBitmaskCache(max_size=0)
+    disabled.get("a", lambda: torch.tensor([0]))
+    assert len(disabled) == 0
+
+
+def test_apply_logits_processors_batches_bitmasks():
+    vocab_size = 64
+    bitmask_processor = AllowedTokensLogitsProcessor(num_allowed=3)
+
+    def scale(token_ids: List[int], logits: torch.Tensor) -> torch.Tensor:
+        return logits * 2
+
+    processors = [[bitmask_processor], [scale, bitmask_processor], [scale],
+                  []]
+    seq_groups = [
+        SimpleNamespace(
+            seq_ids=[i],
+            sample_indices=[i],
+            prompt_logprob_indices=[],
+            seq_data={i: SequenceData.from_seqs([1, 2], [i * 10])},
+            sampling_params=SimpleNamespace(logits_processors=processors[i]),
+        ) for i in range(4)
+    ]
+    logits = torch.randn(4, vocab_size)
+    expected = logits.clone()
+    expected[1:3] *= 2
+    for row in range(2):
+        allowed = torch.zeros(vocab_size, dtype=torch.bool)
+        allowed[row * 10 + 1:row * 10 + 4] = True
+        expected[row][~allowed] = -float("inf")
+
+    actual = _apply_logits_processors(
+        logits, SimpleNamespace(seq_groups=seq_groups))
+    assert torch.equal(actual, expected)
+    assert bitmask_processor.num_calls == 2
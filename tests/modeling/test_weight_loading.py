@@ -0,0 +1,63 @@
+import pytest
+import torch
+from safetensors.torch import save_file
+
+from aphrodite.common.config import LoadConfig
+from aphrodite.modeling.model_loader import weight_utils
+from aphrodite.modeling.model_loader.loader import DefaultModelLoader
+from aphrodite.modeling.model_loader.weight_utils import (
+    parallel_safetensors_weights_iterator, safetensors_weights_iterator)
+
+
+@pytest.fixture
+def safetensors_files(tmp_path):
+    torch.manual_seed(0)
+    files = []
+    for i in range(3):
+        tensors = {
+            f"layers.{i}.weight": torch.randn(64, 33),
+            f"layers.{i}.bias": torch.randn(7, dtype=torch.bfloat16),
+            f"layers.{i}.scale": torch.randn(()).half(),
+            f"layers.{i}.index": torch.arange(5, dtype=torch.int32),
+            f"layers.{i}.mask": torch.rand(3, 4) > 0.5,
+            f"layers.{i}.empty": torch.empty(0, 4),
+        }
+        path = str(tmp_path / f"model-{i}.safetensors")
+        save_file(tensors, path, metadata={"format": "pt"})
+        files.append(path)
+    return files
+
+
+@pytest.mark.parametrize("num_threads", [1, 4])
+@pytest.mark.parametrize("prefetch_bytes", [1, 1024, 1 << 30])
+def test_parallel_safetensors_weights_iterator(safetensors_files, num_threads,
+                                               prefetch_bytes, monkeypatch):
+    # Read the larger tensors in several chunks.
+    monkeypatch.setattr(weight_utils, "_PREFETCH_CHUNK_BYTES", 1000)
+    expected = dict(safetensors_weights_iterator(safetensors_files))
+    loaded = dict(
+        parallel_safetensors_weights_iterator(safetensors_files, num_threads,
+                                              prefetch_bytes))
+    assert loaded.keys() == expected.keys()
+    for name, tensor in expected.items():
+        assert loaded[name].dtype == tensor.dtype
+        assert torch.equal(loaded[name], tensor)
+
+
+def test_parallel_safetensors_weights_iterator_early_exit(safetensors_files):
+    iterator = parallel_safetensors_weights_iterator(safetensors_files, 2, 1)
+    name, _ = next(iterator)
+    assert name.startswith("layers.0.")
+    iterator.close()
+
+
+def test_default_model_loader_extra_config():
+    loader = DefaultModelLoader(
+        LoadConfig(model_loader_extra_config={
+            "num_threads": 8,
+            "prefetch_bytes": 1024
+        }))
+    assert loader.num_threads == 8 and loader.prefetch_bytes == 1024
+    assert DefaultModelLoader(LoadConfig()).num_threads == 0
+    with pytest.raises(ValueError):
+        DefaultModelLoader(LoadConfig(model_loader_extra_config={"foo": 1}))
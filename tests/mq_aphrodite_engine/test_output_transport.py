@@ -0,0 +1,164 @@
+"""Test the encoding of request outputs sent by the MQAphroditeEngine."""
+
+import pickle
+import random
+from typing import List
+
+from aphrodite.common.outputs import CompletionOutput, RequestOutput
+from aphrodite.common.sampling_params import RequestOutputKind, SamplingParams
+from aphrodite.common.sequence import Logprob, RequestMetrics
+from aphrodite.distributed.device_communicators.shm_broadcast import (
+    ShmRingBuffer)
+from aphrodite.engine.multiprocessing.outputs import (
+    RequestOutputDecoder, RequestOutputEncoder, SharedMemoryOutputChannel)
+
+
+def as_tuple(request_output: RequestOutput):
+    return (request_output.request_id, request_output.prompt,
+            list(request_output.prompt_token_ids or []),
+            request_output.prompt_logprobs, request_output.finished,
+            request_output.metrics, [(output.index, output.text,
+                                      list(output.token_ids),
+                                      output.cumulative_logprob,
+                                      output.logprobs, output.finish_reason,
+                                      output.stop_reason)
+                                     for output in request_output.outputs])
+
+
+class FakeRequest:
+    """Produces the outputs of a request like the engine does, updating the
+    same cached RequestOutput at every step."""
+
+    def __init__(self, request_id: str, params: SamplingParams):
+        self.params = params
+        self.step = 0
+        self.texts = [""] * params.n
+        self.token_ids: List[List[int]] = [[] for _ in range(params.n)]
+        self.logprobs: List[list] = [[] for _ in range(params.n)]
+        self.output = RequestOutput(request_id=request_id,
+                                    prompt="Hello",
+                                    prompt_token_ids=[1, 2, 3],
+                                    prompt_logprobs=[
+                                        None, {
+                                            2: Logprob(-1.0, 1, "b")
+                                        }, {
+                                            3: Logprob(-2.0, 3, "c")
+                                        }
+                                    ],
+                                    outputs=[],
+                                    finished=False)
+
+    def next_output(self, finished: bool) -> RequestOutput:
+        delta = self.params.output_kind == RequestOutputKind.DELTA
+        outputs: List[CompletionOutput] = []
+        for i in range(self.params.n):
+            token_id = random.randrange(100)
+            self.token_ids[i].append(token_id)
+            self.logprobs[i].append({token_id: Logprob(-random.random())})
+            new_text = random.choice(["a", "bc", " d", "é"])
+            self.texts[i] += new_text
+            if random.random() < 0.2:
+                # A stop string was cut from the end of the text.
+                self.texts[i] = self.texts[i][:-2]
+            outputs.append(
+                CompletionOutput(
+                    index=i,
+                    text=new_text if delta else self.texts[i],
+                    token_ids=[token_id]
+                    if delta else tuple(self.token_ids[i]),
+                    cumulative_logprob=-float(self.step),
+                    logprobs=self.logprobs[i][-1:]
+                    if delta else self.logprobs[i],
+                    finish_reason="stop" if finished else None,
+                    stop_reason="\n" if finished else None))
+        if self.params.n > 1:
+            random.shuffle(outputs)
+        output = self.output
+        output.outputs = outputs
+        output.finished = finished
+        output.metrics = RequestMetrics(arrival_time=1.0,
+                                        last_token_time=2.0 + self.step,
+                                        first_scheduled_time=1.5,
+                                        first_token_time=None,
+                                        time_in_queue=0.5)
+        if delta and self.step > 0:
+            output.prompt = None
+            output.prompt_token_ids = None
+            output.prompt_logprobs = None
+        self.step += 1
+        return output
+
+
+def test_outputs_round_trip():
+    random.seed(0)
+    encoder = RequestOutputEncoder()
+    decoder = RequestOutputDecoder()
+    requests = {
+        "cumulative":
+        FakeRequest("cumulative", SamplingParams()),
+        "delta":
+        FakeRequest("delta",
+                    SamplingParams(output_kind=RequestOutputKind.DELTA)),
+        "best_of":
+        FakeRequest("best_of", SamplingParams(n=2)),
+    }
+    for request_id, request in requests.items():
+        encoder.add_request(request_id, request.params)
+
+    num_steps = 20
+    for step in range(num_steps):
+        outputs = [
+            request.next_output(finished=step == num_steps - 1)
+            for request in requests.values()
+        ]
+        expected = pickle.loads(pickle.dumps(outputs))
+        decoded = [
+            decoder.to_request_output(delta)
+            for delta in decoder.decode(encoder.encode(outputs))
+        ]
+        assert ([as_tuple(output) for output in decoded
+                 ] == [as_tuple(output) for output in expected])
+
+    # The state of finished requests is dropped on both sides.
+    assert not encoder._sent
+    assert not decoder._outputs
+
+
+def test_cumulative_outputs_are_sent_incrementally():
+    encoder = RequestOutputEncoder()
+    request = FakeRequest("request", SamplingParams())
+    encoder.add_request("request", request.params)
+    for _ in range(50):
+        output = request.next_output(finished=False)
+        delta, = RequestOutputDecoder().decode(encoder.encode([output]))
+    assert delta.prompt is None and delta.prompt_token_ids is None
+    assert len(delta.outputs[0].token_ids) == 1
+    assert len(delta.outputs[0].logprobs) == 1
+
+    # Aborted requests are no longer sent incrementally.
+    encoder.remove_request("request")
+    delta, = RequestOutputDecoder().decode(encoder.encode([output]))
+    assert not delta.incremental
+    assert delta.prompt == "Hello"
+    assert len(delta.outputs[0].token_ids) == 50
+
+
+def test_shared_memory_output_channel():
+    buffer = ShmRingBuffer(n_reader=1, max_chunk_bytes=16, max_chunks=2)
+    writer = SharedMemoryOutputChannel(buffer)
+    reader = SharedMemoryOutputChannel(pickle.loads(pickle.dumps(buffer)))
+
+    def read() -> bytes:
+        with reader.read() as payload:
+            return bytes(payload)
+
+    assert writer.try_write(b"first")
+    assert writer.try_write(b"")
+    # Every chunk is waiting to be read.
+    assert not writer.try_write(b"third")
+    assert read() == b"first"
+    # Does not fit in a chunk with its length.
+    assert not writer.try_write(b"x" * 13)
+    assert writer.try_write(b"x" * 12)
+    assert read() == b""
+    assert read() == b"x" * 12
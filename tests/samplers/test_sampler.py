@@ -1,6 +1,7 @@
 import itertools
 import random
 from dataclasses import dataclass
+from types import SimpleNamespace
 from typing import Dict, List, Optional, Tuple
 from unittest.mock import Mock, patch
 
@@ -11,8 +12,12 @@ from transformers import GenerationConfig, GenerationMixin
 from aphrodite.common.sequence import (SamplingParams, SequenceData,
                                        SequenceGroupMetadata)
 from aphrodite.common.utils import Counter, is_pin_memory_available
-from aphrodite.modeling.layers.sampler import Sampler
-from aphrodite.modeling.sampling_metadata import SamplingMetadata
+from aphrodite.endpoints.openai.logits_processors import get_logits_processors
+from aphrodite.modeling.layers import sampler as sampler_module
+from aphrodite.modeling.layers.sampler import Sampler, SamplerID
+from aphrodite.modeling.sampling_metadata import (PersistentSamplingState,
+                                                  SamplingMetadata,
+                                                  SamplingTensors)
 from aphrodite.modeling.utils import set_random_seed
 
 
@@ -789,6 +794,47 @@ def test_sampler_no_repeat_ngram(seed: int, device: str):
         "No-repeat-ngram sampling is not deterministic with same seed"
 
 
+@pytest.mark.parametrize("device", CUDA_DEVICES)
+def test_sampler_no_repeat_ngram_output_tokens(device: str):
+    """Test that no-repeat-ngram also covers generated tokens, including
+    ones appended after the sequence's n-gram index was built."""
+    vocab_size = 8
+
+    seq_data = SequenceData.from_seqs([1, 2], [5, 1])
+    seq_data.update_num_computed_tokens(seq_data.get_len() - 1)
+    seq_data.get_ngram_index(3)
+    seq_data.append_token_id(2, logprob=0.0)
+
+    seq_group_metadata = SequenceGroupMetadata(
+        request_id="test_0",
+        is_prompt=False,
+        seq_data={0: seq_data},
+        sampling_params=SamplingParams(temperature=0.0,
+                                       no_repeat_ngram_size=3),
+        block_tables={0: [1]},
+    )
+
+    sampling_metadata = SamplingMetadata.prepare(
+        [seq_group_metadata],
+        seq_lens=[seq_data.get_len()],
+        query_lens=[1],
+        device=device,
+        pin_memory=is_pin_memory_available())
+
+    fake_logits = torch.full((1, vocab_size),
+                             1e-2,
+                             device=device,
+                             dtype=torch.float16)
+    fake_logits[0, 5] = 1.0
+
+    sampler = MockLogitsSampler(fake_logits)
+    sampler_output = sampler(logits=fake_logits,
+                             sampling_metadata=sampling_metadata)
+
+    assert sampler_output[0].samples[0].output_token != 5, \
+        "Token 5 would repeat the [1, 2, 5] trigram"
+
+
 @pytest.mark.parametrize("device", CUDA_DEVICES)
 def test_sampler_dry(device: str):
     vocab_size = 8
@@ -915,6 +961,213 @@ def test_sampler_dry_sequence_breakers(device: str):
         "DRY should not detect patterns across sequence breakers"
 
 
+@pytest.mark.parametrize("device", CUDA_DEVICES)
+def test_sampler_dry_incremental(device: str):
+    """Test that DRY follows tokens appended after the sequence's token index
+    was built."""
+    vocab_size = 8
+
+    seq_data = SequenceData.from_seqs([1, 2, 3, 4], [1, 2])
+    seq_data.update_num_computed_tokens(seq_data.get_len() - 1)
+    # Build the index, then decode one more token of the repeated pattern.
+    seq_data.get_token_position_index()
+    seq_data.append_token_id(3, logprob=0.0)
+
+    seq_group_metadata = SequenceGroupMetadata(
+        request_id="test_0",
+        is_prompt=False,
+        seq_data={0: seq_data},
+        sampling_params=SamplingParams(
+            temperature=0.0,
+            dry_multiplier=1.0,
+            dry_allowed_length=2,
+            dry_base=2.0,
+        ),
+        block_tables={0: [1]},
+    )
+
+    sampling_metadata = SamplingMetadata.prepare(
+        [seq_group_metadata],
+        seq_lens=[seq_data.get_len()],
+        query_lens=[1],
+        device=device,
+        pin_memory=is_pin_memory_available())
+
+    fake_logits = torch.full((1, vocab_size),
+                             1e-2,
+                             device=device,
+                             dtype=torch.float16)
+    fake_logits[0, 4] = 1.0
+
+    sampler = MockLogitsSampler(fake_logits)
+    sampler_output = sampler(logits=fake_logits,
+                             sampling_metadata=sampling_metadata)
+
+    assert sampler_output[0].samples[0].output_token != 4, \
+        "DRY should penalize continuing the repeated [1, 2, 3] pattern"
+
+
+@pytest.mark.parametrize("seed", list(range(4)))
+@pytest.mark.parametrize("device", CUDA_DEVICES)
+def test_persistent_sampling_state(seed: int, device: str):
+    """The persistent sampling state builds the same tensors as
+    SamplingTensors.from_sampling_metadata while sequences join, decode and
+    leave the batch."""
+    random.seed(seed)
+    vocab_size = 100
+    params_choices = [
+        SamplingParams(temperature=0.0),
+        SamplingParams(temperature=0.7, top_k=20, top_p=0.9, min_p=0.05),
+        SamplingParams(temperature=1.2,
+                       presence_penalty=0.5,
+                       repetition_penalty=1.1,
+                       prompt_logprobs=2),
+        SamplingParams(dry_multiplier=0.8,
+                       dry_sequence_breaker_ids=[1, 2, 3],
+                       temperature_last=True),
+        SamplingParams(dry_multiplier=1.0, dry_sequence_breaker_ids=[4]),
+    ]
+    # A small initial number of slots, so that they are reclaimed and grown.
+    state = PersistentSamplingState(vocab_size,
+                                    torch.device(device),
+                                    torch.float16,
+                                    num_slots=2)
+    seq_id_counter = Counter()
+    running: Dict[int, Tuple[SequenceData, SamplingParams]] = {}
+
+    for _ in range(30):
+        for seq_id in random.sample(list(running), len(running) // 4):
+            del running[seq_id]
+        new_seq_ids = []
+        for _ in range(random.randint(0, 3)):
+            # Reuse the id of a finished sequence now and then.
+            seq_id = next(seq_id_counter) if random.random() < 0.8 else 0
+            prompt = [random.randrange(vocab_size) for _ in range(
+                random.randint(1, 12))]
+            running[seq_id] = (SequenceData.from_seqs(prompt),
+                               random.choice(params_choices))
+            new_seq_ids.append(seq_id)
+
+        seq_group_metadata_list = []
+        seq_lens = []
+        query_lens = []
+        for seq_id, (seq_data, params) in running.items():
+            is_prompt = seq_id in new_seq_ids
+            if random.random() < 0.1:
+                # The output tokens were replaced.
+                seq_data.output_token_ids = list(
+                    seq_data.output_token_ids[:-1])
+            seq_group_metadata_list.append(
+                SequenceGroupMetadata(request_id=str(seq_id),
+                                      is_prompt=is_prompt,
+                                      seq_data={seq_id: seq_data},
+                                      sampling_params=params,
+                                      block_tables={seq_id: [1]}))
+            seq_lens.append(seq_data.get_len())
+            query_lens.append(seq_data.get_len() if is_prompt else 1)
+        if not seq_group_metadata_list:
+            continue
+
+        sampling_metadata = SamplingMetadata.prepare(
+            seq_group_metadata_list,
+            seq_lens,
+            query_lens,
+            device=device,
+            pin_memory=is_pin_memory_available())
+        expected_tensors, *expected_flags = (
+            SamplingTensors.from_sampling_metadata(sampling_metadata,
+                                                   vocab_size, device,
+                                                   torch.float16))
+        tensors, *flags = state.get_sampling_tensors(sampling_metadata)
+        assert flags == expected_flags
+        for name, expected in vars(expected_tensors).items():
+            actual = getattr(tensors, name)
+            assert actual.dtype == expected.dtype, name
+            assert torch.equal(actual, expected), name
+
+        for seq_data, _ in running.values():
+            seq_data.append_token_id(random.randrange(vocab_size), 0.0)
+
+
+@pytest.mark.parametrize("device", CUDA_DEVICES)
+def test_sampler_without_persistent_sampling_state(device: str,
+                                                   monkeypatch):
+    """With APHRODITE_DISABLE_PERSISTENT_SAMPLING_STATE, the sampler rebuilds
+    its sampling tensors on every step and samples the same tokens."""
+    set_random_seed(0)
+    torch.set_default_device(device)
+    batch_size = 16
+    _, fake_logits, sampler = _prepare_test(batch_size)
+    for i in range(batch_size):
+        fake_logits[i, i] = 1e2
+    sampling_params = SamplingParams(temperature=0.8,
+                                     top_k=5,
+                                     repetition_penalty=1.2)
+    expected = _do_sample(batch_size, fake_logits, sampler, sampling_params,
+                          device)
+    assert sampler._sampling_state is not None
+
+    monkeypatch.setenv("APHRODITE_DISABLE_PERSISTENT_SAMPLING_STATE", "1")
+    sampler = MockLogitsSampler(fake_logits)
+    with patch.object(PersistentSamplingState,
+                      "get_sampling_tensors") as get_sampling_tensors:
+        sampler_output = _do_sample(batch_size, fake_logits, sampler,
+                                    sampling_params, device)
+    get_sampling_tensors.assert_not_called()
+    assert sampler._sampling_state is None
+    assert sampler_output == expected
+
+
+@pytest.mark.parametrize("device", CUDA_DEVICES)
+def test_persistent_sampling_state_releases_memory(device: str):
+    """The slot of a sequence is released once its SequenceData is freed,
+    and the token rows shrink once the long sequences left the batch."""
+    vocab_size = 100
+    params = SamplingParams(temperature=1.0, repetition_penalty=1.1)
+    state = PersistentSamplingState(vocab_size,
+                                    torch.device(device),
+                                    torch.float16,
+                                    num_slots=2)
+
+    def step(running: Dict[int, SequenceData]) -> None:
+        seq_group_metadata_list = [
+            SequenceGroupMetadata(request_id=str(seq_id),
+                                  is_prompt=False,
+                                  seq_data={seq_id: seq_data},
+                                  sampling_params=params,
+                                  block_tables={seq_id: [1]})
+            for seq_id, seq_data in running.items()
+        ]
+        sampling_metadata = SamplingMetadata.prepare(
+            seq_group_metadata_list,
+            [seq_data.get_len() for seq_data in running.values()],
+            [1] * len(running),
+            device=device,
+            pin_memory=is_pin_memory_available())
+        expected_tensors, *_ = SamplingTensors.from_sampling_metadata(
+            sampling_metadata, vocab_size, device, torch.float16)
+        tensors, *_ = state.get_sampling_tensors(sampling_metadata)
+        assert torch.equal(tensors.prompt_tokens,
+                           expected_tensors.prompt_tokens)
+
+    running = {
+        0: SequenceData.from_seqs([1] * 4000),
+        1: SequenceData.from_seqs([2] * 8),
+    }
+    step(running)
+    assert state._prompt_tokens.size(1) >= 4000
+    num_free_slots = len(state._free_slots)
+
+    del running[0]
+    step(running)
+    assert len(state._free_slots) == num_free_slots + 1
+    assert state._prompt_tokens.size(1) < 4000
+
+    # The long sequence is copied again if it is sampled again.
+    running[0] = SequenceData.from_seqs([1] * 4000)
+    step(running)
+
+
 @pytest.mark.parametrize("seed", RANDOM_SEEDS)
 @pytest.mark.parametrize("device", CUDA_DEVICES)
 def test_sampler_nsigma(seed: int, device: str):
@@ -1037,3 +1290,119 @@ def test_sampler_include_gpu_probs_tensor(device: str):
     assert sampler_output.sampled_token_probs is not None
     assert sampler_output.logprobs is not None
     assert sampler_output.sampled_token_ids is not None
+
+
+def test_sampler_plan():
+    enabled = {sampler_id: True for sampler_id in SamplerID}
+    enabled[SamplerID.TYPICAL_P] = False
+    order = [
+        SamplerID.TEMPERATURE, SamplerID.MIN_P, SamplerID.TYPICAL_P,
+        SamplerID.TOP_A, SamplerID.XTC, SamplerID.TFS, SamplerID.QUADRATIC,
+        SamplerID.MIN_P
+    ]
+    assert sampler_module._get_sampler_plan(order, enabled) == [
+        SamplerID.TEMPERATURE,
+        (SamplerID.MIN_P, SamplerID.TOP_A),
+        SamplerID.XTC,
+        (SamplerID.TFS, ),
+        SamplerID.QUADRATIC,
+        SamplerID.MIN_P,
+    ]
+
+
+@pytest.mark.parametrize("seed", list(range(16)))
+@pytest.mark.parametrize("device", CUDA_DEVICES)
+def test_sampler_truncations(seed: int, device: str):
+    """Truncation samplers applied with a single sort keep the same tokens
+    as when applied one after the other."""
+    set_random_seed(seed)
+    torch.set_default_device(device)
+    batch_size, vocab_size = 8, 1000
+    logits = torch.randn(batch_size, vocab_size) * random.choice([1, 3, 6])
+    tensors = SimpleNamespace(
+        top_ps=torch.rand(batch_size) * 0.5 + 0.5,
+        top_ks=torch.randint(5, vocab_size, (batch_size, )),
+        top_as=torch.rand(batch_size) * 0.3,
+        min_ps=torch.rand(batch_size) * 0.1,
+        tfss=torch.rand(batch_size) * 0.5 + 0.5,
+        eta_cutoffs=torch.rand(batch_size) * 1e-3,
+        epsilon_cutoffs=torch.rand(batch_size) * 1e-3)
+    apply_sampler = {
+        SamplerID.TOP_P_TOP_K:
+        lambda x: sampler_module._apply_top_k_top_p(
+            x, tensors.top_ps.clone(), tensors.top_ks.clone()),
+        SamplerID.TOP_A:
+        lambda x: sampler_module._apply_top_a(x, tensors.top_as.clone()),
+        SamplerID.MIN_P:
+        lambda x: sampler_module._apply_min_p(x, tensors.min_ps.clone()),
+        SamplerID.TFS:
+        lambda x: sampler_module._apply_tfs(x, tensors.tfss.clone()),
+        SamplerID.ETA_CUTOFF:
+        lambda x: sampler_module._apply_eta_cutoff(
+            x, tensors.eta_cutoffs.clone()),
+        SamplerID.EPSILON_CUTOFF:
+        lambda x: sampler_module._apply_epsilon_cutoff(
+            x, tensors.epsilon_cutoffs.clone()),
+    }
+    order = tuple(random.sample(list(apply_sampler), random.randint(1, 6)))
+
+    expected = logits.clone()
+    for sampler_id in order:
+        expected = apply_sampler[sampler_id](expected)
+    actual = sampler_module._apply_truncations(logits.clone(), order,
+                                               tensors)
+    assert torch.equal(actual.isinf(), expected.isinf())
+    assert torch.equal(actual[~actual.isinf()], logits[~actual.isinf()])
+
+    # Only the given rows are truncated.
+    rows = torch.tensor([1, 4, 5])
+    actual = sampler_module._apply_truncations(logits.clone(), order,
+                                               tensors, rows)
+    assert torch.equal(actual[rows].isinf(), expected[rows].isinf())
+    other_rows = [0, 2, 3, 6, 7]
+    assert torch.equal(actual[other_rows], logits[other_rows])
+
+
+@pytest.mark.parametrize("seed", list(range(8)))
+@pytest.mark.parametrize("device", CUDA_DEVICES)
+def test_sampler_logit_bias_allowed_token_ids(seed: int, device: str):
+    """The logit bias and allowed token ids of the batch, applied at once,
+    match the per-row logits processors."""
+    set_random_seed(seed)
+    torch.set_default_device(device)
+    batch_size, vocab_size = 6, 1000
+    tokenizer = [None] * vocab_size
+    seq_groups = []
+    for i in range(batch_size // 2):
+        logit_bias = random.choice([
+            None, {
+                token_id: random.uniform(-100, 100)
+                for token_id in random.sample(range(vocab_size), 300)
+            }
+        ])
+        allowed_token_ids = random.choice(
+            [None, random.sample(range(vocab_size), 50)])
+        # Two sequences per request.
+        seq_groups.append(
+            SimpleNamespace(sample_indices=[2 * i, 2 * i + 1],
+                            sampling_params=SamplingParams(
+                                logit_bias=logit_bias,
+                                allowed_token_ids=allowed_token_ids)))
+    logits = torch.randn(batch_size, vocab_size)
+
+    expected = logits.clone()
+    for seq_group in seq_groups:
+        params = seq_group.sampling_params
+        processors = get_logits_processors(params.logit_bias,
+                                           params.allowed_token_ids,
+                                           tokenizer)
+        for row in seq_group.sample_indices:
+            for processor in processors:
+                expected[row] = processor([], expected[row])
+
+    sampling_metadata = SimpleNamespace(seq_groups=seq_groups)
+    actual = sampler_module._apply_logit_bias(logits.clone(),
+                                              sampling_metadata)
+    actual = sampler_module._apply_allowed_token_ids(actual,
+                                                     sampling_metadata)
+    torch.testing.assert_close(actual, expected)
@@ -6,7 +6,10 @@ import torch
 from aphrodite.common.sequence import ExecuteModelRequest
 from aphrodite.spec_decode.metrics import AsyncMetricsCollector
 from aphrodite.spec_decode.multi_step_worker import MultiStepWorker
+from aphrodite.spec_decode.ngram_worker import NGramWorker
 from aphrodite.spec_decode.spec_decode_worker import SpecDecodeWorker
+from aphrodite.spec_decode.speculation_length import (
+    SpeculationLengthController)
 from aphrodite.spec_decode.top1_proposer import Top1Proposer
 
 from .test_utils import mock_spec_decode_sampler
@@ -85,3 +88,118 @@ def test_disable_spec_tokens(queue_size: int, batch_size: int, k: int,
                 num_lookahead_slots=k),
             seq_ids_with_bonus_token_in_last_step=set())
         assert proposals.proposal_lens.tolist() == [0] * batch_size
+
+
+@pytest.mark.parametrize("speculate", [[False, False], [True, False]])
+@torch.inference_mode()
+def test_adaptive_speculation_length(speculate):
+    """Verify that the chosen speculation length is used for the step, and
+    that requests skipped for a step speculate again in the next one.
+    """
+    k = 4
+    batch_size = 2
+    chosen_k = 0 if not any(speculate) else 2
+    draft_worker = mock_worker(cls=NGramWorker)
+    target_worker = mock_worker()
+    worker = SpecDecodeWorker(proposer_worker=draft_worker,
+                              scorer_worker=target_worker,
+                              spec_decode_sampler=mock_spec_decode_sampler(
+                                  "rejection_sampler"),
+                              disable_logprobs=False,
+                              metrics_collector=MagicMock(
+                                  spec=AsyncMetricsCollector),
+                              adaptive_speculation_length=True)
+    controller = MagicMock(spec=SpeculationLengthController)
+    controller.allow_no_speculation = True
+    controller.is_dropped.return_value = False
+    controller.choose.return_value = (chosen_k, speculate)
+    worker._speculation_length_controller = controller
+
+    seq_group_metadata_list, _, _ = create_batch(batch_size, k)
+    execute_model_req = ExecuteModelRequest(
+        seq_group_metadata_list=seq_group_metadata_list,
+        num_lookahead_slots=k)
+
+    exception_secret = 'artificial stop'
+    num_speculative_tokens = []
+
+    def run(execute_model_req, *args, **kwargs):
+        num_speculative_tokens.extend(
+            sgm.num_speculative_tokens
+            for sgm in execute_model_req.seq_group_metadata_list)
+        raise ValueError(exception_secret)
+
+    run_method = ('_run_speculative_decoding_step'
+                  if chosen_k else '_run_no_spec')
+    with patch.object(worker, run_method, side_effect=run) as run_step, \
+        pytest.raises(ValueError, match=exception_secret):
+        worker.execute_model(execute_model_req=execute_model_req)
+
+    assert execute_model_req.num_lookahead_slots == chosen_k
+    if chosen_k:
+        assert run_step.call_args.args[1] == chosen_k
+    else:
+        assert run_step.call_args.kwargs["skip_proposer"] is False
+    assert num_speculative_tokens == [
+        None if speculate_seq else 0 for speculate_seq in speculate
+    ]
+    # The skipped requests are not disabled for good.
+    assert all(sgm.num_speculative_tokens is None
+               for sgm in seq_group_metadata_list)
+
+
+@torch.inference_mode()
+def test_adaptive_speculation_length_drops_for_good():
+    """Verify that a request skipped for good by a proposer with a KV cache
+    stays skipped when the metadata is rebuilt at the next step.
+    """
+    k = 4
+    batch_size = 2
+    draft_worker = mock_worker(cls=MultiStepWorker)
+    target_worker = mock_worker()
+    worker = SpecDecodeWorker(proposer_worker=draft_worker,
+                              scorer_worker=target_worker,
+                              spec_decode_sampler=mock_spec_decode_sampler(
+                                  "rejection_sampler"),
+                              disable_logprobs=False,
+                              metrics_collector=MagicMock(
+                                  spec=AsyncMetricsCollector),
+                              adaptive_speculation_length=True)
+    controller = SpeculationLengthController(k, allow_no_speculation=False)
+    # Request "0" accepts all its proposed tokens, request "1" none.
+    for step in range(16):
+        num_scored_tokens = 2 * batch_size + step % 3 + batch_size * k
+        controller.observe_acceptance(["0", "1"], [k, k], [k + 1, 1])
+        controller.observe_step_times(k, num_scored_tokens, 0.5 * k,
+                                      10.0 + num_scored_tokens)
+    worker._speculation_length_controller = controller
+
+    exception_secret = 'artificial stop'
+    num_speculative_tokens = []
+
+    def run(execute_model_req, *args, **kwargs):
+        num_speculative_tokens.append([
+            sgm.num_speculative_tokens
+            for sgm in execute_model_req.seq_group_metadata_list
+        ])
+        raise ValueError(exception_secret)
+
+    with patch.object(controller, "choose",
+                      wraps=controller.choose) as choose, \
+        patch.object(worker, "_run_speculative_decoding_step",
+                     side_effect=run):
+        for _ in range(2):
+            # The scheduler builds the metadata anew at each step.
+            seq_group_metadata_list, _, _ = create_batch(batch_size, k)
+            execute_model_req = ExecuteModelRequest(
+                seq_group_metadata_list=seq_group_metadata_list,
+                num_lookahead_slots=k)
+            with pytest.raises(ValueError, match=exception_secret):
+                worker.execute_model(execute_model_req=execute_model_req)
+
+    assert [call.args[0] for call in choose.call_args_list] == [["0", "1"],
+                                                                ["0"]]
+    assert num_speculative_tokens == [[None, 0], [None, 0]]
+    assert controller.is_dropped("1")
+    controller.remove_request("1")
+    assert not controller.is_dropped("1")
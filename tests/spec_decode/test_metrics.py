@@ -18,6 +18,7 @@ def test_initial_call_returns_none():
                                                           dtype=torch.long,
                                                           device='cuda')
     spec_decode_sampler.num_draft_tokens = 0
+    spec_decode_sampler.num_spec_seqs = 0
 
     collector = AsyncMetricsCollector(spec_decode_sampler)
     collector.init_gpu_tensors(rank=0)
@@ -36,6 +37,7 @@ def test_second_call_returns_metrics():
                                                           dtype=torch.long,
                                                           device='cuda')
     spec_decode_sampler.num_draft_tokens = 0
+    spec_decode_sampler.num_spec_seqs = 0
 
     collect_interval_s = 5.0
     timer = MagicMock()
@@ -64,6 +66,7 @@ def test_nonzero_rank_noop(rank):
                                                           dtype=torch.long,
                                                           device='cuda')
     spec_decode_sampler.num_draft_tokens = 0
+    spec_decode_sampler.num_spec_seqs = 0
 
     collector = AsyncMetricsCollector(spec_decode_sampler)
     collector.init_gpu_tensors(rank=rank)
@@ -83,6 +86,7 @@ def test_noop_until_time():
                                                           dtype=torch.long,
                                                           device='cuda')
     spec_decode_sampler.num_draft_tokens = 0
+    spec_decode_sampler.num_spec_seqs = 0
 
     collect_interval_s = 5.0
     timer = MagicMock()
@@ -117,6 +121,7 @@ def test_timer_is_reset():
                                                           dtype=torch.long,
                                                           device='cuda')
     spec_decode_sampler.num_draft_tokens = 0
+    spec_decode_sampler.num_spec_seqs = 0
 
     collect_interval_s = 5.0
     timer = MagicMock()
@@ -162,8 +167,9 @@ def test_initial_metrics_has_correct_values(has_data: bool):
         num_draft_tokens = 0
     k = 5
 
+    num_spec_seqs = num_draft_tokens // k
     max_num_emitted_tokens = AsyncMetricsCollector.get_max_num_emitted_tokens(
-        num_draft_tokens, k)
+        num_draft_tokens, num_spec_seqs)
 
     spec_decode_sampler = MagicMock()
     spec_decode_sampler.num_accepted_tokens = torch.tensor(num_accepted_tokens,
@@ -173,6 +179,7 @@ def test_initial_metrics_has_correct_values(has_data: bool):
                                                           dtype=torch.long,
                                                           device='cuda')
     spec_decode_sampler.num_draft_tokens = num_draft_tokens
+    spec_decode_sampler.num_spec_seqs = num_spec_seqs
 
     collect_interval_s = 5.0
     timer = MagicMock()
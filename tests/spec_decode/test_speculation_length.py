@@ -0,0 +1,108 @@
+import pytest
+
+from aphrodite.spec_decode.speculation_length import (
+    SpeculationLengthController)
+
+
+def observe_steps(controller: SpeculationLengthController,
+                  acceptance_rates: dict,
+                  num_steps: int,
+                  draft_time_per_token_ms: float,
+                  scoring_time_ms_per_token: float,
+                  scoring_time_ms_base: float = 10.0) -> None:
+    """Feed steps where each request accepts round(rate * k) tokens, with
+    scoring times linear in the number of scored tokens."""
+    request_ids = list(acceptance_rates)
+    k = controller.max_num_speculative_tokens
+    for step in range(num_steps):
+        # Vary the batch size so that the slope of the scoring time is known.
+        batch_size = len(request_ids) + step % 3
+        num_scored_tokens = batch_size + len(request_ids) * k
+        controller.observe_acceptance(
+            request_ids, [k] * len(request_ids),
+            [round(acceptance_rates[r] * k) + 1 for r in request_ids])
+        controller.observe_step_times(
+            k, num_scored_tokens, draft_time_per_token_ms * k,
+            scoring_time_ms_base +
+            scoring_time_ms_per_token * num_scored_tokens)
+
+
+def test_max_length_before_observations():
+    controller = SpeculationLengthController(4, allow_no_speculation=True)
+    assert controller.choose(["a", "b"], 2) == (4, [True, True])
+
+
+@pytest.mark.parametrize("allow_no_speculation", [True, False])
+def test_drops_requests_with_poor_acceptance(allow_no_speculation: bool):
+    controller = SpeculationLengthController(
+        4, allow_no_speculation=allow_no_speculation)
+    observe_steps(controller, {"good": 1.0, "bad": 0.0},
+                  num_steps=16,
+                  draft_time_per_token_ms=0.5,
+                  scoring_time_ms_per_token=1.0)
+
+    assert (controller.get_acceptance_rate("good") >
+            controller.get_acceptance_rate("bad"))
+    k, speculate = controller.choose(["good", "bad"], 2)
+    assert k == 4
+    assert speculate == [True, False]
+    # A request that was not observed enough keeps speculating.
+    k, speculate = controller.choose(["good", "new"], 2)
+    assert speculate == [True, not allow_no_speculation]
+
+
+def test_shorter_length_for_lower_acceptance():
+    high = SpeculationLengthController(8, allow_no_speculation=True)
+    low = SpeculationLengthController(8, allow_no_speculation=True)
+    observe_steps(high, {"a": 0.95},
+                  num_steps=16,
+                  draft_time_per_token_ms=1.0,
+                  scoring_time_ms_per_token=0.1)
+    observe_steps(low, {"a": 0.5},
+                  num_steps=16,
+                  draft_time_per_token_ms=1.0,
+                  scoring_time_ms_per_token=0.1)
+
+    high_k, _ = high.choose(["a"], 1)
+    low_k, _ = low.choose(["a"], 1)
+    assert 0 < low_k < high_k
+
+
+@pytest.mark.parametrize("allow_no_speculation", [True, False])
+def test_expensive_drafts(allow_no_speculation: bool):
+    controller = SpeculationLengthController(
+        4, allow_no_speculation=allow_no_speculation)
+    observe_steps(controller, {"a": 0.5},
+                  num_steps=16,
+                  draft_time_per_token_ms=100.0,
+                  scoring_time_ms_per_token=1.0)
+
+    k, speculate = controller.choose(["a"], 1)
+    if allow_no_speculation:
+        assert (k, speculate) == (0, [False])
+    else:
+        # Proposers with a KV cache speculate at least one token.
+        assert (k, speculate) == (1, [True])
+
+
+def test_exploration():
+    controller = SpeculationLengthController(4,
+                                             allow_no_speculation=True,
+                                             exploration_interval=4)
+    observe_steps(controller, {"a": 0.0},
+                  num_steps=16,
+                  draft_time_per_token_ms=1.0,
+                  scoring_time_ms_per_token=1.0)
+
+    choices = [controller.choose(["a"], 1) for _ in range(4)]
+    assert choices.count((0, [False])) == 3
+    assert choices.count((4, [True])) == 1
+
+
+def test_remove_request():
+    controller = SpeculationLengthController(4, allow_no_speculation=True)
+    controller.observe_acceptance(["a"], [4], [1])
+    assert controller.get_acceptance_rate("a") < 0.5
+    controller.remove_request("a")
+    controller.observe_acceptance_rate(0.8)
+    assert controller.get_acceptance_rate("a") == pytest.approx(0.8)
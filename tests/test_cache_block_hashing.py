@@ -4,10 +4,15 @@ Run `pytest tests/test_cache_block_hashing.py`.
 """
 from typing import List, Optional
 
+import numpy as np
 import pytest
+import torch
 
 from aphrodite.common.sequence import Sequence
 from aphrodite.lora.request import LoRARequest
+from aphrodite.processing.block.hashing import (get_extra_hash,
+                                                hash_block_tokens,
+                                                hash_token_blocks)
 from aphrodite.transformers_utils.tokenizer_group import TokenizerGroup
 
 # Make two prefixes with different first blocks.
@@ -97,3 +102,57 @@ def test_auto_prefix_caching(model: str, block_size: int, max_num_seqs: int,
         different_hashes = [h[-1] for h in hash_pref]
         assert (len(set(same_hashes)) == 1)
         assert (len(set(different_hashes)) == len(different_hashes))
+
+
+@pytest.mark.parametrize("block_size", [1, 16])
+def test_hash_token_blocks(block_size: int):
+    token_ids = np.random.default_rng(0).integers(0, 150_000, 50 * block_size)
+    expected: List[int] = []
+    for start in range(0, len(token_ids), block_size):
+        expected.append(
+            hash_block_tokens(expected[-1] if expected else None,
+                              token_ids[start:start + block_size].tolist(),
+                              extra_hash=7))
+    assert len(set(expected)) == len(expected)
+
+    # All the blocks at once, from a list or an array, with a trailing
+    # partial block.
+    partial_block = [1] * (block_size - 1)
+    assert hash_token_blocks(None,
+                             token_ids.tolist() + partial_block, block_size,
+                             7) == expected
+    assert hash_token_blocks(None, token_ids, block_size, 7) == expected
+    # Continuing from the hash of a block.
+    assert hash_token_blocks(expected[9], token_ids[10 * block_size:],
+                             block_size) == expected[10:]
+    # Another extra hash changes every block.
+    assert not set(hash_token_blocks(None, token_ids, block_size,
+                                     8)) & set(expected)
+
+
+def test_extra_hash():
+    image = torch.zeros(3, 4, 4)
+    other_image = image.clone()
+    other_image[0, 0, 0] = 1
+
+    assert get_extra_hash() is None
+    assert get_extra_hash(multi_modal_inputs=[{}, {}]) is None
+    extra_hashes = [
+        get_extra_hash(lora_int_id=1),
+        get_extra_hash(lora_int_id=2),
+        get_extra_hash(prompt_adapter_id=1),
+        get_extra_hash(multi_modal_inputs=[{
+            "image": image
+        }]),
+        get_extra_hash(multi_modal_inputs=[{
+            "image": other_image
+        }]),
+        get_extra_hash(lora_int_id=1, multi_modal_inputs=[{
+            "image": image
+        }]),
+    ]
+    assert len(set(extra_hashes)) == len(extra_hashes)
+    # Inputs are hashed by content.
+    assert get_extra_hash(multi_modal_inputs=[{
+        "image": image.clone()
+    }]) == extra_hashes[3]
@@ -0,0 +1,136 @@
+import itertools
+
+import pytest
+import torch
+
+import aphrodite.common.grammar as grammar_module
+from aphrodite.common.grammar import GrammarLogitsProcessor
+
+JSON_GRAMMAR = r"""
+start: value
+?value: object | array | STRING | NUMBER
+object: "{" [pair ("," pair)*] "}"
+pair: STRING ":" value
+array: "[" [value ("," value)*] "]"
+STRING: /"[abc ]*"/
+NUMBER: /[0-9]+/
+"""
+
+
+class FakeTokenizer:
+    """Tokens of one and two characters."""
+    name_or_path = "fake-tokenizer"
+    bos_token = "<s>"
+    bos_token_id = 0
+    eos_token_id = 1
+
+    def __init__(self):
+        chars = list('{}[]:,"') + list("abc0123 ")
+        self.tokens = ["<s>", "</s>"] + sorted(
+            set(chars + ["".join(p) for p in itertools.product(chars, chars)]))
+        self.vocab = {token: i for i, token in enumerate(self.tokens)}
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def decode(self, token_ids):
+        return "".join(self.tokens[i] for i in token_ids
+                       if i != self.eos_token_id)
+
+    def encode(self, text):
+        return [self.vocab[char] for char in text]
+
+
+@pytest.mark.parametrize(
+    "seq", ["", "{", '{"a', '{"ab":', '{"ab":[1', '[12,"c"', '"a"', "{]"])
+def test_valid_next_token_strs(seq):
+    """The vocab trie walk finds the tokens that checking each token
+    does."""
+    tokenizer = FakeTokenizer()
+    processor = GrammarLogitsProcessor(tokenizer,
+                                       JSON_GRAMMAR,
+                                       use_disk_cache=False)
+    result = processor.root_parser[seq]
+    expected = set()
+    if result is not None:
+        partial_term, parser = result
+        expected = {
+            token
+            for token in processor.vocab if token is not None
+            and parser.is_valid_next_seq(partial_term + token)
+        }
+        if partial_term == "" and parser.is_valid_next_seq(None):
+            expected.add(None)
+    assert set(processor.get_valid_next_token_strs(seq)) == expected
+
+    # The logits may cover more ids than the tokenizer.
+    logits = torch.zeros(2, len(tokenizer) + 40)
+    processor(logits, [tokenizer.encode(seq)] * 2)
+    allowed = set(processor.get_valid_next_token_ids(seq))
+    for row in logits:
+        assert set((row == 0).nonzero().flatten().tolist()) == allowed
+
+
+def test_token_masks_are_saved(tmp_path, monkeypatch):
+    monkeypatch.setenv("APHRODITE_GRAMMAR_CACHE_PATH", str(tmp_path))
+    monkeypatch.setattr(grammar_module, "_compiled_grammars", {})
+    tokenizer = FakeTokenizer()
+    processor = GrammarLogitsProcessor(tokenizer, JSON_GRAMMAR)
+    logits = torch.zeros(1, len(tokenizer))
+    processor(logits, [tokenizer.encode('{"a":')])
+    compiled = processor.compiled
+    compiled.flush()
+    assert len(compiled.masks) == 1
+    assert len(list(tmp_path.iterdir())) == 1
+
+    # Another process loads the masks instead of computing them.
+    monkeypatch.setattr(grammar_module, "_compiled_grammars", {})
+    processor = GrammarLogitsProcessor(tokenizer, JSON_GRAMMAR)
+    assert processor.compiled is not compiled
+    assert processor.compiled.masks.keys() == compiled.masks.keys()
+    loaded_logits = torch.zeros(1, len(tokenizer))
+    processor(loaded_logits, [tokenizer.encode('{"a":')])
+    assert torch.equal(loaded_logits, logits)
+
+
+def test_token_masks_are_saved_rarely(tmp_path, monkeypatch):
+    """Saves are throttled, and only the masks of the states between
+    terminals are saved."""
+    monkeypatch.setenv("APHRODITE_GRAMMAR_CACHE_PATH", str(tmp_path))
+    monkeypatch.setattr(grammar_module, "_compiled_grammars", {})
+    saved_masks = []
+
+    def save(masks, path):
+        saved_masks.append(masks)
+        open(path, "wb").close()
+
+    monkeypatch.setattr(torch, "save", save)
+    tokenizer = FakeTokenizer()
+    processor = GrammarLogitsProcessor(tokenizer, JSON_GRAMMAR)
+    seq = '{"ab":[1,"c",{"a":22}],"b":"ca"}'
+    for end in range(len(seq)):
+        logits = torch.zeros(1, len(tokenizer))
+        processor(logits, [tokenizer.encode(seq[:end])])
+    compiled = processor.compiled
+    compiled.flush()
+
+    # One save on the first new mask, and one when the process exits.
+    assert len(saved_masks) == 2
+    assert any(partial_term for _, partial_term in compiled.masks)
+    assert saved_masks[-1].keys() == {
+        key
+        for key in compiled.masks if key[1] == ""
+    }
+    compiled.flush()
+    assert len(saved_masks) == 2
+
+
+def test_token_masks_are_bounded():
+    compiled = grammar_module.CompiledGrammar("digest", None, max_size=2)
+    for i in range(3):
+        compiled.add(((i, ), ""), torch.zeros(1, dtype=torch.int32))
+    assert compiled.get(((0, ), "")) is None
+    assert compiled.get(((1, ), "")) is not None
+    compiled.add(((3, ), ""), torch.zeros(1, dtype=torch.int32))
+    # The least recently used mask is dropped.
+    assert list(compiled.masks) == [((1, ), ""), ((3, ), "")]
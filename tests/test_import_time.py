@@ -0,0 +1,81 @@
+"""Check that importing aphrodite stays cheap, by importing it in a fresh
+interpreter and looking at the modules it loaded."""
+import json
+import subprocess
+import sys
+from typing import List
+
+import pytest
+
+from aphrodite.quantization import QUANTIZATION_METHODS, QuantizationConfig
+
+# Budget for `import aphrodite`, which should only read the version. It
+# takes a few milliseconds; the budget leaves room for slow CI machines.
+IMPORT_APHRODITE_BUDGET_US = 500_000
+
+# Not needed to create an engine or an LLM.
+LAZY_MODULES = [
+    "openai",
+    "aphrodite.endpoints.chat_utils",
+    "aphrodite.endpoints.openai.protocol",
+    "aphrodite.quantization.gptq",
+    "aphrodite.quantization.gguf",
+    "aphrodite.quantization.awq_marlin",
+    "aphrodite.triton_utils.custom_cache_manager",
+    "aphrodite.transformers_utils.tokenizer_group.ray_tokenizer_group",
+]
+
+
+def _loaded_modules(statement: str) -> List[str]:
+    """Modules loaded by running the statement in a fresh interpreter."""
+    code = (f"import json, sys; {statement}; "
+            "print(json.dumps(list(sys.modules)))")
+    stdout = subprocess.run([sys.executable, "-c", code],
+                            check=True,
+                            capture_output=True,
+                            text=True).stdout
+    # The last line, after anything logged while importing.
+    return json.loads(stdout.splitlines()[-1])
+
+
+def _import_time_us(statement: str) -> int:
+    """Cumulative time of the top-level module imported by the statement,
+    as reported by -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        check=True,
+        capture_output=True,
+        text=True).stderr
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip() == "aphrodite":
+            return int(cumulative)
+    raise AssertionError(f"aphrodite was not imported:\n{stderr}")
+
+
+def test_import_aphrodite_is_cheap():
+    loaded = _loaded_modules("import aphrodite")
+    assert "torch" not in loaded
+    assert "aphrodite.engine.aphrodite_engine" not in loaded
+    assert _import_time_us("import aphrodite") < IMPORT_APHRODITE_BUDGET_US
+
+
+def test_lazy_exports():
+    loaded = _loaded_modules(
+        "from aphrodite import LLM, AsyncAphrodite, EngineArgs")
+    assert "aphrodite.endpoints.llm" in loaded
+    assert [module for module in LAZY_MODULES if module in loaded] == []
+
+    import aphrodite
+    with pytest.raises(AttributeError):
+        aphrodite.NotAnExport  # noqa: B018
+
+
+def test_quantization_methods_are_loaded_on_lookup():
+    assert list(QUANTIZATION_METHODS)[:2] == ["aqlm", "awq"]
+    assert "gptq" in QUANTIZATION_METHODS
+    assert "not_a_method" not in QUANTIZATION_METHODS
+    for method, config_cls in QUANTIZATION_METHODS.items():
+        assert issubclass(config_cls, QuantizationConfig), method
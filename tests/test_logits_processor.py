@@ -1,14 +1,18 @@
 import random
-from typing import Tuple
+from typing import List, Tuple
 from unittest.mock import patch
 
 import pytest
 import torch
 
+from aphrodite.common.logits_processor import (BatchedLogitsProcessor,
+                                               BiasLogitsProcessor,
+                                               LogitsProcessorBatch)
 from aphrodite.common.sequence import (SamplingParams, SequenceData,
                                        SequenceGroupMetadata)
 from aphrodite.common.utils import is_pin_memory_available
-from aphrodite.modeling.layers.logits_processor import LogitsProcessor
+from aphrodite.modeling.layers.logits_processor import (
+    LogitsProcessor, _apply_logits_processors)
 from aphrodite.modeling.sampling_metadata import SamplingMetadata
 from aphrodite.modeling.utils import set_random_seed
 
@@ -95,3 +99,90 @@ def test_logits_processors(seed: int, device: str):
                                fake_logits[:, 1],
                                rtol=1e-4,
                                atol=0.0)
+
+
+class CountingBatchedLogitsProcessor(BatchedLogitsProcessor):
+    """Sets the logit of the last output token of each row to its number of
+    prompt tokens."""
+
+    def __init__(self):
+        self.batches: List[List[int]] = []
+
+    def apply_batch(self, logits: torch.Tensor,
+                    batch: LogitsProcessorBatch) -> None:
+        self.batches.append(batch.rows)
+        rows = batch.get_rows(logits.device)
+        output_token_ids = batch.get_output_token_ids(logits.device)
+        prompt_lens = (batch.get_prompt_token_ids(logits.device) >= 0).sum(-1)
+        logits[rows, output_token_ids[:, -1]] = prompt_lens.to(logits.dtype)
+
+
+@pytest.mark.parametrize("seed", list(range(8)))
+@pytest.mark.parametrize("device", CUDA_DEVICES)
+def test_batched_logits_processors(seed: int, device: str):
+    """Batched processors are called once per step with all of their rows,
+    and mixed with per-row processors in the order of each request."""
+    set_random_seed(seed)
+    torch.set_default_device(device)
+    vocab_size = 64
+    counting = CountingBatchedLogitsProcessor()
+    bias = BiasLogitsProcessor({5: 1.0, 7: -2.0})
+
+    def double(token_ids, logits):
+        return logits * 2
+
+    def pick_prompt_len(prompt_token_ids, token_ids, logits):
+        logits[len(prompt_token_ids)] = 100.0
+        return logits
+
+    choices = [[counting], [double, counting], [bias, double, counting],
+               [pick_prompt_len, bias], [double], []]
+    seq_group_metadata_list = []
+    seq_lens = []
+    for i in range(random.randint(1, 12)):
+        prompt = list(range(random.randint(1, 10)))
+        output = [random.randrange(vocab_size) for _ in range(3)]
+        seq_group_metadata_list.append(
+            SequenceGroupMetadata(
+                request_id=f"test_{i}",
+                is_prompt=False,
+                seq_data={0: SequenceData.from_seqs(prompt, output)},
+                sampling_params=SamplingParams(
+                    logits_processors=random.choice(choices)),
+                block_tables={0: [1]},
+            ))
+        seq_lens.append(seq_group_metadata_list[-1].seq_data[0].get_len())
+    sampling_metadata = SamplingMetadata.prepare(
+        seq_group_metadata_list,
+        seq_lens,
+        query_lens=[1] * len(seq_lens),
+        device=device,
+        pin_memory=is_pin_memory_available())
+    logits = torch.randn(len(seq_lens), vocab_size)
+
+    expected = logits.clone()
+    for row, seq_group_metadata in enumerate(seq_group_metadata_list):
+        seq_data = seq_group_metadata.seq_data[0]
+        for processor in seq_group_metadata.sampling_params.logits_processors:
+            if processor is counting:
+                expected[row, seq_data.output_token_ids[-1]] = len(
+                    seq_data.prompt_token_ids)
+            elif processor is bias:
+                expected[row] = bias(seq_data.output_token_ids, expected[row])
+            elif processor is pick_prompt_len:
+                expected[row] = processor(seq_data.prompt_token_ids,
+                                          seq_data.output_token_ids,
+                                          expected[row])
+            else:
+                expected[row] = processor(seq_data.output_token_ids,
+                                          expected[row])
+
+    actual = _apply_logits_processors(logits, sampling_metadata)
+    torch.testing.assert_close(actual, expected)
+    # At most one call per stage, with every row using the processor there.
+    counting_rows = [
+        row for row, seq_group_metadata in enumerate(seq_group_metadata_list)
+        if counting in seq_group_metadata.sampling_params.logits_processors
+    ]
+    assert sorted(sum(counting.batches, [])) == counting_rows
+    assert len(counting.batches) <= 3
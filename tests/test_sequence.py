@@ -96,3 +96,59 @@ def test_sequence_group_stage():
     assert seq_group.is_prefill() is True
     seq_group.update_num_computed_tokens(1)
     assert seq_group.is_prefill() is False
+
+
+def test_sequence_data_token_position_index():
+    seq_data = SequenceData.from_seqs([1, 2, 1], [3])
+    index = seq_data.get_token_position_index()
+    assert list(index.last_positions(1, 8)) == [0, 2]
+    assert list(index.last_positions(4, 8)) == []
+
+    # The index is kept up to date as tokens are appended.
+    seq_data.append_token_id(1, logprob=0.0)
+    assert seq_data.get_token_position_index() is index
+    assert list(index.last_positions(1, 2)) == [2, 4]
+    assert list(index.last_positions(1, 0)) == [0, 2, 4]
+    assert len(index) == seq_data.get_len()
+
+    # Replacing the output tokens invalidates it.
+    seq_data.output_token_ids = [2]
+    assert list(
+        seq_data.get_token_position_index().last_positions(2, 8)) == [1, 3]
+
+
+def test_sequence_data_ngram_index():
+    seq_data = SequenceData.from_seqs([1, 2, 3], [1])
+    index = seq_data.get_ngram_index(2)
+    assert index.banned_tokens() == {2}
+    assert seq_data.get_ngram_index(3).banned_tokens() == set()
+
+    # Both indices are kept up to date as tokens are appended.
+    seq_data.append_token_id(2, logprob=0.0)
+    assert seq_data.get_ngram_index(2) is index
+    assert index.banned_tokens() == {3}
+    assert seq_data.get_ngram_index(3).banned_tokens() == {3}
+
+    # With a size of 1 every token seen so far is banned.
+    assert seq_data.get_ngram_index(1).banned_tokens() == {1, 2, 3}
+
+
+def test_sequence_data_prompt_lookup_index():
+    seq_data = SequenceData.from_seqs([1, 2, 3, 1, 2, 4, 1, 2], [4])
+    index = seq_data.get_prompt_lookup_index(1, 2)
+    # [2, 4] was seen once, followed by 1 at position 6.
+    assert index.lookup(4) == [6]
+    assert index.continuation(6, 4) == [1, 2, 4, 4]
+
+    # The index is kept up to date as tokens are appended. [1, 2] was
+    # followed by 4 twice and by 3 once.
+    seq_data.append_token_id(1, logprob=0.0)
+    seq_data.append_token_id(2, logprob=0.0)
+    assert seq_data.get_prompt_lookup_index(1, 2) is index
+    assert index.lookup(4) == [5, 2]
+    assert index.lookup(1) == [5]
+    assert len(index) == seq_data.get_len()
+
+    # Nothing to propose when the suffix was never seen before.
+    seq_data.append_token_id(9, logprob=0.0)
+    assert index.lookup() == []
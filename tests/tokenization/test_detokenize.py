@@ -4,7 +4,7 @@ import pytest
 from transformers import AutoTokenizer
 
 from aphrodite.common.sequence import (Logprob, SamplingParams, Sequence,
-                                       SequenceGroup)
+                                       SequenceGroup, SequenceOutput)
 from aphrodite.transformers_utils.detokenizer import (Detokenizer,
                                                       detokenize_incrementally)
 from aphrodite.transformers_utils.tokenizer_group import get_tokenizer_group
@@ -120,10 +120,10 @@ def create_complete_sequence_token_ids(complete_sequence: str,
     return complete_sequence_token_ids
 
 
-def create_sequence(prompt_token_ids=None):
+def create_sequence(prompt_token_ids=None, seq_id=0):
     prompt_token_ids = prompt_token_ids or [1]
     return Sequence(
-        seq_id=0,
+        seq_id=seq_id,
         inputs={
             "prompt": "<s>",
             "prompt_token_ids": prompt_token_ids,
@@ -185,6 +185,57 @@ def test_decode_sequence_logprobs(complete_sequence: str,
         assert sequential_result == complete_sequence
 
 
+@pytest.mark.parametrize("tokenizer_name", TOKENIZERS)
+@pytest.mark.parametrize("skip_special_tokens", [True, False])
+def test_decode_sequences_batched(tokenizer_name: str,
+                                  detokenizer: Detokenizer,
+                                  skip_special_tokens: bool):
+    """Verify that decoding the sequences of a step in a batch gives the same
+    text and logprobs as decoding them one by one."""
+    sampling_params = SamplingParams(skip_special_tokens=skip_special_tokens,
+                                     logprobs=2)
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+    all_token_ids = [tokenizer(truth)["input_ids"] for truth in TRUTH]
+
+    sequential_seqs = [
+        create_sequence(token_ids[:2], seq_id=i)
+        for i, token_ids in enumerate(all_token_ids)
+    ]
+    batched_seqs = [
+        create_sequence(token_ids[:2], seq_id=len(all_token_ids) + i)
+        for i, token_ids in enumerate(all_token_ids)
+    ]
+    for step in range(2, max(map(len, all_token_ids))):
+        batch = []
+        for seq, token_ids in zip(batched_seqs, all_token_ids):
+            if step < len(token_ids):
+                logprobs = create_dummy_logprobs([token_ids[step]])[0]
+                batch.append((seq, sampling_params,
+                              SequenceOutput(0, token_ids[step], logprobs)))
+        detokenizer.decode_sequences(batch)
+        for seq, _, output in batch:
+            seq.append_token_id(output.output_token, output.logprobs)
+            detokenizer.decode_sequence_inplace(seq, sampling_params)
+
+        for seq, token_ids in zip(sequential_seqs, all_token_ids):
+            if step < len(token_ids):
+                logprobs = create_dummy_logprobs([token_ids[step]])[0]
+                seq.append_token_id(token_ids[step], logprobs)
+                detokenizer.decode_sequence_inplace(seq, sampling_params)
+
+    for sequential_seq, batched_seq in zip(sequential_seqs, batched_seqs):
+        assert batched_seq.output_text == sequential_seq.output_text
+        for sequential_logprobs, batched_logprobs in zip(
+                sequential_seq.output_logprobs, batched_seq.output_logprobs):
+            assert ({
+                token_id: logprob.decoded_token
+                for token_id, logprob in batched_logprobs.items()
+            } == {
+                token_id: logprob.decoded_token
+                for token_id, logprob in sequential_logprobs.items()
+            })
+
+
 @pytest.mark.parametrize("complete_sequence", TRUTH)
 @pytest.mark.parametrize("tokenizer_name", TOKENIZERS)
 def test_decode_prompt_logprobs(complete_sequence_token_ids: List[int],
@@ -1,6 +1,7 @@
 import asyncio
 import os
 import sys
+from concurrent.futures.process import BrokenProcessPool
 from typing import List, Optional
 from unittest.mock import patch
 
@@ -9,6 +10,8 @@ from transformers import AutoTokenizer, PreTrainedTokenizerBase
 
 from aphrodite.transformers_utils.tokenizer_group import (TokenizerGroup,
                                                           get_tokenizer_group)
+from aphrodite.transformers_utils.tokenizer_group.process_tokenizer_group import (  # noqa: E501
+    ProcessTokenizerGroupPool)
 from aphrodite.transformers_utils.tokenizer_group.ray_tokenizer_group import (
     RayTokenizerGroupPool)
 
@@ -28,7 +31,7 @@ class CustomTokenizerGroup(TokenizerGroup):
 
 @pytest.mark.asyncio
 @pytest.mark.parametrize("tokenizer_group_type",
-                         [None, "ray", CustomTokenizerGroup])
+                         [None, "ray", "process", CustomTokenizerGroup])
 async def test_tokenizer_group(tokenizer_group_type):
     reference_tokenizer = AutoTokenizer.from_pretrained("gpt2")
     tokenizer_group = get_tokenizer_group(
@@ -52,7 +55,7 @@ async def test_tokenizer_group(tokenizer_group_type):
 
 
 @pytest.mark.asyncio
-@pytest.mark.parametrize("tokenizer_group_type", ["ray"])
+@pytest.mark.parametrize("tokenizer_group_type", ["ray", "process"])
 async def test_tokenizer_group_pool(tokenizer_group_type):
     reference_tokenizer = AutoTokenizer.from_pretrained("gpt2")
     tokenizer_group_pool = get_tokenizer_group(
@@ -212,3 +215,57 @@ async def test_tokenizer_group_ray_pool_fault_tolerance(tokenizer_group_type):
                                             lora_request=None)
     # Actors should stay the same.
     assert tokenizer_group_pool.tokenizer_actors == tokenizer_actors
+
+
+def _tokenize(tokenizer: PreTrainedTokenizerBase, prompt: str,
+              add_special_tokens: bool) -> List[int]:
+    return tokenizer(prompt, add_special_tokens=add_special_tokens).input_ids
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tokenizer_group_type", [None, "process"])
+async def test_tokenizer_group_run_async(tokenizer_group_type):
+    reference_tokenizer = AutoTokenizer.from_pretrained("gpt2")
+    tokenizer_group = get_tokenizer_group(
+        get_tokenizer_pool_config(tokenizer_group_type),
+        tokenizer_id="gpt2",
+        enable_lora=False,
+        max_num_seqs=1,
+        max_input_length=None,
+    )
+    # More calls than the process pool lets through at once.
+    results = await asyncio.gather(*[
+        tokenizer_group.run_async(
+            _tokenize, f"prompt {i}", add_special_tokens=False)
+        for i in range(20)
+    ])
+    assert results == [
+        reference_tokenizer(f"prompt {i}", add_special_tokens=False).input_ids
+        for i in range(20)
+    ]
+
+
+class ExitingTokenizerGroup(TokenizerGroup):
+
+    def encode(self, *args, **kwargs):
+        os._exit(1)
+
+
+class ExitingProcessTokenizerGroupPool(ProcessTokenizerGroupPool):
+    _worker_cls = ExitingTokenizerGroup
+
+
+@pytest.mark.asyncio
+async def test_process_tokenizer_group_pool_unhealthy():
+    tokenizer_group_pool = ExitingProcessTokenizerGroupPool.from_config(
+        get_tokenizer_pool_config("process"),
+        tokenizer_id="gpt2",
+        enable_lora=False,
+        max_num_seqs=1,
+        max_input_length=None)
+    with pytest.raises(BrokenProcessPool):
+        await tokenizer_group_pool.encode_async(request_id="1",
+                                                prompt="prompt",
+                                                lora_request=None)
+    with pytest.raises(RuntimeError):
+        tokenizer_group_pool.check_health()
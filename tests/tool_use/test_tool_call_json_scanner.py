@@ -0,0 +1,198 @@
+import json
+import random
+from typing import Any, Dict, List, Tuple
+from unittest.mock import MagicMock
+
+import pytest
+
+from aphrodite.endpoints.openai.protocol import ChatCompletionRequest
+from aphrodite.endpoints.openai.tool_parsers import (Hermes2ProToolParser,
+                                                     Llama3JsonToolParser,
+                                                     MistralToolParser)
+from aphrodite.endpoints.openai.tool_parsers.utils import (
+    ToolCallJsonScanner, complete_json_prefix)
+
+TOOL_CALLS = [{
+    "name": "get_current_weather",
+    "arguments": {
+        "city": "Dallas, \"TX\"",
+        "unit": "fahrenheit",
+        "days": [1, 2.5, -3e2],
+        "options": {
+            "alerts": True,
+            "hourly": None,
+            "note": "café 🌤\n\\"
+        }
+    }
+}, {
+    "name": "get_time",
+    "arguments": {}
+}]
+
+
+def split_randomly(text: str, max_len: int = 6) -> List[str]:
+    chunks = []
+    while text:
+        size = random.randint(1, max_len)
+        chunks.append(text[:size])
+        text = text[size:]
+    return chunks
+
+
+@pytest.mark.parametrize("seed", list(range(10)))
+@pytest.mark.parametrize("indent", [None, 2])
+def test_scanner_streams_arguments_like_json_dumps(seed: int, indent):
+    random.seed(seed)
+    text = json.dumps(TOOL_CALLS, indent=indent) + " trailing text"
+    scanner = ToolCallJsonScanner(call_depth=2)
+    streamed = [""] * len(TOOL_CALLS)
+    for chunk in split_randomly(text):
+        scanner.feed(chunk)
+        for i, tool_call in enumerate(scanner.tool_calls):
+            streamed[i] += tool_call.take_arguments_delta()
+
+    assert scanner.done
+    assert text[:scanner.end] == json.dumps(TOOL_CALLS, indent=indent)
+    assert [tool_call.name for tool_call in scanner.tool_calls
+            ] == [tool_call["name"] for tool_call in TOOL_CALLS]
+    assert [tool_call.arguments for tool_call in scanner.tool_calls
+            ] == [tool_call["arguments"] for tool_call in TOOL_CALLS]
+    assert streamed == [
+        json.dumps(tool_call["arguments"]) for tool_call in TOOL_CALLS
+    ]
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_scanner_streams_completable_prefixes(indent):
+    """Wherever generation stops, the streamed arguments are completed to
+    valid JSON by appending to them."""
+    text = json.dumps(TOOL_CALLS[0], indent=indent)
+    for end in range(len(text)):
+        scanner = ToolCallJsonScanner()
+        scanner.feed(text[:end])
+        if not scanner.tool_calls:
+            continue
+        streamed = scanner.tool_calls[0].take_arguments_delta()
+        if not streamed:
+            continue
+        completed = json.loads(streamed + complete_json_prefix(streamed))
+        assert isinstance(completed, dict)
+
+
+def test_scanner_rejects_invalid_json():
+    scanner = ToolCallJsonScanner()
+    scanner.feed('{"name": "get_time", ')
+    with pytest.raises(ValueError):
+        scanner.feed('"arguments": {]')
+    # Further text is ignored.
+    scanner.feed('}}')
+    assert not scanner.done
+
+
+def make_tokenizer(vocab: Dict[str, int]) -> MagicMock:
+    tokenizer = MagicMock()
+    tokenizer.get_vocab.return_value = vocab
+    tokenizer.encode.side_effect = lambda text, **kwargs: [vocab[text]]
+    return tokenizer
+
+
+def stream(parser, chunks: List[Tuple[str, List[int]]]) -> List[Any]:
+    request = ChatCompletionRequest(model="model", messages=[])
+    previous_text = ""
+    previous_token_ids: List[int] = []
+    deltas = []
+    for delta_text, delta_token_ids in chunks:
+        current_text = previous_text + delta_text
+        current_token_ids = previous_token_ids + delta_token_ids
+        delta = parser.extract_tool_calls_streaming(
+            previous_text, current_text, delta_text, previous_token_ids,
+            current_token_ids, delta_token_ids, request)
+        if delta is not None:
+            deltas.append(delta)
+        previous_text = current_text
+        previous_token_ids = current_token_ids
+    return deltas
+
+
+def check_streamed_tool_calls(parser,
+                              deltas,
+                              tool_calls: List[Dict] = TOOL_CALLS) -> None:
+    names: Dict[int, List[str]] = {}
+    arguments: Dict[int, str] = {}
+    for delta in deltas:
+        for tool_call in delta.tool_calls:
+            if tool_call.function.name is not None:
+                names.setdefault(tool_call.index,
+                                 []).append(tool_call.function.name)
+            arguments[tool_call.index] = arguments.get(
+                tool_call.index, "") + (tool_call.function.arguments or "")
+
+    assert names == {
+        i: [tool_call["name"]]
+        for i, tool_call in enumerate(tool_calls)
+    }
+    assert arguments == {
+        i: json.dumps(tool_call["arguments"])
+        for i, tool_call in enumerate(tool_calls)
+    }
+    assert parser.streamed_args_for_tool == [
+        json.dumps(tool_call["arguments"]) for tool_call in tool_calls
+    ]
+    assert parser.prev_tool_call_arr == tool_calls
+
+
+def text_chunks(text: str) -> List[Tuple[str, List[int]]]:
+    return [(chunk, [0]) for chunk in split_randomly(text)]
+
+
+@pytest.mark.parametrize("seed", list(range(5)))
+def test_hermes_streaming(seed: int):
+    random.seed(seed)
+    vocab = {"<tool_call>": 1, "</tool_call>": 2}
+    parser = Hermes2ProToolParser(make_tokenizer(vocab))
+    chunks = []
+    for tool_call in TOOL_CALLS:
+        chunks.append(("<tool_call>", [1]))
+        chunks += text_chunks("\n" + json.dumps(tool_call) + "\n")
+        chunks.append(("</tool_call>", [2]))
+    check_streamed_tool_calls(parser, stream(parser, chunks))
+
+
+@pytest.mark.parametrize("seed", list(range(5)))
+def test_mistral_streaming(seed: int):
+    random.seed(seed)
+    parser = MistralToolParser(make_tokenizer({"[TOOL_CALLS]": 1}))
+    chunks = [("[TOOL_CALLS]", [1])] + text_chunks(json.dumps(TOOL_CALLS))
+    check_streamed_tool_calls(parser, stream(parser, chunks))
+
+
+@pytest.mark.parametrize("seed", list(range(5)))
+def test_llama_streaming(seed: int):
+    random.seed(seed)
+    parser = Llama3JsonToolParser(make_tokenizer({"<|python_tag|>": 1}))
+    text = "; ".join(
+        json.dumps({
+            "name": tool_call["name"],
+            "parameters": tool_call["arguments"]
+        }) for tool_call in TOOL_CALLS)
+    chunks = [("<|python_tag|>", [1])] + text_chunks(text)
+    # Llama calls the arguments "parameters", but they are reported the same.
+    check_streamed_tool_calls(parser, stream(parser, chunks))
+
+
+@pytest.mark.parametrize("split", [0, 10, 30])
+def test_llama_streaming_calls_completing_in_one_delta(split: int):
+    """Tool calls that complete, and start, in the same delta are all sent,
+    names included."""
+    parser = Llama3JsonToolParser(make_tokenizer({"<|python_tag|>": 1}))
+    tool_calls = TOOL_CALLS + [{"name": "get_date", "arguments": {"a": 1}}]
+    text = "; ".join(
+        json.dumps({
+            "name": tool_call["name"],
+            "parameters": tool_call["arguments"]
+        }) for tool_call in tool_calls)
+    chunks = [("<|python_tag|>", [1])]
+    if split:
+        chunks.append((text[:split], [0]))
+    chunks.append((text[split:], [0]))
+    check_streamed_tool_calls(parser, stream(parser, chunks), tool_calls)
@@ -0,0 +1,101 @@
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+import torch
+
+from aphrodite.common.config import (CacheConfig, DeviceConfig, ModelConfig,
+                                     ParallelConfig)
+from aphrodite.common.sequence import ExecuteModelRequest
+from aphrodite.common.utils import GiB_bytes
+from aphrodite.processing.block.offload import PrefixCacheTransfer
+from aphrodite.worker.cache_engine import CacheEngine, PrefixCacheStore
+from aphrodite.worker.cpu_worker import CPUCacheEngine, CPUWorker
+
+
+@pytest.mark.parametrize("block_dim", [0, 1])
+def test_prefix_cache_store_round_trip(block_dim: int, tmp_path):
+    """Blocks demoted to the CPU pool and saved to disk come back intact."""
+
+    def get_kv_cache_shape(num_blocks: int):
+        shape = [2, 2, 4, 8]
+        shape.insert(block_dim, num_blocks)
+        return tuple(shape)
+
+    num_layers = 2
+    gpu_cache = [
+        torch.randn(get_kv_cache_shape(4)) for _ in range(num_layers)
+    ]
+    expected = [layer.select(block_dim, 1).clone() for layer in gpu_cache]
+    store = PrefixCacheStore(get_kv_cache_shape,
+                             num_layers,
+                             torch.float32,
+                             num_cpu_blocks=2,
+                             num_disk_blocks=2,
+                             disk_path=str(tmp_path))
+    assert store.block_dim == block_dim
+
+    def transfer(*transfers):
+        store.transfer(gpu_cache, torch.tensor(transfers).view(-1, 3))
+
+    transfer((PrefixCacheTransfer.DEMOTE, 1, 0))
+    transfer((PrefixCacheTransfer.SAVE, 0, 1))
+    for layer in store.cpu_cache + gpu_cache:
+        layer.zero_()
+    transfer((PrefixCacheTransfer.LOAD, 1, 1),
+             (PrefixCacheTransfer.PROMOTE, 1, 3))
+    for layer, block in zip(gpu_cache, expected):
+        assert torch.equal(layer.select(block_dim, 3), block)
+
+
+def test_cpu_worker_prefix_cache_transfers(tmp_path):
+    """The CPU worker runs the prefix cache transfers of a step against its
+    cache engine, with a disk tier in a local directory."""
+    model_config = MagicMock(spec=ModelConfig)
+    model_config.dtype = torch.float32
+    model_config.is_attention_free = False
+    model_config.get_head_size.return_value = 8
+    model_config.get_sliding_window.return_value = None
+    model_config.get_num_kv_heads.return_value = 2
+    model_config.get_num_layers.return_value = 2
+    model_config.get_num_attention_layers.return_value = 2
+    cache_block_size = CacheEngine.get_cache_block_size(
+        CacheConfig(swap_space=0), model_config, ParallelConfig(1, 1))
+    cache_config = CacheConfig(
+        swap_space=0,
+        enable_prefix_caching=True,
+        prefix_cache_cpu_gb=2 * cache_block_size / GiB_bytes,
+        prefix_cache_disk_path=str(tmp_path),
+        prefix_cache_disk_gb=2 * cache_block_size / GiB_bytes)
+    cache_config.num_gpu_blocks = 4
+    cache_engine = CPUCacheEngine(cache_config, model_config,
+                                  ParallelConfig(1, 1), DeviceConfig("cpu"))
+    store = cache_engine.prefix_cache_store
+    assert store is not None
+    assert len(store.cpu_cache) == len(store.disk_cache) == 2
+    assert os.listdir(tmp_path)
+
+    for layer in cache_engine.cpu_cache:
+        layer.copy_(torch.randn_like(layer))
+    expected = [
+        layer.select(store.block_dim, 1).clone()
+        for layer in cache_engine.cpu_cache
+    ]
+    worker = SimpleNamespace(cache_engine=[cache_engine])
+
+    def step(*transfers):
+        execute_model_req = ExecuteModelRequest(
+            seq_group_metadata_list=[],
+            prefix_cache_transfers=list(transfers))
+        worker_input = CPUWorker.prepare_worker_input(worker,
+                                                      execute_model_req)
+        CPUWorker.execute_worker(worker, worker_input)
+
+    step((PrefixCacheTransfer.DEMOTE, 1, 0))
+    step((PrefixCacheTransfer.SAVE, 0, 1))
+    for layer in store.cpu_cache + cache_engine.cpu_cache:
+        layer.zero_()
+    step((PrefixCacheTransfer.LOAD, 1, 1), (PrefixCacheTransfer.PROMOTE, 1, 3))
+    for layer, block in zip(cache_engine.cpu_cache, expected):
+        assert torch.equal(layer.select(store.block_dim, 3), block)